@@ -5,7 +5,7 @@ a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[('assets', 'assets')],
+    datas=[('assets', 'assets'), ('difficulty_profile.json', '.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
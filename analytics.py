@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+analytics.py - Incrementally maintained combat/run statistics
+SaveSystem feeds every combat result and leaderboard run into
+CombatAggregates, so dashboard questions ("win rate vs Kidnapper",
+"fastest Hard run") are a dict lookup instead of a GROUP BY over the
+whole history. rebuild() recomputes everything from the raw tables.
+
+Updates are expressed as delta rows (combat_deltas / run_deltas) so the
+same deltas can be added onto the stored counters and the in-memory ones.
+"""
+from storage import AGGREGATE_COLUMNS, aggregate_is_empty, merge_aggregate
+
+# Dimensions combat results are counted under
+COMBAT_DIMENSIONS = ("enemy", "level", "class", "difficulty")
+# Dimensions completed runs (leaderboard entries) are counted under
+RUN_DIMENSIONS = ("class", "difficulty")
+
+
+class AggregateRow:
+    """Counters for one (dimension, key) pair"""
+    __slots__ = AGGREGATE_COLUMNS
+
+    def __init__(self, dimension, key, wins=0, losses=0, runs=0, total_time=0.0,
+                 min_time=None, max_time=None, total_damage=0, total_kills=0):
+        self.dimension = dimension
+        self.key = key
+        self.wins = wins
+        self.losses = losses
+        self.runs = runs
+        self.total_time = total_time
+        self.min_time = min_time
+        self.max_time = max_time
+        self.total_damage = total_damage
+        self.total_kills = total_kills
+
+    def as_tuple(self) -> tuple:
+        return tuple(getattr(self, col) for col in AGGREGATE_COLUMNS)
+
+    @property
+    def fights(self) -> int:
+        return self.wins + self.losses
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.fights if self.fights else 0.0
+
+    @property
+    def average_time(self):
+        return self.total_time / self.runs if self.runs else None
+
+
+def combat_deltas(enemy_name, level, result, char_class=None, difficulty=None, sign=1) -> list:
+    """Delta rows for one fight; sign=-1 takes it back out"""
+    keys = {"enemy": enemy_name, "level": level, "class": char_class, "difficulty": difficulty}
+    won = result == "Victory"
+    return [AggregateRow(dimension, str(keys[dimension]), wins=sign if won else 0,
+                         losses=0 if won else sign)
+            for dimension in COMBAT_DIMENSIONS if keys[dimension] is not None]
+
+
+def run_deltas(completion_time, total_damage, enemies_defeated, char_class=None, difficulty=None,
+               sign=1, dimensions=RUN_DIMENSIONS) -> list:
+    """Delta rows for one completed run; sign=-1 takes it back out.
+
+    min/max cannot be taken back out, so a negative delta leaves them alone.
+    """
+    keys = {"class": char_class, "difficulty": difficulty}
+    deltas = []
+    for dimension in dimensions:
+        if keys[dimension] is None:
+            continue
+        agg = AggregateRow(dimension, str(keys[dimension]), runs=sign,
+                           total_damage=sign * (total_damage or 0),
+                           total_kills=sign * (enemies_defeated or 0))
+        if completion_time is not None:
+            agg.total_time = sign * completion_time
+            if sign > 0:
+                agg.min_time = agg.max_time = completion_time
+        deltas.append(agg)
+    return deltas
+
+
+class CombatAggregates:
+    """Running counters keyed by (dimension, key), O(1) to update and query"""
+
+    def __init__(self, rows=()):
+        self.rows = {}
+        for row in rows:
+            agg = AggregateRow(*row)
+            self.rows[(agg.dimension, agg.key)] = agg
+
+    def merge(self, deltas) -> list:
+        """Add delta rows onto the counters; returns the rows that changed.
+
+        Rows whose counters all drop back to zero are removed.
+        """
+        changed = []
+        for delta in deltas:
+            key = (delta.dimension, delta.key)
+            old = self.rows.get(key)
+            row = merge_aggregate(old.as_tuple(), delta.as_tuple()) if old else delta.as_tuple()
+            agg = AggregateRow(*row)
+            if aggregate_is_empty(row):
+                self.rows.pop(key, None)
+            else:
+                self.rows[key] = agg
+            changed.append(agg)
+        return changed
+
+    def record_combat(self, enemy_name, level, result, char_class=None, difficulty=None) -> list:
+        """Count one fight; returns the rows that changed"""
+        return self.merge(combat_deltas(enemy_name, level, result, char_class, difficulty))
+
+    def record_run(self, completion_time, total_damage, enemies_defeated,
+                   char_class=None, difficulty=None) -> list:
+        """Count one completed run; returns the rows that changed"""
+        return self.merge(run_deltas(completion_time, total_damage, enemies_defeated,
+                                     char_class, difficulty))
+
+    def get(self, dimension, key) -> AggregateRow:
+        """Counters for one key (all zero if never seen)"""
+        return self.rows.get((dimension, str(key))) or AggregateRow(dimension, str(key))
+
+    def win_rate(self, dimension, key) -> float:
+        return self.get(dimension, key).win_rate
+
+    def dashboard(self, dimension) -> dict:
+        """{key: AggregateRow} for every key seen under a dimension"""
+        return {key: agg for (dim, key), agg in self.rows.items() if dim == dimension}
+
+    def as_rows(self) -> list:
+        return [agg.as_tuple() for agg in self.rows.values()]
+
+
+def rebuild(backend) -> CombatAggregates:
+    """Recompute aggregates from combat_history, leaderboard and characters"""
+    classes = {}
+
+    def class_of(name):
+        if name not in classes:
+            row = backend.load_character_row(name)
+            classes[name] = row["char_class"] if row else None
+        return classes[name]
+
+    aggregates = CombatAggregates()
+    for _, row in backend.iter_table("combat_history"):
+        aggregates.record_combat(row["enemy_name"], row["level"], row["result"],
+                                 class_of(row["player_name"]), row["difficulty"])
+    for _, row in backend.iter_table("leaderboard"):
+        aggregates.record_run(row["completion_time"], row["total_damage"], row["enemies_defeated"],
+                              class_of(row["player_name"]), row["difficulty"])
+    return aggregates
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+balancer.py - Offline difficulty balancing by batched simulation
+For every difficulty and enemy, searches HP and defense multipliers so
+that a typical player wins about as often, and in about as many turns, as
+TARGETS asks. Fights are simulated thousands at a time on VecCombatEnv
+(combat_env.py). The enemy plays its difficulty's move mix from
+enemy_ai.ENEMY_MODELS.
+
+- Common random numbers: every candidate is scored on the same seeds, so
+  the difference between two candidates is the stat change, not dice noise.
+- Early stopping: batches are added only while the win rate is still
+  within Z standard errors of the target.
+- The HP multiplier is bisected for the win-rate target at each defense
+  step. The defense step whose fights come closest to the turn target
+  wins.
+
+The result is written as a versioned difficulty profile that combat.py
+loads at startup (create_enemy_for_level and the pools pick it up):
+
+    python balancer.py [--seed N] [--out difficulty_profile.json] [--difficulty Hard ...]
+"""
+import argparse
+import json
+import math
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+from combat import (ENEMY_ACTIONS, LEVEL_1_ENEMIES, LEVEL_2_ENEMIES, LEVEL_3_ENEMIES, PROFILE_PATH,
+                    PROFILE_VERSION, load_difficulty_profile)
+from combat_env import ATTACK, DEFEND, SPECIAL, VecCombatEnv
+from enemy_ai import DEFAULT_ENEMY_MODEL, ENEMY_MODELS
+
+# (win rate, turns per fight) wanted for each difficulty and stage
+TARGETS = {
+    "Easy":   {1: (0.95, 14), 2: (0.85, 18), 3: (0.75, 22)},
+    "Normal": {1: (0.85, 17), 2: (0.70, 22), 3: (0.55, 26)},
+    "Hard":   {1: (0.65, 22), 2: (0.50, 27), 3: (0.35, 32)},
+}
+ENEMIES = LEVEL_1_ENEMIES + LEVEL_2_ENEMIES + LEVEL_3_ENEMIES
+
+BATCH = 2048              # fights per simulated batch
+MAX_BATCHES = 8           # per candidate
+Z = 3.0                   # early stop once the target is this many standard errors away
+HP_RANGE = (0.3, 3.0)     # HP multiplier search bounds
+BISECT_STEPS = 10
+DEF_STEPS = (0.5, 0.75, 1.0, 1.5, 2.0)
+WIN_TOLERANCE = 0.02      # loss weights: a miss this big in win rate...
+TURN_TOLERANCE = 0.10     # ...costs as much as this relative miss in fight length
+
+# The typical player the targets are for: special as soon as it is ready,
+# otherwise attack, with the odd defend
+PLAYER_DEFEND = 0.2
+
+
+def _player_policy(obs, rng):
+    ready = (obs[:, 4] > 0) & (obs[:, 5] < 1)
+    return np.where(ready, SPECIAL, np.where(rng.random(len(obs)) < PLAYER_DEFEND, DEFEND, ATTACK))
+
+
+def _enemy_policy(difficulty, rng):
+    model = ENEMY_MODELS.get(difficulty, DEFAULT_ENEMY_MODEL)
+    moves = np.array([ENEMY_ACTIONS.index(move) for move, _ in model])
+    edges = np.cumsum([weight for _, weight in model])
+    edges /= edges[-1]
+    return lambda obs: moves[np.minimum(np.searchsorted(edges, rng.random(len(obs)), side="right"), len(moves) - 1)]
+
+
+def simulate(template, hp_mult, def_mult, difficulty, seed, battles=BATCH):
+    """(wins, total turns) over the first fight of `battles` independent envs"""
+    enemy = dict(template, hp=int(template["hp"] * hp_mult), **{"def": max(0, round(template["def"] * def_mult))})
+    rng = np.random.default_rng(seed + 1)
+    env = VecCombatEnv(battles, seed=seed, difficulty=None, templates=[enemy],
+                       enemy_policy=_enemy_policy(difficulty, rng))
+    obs, _ = env.reset()
+    seen = np.zeros(battles, bool)
+    wins = turns = 0
+    while not seen.all():
+        obs, _, _, _, info = env.step(_player_policy(obs, rng))
+        first = info["done"] & ~seen
+        if first.any():
+            wins += int(info["won"][first].sum())
+            turns += int(info["episode_length"][first].sum())
+            seen |= first
+    return wins, turns
+
+
+class Balancer:
+    def __init__(self, seed=0, batch=BATCH, max_batches=MAX_BATCHES, z=Z):
+        self.seed = seed
+        self.batch = batch
+        self.max_batches = max_batches
+        self.z = z
+        self.battles = 0
+
+    def evaluate(self, template, hp_mult, def_mult, difficulty, target_win=None):
+        """(win rate, turns per fight). With target_win, stops as soon as
+        the win rate is clearly above or below it."""
+        wins = turns = fights = 0
+        for k in range(self.max_batches):
+            # Same seeds for every candidate: common random numbers
+            w, t = simulate(template, hp_mult, def_mult, difficulty, self.seed + 1000 * k, self.batch)
+            wins, turns, fights = wins + w, turns + t, fights + self.batch
+            if target_win is not None:
+                p = wins / fights
+                se = math.sqrt(max(p * (1 - p), 1e-4) / fights)
+                if abs(p - target_win) > self.z * se:
+                    break
+        self.battles += fights
+        return wins / fights, turns / fights
+
+    def tune(self, template, difficulty):
+        """Best {"hp", "def", "win_rate", "turns"} for one enemy at one difficulty"""
+        target_win, target_turns = TARGETS[difficulty][template["level"]]
+        best, seen_defense = None, set()
+        for def_mult in DEF_STEPS:
+            defense = max(0, round(template["def"] * def_mult))
+            if defense in seen_defense:
+                continue
+            seen_defense.add(defense)
+            low, high = HP_RANGE
+            for _ in range(BISECT_STEPS):
+                mid = math.sqrt(low * high)
+                win, _ = self.evaluate(template, mid, def_mult, difficulty, target_win)
+                if win > target_win:
+                    low = mid   # too easy: more HP
+                else:
+                    high = mid
+            hp_mult = math.sqrt(low * high)
+            win, turns = self.evaluate(template, hp_mult, def_mult, difficulty)
+            loss = (((win - target_win) / WIN_TOLERANCE) ** 2
+                    + ((turns - target_turns) / target_turns / TURN_TOLERANCE) ** 2)
+            if best is None or loss < best[0]:
+                best = (loss, {"hp": round(hp_mult, 3), "def": def_mult,
+                               "win_rate": round(win, 3), "turns": round(turns, 1)})
+        return best[1]
+
+    def run(self, difficulties=tuple(TARGETS), verbose=True) -> dict:
+        profile = {}
+        for difficulty in difficulties:
+            profile[difficulty] = {}
+            for template in ENEMIES:
+                entry = profile[difficulty][template["name"]] = self.tune(template, difficulty)
+                if verbose:
+                    target_win, target_turns = TARGETS[difficulty][template["level"]]
+                    print(f"   {difficulty:<6} {template['name']:<13} HP x{entry['hp']:<6} DEF x{entry['def']:<5}"
+                          f" win {entry['win_rate']:.0%} (target {target_win:.0%}),"
+                          f" {entry['turns']:.1f} turns (target {target_turns})")
+        return profile
+
+
+def write_profile(difficulties: dict, path=PROFILE_PATH, seed=0):
+    """Save a profile in the format combat.load_difficulty_profile reads"""
+    profile = {
+        "version": PROFILE_VERSION,
+        "created": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "seed": seed,
+        "targets": {d: {str(level): list(t) for level, t in levels.items()} for d, levels in TARGETS.items()},
+        "difficulties": difficulties,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+        f.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Balance enemy stats for each difficulty")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=PROFILE_PATH)
+    parser.add_argument("--difficulty", action="append", choices=list(TARGETS),
+                        help="only these difficulties (default: all)")
+    args = parser.parse_args(argv)
+
+    balancer = Balancer(seed=args.seed)
+    start = time.perf_counter()
+    difficulties = balancer.run(args.difficulty or tuple(TARGETS))
+    if args.difficulty:
+        # Keep the difficulties we didn't rebalance
+        difficulties = {**load_difficulty_profile(args.out), **difficulties}
+        difficulties = {d: difficulties[d] for d in TARGETS if d in difficulties}
+    write_profile(difficulties, args.out, args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Wrote {args.out} (profile v{PROFILE_VERSION}): {balancer.battles:,} simulated fights "
+          f"in {elapsed:.0f}s")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,8 +8,14 @@ import os
 import random
 import time
 from character import Character
-from combat import Combat
+from combat import DIFFICULTY_MULTIPLIERS, ENEMY_STRIKE, EVENT_ENEMY_ATTACK, EVENT_ENEMY_HEAVY, FLEE_CHANCE
+from encounter import Encounter, create_encounter
+from endless import create_endless_encounter, history_level, trim_history
+from game_loop import FixedTimestep, SimTimers, Tween
+from enemy_ai import EnemyAI
+from hint_engine import CPU_SHARE, HintEngine
 from save_system import SaveSystem
+from render import open_canvas
 from resources import asset_manager, play_level_music
 
 # Config
@@ -19,9 +25,12 @@ ASSETS_DIR = "assets"
 SPRITES_DIR = os.path.join(ASSETS_DIR, "sprites")
 AUDIO_DIR = os.path.join(ASSETS_DIR, "audio")
 
-# Animation timings (in milliseconds)
+# Timings in milliseconds of simulation time (see game_loop.py)
 DAMAGE_ANIMATION_DURATION = 300  # Show damage sprite for 300ms
 VICTORY_ANIMATION_DURATION = 2000  # Show victory sprite for 2 seconds
+ENEMY_TURN_DELAY = 500  # Enemy moves half a second after the player
+GAME_OVER_DELAY = 2000  # Defeat/flee message stays up before the GUI closes
+SAVE_INTERVAL = 30000  # Auto-save every 30 seconds
 
 # Helper: load image or None
 def load_image(name, scale=1.0):
@@ -50,18 +59,34 @@ def load_character_sprites(sprite_path, scale=1.0):
     base_name = sprite_path.rsplit('.', 1)[0]
     
     # Load normal sprite
-    sprites['normal'] = load_image(sprite_path, scale)
+    sprites['normal'] = asset_manager.load_image(sprite_path, scale)
     
     # Load damage sprite
     damage_name = f"{base_name}_damage.png"
-    sprites['damage'] = load_image(damage_name, scale)
+    sprites['damage'] = asset_manager.load_image(damage_name, scale)
     
     # Load victory sprite (optional)
     victory_name = f"{base_name}_victory.png"
-    sprites['victory'] = load_image(victory_name, scale)
+    sprites['victory'] = asset_manager.load_image(victory_name, scale)
     
     return sprites
 
+def load_encounter_sprites(combat: Encounter):
+    """Sprite sets for every enemy and ally in an encounter. Images come from
+    the asset manager's cache, so a gang of the same enemy shares surfaces."""
+    scale = 0.8 if len(combat.enemies) == 1 else 0.55
+    sprites = {c.character.sprite_path: load_character_sprites(c.character.sprite_path, scale)
+               for c in combat.enemies}
+    for ally in combat.allies:
+        sprites[("ally", ally.character.sprite_path)] = load_character_sprites(ally.character.sprite_path, 0.45)
+    return sprites
+
+def enemy_slots(count):
+    """Screen positions for count enemy sprites (a lone enemy keeps the classic spot)"""
+    if count == 1:
+        return [(640, 120)]
+    return [(560 + (i % 3) * 130, 130 + (i // 3) * 70 + (i % 2) * 60) for i in range(count)]
+
 # Helper: load sound (optional)
 def load_sound(name):
     """Load sound with error handling"""
@@ -75,82 +100,47 @@ def load_sound(name):
         return None
 
 # UI helpers
-def draw_text(screen, text, x, y, font, color=(255,255,255)):
+def draw_text(canvas, text, x, y, font, color=(255,255,255)):
     """Draw text with error handling"""
     try:
-        surf = font.render(str(text), True, color)
-        screen.blit(surf, (x, y))
+        canvas.text(text, (x, y), font, color)
     except Exception as e:
         print(f"⚠️ Error drawing text: {e}")
 
-def draw_hp_bar(screen, x, y, current, maximum, w=250, h=20):
+def draw_hp_bar(canvas, x, y, current, maximum, w=250, h=20):
     """Draw HP bar"""
     try:
         ratio = max(0, current) / max(1, maximum)
-        pygame.draw.rect(screen, (120, 10, 10), (x, y, w, h))
-        pygame.draw.rect(screen, (20, 200, 20), (x, y, int(w*ratio), h))
-        pygame.draw.rect(screen, (255, 255, 255), (x, y, w, h), 2)
+        canvas.rect((120, 10, 10), (x, y, w, h))
+        canvas.rect((20, 200, 20), (x, y, int(w*ratio), h))
+        canvas.rect((255, 255, 255), (x, y, w, h), 2)
     except Exception as e:
         print(f"⚠️ Error drawing HP bar: {e}")
 
-# Nigerian-themed enemies with difficulty scaling
-LEVEL_1_ENEMIES = [
-    {"name":"Bandit", "level":1, "hp":100, "atk":4, "def":2, "sprite":"bandit.png"},
-    {"name":"Area Boy", "level":1, "hp":90, "atk":5, "def":1, "sprite":"bandit.png"},
-]
-
-LEVEL_2_ENEMIES = [
-    {"name":"Kidnapper", "level":2, "hp":150, "atk":6, "def":3, "sprite":"kidnapper.png"},
-    {"name":"Armed Robber", "level":2, "hp":140, "atk":7, "def":2, "sprite":"kidnapper.png"},
-]
-
-LEVEL_3_ENEMIES = [
-    {"name":"Politician", "level":3, "hp":200, "atk":8, "def":4, "sprite":"politician.png"},
-]
-
 # Preload optional sounds
 SOUND_ATTACK = None
 SOUND_HEAL = None
 SOUND_WIN = None
 SOUND_LOSE = None
 
-def create_enemy_for_level(level: int, difficulty_multiplier: float = 1.0):
-    """Create enemy based on current level with difficulty scaling"""
-    try:
-        if level == 1:
-            base = random.choice(LEVEL_1_ENEMIES)
-        elif level == 2:
-            base = random.choice(LEVEL_2_ENEMIES)
-        else:  # Level 3
-            base = random.choice(LEVEL_3_ENEMIES)
-        
-        # Apply difficulty multiplier to HP
-        scaled_hp = int(base["hp"] * difficulty_multiplier)
-        
-        e = Character(
-            name=base["name"],
-            level=base["level"],
-            hp=scaled_hp,
-            max_hp=scaled_hp,
-            attack=base["atk"],
-            defense=base["def"],
-            sprite_path=base.get("sprite")
-        )
-        return e
-    except Exception as e:
-        print(f"❌ Error creating enemy: {e}")
-        return Character(name="Enemy", level=1, hp=100, max_hp=100, attack=5, defense=2)
-
 # Main GUI runner
-def run_battle_gui_with_player(player: Character, save_system: SaveSystem, current_level: int = 1):
-    """Main battle GUI loop with animations"""
+def run_battle_gui_with_player(player: Character, save_system: SaveSystem, current_level: int = 1,
+                               endless: bool = False, seed: int = None, monitor=None, bot=None):
+    """Main battle GUI loop with animations.
+
+    endless=True keeps going past stage 3 with endless.py's procedural
+    enemies (seeded by seed, random if None) until the player falls.
+    monitor (endless.SoakMonitor) is told about every finished fight. bot is
+    called each frame the player can act, with whether the special is ready,
+    and answers "attack", "defend", "special", "quit" or None.
+    """
     global SOUND_ATTACK, SOUND_HEAL, SOUND_WIN, SOUND_LOSE
     
+    enemy_ai = hint_engine = None
     try:
         pygame.init()
         pygame.mixer.init()
-        screen = pygame.display.set_mode((WIDTH, HEIGHT))
-        pygame.display.set_caption("⚔️ Escape the Streets of Nigeria")
+        canvas = open_canvas((WIDTH, HEIGHT), "⚔️ Escape the Streets of Nigeria")
         clock = pygame.time.Clock()
         
         # Font loading with fallback
@@ -162,15 +152,14 @@ def run_battle_gui_with_player(player: Character, save_system: SaveSystem, curre
             font = pygame.font.Font(None, 22)
             bigfont = pygame.font.Font(None, 32)
 
-        # Load settings
-        settings = save_system.load_settings()
+        # Settings live in memory on the save system - reads cost no I/O
+        settings = save_system.settings
         
         # Get difficulty multiplier
-        difficulty_multipliers = {"Easy": 0.75, "Normal": 1.0, "Hard": 1.5}
-        difficulty_mult = difficulty_multipliers.get(settings['difficulty'], 1.0)
+        difficulty_mult = DIFFICULTY_MULTIPLIERS.get(settings.difficulty, 1.0)
 
         # Load optional audio (respect settings)
-        if settings['sound_enabled']:
+        if settings.sound_enabled:
             SOUND_ATTACK = load_sound("attack.wav")
             SOUND_HEAL = load_sound("heal.wav")
             SOUND_WIN = load_sound("victory.wav")
@@ -180,24 +169,109 @@ def run_battle_gui_with_player(player: Character, save_system: SaveSystem, curre
         run_start_time = time.time()
         total_damage_dealt = 0
         enemies_defeated = 0
+        completion_time = 0
 
         # Game state
         game_level = current_level
-        enemy = create_enemy_for_level(game_level, difficulty_mult)
-        combat = Combat(player, enemy)
-        message = get_level_intro(game_level, enemy)
+        if endless and seed is None:
+            seed = random.randrange(1 << 30)
+
+        def new_encounter():
+            if endless:
+                return create_endless_encounter(player, game_level, seed, difficulty_mult, settings.difficulty)
+            return create_encounter(player, game_level, difficulty_mult, settings.difficulty)
+
+        fights = 0
+        combat = new_encounter()
+        enemy = combat.enemy
+        message = get_level_intro(game_level, combat)
         weapon_damage_count = 0
         special_ability_count = 0
 
+        # Hard enemies think about their move while the 500 ms turn timer runs
+        enemy_ai = EnemyAI() if settings.difficulty == "Hard" else None
+
+        # Button hints from background rollouts (NIGERIAN_RPG_HINT_CPU=0 turns them off)
+        hint_engine = HintEngine(settings.difficulty) if CPU_SHARE > 0 else None
+        enemy_turn_pending = False
+
+        # Game time advances in fixed steps; every timer below is due at a simulation time
+        frame = FixedTimestep()
+        timers = SimTimers()
+        hp_bars = {}  # id(character) -> Tween, for the HP bars on screen
+        # Between a stage's last blow and the next stage (or the end) there is nothing to click
+        transitions = ("next_stage", "finish", "game_over")
+
+        def shown_hp(character):
+            tween = hp_bars.get(id(character))
+            return tween.value(frame.alpha) if tween else character.hp
+
+        def schedule_enemy_turn():
+            nonlocal enemy_turn_pending
+            enemy_turn_pending = True
+            timers.schedule("enemy_turn", frame.time, ENEMY_TURN_DELAY)
+            if enemy_ai:
+                enemy_ai.request(combat, weapon_damage_count, special_ability_count)
+
+        def win_stage(now):
+            """Record the stage as won and schedule the next stage (or the end)"""
+            nonlocal enemies_defeated, fights, completion_time, message, player_animation_state
+            enemies_defeated += 1
+
+            # Show PLAYER victory animation
+            player_animation_state = 'victory'
+            timers.schedule("player_animation", now, VICTORY_ANIMATION_DURATION)
+
+            handle_victory(player, enemy, combat, save_system, history_level(game_level))
+            fights += 1
+            if monitor:
+                monitor.note_fight(combat)
+            if endless:
+                trim_history(save_system, player.name, fights)
+
+            if game_level >= 3 and not endless:
+                # GAME COMPLETED
+                completion_time = time.time() - run_start_time
+                save_system.save_to_leaderboard(
+                    player.name, 
+                    completion_time, 
+                    total_damage_dealt, 
+                    enemies_defeated
+                )
+
+                message = f"🎉 GAME FINISHED! You escaped!\nTime: {int(completion_time//60)}m {int(completion_time%60)}s"
+                if SOUND_WIN and settings.sound_enabled: 
+                    SOUND_WIN.play()
+
+                # Victory screen once the victory animation has played
+                timers.schedule("finish", now, VICTORY_ANIMATION_DURATION)
+            else:
+                # Next stage once the victory animation has played
+                timers.schedule("next_stage", now, VICTORY_ANIMATION_DURATION)
+
+        def lose_stage(now):
+            """Record the defeat and schedule Game Over"""
+            nonlocal message
+            message = "☠️ You were defeated..."
+            if SOUND_LOSE and settings.sound_enabled: 
+                SOUND_LOSE.play()
+            save_system.save_combat_result(player.name, enemy.name, history_level(game_level), "Defeat")
+            if monitor:
+                monitor.note_fight(combat)
+            try:
+                asset_manager.stop_music(fade_ms=500)
+            except:
+                pass
+            timers.schedule("game_over", now, GAME_OVER_DELAY)
+
         # Load ALL sprite variants for player and enemy
         player_sprites = load_character_sprites(player.sprite_path, scale=0.7)
-        enemy_sprites = load_character_sprites(enemy.sprite_path, scale=0.8)
+        enemy_sprites = load_encounter_sprites(combat)
+        enemy_rects = []  # (screen rect, combatant) drawn last frame, for click targeting
         
         # Animation state tracking
-        player_animation_state = 'normal'  # 'normal', 'damage', 'victory'
+        player_animation_state = 'normal'  # 'normal', 'damage', 'victory'; back to normal on its timer
         enemy_animation_state = 'normal'
-        player_animation_timer = 0
-        enemy_animation_timer = 0
         
         # Load background for current level
         try:
@@ -206,7 +280,7 @@ def run_battle_gui_with_player(player: Character, save_system: SaveSystem, curre
             background_img = None
         
         # Play level music (respect settings)
-        if settings['music_enabled']:
+        if settings.music_enabled:
             try:
                 play_level_music(game_level)
             except:
@@ -220,31 +294,31 @@ def run_battle_gui_with_player(player: Character, save_system: SaveSystem, curre
         pause_btn = pygame.Rect(880, 10, 60, 30)
 
         # Auto-save timer
-        last_save_time = pygame.time.get_ticks()
-        SAVE_INTERVAL = 30000  # Auto-save every 30 seconds
+        timers.schedule("autosave", frame.time, SAVE_INTERVAL)
         
         paused = False
 
         running = True
         while running:
             dt = clock.tick(FPS)
-            current_time = pygame.time.get_ticks()
-            
-            # Update animation timers
-            if player_animation_timer > 0 and current_time >= player_animation_timer:
-                player_animation_state = 'normal'
-                player_animation_timer = 0
-            
-            if enemy_animation_timer > 0 and current_time >= enemy_animation_timer:
-                enemy_animation_state = 'normal'
-                enemy_animation_timer = 0
             
-            # Auto-save
-            if current_time - last_save_time > SAVE_INTERVAL:
-                save_system.save_character(player, game_level)
-                last_save_time = current_time
+            # Hints are only for the player's turn
+            if hint_engine and not enemy_turn_pending:
+                hint_engine.request(combat, weapon_damage_count, special_ability_count)
+
+            # Soak runs (endless.py) play through synthetic clicks on the buttons
+            if bot and not enemy_turn_pending and not paused and not timers.pending(*transitions):
+                move = bot(weapon_damage_count >= player.get_special_threshold() and special_ability_count < 3)
+                if move == "quit":
+                    pygame.event.post(pygame.event.Event(pygame.QUIT))
+                elif move:
+                    button = {"attack": attack_btn, "defend": defend_btn, "special": special_btn}[move]
+                    pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=canvas.to_window(button.center)))
+
+            # Journal changed stats every frame; the interval save is the checkpoint
+            save_system.record_progress(player, game_level)
             
-            for ev in pygame.event.get():
+            for ev in canvas.events():
                 if ev.type == pygame.QUIT:
                     save_system.save_character(player, game_level)
                     try:
@@ -259,15 +333,23 @@ def run_battle_gui_with_player(player: Character, save_system: SaveSystem, curre
                         paused = not paused
 
                 if ev.type == pygame.MOUSEBUTTONDOWN and ev.button == 1:
-                    mx, my = pygame.mouse.get_pos()
+                    mx, my = ev.pos
                     
                     # Pause button
                     if pause_btn.collidepoint(mx, my):
                         paused = not paused
                     
-                    if paused:
+                    # Nothing to click once the fight is decided (an ally can land the last blow)
+                    if paused or timers.pending(*transitions) or combat.is_over()[0]:
                         continue
                     
+                    # Click an enemy to aim at it
+                    for rect, target in enemy_rects:
+                        if rect.collidepoint(mx, my) and target.character.is_alive():
+                            combat.select_target(target)
+                            message = f"🎯 Targeting {target.character.name}"
+                            break
+                    
                     # Attack
                     if attack_btn.collidepoint(mx, my):
                         msg = combat.player_attack()
@@ -277,74 +359,15 @@ def run_battle_gui_with_player(player: Character, save_system: SaveSystem, curre
                         
                         # Trigger ENEMY damage animation
                         enemy_animation_state = 'damage'
-                        enemy_animation_timer = current_time + DAMAGE_ANIMATION_DURATION
+                        timers.schedule("enemy_animation", frame.time, DAMAGE_ANIMATION_DURATION)
                         
-                        if SOUND_ATTACK and settings['sound_enabled']: 
+                        if SOUND_ATTACK and settings.sound_enabled: 
                             SOUND_ATTACK.play()
                         message = msg
                         
                         over, winner = combat.is_over()
                         if not over:
-                            pygame.time.set_timer(pygame.USEREVENT+1, 500, loops=1)
-                        else:
-                            if winner == "player":
-                                enemies_defeated += 1
-                                
-                                # Show PLAYER victory animation
-                                player_animation_state = 'victory'
-                                player_animation_timer = current_time + VICTORY_ANIMATION_DURATION
-                                
-                                handle_victory(player, enemy, combat, save_system, game_level)
-                                
-                                if game_level >= 3:
-                                    # GAME COMPLETED
-                                    completion_time = time.time() - run_start_time
-                                    save_system.save_to_leaderboard(
-                                        player.name, 
-                                        completion_time, 
-                                        total_damage_dealt, 
-                                        enemies_defeated
-                                    )
-                                    
-                                    message = f"🎉 GAME FINISHED! You escaped!\nTime: {int(completion_time//60)}m {int(completion_time%60)}s"
-                                    if SOUND_WIN and settings['sound_enabled']: 
-                                        SOUND_WIN.play()
-                                    
-                                    pygame.time.wait(VICTORY_ANIMATION_DURATION)
-                                    
-                                    show_victory_screen(screen, player, completion_time, 
-                                                       total_damage_dealt, enemies_defeated, 
-                                                       settings['difficulty'], font, bigfont)
-                                    
-                                    save_system.save_character(player, 1)
-                                    try:
-                                        asset_manager.stop_music(fade_ms=1000)
-                                    except:
-                                        pass
-                                    running = False
-                                else:
-                                    # Wait for victory animation to complete
-                                    pygame.time.wait(VICTORY_ANIMATION_DURATION)
-                                    
-                                    game_level += 1
-                                    weapon_damage_count = 0
-                                    special_ability_count = 0
-                                    enemy = create_enemy_for_level(game_level, difficulty_mult)
-                                    combat = Combat(player, enemy)
-                                    message = get_level_intro(game_level, enemy)
-                                    
-                                    # Reload enemy sprites
-                                    enemy_sprites = load_character_sprites(enemy.sprite_path, scale=0.8)
-                                    enemy_animation_state = 'normal'
-                                    player_animation_state = 'normal'
-                                    
-                                    try:
-                                        background_img = asset_manager.get_background(game_level)
-                                        if settings['music_enabled']:
-                                            asset_manager.stop_music(fade_ms=500)
-                                            play_level_music(game_level)
-                                    except:
-                                        pass
+                            schedule_enemy_turn()
 
                     # Defend
                     if defend_btn.collidepoint(mx, my):
@@ -353,7 +376,7 @@ def run_battle_gui_with_player(player: Character, save_system: SaveSystem, curre
                         
                         over, winner = combat.is_over()
                         if not over:
-                            pygame.time.set_timer(pygame.USEREVENT+1, 500, loops=1)
+                            schedule_enemy_turn()
 
                     # Special
                     if special_btn.collidepoint(mx, my):
@@ -368,70 +391,14 @@ def run_battle_gui_with_player(player: Character, save_system: SaveSystem, curre
                             
                             # Trigger ENEMY damage animation
                             enemy_animation_state = 'damage'
-                            enemy_animation_timer = current_time + DAMAGE_ANIMATION_DURATION
+                            timers.schedule("enemy_animation", frame.time, DAMAGE_ANIMATION_DURATION)
                             
-                            if SOUND_ATTACK and settings['sound_enabled']: 
+                            if SOUND_ATTACK and settings.sound_enabled: 
                                 SOUND_ATTACK.play()
                             
                             over, winner = combat.is_over()
                             if not over:
-                                pygame.time.set_timer(pygame.USEREVENT+1, 500, loops=1)
-                            else:
-                                if winner == "player":
-                                    enemies_defeated += 1
-                                    
-                                    # Show PLAYER victory animation
-                                    player_animation_state = 'victory'
-                                    player_animation_timer = current_time + VICTORY_ANIMATION_DURATION
-                                    
-                                    handle_victory(player, enemy, combat, save_system, game_level)
-                                    
-                                    if game_level >= 3:
-                                        completion_time = time.time() - run_start_time
-                                        save_system.save_to_leaderboard(
-                                            player.name, 
-                                            completion_time, 
-                                            total_damage_dealt, 
-                                            enemies_defeated
-                                        )
-                                        
-                                        message = f"🎉 GAME FINISHED! You escaped!\nTime: {int(completion_time//60)}m {int(completion_time%60)}s"
-                                        if SOUND_WIN and settings['sound_enabled']: 
-                                            SOUND_WIN.play()
-                                        
-                                        pygame.time.wait(VICTORY_ANIMATION_DURATION)
-                                        
-                                        show_victory_screen(screen, player, completion_time, 
-                                                           total_damage_dealt, enemies_defeated, 
-                                                           settings['difficulty'], font, bigfont)
-                                        
-                                        save_system.save_character(player, 1)
-                                        try:
-                                            asset_manager.stop_music(fade_ms=1000)
-                                        except:
-                                            pass
-                                        running = False
-                                    else:
-                                        pygame.time.wait(VICTORY_ANIMATION_DURATION)
-                                        
-                                        game_level += 1
-                                        weapon_damage_count = 0
-                                        special_ability_count = 0
-                                        enemy = create_enemy_for_level(game_level, difficulty_mult)
-                                        combat = Combat(player, enemy)
-                                        message = get_level_intro(game_level, enemy)
-                                        
-                                        enemy_sprites = load_character_sprites(enemy.sprite_path, scale=0.8)
-                                        enemy_animation_state = 'normal'
-                                        player_animation_state = 'normal'
-                                        
-                                        try:
-                                            background_img = asset_manager.get_background(game_level)
-                                            if settings['music_enabled']:
-                                                asset_manager.stop_music(fade_ms=500)
-                                                play_level_music(game_level)
-                                        except:
-                                            pass
+                                schedule_enemy_turn()
                         else:
                             if weapon_damage_count < threshold:
                                 message = f"⚠️ Need {threshold - weapon_damage_count} more damage to use special!"
@@ -439,78 +406,137 @@ def run_battle_gui_with_player(player: Character, save_system: SaveSystem, curre
                                 message = "⚠️ Too much of everything is not good my friend!"
                                 special_ability_count = 0
 
+                    # A finishing blow - hit, special or a bleed-out at the top of the turn - clears the stage
+                    over, winner = combat.is_over()
+                    if over and winner == "player":
+                        win_stage(frame.time)
+                    elif over and winner == "enemy":
+                        # A miss or failed defend can take the last HP
+                        lose_stage(frame.time)
+
                     # Flee
                     if flee_btn.collidepoint(mx, my):
-                        if random.random() < 0.6:
+                        if random.random() < FLEE_CHANCE:
                             message = "🏃 You fled! Game Over."
                             save_system.save_character(player, game_level)
                             try:
                                 asset_manager.stop_music(fade_ms=500)
                             except:
                                 pass
-                            pygame.time.wait(2000)
-                            running = False
+                            timers.schedule("game_over", frame.time, GAME_OVER_DELAY)
                         else:
                             message = "Couldn't escape!"
-                            pygame.time.set_timer(pygame.USEREVENT+1, 500, loops=1)
-
-                # Enemy turn event
-                if ev.type == pygame.USEREVENT+1:
-                    if not paused:
-                        emsg = combat.enemy_turn()
-                        message = emsg
+                            combat.player_wait()
+                            schedule_enemy_turn()
+
+            # Simulation: run the fixed steps this frame paid for (none while paused)
+            for now in frame.run(0 if paused else dt):
+                for name in timers.pop_due(now):
+                    if name == "player_animation":
+                        player_animation_state = 'normal'
+                    elif name == "enemy_animation":
+                        enemy_animation_state = 'normal'
+                    elif name == "autosave":
+                        save_system.save_character(player, game_level)
+                        timers.schedule("autosave", now, SAVE_INTERVAL)
+                    elif name == "enemy_turn":
+                        enemy_turn_pending = False
+                        # The AI's pick if its search finished in time, else a plain strike
+                        action = (enemy_ai.decision() if enemy_ai else None) or ENEMY_STRIKE
+                        emsg = combat.enemy_turn(action)
+                        # Group turns can run long; keep the latest lines
+                        message = "\n".join(emsg.split("\n")[-3:]) or message
                         
-                        # Trigger PLAYER damage animation
-                        player_animation_state = 'damage'
-                        player_animation_timer = current_time + DAMAGE_ANIMATION_DURATION
+                        # Trigger PLAYER damage animation (only when an enemy hit the player)
+                        if combat.last_event in (EVENT_ENEMY_ATTACK, EVENT_ENEMY_HEAVY) and combat.last_amount:
+                            player_animation_state = 'damage'
+                            timers.schedule("player_animation", now, DAMAGE_ANIMATION_DURATION)
                         
-                        if SOUND_ATTACK and settings['sound_enabled']: 
+                        if SOUND_ATTACK and settings.sound_enabled: 
                             SOUND_ATTACK.play()
                         
                         over, winner = combat.is_over()
-                        if over and winner == "enemy":
-                            message = "☠️ You were defeated..."
-                            if SOUND_LOSE and settings['sound_enabled']: 
-                                SOUND_LOSE.play()
-                            save_system.save_combat_result(player.name, enemy.name, game_level, "Defeat")
-                            try:
+                        if over and winner == "player":
+                            # Allies act in the enemy turn and can finish the last foe
+                            win_stage(now)
+                        elif over and winner == "enemy":
+                            lose_stage(now)
+                    elif name == "next_stage":
+                        game_level += 1
+                        weapon_damage_count = 0
+                        special_ability_count = 0
+                        combat = new_encounter()
+                        enemy = combat.enemy
+                        message = get_level_intro(game_level, combat)
+                        hp_bars.clear()
+                    
+                        # Reload enemy sprites
+                        enemy_sprites = load_encounter_sprites(combat)
+                        enemy_animation_state = 'normal'
+                        player_animation_state = 'normal'
+                    
+                        try:
+                            background_img = asset_manager.get_background(game_level)
+                            if settings.music_enabled:
                                 asset_manager.stop_music(fade_ms=500)
-                            except:
-                                pass
-                            pygame.time.wait(2000)
-                            running = False
+                                play_level_music(game_level)
+                        except:
+                            pass
+                    elif name == "finish":
+                        show_victory_screen(canvas, player, completion_time, 
+                                           total_damage_dealt, enemies_defeated, 
+                                           settings.difficulty, font, bigfont)
+                    
+                        save_system.save_character(player, 1)
+                        try:
+                            asset_manager.stop_music(fade_ms=1000)
+                        except:
+                            pass
+                        running = False
+                    elif name == "game_over":
+                        running = False
+                
+                # HP bars ease toward the real HP once per step
+                for character in (player, combat.enemy):
+                    hp_bars.setdefault(id(character), Tween(character.hp)).step(character.hp)
+                if not running:
+                    break
+
+            # Under load the simulation catches up first and the frame is not drawn
+            if not running or not frame.should_render():
+                continue
 
             # Render - Draw background first
             if background_img:
-                screen.blit(background_img, (0, 0))
+                canvas.image(background_img, (0, 0))
             else:
-                screen.fill((26, 26, 48))
+                canvas.clear((26, 26, 48))
             
             # Semi-transparent overlay for UI visibility
-            overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 100))
-            screen.blit(overlay, (0, 0))
+            canvas.fill((0, 0, 0, 100))
             
             # Top info panel with background
-            info_panel = pygame.Surface((WIDTH, 120), pygame.SRCALPHA)
-            info_panel.fill((20, 20, 40, 180))
-            screen.blit(info_panel, (0, 0))
+            canvas.fill((20, 20, 40, 180), (0, 0, WIDTH, 120))
             
             # Top info
-            draw_text(screen, f"Player: {player.name}  Lv {player.level}", 30, 18, bigfont, (255, 255, 255))
-            draw_hp_bar(screen, 30, 58, player.hp, player.max_hp)
-            draw_text(screen, f"HP {player.hp}/{player.max_hp}", 300, 56, font, (255, 255, 255))
-            draw_text(screen, f"Stage: {game_level}/3", 30, 95, font, (240, 200, 100))
-
-            # Enemy info
-            draw_text(screen, f"Enemy: {combat.enemy.name}  Lv {combat.enemy.level}", 600, 18, bigfont, (255, 255, 255))
-            draw_hp_bar(screen, 600, 58, combat.enemy.hp, combat.enemy.max_hp)
-            draw_text(screen, f"HP {combat.enemy.hp}/{combat.enemy.max_hp}", 860, 56, font, (255, 255, 255))
+            draw_text(canvas, f"Player: {player.name}  Lv {player.level}", 30, 18, bigfont, (255, 255, 255))
+            draw_hp_bar(canvas, 30, 58, shown_hp(player), player.max_hp)
+            draw_text(canvas, f"HP {player.hp}/{player.max_hp}", 300, 56, font, (255, 255, 255))
+            draw_text(canvas, f"Stage: {game_level}" + (" (endless)" if endless else "/3"), 30, 95, font,
+                      (240, 200, 100))
+
+            # Enemy info (the targeted enemy, plus how many others still stand)
+            others = len(combat.foes) - combat.enemy.is_alive()
+            enemy_label = f"Enemy: {combat.enemy.name}  Lv {combat.enemy.level}" + (f"  (+{others})" if others > 0 else "")
+            draw_text(canvas, enemy_label, 600, 18, bigfont, (255, 255, 255))
+            draw_hp_bar(canvas, 600, 58, shown_hp(combat.enemy), combat.enemy.max_hp)
+            draw_text(canvas, f"HP {combat.enemy.hp}/{combat.enemy.max_hp}", 860, 56, font, (255, 255, 255))
+            draw_text(canvas, status_text(combat.enemy), 600, 86, font, (255, 170, 120))
+            draw_text(canvas, status_text(player), 300, 95, font, (150, 230, 150))
             
             # Pause button
-            pygame.draw.rect(screen, (155, 89, 182), pause_btn)
-            pause_text = font.render("⏸", True, (255, 255, 255))
-            screen.blit(pause_text, (pause_btn.x + 18, pause_btn.y + 2))
+            canvas.rect((155, 89, 182), pause_btn)
+            canvas.text("⏸", (pause_btn.x + 18, pause_btn.y + 2), font, (255, 255, 255))
 
             # Draw PLAYER sprite with animation
             current_player_sprite = player_sprites.get(player_animation_state)
@@ -518,69 +544,93 @@ def run_battle_gui_with_player(player: Character, save_system: SaveSystem, curre
                 current_player_sprite = player_sprites.get('normal')
             
             if current_player_sprite:
-                screen.blit(current_player_sprite, (60, 120))
+                canvas.image(current_player_sprite, (60, 120))
             else:
-                pygame.draw.rect(screen, (100, 100, 255), (60, 140, 80, 120))
-                draw_text(screen, player.weapon, 65, 265, font, (255, 255, 255))
-            
-            # Draw ENEMY sprite with animation
-            current_enemy_sprite = enemy_sprites.get(enemy_animation_state)
-            if not current_enemy_sprite or enemy_animation_state not in enemy_sprites:
-                current_enemy_sprite = enemy_sprites.get('normal')
+                canvas.rect((100, 100, 255), (60, 140, 80, 120))
+                draw_text(canvas, player.weapon, 65, 265, font, (255, 255, 255))
             
-            if current_enemy_sprite:
-                screen.blit(current_enemy_sprite, (640, 120))
-            else:
-                pygame.draw.rect(screen, (255, 100, 100), (640, 140, 80, 120))
-                draw_text(screen, enemy.name[:8], 645, 265, font, (255, 255, 255))
+            # Draw ALLY sprites behind the player
+            for i, ally in enumerate(combat.allies):
+                if not ally.character.is_alive():
+                    continue
+                ax, ay = 240, 150 + i * 100
+                ally_sprite = enemy_sprites.get(("ally", ally.character.sprite_path), {}).get('normal')
+                if ally_sprite:
+                    canvas.image(ally_sprite, (ax, ay))
+                else:
+                    canvas.rect((100, 200, 255), (ax, ay, 50, 70))
+                draw_hp_bar(canvas, ax, ay - 12, ally.character.hp, ally.character.max_hp, w=90, h=8)
+
+            # Draw ENEMY sprites; the animation plays on the targeted enemy
+            enemy_rects = []
+            group = len(combat.enemies) > 1
+            for target, (ex, ey) in zip(combat.enemies, enemy_slots(len(combat.enemies))):
+                foe = target.character
+                if group and not foe.is_alive():
+                    continue
+                sprites = enemy_sprites.get(foe.sprite_path, {})
+                state = enemy_animation_state if target is combat.target else 'normal'
+                current_enemy_sprite = sprites.get(state) or sprites.get('normal')
+                
+                if current_enemy_sprite:
+                    canvas.image(current_enemy_sprite, (ex, ey))
+                    rect = current_enemy_sprite.get_rect(topleft=(ex, ey))
+                else:
+                    rect = pygame.Rect(ex, ey + 20, 80, 120)
+                    canvas.rect((255, 100, 100), rect)
+                    draw_text(canvas, foe.name[:8], ex + 5, ey + 145, font, (255, 255, 255))
+                enemy_rects.append((rect, target))
+                if group:
+                    draw_hp_bar(canvas, rect.x, rect.y - 10, foe.hp, foe.max_hp, w=min(rect.width, 120), h=8)
+                    if target is combat.target:
+                        canvas.rect((241, 196, 15), rect.inflate(6, 6), 2)
 
             # Action buttons
-            pygame.draw.rect(screen, (200, 200, 200), attack_btn)
-            pygame.draw.rect(screen, (200, 200, 200), defend_btn)
+            canvas.rect((200, 200, 200), attack_btn)
+            canvas.rect((200, 200, 200), defend_btn)
             
             # Special button color based on availability
             threshold = player.get_special_threshold()
             if weapon_damage_count >= threshold and special_ability_count < 3:
-                pygame.draw.rect(screen, (155, 89, 182), special_btn)
+                canvas.rect((155, 89, 182), special_btn)
             else:
-                pygame.draw.rect(screen, (100, 100, 100), special_btn)
+                canvas.rect((100, 100, 100), special_btn)
             
-            pygame.draw.rect(screen, (200, 200, 200), flee_btn)
+            canvas.rect((200, 200, 200), flee_btn)
             
-            draw_text(screen, "ATTACK", attack_btn.x+30, attack_btn.y+15, font, (0, 0, 0))
-            draw_text(screen, "DEFEND", defend_btn.x+30, defend_btn.y+15, font, (0, 0, 0))
-            draw_text(screen, "SPECIAL", special_btn.x+28, special_btn.y+15, font, (0, 0, 0))
-            draw_text(screen, "FLEE", flee_btn.x+50, flee_btn.y+15, font, (0, 0, 0))
+            draw_text(canvas, "ATTACK", attack_btn.x+30, attack_btn.y+15, font, (0, 0, 0))
+            draw_text(canvas, "DEFEND", defend_btn.x+30, defend_btn.y+15, font, (0, 0, 0))
+            draw_text(canvas, "SPECIAL", special_btn.x+28, special_btn.y+15, font, (0, 0, 0))
+            draw_text(canvas, "FLEE", flee_btn.x+50, flee_btn.y+15, font, (0, 0, 0))
+
+            # Move hint: outline the recommended button
+            hint = hint_engine.hint() if hint_engine and not enemy_turn_pending else None
+            if hint:
+                hint_btn = {"ATTACK": attack_btn, "DEFEND": defend_btn, "SPECIAL": special_btn}[hint.action]
+                canvas.rect((241, 196, 15), hint_btn.inflate(8, 8), 3)
+                draw_text(canvas, f"💡 Hint: {hint.action} (win {hint.win_rate:.0%})", 30, 448, font, (241, 196, 15))
 
             # Stats display
             elapsed_time = time.time() - run_start_time
-            draw_text(screen, f"Time: {int(elapsed_time//60)}:{int(elapsed_time%60):02d}", 30, 545, font, (200, 200, 255))
-            draw_text(screen, f"Damage: {weapon_damage_count}/{threshold}", 410, 545, font, (200, 200, 255))
-            draw_text(screen, f"Kills: {enemies_defeated}", 750, 545, font, (200, 200, 255))
+            draw_text(canvas, f"Time: {int(elapsed_time//60)}:{int(elapsed_time%60):02d}", 30, 545, font, (200, 200, 255))
+            draw_text(canvas, f"Damage: {weapon_damage_count}/{threshold}", 410, 545, font, (200, 200, 255))
+            draw_text(canvas, f"Kills: {enemies_defeated}", 750, 545, font, (200, 200, 255))
 
             # Message log panel
-            msg_panel = pygame.Surface((WIDTH, 90), pygame.SRCALPHA)
-            msg_panel.fill((20, 20, 40, 180))
-            screen.blit(msg_panel, (0, 350))
+            canvas.fill((20, 20, 40, 180), (0, 350, WIDTH, 90))
             
-            draw_text(screen, "Message:", 30, 360, bigfont, (255, 255, 255))
+            draw_text(canvas, "Message:", 30, 360, bigfont, (255, 255, 255))
             lines = message.split('\n')
             for i, line in enumerate(lines[:3]):
-                draw_text(screen, line, 30, 400 + i*25, font, (255, 255, 255))
+                draw_text(canvas, line, 30, 400 + i*25, font, (255, 255, 255))
             
             # Pause overlay
             if paused:
-                pause_overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-                pause_overlay.fill((0, 0, 0, 150))
-                screen.blit(pause_overlay, (0, 0))
-                
-                pause_title = bigfont.render("⏸ PAUSED", True, (255, 255, 255))
-                screen.blit(pause_title, (WIDTH//2 - pause_title.get_width()//2, HEIGHT//2 - 50))
-                
-                pause_hint = font.render("Press ESC or P to resume", True, (236, 240, 241))
-                screen.blit(pause_hint, (WIDTH//2 - pause_hint.get_width()//2, HEIGHT//2 + 10))
+                canvas.fill((0, 0, 0, 150))
+                canvas.text("⏸ PAUSED", (WIDTH//2, HEIGHT//2 - 50), bigfont, (255, 255, 255), center=True)
+                canvas.text("Press ESC or P to resume", (WIDTH//2, HEIGHT//2 + 10), font, (236, 240, 241), center=True)
 
-            pygame.display.flip()
+            canvas.present()
         
         # Save on exit
         save_system.save_character(player, game_level)
@@ -594,20 +644,19 @@ def run_battle_gui_with_player(player: Character, save_system: SaveSystem, curre
         import traceback
         traceback.print_exc()
     finally:
-        pygame.quit()
+        for worker in (enemy_ai, hint_engine):
+            if worker:
+                worker.close()
 
-def show_victory_screen(screen, player, completion_time, total_damage, enemies_defeated, difficulty, font, bigfont):
+def show_victory_screen(canvas, player, completion_time, total_damage, enemies_defeated, difficulty, font, bigfont):
     """Show victory stats screen"""
     minutes = int(completion_time // 60)
     seconds = int(completion_time % 60)
     
-    overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-    overlay.fill((0, 0, 0, 200))
-    screen.blit(overlay, (0, 0))
+    canvas.fill((0, 0, 0, 200))
     
     y = 100
-    title = bigfont.render("🎉 VICTORY! 🎉", True, (241, 196, 15))
-    screen.blit(title, (WIDTH//2 - title.get_width()//2, y))
+    canvas.text("🎉 VICTORY! 🎉", (WIDTH//2, y), bigfont, (241, 196, 15), center=True)
     
     y += 80
     stats = [
@@ -622,15 +671,34 @@ def show_victory_screen(screen, player, completion_time, total_damage, enemies_d
     ]
     
     for stat in stats:
-        text = font.render(stat, True, (236, 240, 241))
-        screen.blit(text, (WIDTH//2 - text.get_width()//2, y))
+        canvas.text(stat, (WIDTH//2, y), font, (236, 240, 241), center=True)
         y += 35
     
-    pygame.display.flip()
+    canvas.present()
     pygame.time.wait(5000)
 
-def get_level_intro(level: int, enemy: Character) -> str:
+def status_text(character: Character) -> str:
+    """Short HUD line for a character's live status effects ("" if none)"""
+    status = character.status
+    if not status:
+        return ""
+    parts = []
+    if status.stun:
+        parts.append("STUNNED")
+    if status.bleed:
+        parts.append(f"Bleed {status.bleed}/turn")
+    if status.defense_break:
+        parts.append(f"DEF -{status.defense_break}")
+    if status.regen:
+        parts.append(f"Regen {status.regen}/turn")
+    return "  ".join(parts)
+
+def get_level_intro(level: int, combat: Encounter) -> str:
     """Get intro text for level"""
+    enemy = combat.enemy
+    if len(combat.enemies) > 1:
+        backup = "".join(f"\n{a.character.name} fights beside you!" for a in combat.allies)
+        return f"⚔️ A gang of {len(combat.enemies)} blocks your path, led by {combat.enemies[0].character.name}!{backup}"
     intros = {
         1: f"🌳 You spawned in the thick Forests of Nigeria\nA wild {enemy.name} blocks your path!",
         2: f"🏙️ You escaped the forest, but the city is dangerous!\nA {enemy.name} confronts you!",
@@ -638,7 +706,7 @@ def get_level_intro(level: int, enemy: Character) -> str:
     }
     return intros.get(level, f"⚔️ A wild {enemy.name} appears!")
 
-def handle_victory(player: Character, enemy: Character, combat: Combat, save_system: SaveSystem, level: int):
+def handle_victory(player: Character, enemy: Character, combat: Encounter, save_system: SaveSystem, level: int):
     """Handle victory - restore HP and give XP"""
     try:
         player.hp = player.max_hp
@@ -646,8 +714,7 @@ def handle_victory(player: Character, enemy: Character, combat: Combat, save_sys
         leveled = player.gain_xp(xp)
         save_system.save_combat_result(player.name, enemy.name, level, "Victory")
         
-        settings = save_system.load_settings()
-        if SOUND_WIN and settings['sound_enabled']: 
+        if SOUND_WIN and save_system.settings.sound_enabled: 
             SOUND_WIN.play()
         print(f"🎉 Victory! Gained {xp} XP")
     except Exception as e:
@@ -0,0 +1,572 @@
+# -*- coding: utf-8 -*-
+"""
+battle_server.py - Asyncio server hosting many concurrent battles
+Thin clients send attack/defend/special/flee actions; the server runs
+the Combat, schedules the enemy's reply 500 ms later (the same delay as
+the GUI's USEREVENT+1 timer) and pushes it back as an event. Results
+and runs are persisted through SaveSystem on a single worker thread so
+SQLite never blocks the event loop. Idle sessions are saved and evicted.
+
+Frames use the save service layout: <length, opcode, request id> + JSON.
+
+    python battle_server.py serve [--port 8765] [--db nigerian_rpg.db]
+    python battle_server.py loadtest [--sessions 2000] [--connections 50] [--seconds 10]
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from itertools import count
+from character import create_player
+from combat import (DIFFICULTY_MULTIPLIERS, EVENT_DEFEAT, EVENT_FLEE, EVENT_FLEE_FAILED,
+                    EVENT_LEVEL_UP, EVENT_VICTORY, FLEE_CHANCE)
+from pooling import BattlePool
+from save_service import FRAME_HEADER, MAX_FRAME
+from save_system import SaveSystem
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+ENEMY_TURN_DELAY = 0.5   # seconds, matches pygame.time.set_timer(USEREVENT+1, 500)
+IDLE_TIMEOUT = 300.0     # seconds without an action before a session is evicted
+EVICT_INTERVAL = 5.0     # how often idle sessions are looked for
+LOG_LIMIT = 50           # combat log lines kept per session
+
+# Opcodes (client -> server)
+OP_START = 1
+OP_ACTION = 2
+OP_END = 3
+OP_STATS = 4
+# Opcodes (server -> client)
+OP_OK = 0
+OP_ERROR = 1
+OP_EVENT = 5
+
+ACTIONS = ("attack", "defend", "special", "flee")
+
+
+def _frame(opcode, request_id, payload) -> bytes:
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return FRAME_HEADER.pack(len(body), opcode, request_id) + body
+
+
+async def read_frame(reader):
+    """Read one frame from a StreamReader - returns (opcode, request_id, payload)"""
+    length, opcode, request_id = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    if length > MAX_FRAME:
+        raise ConnectionError(f"frame too large ({length} bytes)")
+    return opcode, request_id, json.loads(await reader.readexactly(length))
+
+
+def _detached_copy(player):
+    """Copy of a character for the save worker; the live one keeps changing on the loop.
+
+    The copy takes over the dirty fields, so only those get written.
+    """
+    copy = replace(player)
+    copy.mark_clean()
+    dirty = player.dirty_fields()
+    if dirty:
+        copy.mark_dirty(*dirty)
+    player.mark_clean()
+    return copy
+
+
+class FrameWriter:
+    """Coalesces the frames queued during one loop iteration into one write.
+
+    Thousands of sessions answering and pushing enemy turns would otherwise
+    cost one send() syscall per frame.
+    """
+
+    __slots__ = ("writer", "buffer", "scheduled")
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.buffer = bytearray()
+        self.scheduled = False
+
+    def send(self, opcode, request_id, payload):
+        if self.writer.is_closing():
+            return
+        self.buffer += _frame(opcode, request_id, payload)
+        if not self.scheduled:
+            self.scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self):
+        self.scheduled = False
+        if self.buffer and not self.writer.is_closing():
+            self.writer.write(bytes(self.buffer))
+        self.buffer.clear()
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+def deep_sizeof(obj, seen=None) -> int:
+    """Approximate bytes held by obj and everything it references"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_sizeof(getattr(obj, slot), seen)
+                    for slot in obj.__slots__ if hasattr(obj, slot))
+    return size
+
+
+class BattleSession:
+    """One player's run: the same rules as run_battle_gui_with_player"""
+
+    __slots__ = ("session_id", "player", "enemy", "combat", "level", "difficulty", "difficulty_mult",
+                 "weapon_damage_count", "special_ability_count", "total_damage_dealt",
+                 "enemies_defeated", "run_start_time", "last_active", "enemy_timer",
+                 "writer", "finished", "message", "events")
+
+    def __init__(self, session_id, player, level, difficulty, pool):
+        self.session_id = session_id
+        self.player = player
+        self.level = level
+        self.difficulty = difficulty
+        self.difficulty_mult = DIFFICULTY_MULTIPLIERS.get(difficulty, 1.0)
+        self.combat = pool.acquire(player, level, self.difficulty_mult, difficulty)
+        self.enemy = self.combat.enemy
+        self.weapon_damage_count = 0
+        self.special_ability_count = 0
+        self.total_damage_dealt = 0
+        self.enemies_defeated = 0
+        self.run_start_time = time.time()
+        self.last_active = time.monotonic()
+        self.enemy_timer = None
+        self.writer = None
+        self.finished = None  # "victory", "defeat" or "fled" once the run is over
+        self.message = f"⚔️ A wild {self.enemy.name} appears!"
+        # (event id, amount) pairs for the last action, as in wire_protocol.py
+        self.events = []
+
+    def state(self) -> dict:
+        return {"session": self.session_id, "message": self.message, "level": self.level,
+                "player_hp": self.player.hp, "player_max_hp": self.player.max_hp,
+                "enemy": self.enemy.name, "enemy_hp": self.enemy.hp, "enemy_max_hp": self.enemy.max_hp,
+                "special_meter": self.weapon_damage_count, "enemy_turn": self.enemy_timer is not None,
+                "finished": self.finished, "events": self.events}
+
+    def memory(self) -> int:
+        return deep_sizeof((self.player, self.enemy, self.combat.log, self.message))
+
+
+class BattleServer:
+    """Hosts BattleSessions keyed by session id"""
+
+    def __init__(self, save_system=None, idle_timeout=IDLE_TIMEOUT, enemy_delay=ENEMY_TURN_DELAY):
+        self.saves = save_system if save_system is not None else SaveSystem()
+        self.idle_timeout = idle_timeout
+        self.enemy_delay = enemy_delay
+        self.sessions = {}
+        self.pool = BattlePool()  # enemies and Combats are recycled across sessions
+        self._ids = count(1)
+        # SaveSystem is synchronous and single-threaded: one worker keeps it off the loop
+        self._db = ThreadPoolExecutor(max_workers=1, thread_name_prefix="battle-save")
+        self._pending_saves = set()
+        self.actions = 0
+        self.evicted = 0
+        self.action_times = deque(maxlen=10000)  # seconds spent handling recent actions
+        self.server = None
+        self._evictor = None
+        self._writers = set()
+
+    # ---- persistence ----
+    def _persist(self, fn, *args):
+        future = asyncio.get_running_loop().run_in_executor(self._db, fn, *args)
+        self._pending_saves.add(future)
+
+        def done(future):
+            self._pending_saves.discard(future)
+            if not future.cancelled() and future.exception() is not None:
+                # Nothing awaits these writes, so a failure would otherwise go unseen
+                print(f"⚠️ {fn.__name__} failed: {future.exception()!r}", flush=True)
+        future.add_done_callback(done)
+
+    def _persist_player(self, session, level):
+        self._persist(self.saves.save_character, _detached_copy(session.player), level)
+
+    # ---- game rules ----
+    def _schedule_enemy_turn(self, session):
+        if session.enemy_timer:
+            session.enemy_timer.cancel()  # set_timer(loops=1) restarts the countdown too
+        session.enemy_timer = asyncio.get_running_loop().call_later(
+            self.enemy_delay, self._enemy_turn, session.session_id, time.monotonic())
+
+    def _after_player_move(self, session):
+        # Trim while the fight is still ours; victory or defeat may hand it back to the pool
+        del session.combat.log[:-LOG_LIMIT]
+        session.events.append((session.combat.last_event, session.combat.last_amount))
+        over, winner = session.combat.is_over()
+        if not over:
+            self._schedule_enemy_turn(session)
+        elif winner == "player":
+            self._victory(session)
+        else:
+            self._defeat(session)
+
+    def _victory(self, session):
+        player, combat = session.player, session.combat
+        session.enemies_defeated += 1
+        player.hp = player.max_hp
+        reward = combat.reward_xp_for_enemy()
+        session.events.append((EVENT_VICTORY, reward))
+        if player.gain_xp(reward):
+            session.events.append((EVENT_LEVEL_UP, player.level))
+        self._persist(self.saves.save_combat_result, player.name, session.enemy.name,
+                      session.level, "Victory", session.difficulty)
+        if session.level >= 3:
+            completion_time = time.time() - session.run_start_time
+            self._persist(self.saves.save_to_leaderboard, player.name, completion_time,
+                          session.total_damage_dealt, session.enemies_defeated, session.difficulty)
+            self._persist_player(session, 1)
+            session.finished = "victory"
+            session.message = f"🎉 GAME FINISHED! You escaped!\nTime: {int(completion_time//60)}m {int(completion_time%60)}s"
+            self._close(session)
+        else:
+            session.level += 1
+            session.weapon_damage_count = 0
+            session.special_ability_count = 0
+            self.pool.release(session.combat)
+            session.combat = self.pool.acquire(player, session.level, session.difficulty_mult,
+                                               session.difficulty)
+            session.enemy = session.combat.enemy
+            session.message += f"\n⚔️ Level {session.level}: {session.enemy.name} appears!"
+
+    def _defeat(self, session):
+        self._persist(self.saves.save_combat_result, session.player.name, session.enemy.name,
+                      session.level, "Defeat", session.difficulty)
+        session.events.append((EVENT_DEFEAT, 0))
+        session.finished = "defeat"
+        session.message = "☠️ You were defeated..."
+        self._close(session)
+
+    def _enemy_turn(self, session_id, scheduled_at):
+        session = self.sessions.get(session_id)
+        if session is None or session.finished:
+            return
+        session.enemy_timer = None
+        session.message = session.combat.enemy_turn()
+        del session.combat.log[:-LOG_LIMIT]
+        session.events = [(session.combat.last_event, session.combat.last_amount)]
+        over, winner = session.combat.is_over()
+        if over and winner == "enemy":
+            self._defeat(session)
+        state = session.state()
+        state["delay_ms"] = (time.monotonic() - scheduled_at) * 1000
+        if session.writer:
+            session.writer.send(OP_EVENT, 0, state)
+
+    def act(self, session, action) -> dict:
+        """Apply one player action and return the new state"""
+        session.last_active = time.monotonic()
+        combat, player = session.combat, session.player
+        self.actions += 1
+        session.events = []
+        if action == "attack":
+            session.message = combat.player_attack()
+            damage = player.get_weapon_damage()
+            session.weapon_damage_count += damage
+            session.total_damage_dealt += damage
+            self._after_player_move(session)
+        elif action == "defend":
+            session.message = combat.player_defend()
+            self._after_player_move(session)
+        elif action == "special":
+            threshold = player.get_special_threshold()
+            if session.weapon_damage_count >= threshold and session.special_ability_count < 3:
+                session.message = combat.player_special_attack()
+                session.total_damage_dealt += player.get_weapon_damage() * 2
+                session.weapon_damage_count = 0
+                session.special_ability_count += 1
+                self._after_player_move(session)
+            elif session.weapon_damage_count < threshold:
+                session.message = f"⚠️ Need {threshold - session.weapon_damage_count} more damage to use special!"
+            else:
+                session.message = "⚠️ Too much of everything is not good my friend!"
+                session.special_ability_count = 0
+        elif action == "flee":
+            if random.random() < FLEE_CHANCE:
+                session.message = "🏃 You fled! Game Over."
+                session.events.append((EVENT_FLEE, 0))
+                session.finished = "fled"
+                self._persist_player(session, session.level)
+                self._close(session)
+            else:
+                session.message = "Couldn't escape!"
+                session.events.append((EVENT_FLEE_FAILED, 0))
+                self._schedule_enemy_turn(session)
+        else:
+            raise ValueError(f"unknown action {action!r} (expected one of {ACTIONS})")
+        return session.state()
+
+    # ---- session lifecycle ----
+    async def start_session(self, name, char_class="Citizen", level=None, difficulty="Normal") -> BattleSession:
+        loop = asyncio.get_running_loop()
+        player, saved_level = await loop.run_in_executor(self._db, self.saves.load_character, name)
+        if player is None:
+            player, saved_level = create_player(name, char_class), 1
+            self._persist(self.saves.save_character, _detached_copy(player), 1)
+        session = BattleSession(next(self._ids), player, level or saved_level, difficulty, self.pool)
+        self.sessions[session.session_id] = session
+        return session
+
+    def _close(self, session):
+        if session.enemy_timer:
+            session.enemy_timer.cancel()
+            session.enemy_timer = None
+        if self.sessions.pop(session.session_id, None) is not None:
+            # Nothing reads the fight after this tick, so it can go back to the pool
+            self.pool.release(session.combat)
+
+    def evict_idle(self) -> int:
+        """Save and drop sessions nobody has touched for idle_timeout"""
+        cutoff = time.monotonic() - self.idle_timeout
+        idle = [s for s in self.sessions.values() if s.last_active < cutoff and s.enemy_timer is None]
+        for session in idle:
+            self._persist_player(session, session.level)
+            self._close(session)
+        self.evicted += len(idle)
+        return len(idle)
+
+    async def _evict_loop(self):
+        while True:
+            await asyncio.sleep(EVICT_INTERVAL)
+            self.evict_idle()
+
+    def stats(self) -> dict:
+        memory = [s.memory() for s in self.sessions.values()]
+        times = sorted(self.action_times)
+        p99 = times[int(0.99 * (len(times) - 1))] * 1000 if times else 0.0
+        return {"sessions": len(memory), "memory_bytes": sum(memory),
+                "max_session_bytes": max(memory, default=0), "actions": self.actions,
+                "action_p99_ms": p99,
+                "evicted": self.evicted, "pending_saves": len(self._pending_saves)}
+
+    # ---- networking ----
+    async def _handle(self, writer, opcode, payload):
+        if opcode == OP_START:
+            session = await self.start_session(payload["name"], payload.get("char_class", "Citizen"),
+                                         payload.get("level"), payload.get("difficulty", "Normal"))
+            session.writer = writer
+            return session.state()
+        if opcode == OP_STATS:
+            return self.stats()
+        session = self.sessions.get(payload.get("session"))
+        if session is None:
+            raise KeyError(f"no such session {payload.get('session')}")
+        session.writer = writer  # events follow the client if it reconnects
+        if opcode == OP_ACTION:
+            start = time.perf_counter()
+            state = self.act(session, payload["action"])
+            self.action_times.append(time.perf_counter() - start)
+            return state
+        if opcode == OP_END:
+            self._persist_player(session, session.level)
+            self._close(session)
+            return {"session": session.session_id, "finished": "ended"}
+        raise ValueError(f"unknown opcode {opcode}")
+
+    async def _client(self, reader, stream_writer):
+        writer = FrameWriter(stream_writer)
+        self._writers.add(writer)
+        try:
+            while True:
+                opcode, request_id, payload = await read_frame(reader)
+                try:
+                    reply = (OP_OK, await self._handle(writer, opcode, payload))
+                except Exception as e:
+                    reply = (OP_ERROR, f"{type(e).__name__}: {e}")
+                writer.send(reply[0], request_id, reply[1])
+                await stream_writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.server = await asyncio.start_server(self._client, host, port, backlog=1024)
+        self._evictor = asyncio.create_task(self._evict_loop())
+        return self
+
+    async def stop(self):
+        if self._evictor:
+            self._evictor.cancel()
+        if self.server:
+            self.server.close()
+            for writer in list(self._writers):
+                writer.close()
+            await self.server.wait_closed()
+        for session in list(self.sessions.values()):
+            self._persist_player(session, session.level)
+            self._close(session)
+        if self._pending_saves:
+            await asyncio.gather(*self._pending_saves, return_exceptions=True)
+        self._db.shutdown(wait=True)
+        self.saves.close()
+
+
+# ============================================
+# LOAD TEST CLIENT
+# ============================================
+
+class BattleClient:
+    """Multiplexes many sessions over one connection"""
+
+    def __init__(self, reader, writer):
+        self.reader, self.writer = reader, FrameWriter(writer)
+        self._ids = count(1)
+        self.replies = {}
+        self.events = {}
+        self._task = asyncio.create_task(self._read_loop())
+
+    @classmethod
+    async def connect(cls, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def _read_loop(self):
+        try:
+            while True:
+                opcode, request_id, payload = await read_frame(self.reader)
+                if opcode == OP_EVENT:
+                    self.events.setdefault(payload["session"], asyncio.Queue()).put_nowait(payload)
+                else:
+                    future = self.replies.pop(request_id, None)
+                    if future and not future.done():
+                        future.set_result((opcode, payload))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            for future in self.replies.values():
+                future.set_exception(ConnectionError("battle server closed the connection"))
+
+    async def call(self, opcode, payload):
+        request_id = next(self._ids)
+        future = self.replies[request_id] = asyncio.get_running_loop().create_future()
+        self.writer.send(opcode, request_id, payload)
+        status, result = await future
+        if status != OP_OK:
+            raise RuntimeError(result)
+        return result
+
+    async def next_event(self, session_id):
+        return await self.events.setdefault(session_id, asyncio.Queue()).get()
+
+    async def close(self):
+        self._task.cancel()
+        self.writer.close()
+
+
+async def run_load(host=DEFAULT_HOST, port=DEFAULT_PORT, sessions=2000, connections=50, seconds=10.0) -> dict:
+    """Play many sessions at once; reports action latency and enemy-turn timing"""
+    clients = [await BattleClient.connect(host, port) for _ in range(connections)]
+    latencies, delays = [], []
+    outcomes = {}
+    deadline = time.monotonic() + seconds
+
+    async def play(index):
+        client = clients[index % connections]
+        await asyncio.sleep(random.random() * ENEMY_TURN_DELAY)  # don't start in lockstep
+        state = await client.call(OP_START, {"name": f"Load{index}", "difficulty": "Normal"})
+        sid = state["session"]
+        while time.monotonic() < deadline and not state["finished"]:
+            action = "special" if state["special_meter"] >= 50 else random.choice(("attack", "attack", "defend"))
+            start = time.perf_counter()
+            state = await client.call(OP_ACTION, {"session": sid, "action": action})
+            latencies.append(time.perf_counter() - start)
+            if state["enemy_turn"]:
+                event = await client.next_event(sid)
+                delays.append(event["delay_ms"])
+                state = event
+        if not state["finished"]:
+            await client.call(OP_END, {"session": sid})
+        outcomes[state["finished"] or "ended"] = outcomes.get(state["finished"] or "ended", 0) + 1
+
+    async def sample_server():
+        await asyncio.sleep(seconds * 0.9)
+        return await clients[0].call(OP_STATS, {})
+
+    began = time.perf_counter()
+    peak, *_ = await asyncio.gather(sample_server(), *(play(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - began
+    for client in clients:
+        await client.close()
+    latencies.sort()
+    delays.sort()
+    pick = lambda data, q: data[min(len(data) - 1, int(q * len(data)))] if data else 0.0
+    return {"sessions": sessions, "actions": len(latencies), "actions_per_sec": len(latencies) / elapsed,
+            "p50_ms": pick(latencies, 0.50) * 1000, "p99_ms": pick(latencies, 0.99) * 1000,
+            "enemy_delay_p99_ms": pick(delays, 0.99), "outcomes": outcomes, "server": peak}
+
+
+async def _loadtest(args):
+    server = None
+    port = args.port
+    if port is None:
+        # Separate process, so the load generator doesn't share the server's loop or GIL
+        import os
+        import signal
+        import tempfile
+        db = os.path.join(tempfile.mkdtemp(), "battle_load.db")
+        server = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.abspath(__file__), "serve", "--port", "0", "--db", db,
+            stdout=asyncio.subprocess.PIPE)
+        port = int((await server.stdout.readline()).decode().rsplit(":", 1)[1])
+    result = await run_load(DEFAULT_HOST, port, args.sessions, args.connections, args.seconds)
+    if server:
+        server.send_signal(signal.SIGINT)
+        await server.wait()
+    print(f"✅ {result['sessions']} sessions, {result['actions']} actions "
+          f"({result['actions_per_sec']:,.0f}/s): p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms")
+    print(f"   enemy turn delay p99 {result['enemy_delay_p99_ms']:.0f} ms (target {ENEMY_TURN_DELAY * 1000:.0f}), "
+          f"outcomes {result['outcomes']}")
+    print(f"   server: {result['server']['sessions']} live sessions, "
+          f"{result['server']['memory_bytes'] / 1024:,.0f} KiB "
+          f"(max {result['server']['max_session_bytes']:,} bytes/session), "
+          f"action handling p99 {result['server']['action_p99_ms']:.3f} ms")
+
+
+async def _serve(args):
+    server = await BattleServer(SaveSystem(args.db)).start(args.host, args.port)
+    port = server.server.sockets[0].getsockname()[1]
+    print(f"⚔️ Battle server listening on {args.host}:{port}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Nigerian RPG battle server")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve")
+    serve.add_argument("--host", default=DEFAULT_HOST)
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--db", default="nigerian_rpg.db")
+    load = sub.add_parser("loadtest")
+    load.add_argument("--port", type=int, default=None, help="existing server (default: start a temporary one)")
+    load.add_argument("--sessions", type=int, default=2000)
+    load.add_argument("--connections", type=int, default=50)
+    load.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args) if args.command == "serve" else _loadtest(args))
+    except KeyboardInterrupt:
+        pass
@@ -1,7 +1,36 @@
 #This whole file explains the Character class and its methods for an RPG game.
 # character.py
 from dataclasses import dataclass, field
+import json
 import random
+from progression import ATTACK_PER_LEVEL, DEFENSE_PER_LEVEL, HP_PER_LEVEL, MAX_LEVEL, curve_for
+from skills import compile_skill
+
+# Attributes mirrored in the `characters` table. Assigning a new value to any
+# of them marks the character dirty so SaveSystem can skip or shrink saves.
+PERSISTED_FIELDS = frozenset({
+    "char_class", "level", "hp", "max_hp", "attack", "defense", "weapon",
+    "xp", "xp_to_next", "sprite_path", "skills", "damage_dealt"
+})
+
+# d6 added to weapon damage by basic_attack (enemy_ai.py models it too)
+ATTACK_ROLL = (1, 6)
+
+# Starting stats per class and weapon tables (combat_env.py vectorizes them)
+CLASS_STATS = {
+    "Citizen": {"hp": 100, "atk": 5, "def": 2},
+    "Soldier": {"hp": 120, "atk": 7, "def": 3},
+    "Police": {"hp": 110, "atk": 6, "def": 4}
+}
+WEAPONS = ("Juju", "Cutlass", "Gun")
+WEAPON_DAMAGE = {"Juju": 5, "Cutlass": 2, "Gun": 10}
+SPECIAL_THRESHOLDS = {"Juju": 25, "Cutlass": 10, "Gun": 50}
+SPECIAL_ABILITIES = {
+    "Cutlass": ("BENIN RAMPAGE", "LAGOS ATTACK", "BARAWO BARAGE"),
+    "Juju": ("OGUN STRIKE", "SANGO FATAL", "AMADIOHA SPAWN"),
+    "Gun": ("BARRAGE", "AK47 FIESTA", "MK 419 BARRAGE")
+}
+
 # attribute based initialization
 @dataclass
 class Character:
@@ -18,6 +47,63 @@ class Character:
     sprite_path: str = None
     skills: dict = field(default_factory=dict)
     damage_dealt: int = 0
+    _dirty: set = field(default_factory=set, init=False, repr=False, compare=False)
+    _skills_json: str = field(default=None, init=False, repr=False, compare=False)
+    _compiled_skills: dict = field(default=None, init=False, repr=False, compare=False)
+    # Live status effects for the current fight (status_effects.StatusState), never saved
+    status: object = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # A freshly built character has never been written anywhere
+        self._dirty = set(PERSISTED_FIELDS)
+
+    def __setattr__(self, key, value):
+        if key in PERSISTED_FIELDS:
+            dirty = self.__dict__.get("_dirty")
+            if dirty is not None:
+                # skills is a mutable dict, so any reassignment counts as a change
+                if key == "skills":
+                    dirty.add(key)
+                    self.__dict__["_skills_json"] = None
+                    self.__dict__["_compiled_skills"] = None
+                elif self.__dict__.get(key) != value:
+                    dirty.add(key)
+        object.__setattr__(self, key, value)
+
+    # ---- change tracking ----
+    def is_dirty(self) -> bool:
+        return bool(self._dirty)
+
+    def dirty_fields(self) -> set:
+        """Persisted attributes changed since the last save/load"""
+        return set(self._dirty)
+
+    def mark_dirty(self, *names):
+        """Flag attributes as changed (e.g. after editing skills in place)"""
+        for name in names or PERSISTED_FIELDS:
+            if name in PERSISTED_FIELDS:
+                self._dirty.add(name)
+            if name == "skills":
+                self._skills_json = None
+                self._compiled_skills = None
+
+    def mark_clean(self):
+        self._dirty.clear()
+
+    def reset_as_new(self, **values):
+        """Reassign attributes in bulk and start over like a freshly built
+        character: no skills, no status, every field dirty. For objects that
+        are never saved (pooled enemies), so per-field dirty checks are skipped."""
+        self.__dict__.update(values)
+        self.skills.clear()
+        self.status = None
+        self.mark_dirty()
+
+    def skills_json(self) -> str:
+        """JSON form of skills, serialized once per change"""
+        if self._skills_json is None:
+            self._skills_json = json.dumps(self.skills)
+        return self._skills_json
     
     def is_alive(self) -> bool:
         return self.hp > 0
@@ -28,62 +114,46 @@ class Character:
     def heal(self, amt: int):
         self.hp = min(self.max_hp, self.hp + int(amt))
 
+    def get_defense(self) -> int:
+        """Defense after status effects (a defense break lowers it)"""
+        status = self.status
+        return max(0, self.defense - status.defense_break) if status else self.defense
+
     def basic_attack(self, target: "Character") -> int:
         """Basic attack with weapon damage"""
-        roll = random.randint(1, 6)
+        roll = random.randint(*ATTACK_ROLL)
         weapon_dmg = self.get_weapon_damage()
-        base = max(1, weapon_dmg + roll - target.defense)
+        base = max(1, weapon_dmg + roll - target.get_defense())
         target.take_damage(base)
         self.damage_dealt += base
         return base
 
     def get_weapon_damage(self) -> int:
         """Get weapon base damage"""
-        weapon_damages = {
-            "Juju": 5,
-            "Cutlass": 2,
-            "Gun": 10
-        }
-        return weapon_damages.get(self.weapon, 2)
+        return WEAPON_DAMAGE.get(self.weapon, 2)
 
     def get_special_threshold(self) -> int:
         """Damage threshold for special ability"""
-        thresholds = {
-            "Juju": 25,
-            "Cutlass": 10,
-            "Gun": 50
-        }
-        return thresholds.get(self.weapon, 30)
+        return SPECIAL_THRESHOLDS.get(self.weapon, 30)
 
     def get_special_abilities(self) -> list:
         """Get list of special abilities for weapon"""
-        specials = {
-            "Cutlass": ["BENIN RAMPAGE", "LAGOS ATTACK", "BARAWO BARAGE"],
-            "Juju": ["OGUN STRIKE", "SANGO FATAL", "AMADIOHA SPAWN"],
-            "Gun": ["BARRAGE", "AK47 FIESTA", "MK 419 BARRAGE"]
-        }
-        return specials.get(self.weapon, ["BASIC STRIKE"])
-
-    def use_skill(self, skill_name: str, target: "Character"):
-        """Returns (description_str, effect_value)"""
-        if skill_name not in self.skills:
-            return f"{self.name} tried to use {skill_name} but doesn't know it.", 0
-
-        skill = self.skills[skill_name]
-        typ = skill.get("type", "damage")
-        power = skill.get("power", 0)
-
-        if typ == "damage":
-            dmg = max(1, int(self.attack * skill.get("mult", 1.0) + power - target.defense))
-            target.take_damage(dmg)
-            self.damage_dealt += dmg
-            return f"{self.name} used {skill_name} for {dmg} damage!", dmg
-        elif typ == "heal":
-            heal_amt = int(power + self.level * skill.get("scale", 0))
-            self.heal(heal_amt)
-            return f"{self.name} used {skill_name} and healed {heal_amt} HP!", heal_amt
-        else:
-            return f"{self.name} used {skill_name} but nothing happened.", 0
+        return list(SPECIAL_ABILITIES.get(self.weapon, ("BASIC STRIKE",)))
+
+    def use_skill(self, skill_name: str, target: "Character", effects=None):
+        """Returns (description_str, effect_value). Buff skills need the
+        fight's StatusEngine (combat.effects). Each skill is compiled on its
+        first use after a change (see skills.py)."""
+        compiled = self._compiled_skills
+        if compiled is None:
+            compiled = self._compiled_skills = {}
+        skill = compiled.get(skill_name)
+        if skill is None:
+            definition = self.skills.get(skill_name)
+            if definition is None:
+                return f"{self.name} tried to use {skill_name} but doesn't know it.", 0
+            skill = compiled[skill_name] = compile_skill(definition)
+        return skill.apply(self, skill_name, target, effects)
 
     def use_special_attack(self, target: "Character") -> tuple:
         """Use random special ability - guaranteed hit with 2x damage"""
@@ -94,18 +164,56 @@ class Character:
         return ability_name, damage
 
     def gain_xp(self, amount: int):
+        """Add XP and apply every level-up it pays for at once (see progression.py)"""
         self.xp += int(amount)
-        leveled = False
-        while self.xp >= self.xp_to_next:
-            self.xp -= self.xp_to_next
-            self.level_up()
-            leveled = True
-        return leveled
-
-    def level_up(self):
-        self.level += 1
-        self.max_hp += 5
-        self.attack += 1
-        self.defense += 1
+        if self.xp < self.xp_to_next:
+            return False
+        curve = curve_for(self.xp_to_next)
+        levels = curve.levels_for_xp(self.xp, MAX_LEVEL - self.level)
+        if not levels:
+            return False
+        self.xp -= curve.xp_for_levels(levels)
+        self.level_up(levels)
+        return True
+
+    def level_up(self, levels: int = 1):
+        self.level += levels
+        self.max_hp += HP_PER_LEVEL * levels
+        self.attack += ATTACK_PER_LEVEL * levels
+        self.defense += DEFENSE_PER_LEVEL * levels
         self.hp = self.max_hp
-        self.xp_to_next = int(self.xp_to_next * 1.3)
\ No newline at end of file
+        self.xp_to_next = curve_for(self.xp_to_next).thresholds[levels]
+
+
+def create_player(name: str, char_class: str):
+    """Create a new player character"""
+    stats = CLASS_STATS.get(char_class, CLASS_STATS["Citizen"])
+    weapon = random.choice(WEAPONS)
+    
+    sprite_map = {
+        "Citizen": "hero.png",
+        "Soldier": "soldier.png",
+        "Police": "police.png"
+    }
+    
+    skills = {}
+    if char_class == "Soldier":
+        skills["Military Strike"] = {"power": 8, "type": "damage", "mult": 1.5}
+    elif char_class == "Police":
+        skills["Arrest"] = {"power": 6, "type": "damage", "mult": 1.3}
+    
+    p = Character(
+        name=name,
+        level=1,
+        hp=stats["hp"],
+        max_hp=stats["hp"],
+        attack=stats["atk"],
+        defense=stats["def"],
+        char_class=char_class,
+        weapon=weapon,
+        xp=0,
+        xp_to_next=50,
+        sprite_path=sprite_map.get(char_class, "hero.png"),
+        skills=skills
+    )
+    return p
@@ -1,20 +1,191 @@
 # combat.py
+import json
+import os
 import random
 from character import Character
+from combat_snapshot import CombatSnapshot, characters_from_snapshot, restore_snapshot, take_snapshot
+from status_effects import BENEFICIAL, SPECIAL_EFFECTS, StatusEngine
+
+# Nigerian-themed enemies with difficulty scaling
+LEVEL_1_ENEMIES = [
+    {"name":"Bandit", "level":1, "hp":100, "atk":4, "def":2, "sprite":"bandit.png"},
+    {"name":"Area Boy", "level":1, "hp":90, "atk":5, "def":1, "sprite":"bandit.png"},
+]
+
+LEVEL_2_ENEMIES = [
+    {"name":"Kidnapper", "level":2, "hp":150, "atk":6, "def":3, "sprite":"kidnapper.png"},
+    {"name":"Armed Robber", "level":2, "hp":140, "atk":7, "def":2, "sprite":"kidnapper.png"},
+]
+
+LEVEL_3_ENEMIES = [
+    {"name":"Politician", "level":3, "hp":200, "atk":8, "def":4, "sprite":"politician.png"},
+]
+
+# Enemy HP multiplier per difficulty setting (fallback when the profile has no entry)
+DIFFICULTY_MULTIPLIERS = {"Easy": 0.75, "Normal": 1.0, "Hard": 1.5}
+
+# Per-enemy HP/defense multipliers for each difficulty, written by balancer.py
+PROFILE_VERSION = 1
+PROFILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "difficulty_profile.json")
+
+def load_difficulty_profile(path: str = PROFILE_PATH) -> dict:
+    """{difficulty: {enemy name: {"hp": mult, "def": mult}}} from a profile file ({} if unusable)"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            profile = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not read difficulty profile {path}: {e}")
+        return {}
+    if profile.get("version") != PROFILE_VERSION:
+        print(f"⚠️ Ignoring difficulty profile version {profile.get('version')} (expected {PROFILE_VERSION})")
+        return {}
+    return profile.get("difficulties", {})
+
+DIFFICULTY_PROFILE = load_difficulty_profile()
+
+def pick_enemy_template(level: int) -> dict:
+    """Random enemy template for a level"""
+    if level == 1:
+        return random.choice(LEVEL_1_ENEMIES)
+    elif level == 2:
+        return random.choice(LEVEL_2_ENEMIES)
+    else:  # Level 3
+        return random.choice(LEVEL_3_ENEMIES)
+
+def scale_enemy(base: dict, difficulty_multiplier: float = 1.0, difficulty: str = None) -> tuple:
+    """(hp, defense) for an enemy template: the balanced profile entry for
+    difficulty if there is one, else HP times difficulty_multiplier"""
+    tuned = DIFFICULTY_PROFILE.get(difficulty, {}).get(base["name"]) if difficulty else None
+    if tuned:
+        return int(base["hp"] * tuned["hp"]), max(0, round(base["def"] * tuned["def"]))
+    return int(base["hp"] * difficulty_multiplier), base["def"]
+
+def create_enemy_for_level(level: int, difficulty_multiplier: float = 1.0, difficulty: str = None):
+    """Create enemy based on current level with difficulty scaling"""
+    try:
+        base = pick_enemy_template(level)
+        
+        # Apply the difficulty profile (or the plain HP multiplier)
+        scaled_hp, defense = scale_enemy(base, difficulty_multiplier, difficulty)
+        
+        e = Character(
+            name=base["name"],
+            level=base["level"],
+            hp=scaled_hp,
+            max_hp=scaled_hp,
+            attack=base["atk"],
+            defense=defense,
+            sprite_path=base.get("sprite")
+        )
+        return e
+    except Exception as e:
+        print(f"❌ Error creating enemy: {e}")
+        return Character(name="Enemy", level=1, hp=100, max_hp=100, attack=5, defense=2)
+
+# Event ids - compact stand-ins for the log messages (see wire_protocol.py).
+# VICTORY through LEVEL_UP are fight outcomes, reported by battle_server.py.
+EVENT_NONE = 0
+EVENT_ATTACK_HIT = 1
+EVENT_ATTACK_MISS = 2
+EVENT_DEFEND_OK = 3
+EVENT_DEFEND_FAIL = 4
+EVENT_SPECIAL = 5
+EVENT_ENEMY_ATTACK = 6
+EVENT_VICTORY = 7
+EVENT_DEFEAT = 8
+EVENT_FLEE = 9
+EVENT_FLEE_FAILED = 10
+EVENT_LEVEL_UP = 11
+EVENT_ENEMY_HEAVY = 12
+EVENT_ENEMY_RECOVER = 13
+EVENT_ENEMY_STUNNED = 14
+EVENT_STATUS = 15          # status effects ended the fight before the player acted
+
+# Enemy moves. STRIKE is the classic counter-attack; Hard enemies let
+# enemy_ai.py pick between all three.
+ENEMY_STRIKE = "strike"
+ENEMY_HEAVY = "heavy"
+ENEMY_RECOVER = "recover"
+ENEMY_ACTIONS = (ENEMY_STRIKE, ENEMY_HEAVY, ENEMY_RECOVER)
+
+# Turn rules, shared with the enemy AI's model of a fight
+PLAYER_HIT_CHANCE = 90          # percent
+MISS_PENALTY = 2
+DEFEND_CHANCE = 90              # percent
+DEFEND_FAIL_PENALTY = 5
+STRIKE_DAMAGE = (2, 6)
+DEFENDED_STRIKE_DAMAGE = (1, 2)
+HEAVY_HIT_CHANCE = 70           # percent; a successful defend blocks it completely
+HEAVY_DAMAGE = (4, 9)
+RECOVER_HEAL = (4, 8)
+FLEE_CHANCE = 0.6
 
 class Combat:
     def __init__(self, player: Character, enemy: Character):
+        self.log = []
+        self.effects = StatusEngine()
+        self.reset(player, enemy)
+
+    def reset(self, player: Character, enemy: Character):
+        """Start a fresh fight, reusing this object (see pooling.py)"""
         self.player = player
         self.enemy = enemy
-        self.log = []
+        self.log.clear()
+        self.effects.clear(player, enemy)
         self.turn_count = 0
         self.player_defended = False
+        # What the last action did, as an event id plus the HP it moved
+        self.last_event = EVENT_NONE
+        self.last_amount = 0
+
+    def snapshot(self) -> CombatSnapshot:
+        """Immutable, hashable copy of the battle state (see combat_snapshot.py)"""
+        return take_snapshot(self)
+
+    def restore(self, snap: CombatSnapshot):
+        """Return to a snapshot in place - no new objects are built"""
+        restore_snapshot(self, snap)
+
+    @classmethod
+    def from_snapshot(cls, snap: CombatSnapshot) -> "Combat":
+        """New Combat, with its own Characters, in the snapshot's state"""
+        combat = cls(*characters_from_snapshot(snap))
+        restore_snapshot(combat, snap)
+        return combat
+
+    def apply_effect(self, target: Character, kind: str, power: int = 0, turns: int = 1) -> str:
+        """Put a status effect on target (see status_effects.py); its message, empty if it changed nothing"""
+        return self.effects.apply(target, kind, power, turns)
+
+    def _start_turn(self) -> list:
+        """Tick status effects at the top of the player's turn; their message lines"""
+        return self.effects.advance()
+
+    def _status_ended(self, lines) -> str:
+        """The turn's message if status effects ended the fight (the player's
+        action is then skipped), else None"""
+        if not (lines and self.is_over()[0]):
+            return None
+        self.last_event, self.last_amount = EVENT_STATUS, 0
+        msg = "\n".join(lines)
+        self.log.append(msg)
+        self.turn_count += 1
+        return msg
+
+    def _with_status(self, lines, msg):
+        return "\n".join(lines + [msg]) if lines else msg
 
     def player_attack(self):
         """Player attacks - 90% hit rate"""
+        status = self._start_turn()
+        ended = self._status_ended(status)
+        if ended:
+            return ended
         hit_chance = random.randint(1, 100)
         
-        if hit_chance > 10:  # 90% success
+        if hit_chance > 100 - PLAYER_HIT_CHANCE:  # 90% success
             dmg = self.player.basic_attack(self.enemy)
             
             # Enemy reactions on successful hit
@@ -24,9 +195,10 @@ class Combat:
                 "Politician": ["🎭 You are a fool!", "💼 I belong to the people!"]
             }
             reaction = random.choice(reactions.get(self.enemy.name, ["😡 Arrgh!"]))
+            self.last_event, self.last_amount = EVENT_ATTACK_HIT, dmg
             msg = f"✅ You attacked! +{dmg}xp damage dealt!\n{reaction}"
         else:  # Miss - player takes minor damage
-            self.player.take_damage(2)
+            self.player.take_damage(MISS_PENALTY)
             
             fail_reactions = {
                 "Bandit": ["😆 Odeshi! You missed!", "🤣 Miss tire!"],
@@ -34,17 +206,23 @@ class Combat:
                 "Politician": ["🎪 I belong to the people!", "🎯 Miss!"]
             }
             reaction = random.choice(fail_reactions.get(self.enemy.name, ["😂 You missed!"]))
+            self.last_event, self.last_amount = EVENT_ATTACK_MISS, MISS_PENALTY
             msg = f"❌ Attack FAILED! -2xp HP\n{reaction}"
         
+        msg = self._with_status(status, msg)
         self.log.append(msg)
         self.turn_count += 1
         return msg
 
     def player_defend(self):
         """Player defends - 90% success rate"""
+        status = self._start_turn()
+        ended = self._status_ended(status)
+        if ended:
+            return ended
         defend_chance = random.randint(1, 100)
         
-        if defend_chance > 10:  # 90% success
+        if defend_chance > 100 - DEFEND_CHANCE:  # 90% success
             self.player_defended = True
             
             defense_reactions = {
@@ -53,9 +231,10 @@ class Combat:
                 "Politician": ["🎭 It is better you fall now", "💼 This won't save you!"]
             }
             reaction = random.choice(defense_reactions.get(self.enemy.name, ["😠 Hmph!"]))
+            self.last_event, self.last_amount = EVENT_DEFEND_OK, 0
             msg = f"🛡️ DEFENSE SUCCESSFUL! You blocked the attack!\n{reaction}"
         else:  # Failed defense
-            self.player.take_damage(5)
+            self.player.take_damage(DEFEND_FAIL_PENALTY)
             
             fail_def_reactions = {
                 "Bandit": ["😱 Wallahi, I go kill you!!", "💥 See as you scatter!"],
@@ -63,35 +242,92 @@ class Combat:
                 "Politician": ["🎯 Na me dey here", "💀 Power overwhelms you!"]
             }
             reaction = random.choice(fail_def_reactions.get(self.enemy.name, ["💥 Boom!"]))
+            self.last_event, self.last_amount = EVENT_DEFEND_FAIL, DEFEND_FAIL_PENALTY
             msg = f"❌ DEFENSE FAILED! -5xp HP\n{reaction}"
         
+        msg = self._with_status(status, msg)
         self.log.append(msg)
         self.turn_count += 1
         return msg
 
     def player_special_attack(self):
-        """Player uses special ability - guaranteed hit"""
+        """Player uses special ability - guaranteed hit, plus its status effect"""
+        status = self._start_turn()
+        ended = self._status_ended(status)
+        if ended:
+            return ended
         ability_name, damage = self.player.use_special_attack(self.enemy)
+        self.last_event, self.last_amount = EVENT_SPECIAL, damage
         msg = f"⚡ SPECIAL ABILITY: {ability_name}!\n💥 {damage}xp damage dealt! (GUARANTEED HIT)"
+        effect = SPECIAL_EFFECTS.get(ability_name)
+        if effect and self.enemy.is_alive():
+            kind, power, turns = effect
+            applied = self.apply_effect(self.player if kind in BENEFICIAL else self.enemy, kind, power, turns)
+            if applied:
+                msg += "\n" + applied
+        msg = self._with_status(status, msg)
         self.log.append(msg)
         self.turn_count += 1
         return msg
 
-    def enemy_turn(self):
-        """Enemy attacks player"""
+    def enemy_turn(self, action: str = ENEMY_STRIKE):
+        """Enemy attacks player (or another move picked by the enemy AI)"""
+        if self.effects.is_stunned(self.enemy):
+            return self._enemy_stunned()
+        if action == ENEMY_HEAVY:
+            return self._enemy_heavy()
+        if action == ENEMY_RECOVER:
+            return self._enemy_recover()
         if self.player_defended:
             # Reduced damage if player defended
-            damage = random.randint(1, 2)
+            damage = random.randint(*DEFENDED_STRIKE_DAMAGE)
             self.player_defended = False
         else:
             # Normal damage
-            damage = random.randint(2, 6)
+            damage = random.randint(*STRIKE_DAMAGE)
         
         self.player.take_damage(damage)
+        self.last_event, self.last_amount = EVENT_ENEMY_ATTACK, damage
         msg = f"🔥 {self.enemy.name} counter-attacks for {damage}xp damage!"
         self.log.append(msg)
         return msg
 
+    def _enemy_heavy(self):
+        """Wind-up attack: hits hard, but a successful defend stops it"""
+        if self.player_defended:
+            damage = 0
+            msg = f"🛡️ {self.enemy.name}'s heavy blow smashes into your guard - no damage!"
+        elif random.randint(1, 100) > 100 - HEAVY_HIT_CHANCE:
+            damage = random.randint(*HEAVY_DAMAGE)
+            msg = f"💥 {self.enemy.name} lands a HEAVY blow for {damage}xp damage!"
+        else:
+            damage = 0
+            msg = f"💨 {self.enemy.name} swings wild and misses!"
+        self.player_defended = False
+        self.player.take_damage(damage)
+        self.last_event, self.last_amount = EVENT_ENEMY_HEAVY, damage
+        self.log.append(msg)
+        return msg
+
+    def _enemy_stunned(self):
+        """A stunned enemy loses its move"""
+        self.player_defended = False
+        self.last_event, self.last_amount = EVENT_ENEMY_STUNNED, 0
+        msg = f"😵 {self.enemy.name} is stunned and can't move!"
+        self.log.append(msg)
+        return msg
+
+    def _enemy_recover(self):
+        """Enemy catches its breath instead of attacking"""
+        before = self.enemy.hp
+        self.enemy.heal(random.randint(*RECOVER_HEAL))
+        healed = self.enemy.hp - before
+        self.player_defended = False
+        self.last_event, self.last_amount = EVENT_ENEMY_RECOVER, healed
+        msg = f"💊 {self.enemy.name} catches breath and recovers {healed} HP!"
+        self.log.append(msg)
+        return msg
+
     def is_over(self):
         if not self.player.is_alive():
             return True, "enemy"
@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""
+combat_env.py - Gym-style environments for training combat policies
+CombatEnv wraps one real Combat the same way battle_gui drives it: the
+player acts, then the enemy responds. That includes the special-meter
+bookkeeping and the flee roll. VecCombatEnv runs the same rules for
+thousands of independent battles at once on NumPy arrays, and resets
+finished battles automatically. Status effects from specials are carried
+as a turns-left summary per battle (see status_effects.summarize).
+
+Both follow the Gymnasium calling convention without depending on it:
+
+    env = VecCombatEnv(4096, seed=0)
+    obs, info = env.reset()
+    obs, reward, terminated, truncated, info = env.step(actions)
+
+Actions: 0 attack, 1 defend, 2 special, 3 flee. The enemy strikes unless
+an enemy policy is given, or enemy actions are passed to step(); those
+are indices into combat.ENEMY_ACTIONS, so enemy policies can be trained
+too. Needs numpy (pip install numpy). Run directly for the rule check and
+throughput benchmark:
+
+    python combat_env.py [num_envs]
+"""
+import random
+import sys
+import time
+import numpy as np
+from character import (ATTACK_ROLL, CLASS_STATS, SPECIAL_ABILITIES, SPECIAL_THRESHOLDS, WEAPON_DAMAGE, WEAPONS,
+                       create_player)
+from combat import (Combat, DEFEND_CHANCE, DEFEND_FAIL_PENALTY, DEFENDED_STRIKE_DAMAGE, DIFFICULTY_MULTIPLIERS,
+                    ENEMY_ACTIONS, FLEE_CHANCE, HEAVY_DAMAGE, HEAVY_HIT_CHANCE, LEVEL_1_ENEMIES, LEVEL_2_ENEMIES,
+                    LEVEL_3_ENEMIES, MISS_PENALTY, PLAYER_HIT_CHANCE, RECOVER_HEAL, STRIKE_DAMAGE,
+                    create_enemy_for_level, scale_enemy)
+from status_effects import NO_EFFECTS, SPECIAL_EFFECTS, apply_to_summary
+
+ATTACK, DEFEND, SPECIAL, FLEE = 0, 1, 2, 3
+ACTIONS = ("attack", "defend", "special", "flee")
+STRIKE, HEAVY, RECOVER = range(len(ENEMY_ACTIONS))
+MAX_SPECIALS = 3          # matches special_ability_count < 3 in battle_gui
+
+OBS_FIELDS = ("player_hp", "enemy_hp", "player_defended", "special_meter", "special_ready",
+              "specials_used", "weapon_damage", "enemy_defense", "level", "turn")
+OBS_SIZE = len(OBS_FIELDS)
+
+TURN_LIMIT = 200          # episodes are truncated after this many steps
+WIN_REWARD, LOSS_REWARD = 1.0, -1.0
+FLEE_REWARD = -0.5        # fleeing ends the run
+INVALID_REWARD = -0.01    # special pressed when it isn't ready
+SHAPING = 0.1             # weight of per-step HP swing in the reward
+
+_LEVEL_TEMPLATES = (LEVEL_1_ENEMIES, LEVEL_2_ENEMIES, LEVEL_3_ENEMIES)
+# Columns of VecCombatEnv.effects (status_effects.NO_EFFECTS layout)
+_EFFECT_TURNS = [1, 3, 4, 6]
+_EFFECT_POWERS, _EFFECT_POWER_TURNS = [0, 2, 5], [1, 3, 6]
+
+
+def observe(p_hp, p_max, e_hp, e_max, defended, meter, threshold, uses, weapon, e_def, level, turns):
+    """Observation vector(s); works on scalars or arrays alike"""
+    return np.stack(np.broadcast_arrays(
+        np.divide(p_hp, p_max), np.divide(e_hp, e_max), np.asarray(defended, dtype=np.float32),
+        np.minimum(np.divide(meter, threshold), 1.0), np.asarray(meter >= threshold, dtype=np.float32),
+        np.divide(uses, MAX_SPECIALS), np.divide(weapon, 10.0), np.divide(e_def, 10.0),
+        np.divide(level, 3.0), np.divide(turns, TURN_LIMIT)), axis=-1).astype(np.float32)
+
+
+class CombatEnv:
+    """One battle on the real Combat class.
+
+    Combat draws from the global random module, so reset(seed=...) seeds it.
+    """
+    n_actions = len(ACTIONS)
+    obs_size = OBS_SIZE
+
+    def __init__(self, level=None, difficulty="Normal", char_class=None, enemy_policy=None,
+                 max_turns=TURN_LIMIT):
+        self.level = level
+        self.difficulty = difficulty
+        self.difficulty_mult = DIFFICULTY_MULTIPLIERS.get(difficulty, 1.0)
+        self.char_class = char_class
+        self.enemy_policy = enemy_policy   # obs -> enemy action index
+        self.max_turns = max_turns
+        self.combat = None
+
+    def reset(self, seed=None):
+        if seed is not None:
+            random.seed(seed)
+        self.current_level = self.level or random.randint(1, 3)
+        player = create_player("Trainee", self.char_class or random.choice(list(CLASS_STATS)))
+        self.combat = Combat(player, create_enemy_for_level(self.current_level, self.difficulty_mult,
+                                                                    self.difficulty))
+        self.weapon_damage_count = 0
+        self.special_ability_count = 0
+        self.steps = 0
+        return self._obs(), {"level": self.current_level, "weapon": player.weapon}
+
+    def _obs(self):
+        player, enemy = self.combat.player, self.combat.enemy
+        return observe(player.hp, player.max_hp, enemy.hp, enemy.max_hp, self.combat.player_defended,
+                       self.weapon_damage_count, player.get_special_threshold(), self.special_ability_count,
+                       player.get_weapon_damage(), enemy.defense, self.current_level, self.steps)
+
+    def step(self, action, enemy_action=None):
+        combat, player, enemy = self.combat, self.combat.player, self.combat.enemy
+        p_before, e_before = player.hp, enemy.hp
+        self.steps += 1
+        reward, acted, fled = 0.0, True, False
+
+        if action == ATTACK:
+            combat.player_attack()
+            self.weapon_damage_count += player.get_weapon_damage()
+        elif action == DEFEND:
+            combat.player_defend()
+        elif action == SPECIAL:
+            threshold = player.get_special_threshold()
+            if self.weapon_damage_count >= threshold and self.special_ability_count < MAX_SPECIALS:
+                combat.player_special_attack()
+                self.weapon_damage_count = 0
+                self.special_ability_count += 1
+            else:
+                # No turn is taken; past the cap battle_gui resets the counter
+                if self.weapon_damage_count >= threshold:
+                    self.special_ability_count = 0
+                reward += INVALID_REWARD
+                acted = False
+        elif action == FLEE:
+            fled = random.random() < FLEE_CHANCE
+            acted = not fled
+        else:
+            raise ValueError(f"unknown action {action!r} (expected 0-{len(ACTIONS) - 1})")
+
+        if acted and not combat.is_over()[0]:
+            if enemy_action is None:
+                enemy_action = self.enemy_policy(self._obs()) if self.enemy_policy else STRIKE
+            combat.enemy_turn(ENEMY_ACTIONS[enemy_action])
+
+        over, winner = combat.is_over()
+        reward += SHAPING * ((e_before - enemy.hp) / enemy.max_hp - (p_before - player.hp) / player.max_hp)
+        if winner == "player":
+            reward += WIN_REWARD
+        elif winner == "enemy":
+            reward += LOSS_REWARD
+        elif fled:
+            reward += FLEE_REWARD
+        terminated = over or fled
+        truncated = not terminated and self.steps >= self.max_turns
+        return self._obs(), reward, terminated, truncated, {"winner": winner, "fled": fled}
+
+
+class VecCombatEnv:
+    """num_envs independent battles stepped together on NumPy arrays.
+
+    Finished battles reset automatically. Their last observation, return
+    and length are in info (rows where info["done"] is set). Steps and
+    resets draw from separate streams, so every step consumes the same
+    random numbers whatever happens in the fights - two envs with the same
+    seed but different enemy stats see common random numbers.
+
+    templates, if given, replaces the per-level enemy lists: every battle
+    draws one of these template dicts (see combat.LEVEL_1_ENEMIES).
+    """
+    n_actions = len(ACTIONS)
+    obs_size = OBS_SIZE
+
+    def __init__(self, num_envs, seed=None, level=None, difficulty="Normal", char_class=None,
+                 enemy_policy=None, max_turns=TURN_LIMIT, templates=None):
+        self.num_envs = num_envs
+        self.level = level
+        self.difficulty_mult = DIFFICULTY_MULTIPLIERS.get(difficulty, 1.0)
+        self.char_class = char_class
+        self.enemy_policy = enemy_policy   # obs array -> enemy action index array
+        self.max_turns = max_turns
+        self._seed(seed)
+
+        # Lookup tables built from the same data the game uses
+        self._class_hp = np.array([stats["hp"] for stats in CLASS_STATS.values()])
+        self._class_index = list(CLASS_STATS).index(char_class) if char_class else None
+        self._weapon_damage = np.array([WEAPON_DAMAGE[w] for w in WEAPONS])
+        self._threshold = np.array([SPECIAL_THRESHOLDS[w] for w in WEAPONS])
+        # Per weapon and ability: the effect summary it puts down (the non-zero fields are the ones it sets)
+        self._special_summary = np.array([[apply_to_summary(NO_EFFECTS, *SPECIAL_EFFECTS[name])
+                                           if name in SPECIAL_EFFECTS else NO_EFFECTS
+                                           for name in SPECIAL_ABILITIES[w]] for w in WEAPONS])
+        self._templates = templates
+        if templates is None:
+            templates = [t for level_templates in _LEVEL_TEMPLATES for t in level_templates]
+        scaled = [scale_enemy(t, self.difficulty_mult, difficulty) for t in templates]
+        self._enemy_hp = np.array([hp for hp, _ in scaled])
+        self._enemy_def = np.array([defense for _, defense in scaled])
+        self._enemy_level = np.array([t["level"] for t in templates])
+        self._level_start = np.cumsum([0] + [len(t) for t in _LEVEL_TEMPLATES])[:-1]
+        self._level_count = np.array([len(t) for t in _LEVEL_TEMPLATES])
+
+        shape = (num_envs,)
+        self.p_hp = np.zeros(shape, np.int32)
+        self.p_max = np.ones(shape, np.int32)
+        self.e_hp = np.zeros(shape, np.int32)
+        self.e_max = np.ones(shape, np.int32)
+        self.e_def = np.zeros(shape, np.int32)
+        self.weapon = np.zeros(shape, np.int32)
+        self.weapon_index = np.zeros(shape, np.int32)
+        self.threshold = np.ones(shape, np.int32)
+        self.meter = np.zeros(shape, np.int32)
+        self.uses = np.zeros(shape, np.int32)
+        self.defended = np.zeros(shape, bool)
+        self.effects = np.zeros(shape + (len(NO_EFFECTS),), np.int32)   # status_effects summary
+        self.levels = np.ones(shape, np.int32)
+        self.turns = np.zeros(shape, np.int32)
+        self.returns = np.zeros(shape, np.float64)
+
+    def _seed(self, seed):
+        step_seed, reset_seed = np.random.SeedSequence(seed).spawn(2)
+        self.rng = np.random.default_rng(step_seed)
+        self._reset_rng = np.random.default_rng(reset_seed)
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self._seed(seed)
+        self._reset(np.ones(self.num_envs, bool))
+        return self._obs(), {}
+
+    def _reset(self, mask):
+        n = int(mask.sum())
+        if not n:
+            return
+        rng = self._reset_rng
+        if self._templates is not None:
+            template = rng.integers(0, len(self._templates), n)
+            levels = self._enemy_level[template]
+        else:
+            levels = np.full(n, self.level) if self.level else rng.integers(1, 4, n)
+            template = self._level_start[levels - 1] + (rng.random(n) * self._level_count[levels - 1]).astype(np.int64)
+        classes = np.full(n, self._class_index) if self._class_index is not None else rng.integers(0, len(CLASS_STATS), n)
+        weapons = rng.integers(0, len(WEAPONS), n)
+        self.levels[mask] = levels
+        self.p_hp[mask] = self.p_max[mask] = self._class_hp[classes]
+        self.e_hp[mask] = self.e_max[mask] = self._enemy_hp[template]
+        self.e_def[mask] = self._enemy_def[template]
+        self.weapon[mask] = self._weapon_damage[weapons]
+        self.weapon_index[mask] = weapons
+        self.threshold[mask] = self._threshold[weapons]
+        self.meter[mask] = 0
+        self.uses[mask] = 0
+        self.defended[mask] = False
+        self.effects[mask] = 0
+        self.turns[mask] = 0
+        self.returns[mask] = 0.0
+
+    def _obs(self):
+        return observe(self.p_hp, self.p_max, self.e_hp, self.e_max, self.defended, self.meter,
+                       self.threshold, self.uses, self.weapon, self.e_def, self.levels, self.turns)
+
+    def step(self, actions, enemy_actions=None):
+        actions = np.asarray(actions)
+        rng, n = self.rng, self.num_envs
+        p_before, e_before = self.p_hp.copy(), self.e_hp.copy()
+        reward = np.zeros(n, np.float64)
+        self.turns += 1
+
+        special = actions == SPECIAL
+        ready = self.meter >= self.threshold
+        fired = special & ready & (self.uses < MAX_SPECIALS)
+
+        # Status effects tick at the top of every attack, defend and special
+        # (Combat._start_turn); if bleeding ends the fight the action is skipped
+        fx = self.effects
+        acted = (actions == ATTACK) | (actions == DEFEND) | fired
+        self.e_hp -= np.where(acted, fx[:, 0], 0)
+        self.p_hp = np.where(acted, np.minimum(self.p_max, self.p_hp + fx[:, 5]), self.p_hp)
+        fx[:, _EFFECT_TURNS] -= acted[:, None] & (fx[:, _EFFECT_TURNS] > 0)
+        fx[:, _EFFECT_POWERS] *= fx[:, _EFFECT_POWER_TURNS] > 0
+        playing = self.e_hp > 0
+
+        # Attack: hit for weapon + d6 - defense (at least 1), or take the miss penalty.
+        # The meter fills on every attack, hit or miss, as in battle_gui.
+        attack = actions == ATTACK
+        hit = rng.random(n) < PLAYER_HIT_CHANCE / 100
+        defense = np.maximum(0, self.e_def - fx[:, 2])
+        damage = np.maximum(1, self.weapon + rng.integers(ATTACK_ROLL[0], ATTACK_ROLL[1] + 1, n) - defense)
+        self.e_hp -= np.where(attack & playing & hit, damage, 0)
+        self.p_hp -= np.where(attack & playing & ~hit, MISS_PENALTY, 0)
+        self.meter += np.where(attack, self.weapon, 0)
+
+        defend = actions == DEFEND
+        blocked = rng.random(n) < DEFEND_CHANCE / 100
+        self.defended |= defend & playing & blocked
+        self.p_hp -= np.where(defend & playing & ~blocked, DEFEND_FAIL_PENALTY, 0)
+
+        # Special: 2x weapon damage, then one of the weapon's abilities (picked
+        # uniformly) puts its effect down if the enemy is still standing
+        ability = rng.integers(0, len(self._special_summary[0]), n)
+        self.e_hp -= np.where(fired & playing, 2 * self.weapon, 0)
+        lands = fired & playing & (self.e_hp > 0)
+        placed = self._special_summary[self.weapon_index, ability]
+        fx[...] = np.where(lands[:, None] & (placed != 0), placed, fx)
+        self.meter[fired] = 0
+        self.uses += fired
+        invalid = special & ~fired
+        self.uses[invalid & ready] = 0   # battle_gui resets the counter past the cap
+        reward += np.where(invalid, INVALID_REWARD, 0.0)
+
+        fled = (actions == FLEE) & (rng.random(n) < FLEE_CHANCE)
+        np.maximum(self.e_hp, 0, out=self.e_hp)
+        np.maximum(self.p_hp, 0, out=self.p_hp)
+
+        # Enemy turn wherever the player used a turn and the fight goes on
+        responds = ~invalid & ~fled & (self.e_hp > 0) & (self.p_hp > 0)
+        if enemy_actions is None:
+            enemy_actions = self.enemy_policy(self._obs()) if self.enemy_policy else STRIKE
+        enemy_actions = np.broadcast_to(np.asarray(enemy_actions), (n,))
+        moves = responds & (fx[:, 4] == 0)   # a stunned enemy loses its move
+        strike = moves & (enemy_actions == STRIKE)
+        heavy = moves & (enemy_actions == HEAVY)
+        recover = moves & (enemy_actions == RECOVER)
+        strike_damage = np.where(self.defended, rng.integers(DEFENDED_STRIKE_DAMAGE[0], DEFENDED_STRIKE_DAMAGE[1] + 1, n),
+                                 rng.integers(STRIKE_DAMAGE[0], STRIKE_DAMAGE[1] + 1, n))
+        heavy_lands = ~self.defended & (rng.random(n) < HEAVY_HIT_CHANCE / 100)
+        heavy_damage = np.where(heavy_lands, rng.integers(HEAVY_DAMAGE[0], HEAVY_DAMAGE[1] + 1, n), 0)
+        self.p_hp -= np.where(strike, strike_damage, 0) + np.where(heavy, heavy_damage, 0)
+        np.maximum(self.p_hp, 0, out=self.p_hp)
+        heal = rng.integers(RECOVER_HEAL[0], RECOVER_HEAL[1] + 1, n)
+        self.e_hp = np.where(recover, np.minimum(self.e_max, self.e_hp + heal), self.e_hp)
+        self.defended &= ~responds
+
+        won = self.e_hp <= 0
+        lost = self.p_hp <= 0
+        reward += SHAPING * ((e_before - self.e_hp) / self.e_max - (p_before - self.p_hp) / self.p_max)
+        reward += np.where(won, WIN_REWARD, 0.0) + np.where(lost, LOSS_REWARD, 0.0)
+        reward += np.where(fled & ~won & ~lost, FLEE_REWARD, 0.0)
+        terminated = won | lost | fled
+        truncated = ~terminated & (self.turns >= self.max_turns)
+        self.returns += reward
+
+        done = terminated | truncated
+        info = {"done": done, "won": won}
+        if done.any():
+            info["final_observation"] = self._obs()
+            info["episode_return"] = self.returns.copy()
+            info["episode_length"] = self.turns.copy()
+            self._reset(done)
+        return self._obs(), reward, terminated, truncated, info
+
+
+def _random_policy_stats(episodes, seed):
+    """(win rate, mean length) of a random attack/defend/special policy on both envs"""
+    env = CombatEnv(level=2)
+    rng = random.Random(seed)
+    wins = length = 0
+    for episode in range(episodes):
+        env.reset(seed=seed + episode)
+        done = False
+        while not done:
+            _, _, terminated, truncated, info = env.step(rng.randrange(FLEE))
+            done = terminated or truncated
+        wins += info["winner"] == "player"
+        length += env.steps
+
+    # First episode of each vectorized battle only: counting whichever finish
+    # first would over-sample short fights
+    vec = VecCombatEnv(episodes, seed=seed, level=2)
+    vec.reset()
+    seen = np.zeros(episodes, bool)
+    vec_wins = vec_length = 0
+    policy_rng = np.random.default_rng(seed)
+    while not seen.all():
+        _, _, _, _, info = vec.step(policy_rng.integers(0, FLEE, episodes))
+        first = info["done"] & ~seen
+        if first.any():
+            vec_wins += int(info["won"][first].sum())
+            vec_length += int(info["episode_length"][first].sum())
+            seen |= first
+    return (wins / episodes, length / episodes), (vec_wins / episodes, vec_length / episodes)
+
+
+def benchmark(num_envs=4096, seconds=2.0) -> dict:
+    """Env-steps/second for CombatEnv and VecCombatEnv on one core"""
+    results = {}
+    env = CombatEnv()
+    env.reset(seed=0)
+    steps, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        _, _, terminated, truncated, _ = env.step(steps % 3 and ATTACK or DEFEND)
+        if terminated or truncated:
+            env.reset()
+        steps += 1
+    results["CombatEnv"] = steps / (time.perf_counter() - start)
+
+    vec = VecCombatEnv(num_envs, seed=0)
+    vec.reset()
+    actions = np.random.default_rng(0).integers(0, 3, (64, num_envs))
+    calls, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        vec.step(actions[calls % 64])
+        calls += 1
+    results[f"VecCombatEnv({num_envs})"] = calls * num_envs / (time.perf_counter() - start)
+    return results
+
+
+if __name__ == "__main__":
+    num_envs = int(sys.argv[1]) if len(sys.argv) > 1 else 4096
+
+    a, b = VecCombatEnv(8, seed=7), VecCombatEnv(8, seed=7)
+    assert np.array_equal(a.reset()[0], b.reset()[0])
+    for step in range(300):
+        actions = (np.arange(8) + step) % 3
+        assert np.array_equal(a.step(actions)[0], b.step(actions)[0])
+    print("✅ same seed, same trajectories (with auto-resets)")
+
+    (win, length), (vec_win, vec_length) = _random_policy_stats(4000, seed=11)
+    assert abs(win - vec_win) < 0.03 and abs(length - vec_length) < 0.05 * length
+    print(f"✅ random policy vs the real Combat: win {win:.1%} / {vec_win:.1%} vectorized, "
+          f"length {length:.1f} / {vec_length:.1f} steps")
+
+    for name, rate in benchmark(num_envs).items():
+        print(f"   {name:<20} {rate:>14,.0f} env-steps/s")
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+combat_snapshot.py - Cheap immutable snapshots of a Combat
+AI search, replay validation and undo clone battle state many times per
+decision. A CombatSnapshot is one flat tuple: both characters' stats,
+turn_count, player_defended, the status wheel's turn and each character's
+live effects as (kind, power, expires) tuples. It is hashable, so it can
+key a transposition table. Restoring writes the values back into the
+existing objects instead of building new ones, and rebuilds the
+StatusEngine from the effects.
+
+    snap = combat.snapshot()
+    ...try a move...
+    combat.restore(snap)
+
+The combat log is not part of the state. Run directly for a benchmark:
+
+    python combat_snapshot.py [iterations]
+"""
+import copy
+import json
+import sys
+import time
+from operator import itemgetter
+from character import Character, PERSISTED_FIELDS, create_player
+from status_effects import BLEED, DEFENSE_BREAK
+
+# Character attributes captured, in snapshot order (skills go last, as JSON)
+CHARACTER_STATE = ("name", "level", "hp", "max_hp", "attack", "defense", "char_class",
+                   "weapon", "xp", "xp_to_next", "sprite_path", "damage_dealt")
+_STRIDE = len(CHARACTER_STATE) + 1
+_PLAYER, _ENEMY = 0, _STRIDE
+_TURN, _DEFENDED = 2 * _STRIDE, 2 * _STRIDE + 1
+_WHEEL_TURN, _PLAYER_EFFECTS, _ENEMY_EFFECTS = 2 * _STRIDE + 2, 2 * _STRIDE + 3, 2 * _STRIDE + 4
+_HP = CHARACTER_STATE.index("hp")
+_get_state = itemgetter(*CHARACTER_STATE)
+
+
+class CombatSnapshot(tuple):
+    """Immutable, hashable battle state (a flat tuple)"""
+    __slots__ = ()
+
+    @property
+    def player(self) -> tuple:
+        return self[_PLAYER:_PLAYER + _STRIDE]
+
+    @property
+    def enemy(self) -> tuple:
+        return self[_ENEMY:_ENEMY + _STRIDE]
+
+    @property
+    def player_hp(self) -> int:
+        return self[_PLAYER + _HP]
+
+    @property
+    def enemy_hp(self) -> int:
+        return self[_ENEMY + _HP]
+
+    @property
+    def turn_count(self) -> int:
+        return self[_TURN]
+
+    @property
+    def player_defended(self) -> bool:
+        return self[_DEFENDED]
+
+    @property
+    def effects_turn(self) -> int:
+        return self[_WHEEL_TURN]
+
+    @property
+    def player_effects(self) -> tuple:
+        return self[_PLAYER_EFFECTS]
+
+    @property
+    def enemy_effects(self) -> tuple:
+        return self[_ENEMY_EFFECTS]
+
+
+def take_snapshot(combat) -> CombatSnapshot:
+    player, enemy, effects = combat.player, combat.enemy, combat.effects
+    return tuple.__new__(CombatSnapshot, (
+        *_get_state(player.__dict__), player.skills_json(),
+        *_get_state(enemy.__dict__), enemy.skills_json(),
+        combat.turn_count, combat.player_defended,
+        effects.turn, effects.effects_of(player), effects.effects_of(enemy)))
+
+
+def _restore_character(character, snap, offset):
+    # Straight into __dict__, flagging changed fields dirty like __setattr__ would
+    state = character.__dict__
+    dirty = state["_dirty"]
+    for i, name in enumerate(CHARACTER_STATE, offset):
+        value = snap[i]
+        if state[name] != value:
+            state[name] = value
+            if name in PERSISTED_FIELDS:
+                dirty.add(name)
+    skills_json = snap[offset + _STRIDE - 1]
+    if character.skills_json() != skills_json:
+        state["skills"] = json.loads(skills_json)
+        state["_skills_json"] = skills_json
+        state["_compiled_skills"] = None
+        dirty.add("skills")
+
+
+def restore_snapshot(combat, snap: CombatSnapshot):
+    """Put combat (and its two characters) back to snap, in place"""
+    _restore_character(combat.player, snap, _PLAYER)
+    _restore_character(combat.enemy, snap, _ENEMY)
+    combat.turn_count = snap[_TURN]
+    combat.player_defended = snap[_DEFENDED]
+    combat.effects.restore(snap[_WHEEL_TURN], ((combat.player, snap[_PLAYER_EFFECTS]),
+                                               (combat.enemy, snap[_ENEMY_EFFECTS])))
+
+
+def _character_from_snapshot(snap, offset) -> Character:
+    values = dict(zip(CHARACTER_STATE, snap[offset:offset + _STRIDE - 1]))
+    return Character(skills=json.loads(snap[offset + _STRIDE - 1]), **values)
+
+
+def characters_from_snapshot(snap: CombatSnapshot) -> tuple:
+    """New (player, enemy) Characters in the snapshot's state"""
+    return _character_from_snapshot(snap, _PLAYER), _character_from_snapshot(snap, _ENEMY)
+
+
+def benchmark(iterations=200000) -> dict:
+    """Snapshots/restores per second, against copy.deepcopy of the Combat"""
+    from combat import Combat, create_enemy_for_level
+    combat = Combat(create_player("Bench", "Soldier"), create_enemy_for_level(2))
+    results = {}
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        snap = combat.snapshot()
+    results["snapshot"] = iterations / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        combat.enemy.hp = i & 0xFF
+        combat.restore(snap)
+    results["restore"] = iterations / (time.perf_counter() - start)
+
+    table = {}
+    start = time.perf_counter()
+    for i in range(iterations):
+        combat.turn_count = i & 0x3FF
+        table[combat.snapshot()] = i
+    results["transposition_insert"] = iterations / (time.perf_counter() - start)
+
+    copies = max(1, iterations // 20)
+    start = time.perf_counter()
+    for _ in range(copies):
+        copy.deepcopy(combat)
+    results["deepcopy"] = copies / (time.perf_counter() - start)
+    return results
+
+
+if __name__ == "__main__":
+    from combat import Combat, create_enemy_for_level
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    combat = Combat(create_player("Check", "Police"), create_enemy_for_level(3))
+    before = combat.snapshot()
+    for _ in range(5):
+        combat.player_attack()
+        combat.enemy_turn()
+    assert combat.snapshot() != before
+    combat.restore(before)
+    assert combat.snapshot() == before and hash(combat.snapshot()) == hash(before)
+    clone = Combat.from_snapshot(before)
+    assert clone.snapshot() == before and clone.player == combat.player
+
+    # Status effects come back too, and keep ticking and expiring on schedule
+    combat.apply_effect(combat.enemy, BLEED, 3, 3)
+    combat.apply_effect(combat.enemy, DEFENSE_BREAK, 2, 2)
+    combat.player_defend()
+    bleeding = combat.snapshot()
+    assert bleeding.enemy_effects and bleeding.effects_turn == 1
+    for _ in range(3):
+        combat.player_defend()
+    assert combat.enemy.status.bleed == 0
+    combat.restore(bleeding)
+    assert combat.snapshot() == bleeding and combat.enemy.status.bleed == 3
+    assert combat.enemy.get_defense() == max(0, combat.enemy.defense - 2)
+    clone = Combat.from_snapshot(bleeding)
+    assert clone.snapshot() == bleeding
+    for _ in range(3):
+        clone.player_defend()
+    assert clone.snapshot().enemy_effects == ()
+    assert clone.enemy.hp == combat.enemy.hp - 6
+    print("✅ snapshot/restore round trip and clone match, status effects included")
+
+    for op, rate in benchmark(iterations).items():
+        print(f"   {op:<22} {rate:>12,.0f} /s")
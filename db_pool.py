@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+db_pool.py - Thread-safe SQLite connection pool for the save system
+  - one read-only connection per thread (leaderboard/history queries)
+  - one shared writer connection, serialized by a lock
+  - WAL journaling + busy timeout so readers never block the writer
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+BUSY_TIMEOUT = 5.0  # seconds SQLite waits on a lock before "database is locked"
+
+
+class ConnectionPool:
+    """Per-thread reader connections plus a single serialized writer"""
+
+    def __init__(self, db_name, busy_timeout=BUSY_TIMEOUT):
+        self.db_name = db_name
+        self.busy_timeout = busy_timeout
+        self.in_memory = db_name == ':memory:' or str(db_name).startswith('file::memory:')
+        self._local = threading.local()
+        self._write_lock = threading.RLock()
+        self._all = []
+        self._all_lock = threading.Lock()
+        self._closed = False
+
+        self._writer = self._connect(db_name)
+        if not self.in_memory:
+            # WAL lets reader connections run while the writer commits
+            self._writer.execute('PRAGMA journal_mode=WAL')
+            self._writer.execute('PRAGMA synchronous=NORMAL')
+
+    def _connect(self, target, uri=False):
+        conn = sqlite3.connect(target, timeout=self.busy_timeout, uri=uri, check_same_thread=False)
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}')
+        with self._all_lock:
+            self._all.append(conn)
+        return conn
+
+    @contextmanager
+    def writer(self):
+        """Exclusive access to the writer connection; commits on success, rolls back on error.
+
+        Inside transaction() both are left to the enclosing transaction.
+        """
+        with self._write_lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Connection pool is closed")
+            outermost = getattr(self._local, 'write_depth', 0) == 0
+            try:
+                yield self._writer
+                if outermost:
+                    self._writer.commit()
+            except Exception:
+                if outermost:
+                    self._writer.rollback()
+                raise
+
+    @contextmanager
+    def transaction(self):
+        """Group several writer() blocks into one commit.
+
+        Nested calls become savepoints: an error rolls back just the nested
+        block, and the outer transaction decides whether to carry on.
+        """
+        with self._write_lock:
+            depth = self._local.write_depth = getattr(self._local, 'write_depth', 0) + 1
+            savepoint = f'nested_{depth}'
+            try:
+                if depth > 1:
+                    self._writer.execute(f'SAVEPOINT {savepoint}')
+                elif not self._writer.in_transaction:
+                    # Take the write lock up front, so reads inside the
+                    # transaction can't go stale before its writes land
+                    self._writer.execute('BEGIN IMMEDIATE')
+                yield self._writer
+            except Exception:
+                self._local.write_depth -= 1
+                if depth == 1:
+                    self._writer.rollback()
+                elif self._writer.in_transaction:
+                    self._writer.execute(f'ROLLBACK TO {savepoint}')
+                    self._writer.execute(f'RELEASE {savepoint}')
+                raise
+            self._local.write_depth -= 1
+            if depth == 1:
+                self._writer.commit()
+            else:
+                self._writer.execute(f'RELEASE {savepoint}')
+
+    def reader(self) -> sqlite3.Connection:
+        """This thread's read-only connection"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed")
+        if self.in_memory or getattr(self._local, 'write_depth', 0):
+            # A private in-memory DB is only reachable through the writer, and
+            # inside a transaction reads must see the uncommitted writes
+            return _LockedConnection(self._writer, self._write_lock)
+        conn = getattr(self._local, 'reader', None)
+        if conn is None:
+            uri = Path(self.db_name).absolute().as_uri() + '?mode=ro'
+            conn = self._connect(uri, uri=True)
+            self._local.reader = conn
+        return conn
+
+    def close(self):
+        with self._write_lock:
+            self._closed = True
+            with self._all_lock:
+                for conn in self._all:
+                    conn.close()
+                self._all.clear()
+
+
+class _LockedConnection:
+    """Runs reads on the shared writer connection while holding its lock"""
+
+    def __init__(self, conn, lock):
+        self.conn = conn
+        self.lock = lock
+
+    def execute(self, sql, params=()):
+        with self.lock:
+            return _Result(self.conn.execute(sql, params).fetchall())
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
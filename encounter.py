@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""
+encounter.py - N-vs-M fights with an initiative scheduler
+An Encounter puts the player, any ally NPCs and any number of enemies in
+one fight. Turn order comes from a heapq keyed on when each combatant is
+next ready: acting costs TICKS // speed, so faster fighters act more
+often. Ties go to whoever joined first, so a one-on-one at equal speed
+alternates exactly like Combat.
+
+Targeting uses one TargetIndex per side: lazy heaps for lowest HP and
+highest threat. Entries are stamped, and a change pushes a fresh entry
+instead of rescanning. Stale entries are dropped when they reach the top.
+Allies focus the weakest enemy. Enemies go for whoever has dealt the
+most damage.
+
+The player's moves and every enemy move against the player go through
+a Combat duel. They keep the same rules, messages, events and dice
+order, and Encounter offers the same surface battle_gui uses on Combat
+(player, enemy, player_attack, enemy_turn, is_over, ...). enemy_turn()
+runs NPCs until the player is next.
+
+    combat = create_encounter(player, level, difficulty_mult, difficulty)
+"""
+import heapq
+import random
+import time
+from itertools import count
+from character import Character
+from combat import (Combat, ENEMY_STRIKE, EVENT_NONE, LEVEL_1_ENEMIES, LEVEL_2_ENEMIES, LEVEL_3_ENEMIES,
+                    PLAYER_HIT_CHANCE, STRIKE_DAMAGE, create_enemy_for_level, scale_enemy)
+
+TICKS = 1000              # scheduler time per action is TICKS // speed
+BASE_SPEED = 10
+HEROES, FOES = "heroes", "foes"
+
+# Group fights per level: (chance, [(enemy, count, HP share, speed)], allies).
+# Members get a share of the template's (difficulty-scaled) HP.
+GROUP_ENCOUNTERS = {
+    1: (0.3, [("Area Boy", 3, 0.4, 12)], []),
+    2: (0.3, [("Kidnapper", 1, 0.7, 10), ("Armed Robber", 1, 0.6, 11)], ["Vigilante"]),
+    3: (0.4, [("Politician", 1, 0.8, 8), ("Area Boy", 2, 0.4, 12)], ["Police Backup"]),
+}
+ALLIES = {
+    "Vigilante": {"hp": 60, "atk": 4, "def": 2, "weapon": "Cutlass", "sprite": "soldier.png", "spd": 9},
+    "Police Backup": {"hp": 80, "atk": 6, "def": 4, "weapon": "Gun", "sprite": "police.png", "spd": 8},
+}
+_TEMPLATES = {t["name"]: t for t in LEVEL_1_ENEMIES + LEVEL_2_ENEMIES + LEVEL_3_ENEMIES}
+
+
+class Combatant:
+    __slots__ = ("cid", "character", "side", "speed", "threat", "ready_at")
+
+    def __init__(self, cid, character, side, speed):
+        self.cid = cid
+        self.character = character
+        self.side = side
+        self.speed = max(1, speed)
+        self.threat = character.attack   # grows with damage dealt in this fight
+        self.ready_at = TICKS // self.speed
+
+    def __repr__(self):
+        return f"Combatant({self.cid}, {self.character.name!r}, hp={self.character.hp}, threat={self.threat})"
+
+
+class TargetIndex:
+    """Lowest-HP and highest-threat lookups for one side, without rescans"""
+
+    def __init__(self):
+        self._by_hp = []       # (hp, cid, stamp)
+        self._by_threat = []   # (-threat, cid, stamp)
+        self._stamp = {}
+        self._alive = {}
+
+    def update(self, combatant):
+        """Call after a combatant's HP or threat changed"""
+        stamp = self._stamp.get(combatant.cid, 0) + 1
+        self._stamp[combatant.cid] = stamp
+        if combatant.character.hp > 0:
+            self._alive[combatant.cid] = combatant
+            heapq.heappush(self._by_hp, (combatant.character.hp, combatant.cid, stamp))
+            heapq.heappush(self._by_threat, (-combatant.threat, combatant.cid, stamp))
+        else:
+            self._alive.pop(combatant.cid, None)
+        if len(self._by_hp) > 4 * len(self._alive) + 32:
+            self._compact()
+
+    def _top(self, heap):
+        while heap:
+            _, cid, stamp = heap[0]
+            if self._stamp[cid] == stamp and cid in self._alive:
+                return self._alive[cid]
+            heapq.heappop(heap)
+        return None
+
+    def _compact(self):
+        stamps = self._stamp
+        self._by_hp = [e for e in self._by_hp if stamps[e[1]] == e[2] and e[1] in self._alive]
+        self._by_threat = [e for e in self._by_threat if stamps[e[1]] == e[2] and e[1] in self._alive]
+        heapq.heapify(self._by_hp)
+        heapq.heapify(self._by_threat)
+
+    def lowest_hp(self):
+        return self._top(self._by_hp)
+
+    def highest_threat(self):
+        return self._top(self._by_threat)
+
+    def alive(self) -> list:
+        return list(self._alive.values())
+
+    def __len__(self):
+        return len(self._alive)
+
+
+class Encounter:
+    """Player + allies vs enemies, turn order by initiative"""
+
+    def __init__(self, player: Character, enemies: list, allies: list = (), speeds: dict = None):
+        speeds = speeds or {}
+        self._ids = count()
+        self._seq = count()
+        self._queue = []   # (ready_at, seq, cid)
+        self.combatants = {}
+        self._by_character = {}   # id(character) -> Combatant
+        self.heroes, self.foes = TargetIndex(), TargetIndex()
+        self.hero = self._add(player, HEROES, BASE_SPEED)
+        self.allies = [self._add(a, HEROES, speeds.get(a.name, BASE_SPEED)) for a in allies]
+        self.enemies = [self._add(e, FOES, speeds.get(e.name, BASE_SPEED)) for e in enemies]
+        # The player's side of every exchange runs on a Combat, so rules and messages match
+        self._duel = Combat(player, enemies[0])
+        self.log = self._duel.log
+        self.target = None
+        self.select_target(None)
+
+    def _add(self, character, side, speed):
+        combatant = Combatant(next(self._ids), character, side, speed)
+        self.combatants[combatant.cid] = combatant
+        self._by_character[id(character)] = combatant
+        (self.heroes if side == HEROES else self.foes).update(combatant)
+        heapq.heappush(self._queue, (combatant.ready_at, next(self._seq), combatant.cid))
+        return combatant
+
+    # ---- Combat-compatible surface ----
+    @property
+    def player(self) -> Character:
+        return self.hero.character
+
+    @property
+    def enemy(self) -> Character:
+        """The enemy the player is aiming at"""
+        return self.target.character
+
+    @property
+    def player_defended(self) -> bool:
+        return self._duel.player_defended
+
+    @player_defended.setter
+    def player_defended(self, value):
+        self._duel.player_defended = value
+
+    @property
+    def effects(self):
+        """The fight's StatusEngine (one for the whole encounter)"""
+        return self._duel.effects
+
+    @property
+    def turn_count(self) -> int:
+        return self._duel.turn_count
+
+    @property
+    def last_event(self) -> int:
+        return self._duel.last_event
+
+    @property
+    def last_amount(self) -> int:
+        return self._duel.last_amount
+
+    @property
+    def name(self) -> str:
+        others = len(self.enemies) - 1
+        return f"{self.enemies[0].character.name} +{others}" if others else self.enemies[0].character.name
+
+    def select_target(self, target=None):
+        """Aim at a living enemy (Combatant or Character); None picks the weakest"""
+        if isinstance(target, Character):
+            target = next((c for c in self.enemies if c.character is target), None)
+        if target is None or target.side != FOES or not target.character.is_alive():
+            target = self.foes.lowest_hp() or self.target or self.enemies[0]
+        self.target = target
+        self._duel.enemy = target.character
+        return target
+
+    def player_attack(self):
+        return self._player_move(self._duel.player_attack)
+
+    def player_defend(self):
+        return self._player_move(self._duel.player_defend)
+
+    def player_special_attack(self):
+        return self._player_move(self._duel.player_special_attack)
+
+    def player_wait(self):
+        """Spend the player's turn without acting (e.g. a failed escape)"""
+        self._end_turn(self.hero)
+
+    def _player_move(self, move):
+        target = self.select_target(self.target)
+        before = target.character.hp
+        msg = move()
+        self.hero.threat += before - target.character.hp
+        # Bleed and regen ticked at the top of the turn may have moved anyone's HP
+        for character in self._duel.effects.ticked:
+            ticked = self._by_character.get(id(character))
+            if ticked is not None:
+                (self.heroes if ticked.side == HEROES else self.foes).update(ticked)
+        self.heroes.update(self.hero)
+        self.foes.update(target)
+        self._end_turn(self.hero)
+        if not target.character.is_alive() and len(self.foes):
+            down = f"💀 {target.character.name} is down! {len(self.foes)} left."
+            self.log.append(down)
+            msg += "\n" + down
+            self.select_target(None)
+        return msg
+
+    def _end_turn(self, combatant):
+        combatant.ready_at += TICKS // combatant.speed
+        heapq.heappush(self._queue, (combatant.ready_at, next(self._seq), combatant.cid))
+
+    def _next_actor(self):
+        """Combatant whose turn it is (stale and dead queue entries are dropped)"""
+        queue = self._queue
+        while queue:
+            ready_at, _, cid = queue[0]
+            combatant = self.combatants[cid]
+            if combatant.ready_at == ready_at and combatant.character.is_alive():
+                return combatant
+            heapq.heappop(queue)
+        return None
+
+    def enemy_turn(self, action: str = ENEMY_STRIKE):
+        """Run allies and enemies until it is the player's turn again.
+
+        action is used by the enemy the player is aiming at (the one the
+        enemy AI reasons about); the rest strike.
+        """
+        self._duel.last_event, self._duel.last_amount = EVENT_NONE, 0
+        messages = []
+        while not self.is_over()[0]:
+            actor = self._next_actor()
+            if actor is None or actor is self.hero:
+                break
+            heapq.heappop(self._queue)
+            if actor.side == FOES:
+                messages.append(self._enemy_acts(actor, action if actor is self.target else ENEMY_STRIKE))
+            else:
+                messages.append(self._ally_acts(actor))
+            self._end_turn(actor)
+        if self.target is not None and not self.target.character.is_alive():
+            self.select_target(None)
+        return "\n".join(messages)
+
+    def _enemy_acts(self, enemy, action):
+        target = self.heroes.highest_threat()
+        if target is self.hero:
+            # The duel handles stuns against the player, as in a one-on-one
+            self._duel.enemy = enemy.character
+            msg = self._duel.enemy_turn(action)
+            self._duel.enemy = self.target.character
+        elif self._duel.effects.is_stunned(enemy.character):
+            msg = f"😵 {enemy.character.name} is stunned and can't move!"
+            self.log.append(msg)
+        else:
+            damage = random.randint(*STRIKE_DAMAGE)
+            target.character.take_damage(damage)
+            msg = f"🔥 {enemy.character.name} hits {target.character.name} for {damage}xp damage!"
+            if not target.character.is_alive():
+                msg += f" {target.character.name} is out!"
+            self.log.append(msg)
+        self.heroes.update(target)
+        self.foes.update(enemy)
+        return msg
+
+    def _ally_acts(self, ally):
+        target = self.foes.lowest_hp()
+        if random.randint(1, 100) > 100 - PLAYER_HIT_CHANCE:
+            damage = ally.character.basic_attack(target.character)
+            ally.threat += damage
+            msg = f"🤝 {ally.character.name} hits {target.character.name} for {damage}xp damage!"
+            if not target.character.is_alive():
+                msg += f" 💀 {target.character.name} is down!"
+        else:
+            msg = f"🤝 {ally.character.name} swings at {target.character.name} and misses!"
+        self.heroes.update(ally)
+        self.foes.update(target)
+        self.log.append(msg)
+        return msg
+
+    def is_over(self):
+        if not self.player.is_alive():
+            return True, "enemy"
+        if not len(self.foes):
+            return True, "player"
+        return False, None
+
+    def reward_xp_for_enemy(self):
+        # Each defeated enemy pays out like a one-on-one win
+        return sum(c.character.level * 25 + random.randint(5, 15) for c in self.enemies)
+
+
+def create_encounter(player: Character, level: int, difficulty_multiplier: float = 1.0,
+                     difficulty: str = None) -> Encounter:
+    """A level's fight: usually one enemy, sometimes a group with allies"""
+    chance, members, ally_names = GROUP_ENCOUNTERS.get(level, (0.0, [], []))
+    if random.random() >= chance:
+        return Encounter(player, [create_enemy_for_level(level, difficulty_multiplier, difficulty)])
+
+    enemies, speeds = [], {}
+    for name, number, share, speed in members:
+        base = _TEMPLATES[name]
+        hp, defense = scale_enemy(base, difficulty_multiplier, difficulty)
+        hp = max(1, int(hp * share))
+        speeds[name] = speed
+        enemies.extend(Character(name=name, level=base["level"], hp=hp, max_hp=hp, attack=base["atk"],
+                                 defense=defense, sprite_path=base.get("sprite")) for _ in range(number))
+    allies = []
+    for name in ally_names:
+        stats = ALLIES[name]
+        speeds[name] = stats["spd"]
+        allies.append(Character(name=name, level=level, hp=stats["hp"], max_hp=stats["hp"], attack=stats["atk"],
+                                defense=stats["def"], weapon=stats["weapon"], sprite_path=stats["sprite"]))
+    return Encounter(player, enemies, allies, speeds)
+
+
+def _brawl(size, seed):
+    """A player + (size - 1) allies vs size enemies, fought out automatically"""
+    from character import create_player
+    random.seed(seed)
+    player = create_player("Bench", "Soldier")
+    player.hp = player.max_hp = 10 ** 6   # keep the player up so the whole brawl runs
+    allies = [Character(name=f"Ally {i}", level=1, hp=60, max_hp=60, attack=4, defense=2) for i in range(size - 1)]
+    enemies = [Character(name=f"Thug {i}", level=1, hp=50, max_hp=50, attack=5, defense=1) for i in range(size)]
+    speeds = {c.name: random.randint(6, 14) for c in allies + enemies}
+    return Encounter(player, enemies, allies, speeds)
+
+
+if __name__ == "__main__":
+    from character import create_player
+
+    # One-on-one at equal speed must replay Combat exactly
+    def replay(fight):
+        while not fight.is_over()[0]:
+            fight.player_attack() if fight.turn_count % 4 else fight.player_defend()
+            if not fight.is_over()[0]:
+                fight.enemy_turn()
+        return fight.log, fight.is_over(), fight.player
+
+    for seed in range(50):
+        random.seed(seed)
+        classic = replay(Combat(create_player("A", "Soldier"), create_enemy_for_level(2)))
+        random.seed(seed)
+        assert replay(Encounter(create_player("A", "Soldier"), [create_enemy_for_level(2)])) == classic
+    print("✅ 1v1 encounters replay Combat exactly (messages, dice, outcome)")
+
+    # Index answers must match a full scan after every action
+    for seed in range(20):
+        fight = _brawl(12, seed)
+        while not fight.is_over()[0]:
+            fight.player_attack()
+            fight.enemy_turn()
+            foes = [c for c in fight.enemies if c.character.is_alive()]
+            heroes = [c for c in [fight.hero] + fight.allies if c.character.is_alive()]
+            if foes:
+                assert fight.foes.lowest_hp().character.hp == min(c.character.hp for c in foes)
+            assert fight.heroes.highest_threat().threat == max(c.threat for c in heroes)
+    print("✅ target indexes agree with full scans")
+
+    for size in (4, 12, 24, 48):
+        fight = _brawl(size, 1)
+        start = time.perf_counter()
+        while not fight.is_over()[0]:
+            fight.player_attack()
+            fight.enemy_turn()
+        elapsed = time.perf_counter() - start
+        actions = len(fight.log)
+        print(f"   {size:>2} vs {size:<2} brawl: {actions:>5} actions in {elapsed * 1000:6.1f} ms "
+              f"({actions / elapsed:,.0f} actions/s)")
@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+"""
+endless.py - Endless survival mode, doubling as a bounded-memory soak test
+After stage 3 the fights keep coming. Each endless stage gets an enemy
+built from a seeded procedural template: one of the stage 1-3 enemies,
+picked by Random(f"{seed}:{stage}"), with a title and stats scaled up per
+stage. Every GANG_EVERY-th stage is a gang. The same seed always
+produces the same sequence of enemies.
+
+Endless fights go into combat history at level ENDLESS_LEVEL, so the
+per-level analytics keep a fixed number of rows. Every TRIM_EVERY fights
+the player's history is cut back to HISTORY_KEEP rows.
+
+SoakMonitor samples RSS, the asset cache sizes, the longest Combat.log
+and the size of the save files while fights run. unbounded() names any
+metric that is still rising in each of the last three windows.
+
+    python endless.py soak [--fights 20000] [--minutes M] [--seed N] [--no-trim]
+    python endless.py gui [--minutes 10] [--seed N]     # autoplayed battle GUI
+
+Both run against a throwaway database, print the samples and exit 1
+if anything grows without bound.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from character import Character, create_player
+from combat import (DIFFICULTY_MULTIPLIERS, LEVEL_1_ENEMIES, LEVEL_2_ENEMIES, LEVEL_3_ENEMIES, scale_enemy)
+from encounter import Encounter, create_encounter
+from enemy_ai import DEFAULT_ENEMY_MODEL, ENEMY_MODELS
+from save_system import SaveSystem
+
+ENDLESS_TEMPLATES = LEVEL_1_ENEMIES + LEVEL_2_ENEMIES + LEVEL_3_ENEMIES
+TITLES = ("Notorious", "Veteran", "Rogue", "Big Man")
+ENDLESS_LEVEL = 4       # level recorded for every endless stage
+STAGE_GROWTH = 0.12     # enemy HP gained per stage past 3
+ATTACK_EVERY = 2        # +1 enemy attack every this many stages past 3
+DEFENSE_EVERY = 3       # +1 enemy defense every this many stages past 3
+GANG_EVERY = 5          # every 5th stage is a gang...
+GANG_SIZE = 3
+GANG_SHARE = 0.45       # ...each member with this share of the scaled HP
+
+HISTORY_KEEP = 500      # combat history rows kept per player
+TRIM_EVERY = 50         # fights between history trims
+
+ATTACK, DEFEND, SPECIAL, QUIT = "attack", "defend", "special", "quit"
+
+METRICS = ("rss", "images", "sounds", "backgrounds", "log", "disk")
+# (absolute, relative) rise between windows that still counts as flat
+GROWTH_SLACK = {
+    "rss": (2 << 20, 0.02),
+    "images": (0, 0.0),
+    "sounds": (0, 0.0),
+    "backgrounds": (0, 0.0),
+    "log": (8, 0.25),
+    "disk": (64 << 10, 0.0),
+}
+WARMUP = 0.25           # share of samples ignored while caches and the WAL fill up
+
+
+def endless_template(stage: int, seed: int = 0) -> dict:
+    """Enemy template for an endless stage (LEVEL_*_ENEMIES keys, plus "base")"""
+    rng = random.Random(f"{seed}:{stage}")
+    base = rng.choice(ENDLESS_TEMPLATES)
+    past = stage - 3
+    return {
+        "name": f"{rng.choice(TITLES)} {base['name']}",
+        "base": base["name"],
+        "level": stage,
+        "hp": int(base["hp"] * (1 + STAGE_GROWTH * past) * rng.uniform(0.9, 1.1)),
+        "atk": base["atk"] + past // ATTACK_EVERY,
+        "def": base["def"] + past // DEFENSE_EVERY,
+        "sprite": base.get("sprite"),
+    }
+
+
+def create_endless_encounter(player: Character, stage: int, seed: int = 0, difficulty_multiplier: float = 1.0,
+                             difficulty: str = None) -> Encounter:
+    """The fight for any stage: the usual ones up to 3, procedural ones after"""
+    if stage <= 3:
+        return create_encounter(player, stage, difficulty_multiplier, difficulty)
+    template = endless_template(stage, seed)
+    # The balanced profile is keyed on the base enemy
+    hp, defense = scale_enemy(dict(template, name=template["base"]), difficulty_multiplier, difficulty)
+    number = GANG_SIZE if stage % GANG_EVERY == 0 else 1
+    if number > 1:
+        hp = max(1, int(hp * GANG_SHARE))
+    return Encounter(player, [Character(name=template["name"], level=template["level"], hp=hp, max_hp=hp,
+                                        attack=template["atk"], defense=defense, sprite_path=template["sprite"])
+                              for _ in range(number)])
+
+
+def history_level(stage: int) -> int:
+    """Level a stage is recorded under in combat history and analytics"""
+    return min(stage, ENDLESS_LEVEL)
+
+
+def trim_history(save_system, player_name: str, fights: int) -> int:
+    """Every TRIM_EVERY fights, cut the player's history back to HISTORY_KEEP rows"""
+    if fights % TRIM_EVERY:
+        return 0
+    return save_system.trim_combat_history(player_name, HISTORY_KEEP)
+
+
+class Autoplayer:
+    """Move picker for soak runs: the special whenever it is ready, else mostly attacks.
+
+    Called once per frame by battle_gui (bot=), it moves every `every`
+    frames and answers QUIT once the deadline has passed.
+    """
+
+    def __init__(self, seed=0, defend=0.15, every=1, deadline=None):
+        self.rng = random.Random(seed)
+        self.defend = defend
+        self.every = every
+        self.deadline = deadline
+        self.frames = 0
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def choose(self, special_ready=False) -> str:
+        if special_ready:
+            return SPECIAL
+        return DEFEND if self.rng.random() < self.defend else ATTACK
+
+    def __call__(self, special_ready=False):
+        if self.expired():
+            return QUIT
+        self.frames += 1
+        return None if self.frames % self.every else self.choose(special_ready)
+
+
+def rss_bytes() -> int:
+    """Resident set size of this process (peak size where /proc is missing)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class SoakMonitor:
+    """Samples memory, caches, log length and save file size as fights finish"""
+
+    def __init__(self, paths=(), assets=None, every=250, verbose=True):
+        self.paths = list(paths)    # files counted towards "disk" (database, WAL, journal)
+        self.assets = assets        # a resources.AssetManager, or None
+        self.every = every
+        self.verbose = verbose
+        self.fights = 0
+        self.log_peak = 0           # longest Combat.log since the last sample
+        self.samples = []           # (seconds, fights, {metric: value})
+        self.start = time.monotonic()
+
+    def note_fight(self, combat):
+        """Count a finished fight; takes a sample every `every` fights"""
+        self.fights += 1
+        self.log_peak = max(self.log_peak, len(combat.log))
+        if self.fights % self.every == 0:
+            self.sample()
+
+    def sample(self) -> dict:
+        assets = self.assets
+        values = {
+            "rss": rss_bytes(),
+            "images": len(assets.image_cache) if assets else 0,
+            "sounds": len(assets.sound_cache) if assets else 0,
+            "backgrounds": len(assets.background_cache) if assets else 0,
+            "log": self.log_peak,
+            "disk": sum(os.path.getsize(p) for p in self.paths if os.path.exists(p)),
+        }
+        self.log_peak = 0
+        self.samples.append((time.monotonic() - self.start, self.fights, values))
+        if self.verbose:
+            if len(self.samples) == 1:
+                print(f"   {'fights':>8} {'secs':>7} {'RSS MiB':>8} {'images':>6} {'sounds':>6} "
+                      f"{'bgs':>4} {'log':>5} {'disk KiB':>9}")
+            print(self._row(self.samples[-1]))
+        return values
+
+    def flush(self):
+        """Sample the fights since the last sample, if there are any"""
+        if self.fights and (not self.samples or self.samples[-1][1] != self.fights):
+            self.sample()
+
+    @staticmethod
+    def _row(sample) -> str:
+        seconds, fights, v = sample
+        return (f"   {fights:>8,} {seconds:>7.1f} {v['rss'] / 2 ** 20:>8.1f} {v['images']:>6} {v['sounds']:>6} "
+                f"{v['backgrounds']:>4} {v['log']:>5} {v['disk'] / 1024:>9,.0f}")
+
+    def unbounded(self) -> list:
+        """Metrics whose peak rose past their slack in each of the last three
+        windows (after the warm-up). Needs six samples; [] until then."""
+        kept = self.samples[int(len(self.samples) * WARMUP):]
+        if len(kept) < 6:
+            return []
+        third = len(kept) // 3
+        windows = (kept[:third], kept[third:2 * third], kept[2 * third:])
+        grew = []
+        for metric in METRICS:
+            absolute, relative = GROWTH_SLACK[metric]
+            peaks = [max(values[metric] for _, _, values in window) for window in windows]
+            if all(later > earlier * (1 + relative) + absolute for earlier, later in zip(peaks, peaks[1:])):
+                grew.append(metric)
+        return grew
+
+    def verdict(self) -> bool:
+        """Print the outcome; True if every metric stayed bounded"""
+        if len(self.samples) < 6 / (1 - WARMUP):
+            print(f"⚠️ Only {len(self.samples)} samples - run longer (or lower --every) for a verdict")
+            return True
+        grew = self.unbounded()
+        if grew:
+            print(f"❌ Growing without bound over {self.fights:,} fights: {', '.join(grew)}")
+            return False
+        print(f"✅ All metrics bounded over {self.fights:,} fights ({len(self.samples)} samples)")
+        return True
+
+
+def _enemy_mover(difficulty, rng):
+    moves, weights = zip(*ENEMY_MODELS.get(difficulty, DEFAULT_ENEMY_MODEL))
+    return lambda: rng.choices(moves, weights)[0]
+
+
+def fight(combat, autoplayer: Autoplayer, enemy_move) -> str:
+    """Play one encounter out with the GUI's rules for the special; "Victory" or "Defeat" """
+    player = combat.player
+    weapon_damage = specials = 0
+    while not combat.is_over()[0]:
+        ready = weapon_damage >= player.get_special_threshold() and specials < 3
+        move = autoplayer.choose(ready)
+        if move == SPECIAL:
+            combat.player_special_attack()
+            weapon_damage, specials = 0, specials + 1
+        elif move == DEFEND:
+            combat.player_defend()
+        else:
+            combat.player_attack()
+            weapon_damage += player.get_weapon_damage()
+        if not combat.is_over()[0]:
+            combat.enemy_turn(enemy_move())
+    return "Victory" if combat.is_over()[1] == "player" else "Defeat"
+
+
+def _sprite_loader():
+    """Loads an encounter's sprites and background through the shared asset
+    cache, like the GUI does, on a dummy display. None without pygame."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    try:
+        import pygame
+        from battle_gui import load_encounter_sprites
+        from resources import asset_manager
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+    except Exception as e:
+        print(f"⚠️ Asset loading disabled: {e}")
+        return None, None
+
+    def load(combat, stage):
+        load_encounter_sprites(combat)
+        asset_manager.get_background(stage)
+    return load, asset_manager
+
+
+def _save_files(db):
+    return [db, db + "-wal", db + ".savelog"]
+
+
+def soak(fights=20000, minutes=None, seed=0, difficulty="Normal", trim=True, every=250, assets=True):
+    """Headless endless runs (a defeat starts a fresh level-1 character at
+    stage 1) against a throwaway database; returns the SoakMonitor"""
+    random.seed(seed)
+    directory = tempfile.mkdtemp(prefix="endless_soak_")
+    db = os.path.join(directory, "soak.db")
+    saves = SaveSystem(db, journal=True)
+    saves.settings.difficulty = difficulty
+    load_sprites, manager = _sprite_loader() if assets else (None, None)
+    monitor = SoakMonitor(_save_files(db), manager, every)
+    autoplayer = Autoplayer(seed)
+    enemy_move = _enemy_mover(difficulty, random.Random(seed + 1))
+    multiplier = DIFFICULTY_MULTIPLIERS.get(difficulty, 1.0)
+    deadline = time.monotonic() + minutes * 60 if minutes else None
+    player, stage, best = create_player("Soak", "Soldier"), 1, 1
+    saves.save_character(player, stage)
+    try:
+        while monitor.fights < fights and (deadline is None or time.monotonic() < deadline):
+            combat = create_endless_encounter(player, stage, seed, multiplier, difficulty)
+            if load_sprites:
+                load_sprites(combat, stage)
+            result = fight(combat, autoplayer, enemy_move)
+            saves.save_combat_result(player.name, combat.enemies[0].character.name, history_level(stage), result)
+            monitor.note_fight(combat)
+            if trim:
+                trim_history(saves, player.name, monitor.fights)
+            if result == "Victory":
+                player.hp = player.max_hp
+                player.gain_xp(combat.reward_xp_for_enemy())
+                stage += 1
+                best = max(best, stage)
+            else:
+                player, stage = create_player("Soak", "Soldier"), 1
+            saves.record_progress(player, stage)
+            if monitor.fights % TRIM_EVERY == 0:
+                saves.save_character(player, stage)
+        monitor.flush()
+        print(f"   furthest stage reached: {best}")
+    finally:
+        saves.close()
+        shutil.rmtree(directory, ignore_errors=True)
+    return monitor
+
+
+def run_gui(minutes=10.0, seed=0, difficulty="Normal", every=5, frames_per_move=6):
+    """The real battle GUI in endless mode, clicked through by an Autoplayer
+    until `minutes` are up. Each defeat starts a new run. Returns the SoakMonitor."""
+    import pygame
+    from battle_gui import run_battle_gui_with_player
+    from render import close_canvas
+    from resources import asset_manager
+    directory = tempfile.mkdtemp(prefix="endless_gui_")
+    db = os.path.join(directory, "soak.db")
+    saves = SaveSystem(db, journal=True)
+    saves.settings.difficulty = difficulty
+    monitor = SoakMonitor(_save_files(db), asset_manager, every)
+    bot = Autoplayer(seed, every=frames_per_move, deadline=time.monotonic() + minutes * 60)
+    runs = 0
+    try:
+        while not bot.expired():
+            player = create_player("Soak", "Soldier")
+            saves.save_character(player, 1)
+            before = monitor.fights
+            run_battle_gui_with_player(player, saves, 1, endless=True, seed=seed + runs, monitor=monitor, bot=bot)
+            runs += 1
+            if monitor.fights == before and not bot.expired():
+                print("❌ The battle GUI stopped without finishing a fight")
+                break
+        monitor.flush()
+        print(f"   {runs} runs")
+    finally:
+        # Every run shares one window; it goes when the soak does
+        close_canvas()
+        pygame.quit()
+        saves.close()
+        shutil.rmtree(directory, ignore_errors=True)
+    return monitor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Endless survival soak test")
+    commands = parser.add_subparsers(dest="command", required=True)
+    headless = commands.add_parser("soak", help="headless fights, as fast as they run")
+    headless.add_argument("--fights", type=int, default=20000)
+    headless.add_argument("--minutes", type=float, help="stop after this long even if fights remain")
+    headless.add_argument("--every", type=int, default=250, help="fights per sample")
+    headless.add_argument("--no-trim", action="store_true", help="never trim combat history")
+    headless.add_argument("--no-assets", action="store_true", help="skip the asset cache")
+    gui = commands.add_parser("gui", help="the battle GUI, autoplayed")
+    gui.add_argument("--minutes", type=float, default=10.0)
+    gui.add_argument("--every", type=int, default=5, help="fights per sample")
+    for command in (headless, gui):
+        command.add_argument("--seed", type=int, default=0)
+        command.add_argument("--difficulty", default="Normal", choices=list(DIFFICULTY_MULTIPLIERS))
+    args = parser.parse_args(argv)
+
+    if args.command == "soak":
+        monitor = soak(args.fights, args.minutes, args.seed, args.difficulty, not args.no_trim, args.every,
+                       not args.no_assets)
+    else:
+        monitor = run_gui(args.minutes, args.seed, args.difficulty, args.every)
+    return 0 if monitor.verdict() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""
+enemy_ai.py - Expectimax enemy decisions for Hard difficulty
+The enemy picks STRIKE, HEAVY or RECOVER by searching its moves against
+the player's likely replies. Dice rolls are chance nodes, and the rules
+come from the constants in combat.py and character.py. The search is
+iterative deepening under a strict time budget. Solved positions are
+kept in a bounded transposition table keyed on battle state: two plain
+dicts, the older one dropped when the newer fills up, so no single
+insert or eviction has to resize or walk a big LRU structure.
+
+The search runs on a worker thread. The GUI calls request() when it
+schedules the enemy turn and decision() when the turn fires, so a frame
+never waits on it:
+
+    ai = EnemyAI()
+    ai.request(combat, weapon_damage_count, special_ability_count)
+    ...500 ms later...
+    combat.enemy_turn(ai.decision() or ENEMY_STRIKE)
+"""
+import gc
+import queue
+import sys
+import threading
+import time
+from character import ATTACK_ROLL
+from combat import (DEFEND_CHANCE, DEFEND_FAIL_PENALTY, DEFENDED_STRIKE_DAMAGE, ENEMY_ACTIONS,
+                    ENEMY_HEAVY, ENEMY_RECOVER, ENEMY_STRIKE, HEAVY_DAMAGE, HEAVY_HIT_CHANCE,
+                    MISS_PENALTY, PLAYER_HIT_CHANCE, RECOVER_HEAL, STRIKE_DAMAGE)
+from status_effects import NO_EFFECTS, SPECIAL_EFFECTS, apply_to_summary, summarize, tick_summary
+
+TIME_BUDGET = 0.05        # seconds per decision
+SEARCH_SHARE = 0.9        # of the budget spent searching; the rest covers work the deadline
+                          # checks can't interrupt (dict resizes, aging the table)
+MAX_DEPTH = 6             # enemy turns looked ahead
+TABLE_SIZE = 200000       # transposition table entries, both generations together
+MAX_SPECIALS = 3          # matches special_ability_count < 3 in battle_gui
+
+# How we expect the player to play: attack most of the time, defend some,
+# and fire the special as soon as it is ready.
+PLAYER_MODEL = {"attack": 0.65, "defend": 0.35}
+SPECIAL_WHEN_READY = 0.6
+
+WIN, LOSS = 1.0, -1.0     # values are from the enemy's point of view
+
+# What enemies tend to do, per difficulty, for models that play thousands
+# of fights (hint_engine.py, balancer.py) and can't afford the search. Hard
+# is the mix of moves the search picks in practice; the rest always strike.
+ENEMY_MODELS = {
+    "Hard": ((ENEMY_STRIKE, 0.1), (ENEMY_HEAVY, 0.7), (ENEMY_RECOVER, 0.2)),
+}
+DEFAULT_ENEMY_MODEL = ((ENEMY_STRIKE, 1.0),)
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+def _uniform(low, high):
+    return [(1.0 / (high - low + 1), value) for value in range(low, high + 1)]
+
+
+class EnemyAI:
+    """Expectimax search over a compact battle state.
+
+    State: (player_hp, enemy_hp, player_defended, weapon_damage_count,
+    special_ability_count, status effects as status_effects.summarize()).
+    Stats that don't change during a fight (max HP, weapon damage, enemy
+    defense, damage per turn, what each special ability applies) form the
+    context.
+    """
+
+    def __init__(self, budget=TIME_BUDGET, max_depth=MAX_DEPTH, table_size=TABLE_SIZE):
+        self.budget = budget
+        self.max_depth = max_depth
+        self.table_size = table_size
+        self.table = {}  # (context, state, depth) -> (value, action)
+        self._old_table = {}  # previous generation; hits are copied into self.table
+        self.hits = 0
+        self.nodes = 0
+        self.last_depth = 0
+        # One search at a time owns the table and the counters above
+        self._search_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._ticket = 0
+        self._decision = None
+        self._requests = queue.Queue()
+        self._worker = None
+
+    # ---- public API ----
+    def choose(self, combat, weapon_damage_count=0, special_ability_count=0, budget=None) -> str:
+        """Decide synchronously within the time budget"""
+        context, state = self._root(combat, weapon_damage_count, special_ability_count)
+        return self._search(context, state, self.budget if budget is None else budget)
+
+    def request(self, combat, weapon_damage_count=0, special_ability_count=0):
+        """Start deciding on the worker thread; returns immediately"""
+        root = self._root(combat, weapon_damage_count, special_ability_count)
+        with self._lock:
+            self._ticket += 1
+            self._decision = None
+            ticket = self._ticket
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, daemon=True, name="enemy-ai")
+            self._worker.start()
+        self._requests.put((ticket, root))
+
+    def decision(self):
+        """Action for the latest request, or None if it isn't ready (never blocks)"""
+        with self._lock:
+            return self._decision
+
+    def close(self):
+        if self._worker is not None:
+            self._requests.put(None)
+            self._worker.join(timeout=1)
+            self._worker = None
+
+    def _run(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            ticket, (context, state) = item
+            with self._lock:
+                superseded = ticket != self._ticket
+            if superseded:
+                continue  # superseded before we started
+            action = self._search(context, state, self.budget)
+            with self._lock:
+                if ticket == self._ticket:
+                    self._decision = action
+
+    # ---- model ----
+    @staticmethod
+    def _root(combat, meter, uses):
+        player, enemy = combat.player, combat.enemy
+        weapon = player.get_weapon_damage()
+        # Expected damage per turn each way, for the leaf estimate
+        rolls = range(ATTACK_ROLL[0], ATTACK_ROLL[1] + 1)
+        player_dpt = (PLAYER_MODEL["attack"] * PLAYER_HIT_CHANCE / 100 *
+                      sum(max(1, weapon + roll - enemy.defense) for roll in rolls) / len(rolls))
+        enemy_dpt = sum(STRIKE_DAMAGE) / 2
+        specials = tuple(SPECIAL_EFFECTS.get(name) for name in player.get_special_abilities())
+        context = (player.max_hp, weapon, player.get_special_threshold(),
+                   enemy.max_hp, enemy.defense, player_dpt, enemy_dpt, specials)
+        # Only "is the special ready" matters, so the meter is capped at the threshold
+        state = (player.hp, enemy.hp, combat.player_defended, min(meter, context[2]), uses,
+                 summarize(combat.effects, player, enemy))
+        return context, state
+
+    @staticmethod
+    def _enemy_outcomes(context, state, action):
+        """[(probability, next_state)] for one enemy move"""
+        p_hp, e_hp, defended, meter, uses, effects = state
+        if effects[4]:
+            # Stunned: whatever it picks, the enemy loses its move
+            return [(1.0, (p_hp, e_hp, False, meter, uses, effects))]
+        if action == ENEMY_RECOVER:
+            e_max = context[3]
+            return [(p, (p_hp, min(e_max, e_hp + heal), False, meter, uses, effects))
+                    for p, heal in _uniform(*RECOVER_HEAL)]
+        if action == ENEMY_HEAVY:
+            if defended:
+                return [(1.0, (p_hp, e_hp, False, meter, uses, effects))]
+            hit = HEAVY_HIT_CHANCE / 100
+            outcomes = [(hit * p, (max(0, p_hp - dmg), e_hp, False, meter, uses, effects))
+                        for p, dmg in _uniform(*HEAVY_DAMAGE)]
+            outcomes.append((1 - hit, (p_hp, e_hp, False, meter, uses, effects)))
+            return outcomes
+        damage = DEFENDED_STRIKE_DAMAGE if defended else STRIKE_DAMAGE
+        return [(p, (max(0, p_hp - dmg), e_hp, False, meter, uses, effects)) for p, dmg in _uniform(*damage)]
+
+    @staticmethod
+    def _player_replies(context, state):
+        """[(probability, next_state)] over the player's likely moves and their dice"""
+        p_hp, e_hp, defended, meter, uses, effects = state
+        p_max, weapon, threshold, _, e_def, _, _, specials = context
+        # Status effects tick before the player moves; bleeding out ends the fight there
+        if effects is not NO_EFFECTS:
+            bleed, regen, effects = tick_summary(effects)
+            e_hp = max(0, e_hp - bleed)
+            p_hp = min(p_max, p_hp + regen)
+            if not e_hp:
+                return [(1.0, (p_hp, 0, defended, meter, uses, effects))]
+            e_def = max(0, e_def - effects[2])
+        charged = min(threshold, meter + weapon)
+        moves = list(PLAYER_MODEL.items())
+        if meter >= threshold and uses < MAX_SPECIALS:
+            moves = [("special", SPECIAL_WHEN_READY)] + [(m, p * (1 - SPECIAL_WHEN_READY)) for m, p in moves]
+
+        outcomes = []
+        for move, p_move in moves:
+            if move == "special":
+                # One of the weapon's abilities, each as likely, and its effect if the enemy stands
+                left = max(0, e_hp - 2 * weapon)
+                for effect in specials:
+                    after = apply_to_summary(effects, *effect) if effect and left else effects
+                    outcomes.append((p_move / len(specials), (p_hp, left, False, 0, uses + 1, after)))
+            elif move == "attack":
+                # battle_gui adds weapon damage to the meter on every attack, hit or miss
+                hit = PLAYER_HIT_CHANCE / 100
+                for p_roll, roll in _uniform(*ATTACK_ROLL):
+                    dmg = max(1, weapon + roll - e_def)
+                    outcomes.append((p_move * hit * p_roll,
+                                     (p_hp, max(0, e_hp - dmg), False, charged, uses, effects)))
+                outcomes.append((p_move * (1 - hit),
+                                 (max(0, p_hp - MISS_PENALTY), e_hp, False, charged, uses, effects)))
+            else:
+                ok = DEFEND_CHANCE / 100
+                outcomes.append((p_move * ok, (p_hp, e_hp, True, meter, uses, effects)))
+                outcomes.append((p_move * (1 - ok),
+                                 (max(0, p_hp - DEFEND_FAIL_PENALTY), e_hp, False, meter, uses, effects)))
+        return outcomes
+
+    @staticmethod
+    def _terminal(state):
+        if state[0] <= 0:
+            return WIN
+        if state[1] <= 0:
+            return LOSS
+        return None
+
+    @staticmethod
+    def _heuristic(context, state):
+        """Who wins the damage race: turns until each side drops, compared"""
+        effects = state[5]
+        enemy_lasts = max(0, state[1] - effects[0] * effects[1]) / context[5]
+        player_lasts = state[0] / context[6]
+        return 0.5 * (enemy_lasts - player_lasts) / (enemy_lasts + player_lasts)
+
+    # ---- search ----
+    def _search(self, context, state, budget) -> str:
+        """Iterative deepening; returns the best move of the deepest finished search"""
+        deadline = time.perf_counter() + budget * SEARCH_SHARE
+        best = ENEMY_STRIKE
+        # Waiting for another search to finish comes out of this one's budget
+        if not self._search_lock.acquire(timeout=budget * SEARCH_SHARE):
+            return best
+        # A full collection can take longer than the whole budget; hold it
+        # off until the search is done
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            if len(self.table) >= self.table_size // 2:
+                # Age the table while on the clock, so the budget covers it
+                self._old_table, self.table = self.table, {}
+            self.last_depth = 0
+            for depth in range(1, self.max_depth + 1):
+                try:
+                    _, best = self._enemy_node(context, state, depth, deadline)
+                except _OutOfTime:
+                    break
+                self.last_depth = depth
+        finally:
+            if collecting:
+                gc.enable()
+            self._search_lock.release()
+        return best
+
+    def _enemy_node(self, context, state, depth, deadline):
+        key = (context, state, depth)
+        cached = self.table.get(key)
+        if cached is None:
+            cached = self._old_table.get(key)
+            if cached is not None:
+                self.table[key] = cached
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.nodes += 1
+        if time.perf_counter() > deadline:
+            raise _OutOfTime
+
+        best_value, best_action = -2.0, ENEMY_STRIKE
+        for action in ENEMY_ACTIONS:
+            value = 0.0
+            for p, after in self._enemy_outcomes(context, state, action):
+                value += p * self._player_node(context, after, depth, deadline)
+            if value > best_value:
+                best_value, best_action = value, action
+
+        self.table[key] = (best_value, best_action)
+        return best_value, best_action
+
+    def _player_node(self, context, state, depth, deadline):
+        terminal = self._terminal(state)
+        if terminal is not None:
+            return terminal
+        if depth <= 1:
+            return self._heuristic(context, state)
+        value = 0.0
+        for p, after in self._player_replies(context, state):
+            # Table hits skip the check in _enemy_node, so a long run of them
+            # would otherwise sail past the deadline
+            if time.perf_counter() > deadline:
+                raise _OutOfTime
+            terminal = self._terminal(after)
+            value += p * (terminal if terminal is not None
+                          else self._enemy_node(context, after, depth - 1, deadline)[0])
+        return value
+
+
+def benchmark(decisions=200, budget=TIME_BUDGET) -> dict:
+    """Decision latency, search depth and table hit rate over simulated Hard fights"""
+    import random
+    from character import create_player
+    from combat import Combat, create_enemy_for_level
+    random.seed(3)
+    ai = EnemyAI(budget=budget)
+    latencies, depths = [], []
+    while len(latencies) < decisions:
+        player = create_player("Bench", random.choice(["Citizen", "Soldier", "Police"]))
+        combat = Combat(player, create_enemy_for_level(random.randint(1, 3), 1.5))
+        meter = 0
+        while not combat.is_over()[0] and len(latencies) < decisions:
+            if random.random() < 0.7:
+                combat.player_attack()
+                meter += player.get_weapon_damage()
+            else:
+                combat.player_defend()
+            if combat.is_over()[0]:
+                break
+            start = time.perf_counter()
+            action = ai.choose(combat, meter)
+            latencies.append(time.perf_counter() - start)
+            depths.append(ai.last_depth)
+            combat.enemy_turn(action)
+    latencies.sort()
+    return {"decisions": len(latencies),
+            "p50_ms": latencies[len(latencies) // 2] * 1000,
+            "max_ms": latencies[-1] * 1000,
+            "mean_depth": sum(depths) / len(depths),
+            "table_entries": len(ai.table) + len(ai._old_table),
+            "table_hit_rate": ai.hits / max(1, ai.hits + ai.nodes)}
+
+
+if __name__ == "__main__":
+    decisions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    stats = benchmark(decisions)
+    print(f"✅ {stats['decisions']} decisions: p50 {stats['p50_ms']:.1f} ms, max {stats['max_ms']:.1f} ms "
+          f"(budget {TIME_BUDGET * 1000:.0f} ms), mean depth {stats['mean_depth']:.1f}")
+    print(f"   transposition table: {stats['table_entries']:,} entries, {stats['table_hit_rate']:.0%} hits")
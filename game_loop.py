@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+game_loop.py - Fixed-timestep clock, simulation timers and tweens for the battle GUI
+The battle loop used to run its logic once per clock.tick(FPS), with
+timers read off get_ticks(). A slow frame then pushed the enemy's turn
+and the animations back, and a different FPS changed the timing.
+
+Now every frame's wall time goes into an accumulator. The game runs in
+fixed STEP_MS steps of simulation time, as many as the frame paid for.
+Timers (enemy turn, animations, autosave, stage transitions) are due at
+simulation times, so they fire on the same step whatever the frame rate.
+Rendering draws whatever state the last step left. Tweens interpolate
+between the last two steps by alpha, the unspent share of a step.
+
+Under load a frame that needed more than CATCH_UP_STEPS steps skips its
+render so the simulation can catch up, but at most MAX_SKIPPED_RENDERS
+frames in a row. A frame longer than MAX_FRAME_MS (a debugger stop, a
+dragged window) only counts up to MAX_FRAME_MS.
+
+    frame = FixedTimestep()
+    for now in frame.run(clock.tick(FPS)):
+        for name in timers.pop_due(now): ...
+    if frame.should_render(): draw(alpha=frame.alpha)
+
+Run directly for a stress test with slow and jittery frames.
+"""
+import random
+
+STEP_MS = 10                # one simulation step: 100 updates per second of game time
+MAX_FRAME_MS = 1000         # longest frame the simulation catches up on
+CATCH_UP_STEPS = 8          # a frame needing more steps than this skips its render...
+MAX_SKIPPED_RENDERS = 5     # ...but never more than this many frames in a row
+EASE = 0.2                  # share of the remaining distance a Tween covers per step
+
+
+class FixedTimestep:
+    """Accumulator that turns variable frame times into fixed simulation steps"""
+
+    def __init__(self, step_ms: int = STEP_MS, max_frame_ms: int = MAX_FRAME_MS):
+        self.step = step_ms
+        self.max_frame = max_frame_ms
+        self.accumulator = 0
+        self.time = 0          # simulation time in ms
+        self.steps = 0         # steps run for the last frame
+        self.skipped = 0       # renders skipped in a row
+        self.dropped = 0       # wall time beyond MAX_FRAME_MS that was never simulated
+
+    def run(self, frame_ms: int):
+        """Add a frame's wall time; yields the simulation time of each step it pays for"""
+        if frame_ms > self.max_frame:
+            self.dropped += frame_ms - self.max_frame
+            frame_ms = self.max_frame
+        self.accumulator += frame_ms
+        self.steps = 0
+        while self.accumulator >= self.step:
+            self.accumulator -= self.step
+            self.time += self.step
+            self.steps += 1
+            yield self.time
+
+    @property
+    def alpha(self) -> float:
+        """How far the next step has come, 0..1, for interpolated drawing"""
+        return self.accumulator / self.step
+
+    def should_render(self) -> bool:
+        """False while catching up after a slow frame (bounded by MAX_SKIPPED_RENDERS)"""
+        if self.steps > CATCH_UP_STEPS and self.skipped < MAX_SKIPPED_RENDERS:
+            self.skipped += 1
+            return False
+        self.skipped = 0
+        return True
+
+
+class SimTimers:
+    """Named one-shot timers due at simulation times; rescheduling a name replaces it"""
+
+    def __init__(self):
+        self._due = {}      # name -> (due, seq)
+        self._seq = 0
+
+    def schedule(self, name: str, now: int, delay: int):
+        self._seq += 1
+        self._due[name] = (now + delay, self._seq)
+
+    def cancel(self, name: str):
+        self._due.pop(name, None)
+
+    def pending(self, *names) -> bool:
+        return any(name in self._due for name in names)
+
+    def pop_due(self, now: int) -> list:
+        """Names due by now, in due order (ties in scheduling order), removed"""
+        due = sorted((when, name) for name, when in self._due.items() if when[0] <= now)
+        for _, name in due:
+            del self._due[name]
+        return [name for _, name in due]
+
+
+class Tween:
+    """A drawn number (e.g. an HP bar) that eases toward its target once per step"""
+
+    __slots__ = ("previous", "current")
+
+    def __init__(self, value=0.0):
+        self.previous = self.current = float(value)
+
+    def step(self, target, ease: float = EASE):
+        self.previous = self.current
+        self.current += (target - self.current) * ease
+        if abs(target - self.current) < 0.5:
+            self.current = float(target)
+
+    def value(self, alpha: float) -> float:
+        """The number to draw, between the last two steps"""
+        return self.previous + (self.current - self.previous) * alpha
+
+
+def _scripted_battle(frames, seconds=120):
+    """A battle-shaped timer script run under a sequence of frame times.
+
+    The enemy moves 500 ms after each player move; hits start a 300 ms
+    damage animation; every 7th exchange wins a stage (2 s victory
+    animation); an autosave runs every 30 s. Returns the (sim time, timer)
+    log, the renders drawn and skipped, and the FixedTimestep.
+    """
+    frame, timers, log = FixedTimestep(), SimTimers(), []
+    rendered = skipped = exchanges = 0
+    timers.schedule("enemy_turn", 0, 500)
+    timers.schedule("autosave", 0, 30000)
+    for frame_ms in frames:
+        for now in frame.run(frame_ms):
+            for name in timers.pop_due(now):
+                log.append((now, name))
+                if name == "enemy_turn":
+                    exchanges += 1
+                    timers.schedule("damage_animation", now, 300)
+                    if exchanges % 7 == 0:
+                        timers.schedule("next_stage", now, 2000)
+                    else:
+                        timers.schedule("enemy_turn", now, 500)
+                elif name == "next_stage":
+                    timers.schedule("enemy_turn", now, 500)
+                elif name == "autosave":
+                    timers.schedule("autosave", now, 30000)
+        if frame.should_render():
+            rendered += 1
+        else:
+            skipped += 1
+        if frame.time >= seconds * 1000:
+            break
+    return log, rendered, skipped, frame
+
+
+if __name__ == "__main__":
+    rng = random.Random(48)
+    seconds = 120
+
+    def frames(pattern):
+        while True:
+            yield pattern()
+
+    patterns = {
+        "steady 30 FPS": lambda: 33,
+        "steady 144 FPS": lambda: 7,
+        "jitter 1-120 ms": lambda: rng.randint(1, 120),
+        "400 ms stalls": lambda: 400 if rng.random() < 0.1 else 16,
+        "slow renders": lambda: rng.choice((16, 16, 16, 90, 250)),
+    }
+    reference = None
+    for label, pattern in patterns.items():
+        log, rendered, skipped, frame = _scripted_battle(frames(pattern), seconds)
+        log = [entry for entry in log if entry[0] <= seconds * 1000]
+        if reference is None:
+            reference = log
+        assert log == reference, f"{label}: timers fired at different simulation times"
+        assert frame.skipped <= MAX_SKIPPED_RENDERS
+        print(f"   {label:<16} {len(log)} timers on identical steps, {rendered:>5} renders, {skipped:>4} skipped")
+
+    # Frames past MAX_FRAME_MS are clipped, never replayed as a burst
+    frame = FixedTimestep()
+    steps = sum(1 for _ in frame.run(5000))
+    assert steps == MAX_FRAME_MS // STEP_MS and frame.dropped == 5000 - MAX_FRAME_MS
+
+    # Interpolation stays between the last two steps
+    tween = Tween(100)
+    tween.step(40)
+    assert tween.value(0) == 100 and tween.value(1) == tween.current and 40 < tween.value(0.5) < 100
+    print(f"✅ {seconds} s of battle timers fire on the same simulation steps under every frame pattern")
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+hint_engine.py - Rollout-backed move hints for the battle HUD
+For the current battle state, HintEngine scores ATTACK, DEFEND and
+SPECIAL (when it is ready). Each score comes from plain-Python rollouts
+that play the rest of the fight to the end. Batches go to each button in
+turn, so the hint improves for as long as the player waits (anytime
+refinement). Results are cached per battle state, so returning to a
+position picks up where the search left off.
+
+The worker thread keeps its CPU use under cpu_share of one core. It
+measures its own thread CPU time and sleeps for the rest, and stops once
+every button has max_rollouts samples. request() and hint() only swap a
+tuple under a lock, so the GUI loop never waits on the search:
+
+    hints = HintEngine(settings.difficulty)
+    hints.request(combat, weapon_damage_count, special_ability_count)   # every frame
+    hint = hints.hint()   # None until there are enough samples
+
+Set NIGERIAN_RPG_HINT_CPU to change the CPU share, or to 0 to turn hints off.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from character import ATTACK_ROLL
+from combat import (DEFEND_CHANCE, DEFEND_FAIL_PENALTY, DEFENDED_STRIKE_DAMAGE, ENEMY_HEAVY,
+                    ENEMY_RECOVER, HEAVY_DAMAGE, HEAVY_HIT_CHANCE, MISS_PENALTY,
+                    PLAYER_HIT_CHANCE, RECOVER_HEAL, STRIKE_DAMAGE)
+from enemy_ai import DEFAULT_ENEMY_MODEL, ENEMY_MODELS
+from status_effects import NO_EFFECTS, SPECIAL_EFFECTS, apply_to_summary, summarize, tick_summary
+
+CPU_SHARE = float(os.environ.get("NIGERIAN_RPG_HINT_CPU", "0.25"))  # fraction of one core
+BATCH = 64                # rollouts per button per pass
+MAX_ROLLOUTS = 4000       # per button per state; the worker idles after that
+MIN_ROLLOUTS = 256        # per button before a hint is shown
+CACHE_SIZE = 512          # battle states remembered (LRU)
+TURN_LIMIT = 150          # a rollout still going after this many turns counts as a loss
+TURN_COST = 0.002         # score lost per turn, so quicker wins rank higher on a tie
+MAX_SPECIALS = 3          # matches special_ability_count < 3 in battle_gui
+
+ATTACK, DEFEND, SPECIAL = "ATTACK", "DEFEND", "SPECIAL"
+
+# How the player plays after the evaluated move: special when it is ready,
+# otherwise mostly attack
+ROLLOUT_DEFEND = 0.2
+
+Hint = namedtuple("Hint", "action win_rate turns samples scores")
+
+
+class HintEngine:
+    """Background Monte Carlo evaluation of the player's buttons"""
+
+    def __init__(self, difficulty="Normal", cpu_share=CPU_SHARE, max_rollouts=MAX_ROLLOUTS,
+                 min_rollouts=MIN_ROLLOUTS, cache_size=CACHE_SIZE, seed=None):
+        self.cpu_share = max(0.01, min(1.0, cpu_share))
+        self.max_rollouts = max_rollouts
+        self.min_rollouts = min_rollouts
+        self.cache_size = cache_size
+        self.rollouts = 0
+        self.cpu_time = 0.0
+        self._enemy_moves, self._enemy_cumulative = self._cumulative(
+            ENEMY_MODELS.get(difficulty, DEFAULT_ENEMY_MODEL))
+        # A private RNG: rollouts must not move the game's random stream
+        self._rng = random.Random(seed)
+        # (context, state) -> {button: [rollouts, wins, turns, score]}
+        self.cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._current = None
+        self._closed = False
+        self._worker = None
+
+    @staticmethod
+    def _cumulative(model):
+        moves, cumulative, total = [], [], 0.0
+        for move, weight in model:
+            total += weight
+            moves.append(move)
+            cumulative.append(total)
+        return moves, [c / total for c in cumulative]
+
+    # ---- public API ----
+    def request(self, combat, weapon_damage_count=0, special_ability_count=0):
+        """Point the search at this battle state; cheap enough to call every frame"""
+        key = self._key(combat, weapon_damage_count, special_ability_count)
+        with self._lock:
+            if key == self._current:
+                return
+            self._current = key
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, daemon=True, name="hint-engine")
+            self._worker.start()
+        self._wake.set()
+
+    def hint(self):
+        """Best button for the latest request, or None while still sampling (never blocks)"""
+        with self._lock:
+            stats = self.cache.get(self._current) if self._current else None
+            if not stats or min(s[0] for s in stats.values()) < self.min_rollouts:
+                return None
+            scores = {button: s[3] / s[0] for button, s in stats.items()}
+            best = max(scores, key=scores.get)
+            rollouts, wins, turns, _ = stats[best]
+            return Hint(best, wins / rollouts, turns / rollouts,
+                        sum(s[0] for s in stats.values()), scores)
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        if self._worker is not None:
+            self._worker.join(timeout=1)
+            self._worker = None
+
+    # ---- worker ----
+    @staticmethod
+    def _key(combat, meter, uses):
+        player, enemy = combat.player, combat.enemy
+        threshold = player.get_special_threshold()
+        specials = tuple(SPECIAL_EFFECTS.get(name) for name in player.get_special_abilities())
+        context = (player.get_weapon_damage(), threshold, enemy.max_hp, enemy.defense, player.max_hp, specials)
+        # Past the threshold only "is the special ready" matters
+        state = (player.hp, enemy.hp, combat.player_defended, min(meter, threshold), uses,
+                 summarize(combat.effects, player, enemy))
+        return context, state
+
+    def _stats(self, key):
+        with self._lock:
+            stats = self.cache.get(key)
+            if stats is None:
+                _, (_, _, _, meter, uses, _) = key
+                buttons = [ATTACK, DEFEND]
+                if meter >= key[0][1] and uses < MAX_SPECIALS:
+                    buttons.append(SPECIAL)
+                stats = self.cache[key] = {button: [0, 0, 0, 0.0] for button in buttons}
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+            else:
+                self.cache.move_to_end(key)
+            return stats
+
+    def _run(self):
+        while not self._closed:
+            key = self._current
+            if key is None:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            stats = self._stats(key)
+            # Anytime refinement: one batch for the least-sampled button per pass
+            button = min(stats, key=lambda b: stats[b][0])
+            if stats[button][0] >= self.max_rollouts:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+
+            start = time.thread_time()
+            wins = turns = 0
+            score = 0.0
+            for _ in range(BATCH):
+                won, length = self._rollout(key, button)
+                wins += won
+                turns += length
+                score += won - TURN_COST * length
+            used = time.thread_time() - start
+            with self._lock:
+                entry = stats[button]
+                entry[0] += BATCH
+                entry[1] += wins
+                entry[2] += turns
+                entry[3] += score
+            self.rollouts += BATCH
+            self.cpu_time += used
+            # Stay under the CPU budget (the wait ends early on a new request)
+            idle = used * (1.0 / self.cpu_share - 1.0)
+            if idle > 0 and self._wake.wait(idle):
+                self._wake.clear()
+
+    def _rollout(self, key, button):
+        """Play the fight out from key, starting with button; (won, turns)"""
+        (weapon, threshold, e_max, e_def, p_max, specials), (p_hp, e_hp, defended, meter, uses, effects) = key
+        rng = self._rng
+        random01, randint = rng.random, rng.randint
+        moves, cumulative = self._enemy_moves, self._enemy_cumulative
+        hit_chance = PLAYER_HIT_CHANCE / 100
+        defend_chance = DEFEND_CHANCE / 100
+        heavy_chance = HEAVY_HIT_CHANCE / 100
+        roll_low, roll_high = ATTACK_ROLL
+        action = button
+        for turn in range(1, TURN_LIMIT + 1):
+            # Status effects tick first; bleeding out ends the fight before the move
+            if effects is not NO_EFFECTS:
+                bleed, regen, effects = tick_summary(effects)
+                e_hp -= bleed
+                p_hp = min(p_max, p_hp + regen)
+                if e_hp <= 0:
+                    return 1, turn
+
+            # Player
+            if action == SPECIAL:
+                e_hp -= 2 * weapon
+                meter = 0
+                uses += 1
+                effect = specials[int(random01() * len(specials))]
+                if effect and e_hp > 0:
+                    effects = apply_to_summary(effects, *effect)
+            elif action == ATTACK:
+                # battle_gui adds weapon damage to the meter on every attack, hit or miss
+                meter += weapon
+                if random01() < hit_chance:
+                    defense = e_def if effects is NO_EFFECTS else max(0, e_def - effects[2])
+                    e_hp -= max(1, weapon + randint(roll_low, roll_high) - defense)
+                else:
+                    p_hp -= MISS_PENALTY
+            elif random01() < defend_chance:
+                defended = True
+            else:
+                p_hp -= DEFEND_FAIL_PENALTY
+            if e_hp <= 0:
+                return 1, turn
+            if p_hp <= 0:
+                return 0, turn
+
+            # Enemy (a stunned one loses its move)
+            if effects is NO_EFFECTS or not effects[4]:
+                pick = random01()
+                move = moves[-1]
+                for i, edge in enumerate(cumulative):
+                    if pick < edge:
+                        move = moves[i]
+                        break
+                if move == ENEMY_RECOVER:
+                    e_hp = min(e_max, e_hp + randint(*RECOVER_HEAL))
+                elif move == ENEMY_HEAVY:
+                    if not defended and random01() < heavy_chance:
+                        p_hp -= randint(*HEAVY_DAMAGE)
+                else:
+                    p_hp -= randint(*(DEFENDED_STRIKE_DAMAGE if defended else STRIKE_DAMAGE))
+            defended = False
+            if p_hp <= 0:
+                return 0, turn
+
+            # Rollout policy for the player's next move
+            if meter >= threshold and uses < MAX_SPECIALS:
+                action = SPECIAL
+            elif random01() < ROLLOUT_DEFEND:
+                action = DEFEND
+            else:
+                action = ATTACK
+        return 0, TURN_LIMIT
+
+
+def benchmark(seconds=3.0, cpu_share=CPU_SHARE) -> dict:
+    """Rollout rate, CPU share actually used and worst frame overrun of a 30 FPS loop"""
+    from character import create_player
+    from combat import Combat, create_enemy_for_level
+    random.seed(5)
+    combat = Combat(create_player("Bench", "Soldier"), create_enemy_for_level(2, 1.5))
+    engine = HintEngine("Hard", cpu_share=cpu_share, max_rollouts=10 ** 9, seed=1)
+
+    frame = 1 / 30
+    overruns, first_hint = [], None
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    next_frame = start
+    while time.perf_counter() - start < seconds:
+        engine.request(combat, 10, 0)
+        if first_hint is None and engine.hint():
+            first_hint = time.perf_counter() - start
+        next_frame += frame
+        delay = next_frame - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        overruns.append(max(0.0, time.perf_counter() - next_frame))
+    wall = time.perf_counter() - start
+    engine.close()
+    return {"rollouts_per_sec": engine.rollouts / max(engine.cpu_time, 1e-9),
+            "rollouts": engine.rollouts,
+            "worker_cpu_share": engine.cpu_time / wall,
+            "process_cpu_share": (time.process_time() - cpu_start) / wall,
+            "first_hint_ms": (first_hint or 0.0) * 1000,
+            "max_frame_overrun_ms": max(overruns) * 1000,
+            "hint": engine.hint()}
+
+
+if __name__ == "__main__":
+    from character import create_player
+    from combat import Combat, create_enemy_for_level
+
+    # A sure kill should be found: special finishes the enemy this turn
+    combat = Combat(create_player("Check", "Soldier"), create_enemy_for_level(1))
+    combat.enemy.hp = 3
+    engine = HintEngine(cpu_share=1.0, seed=2)
+    state = random.getstate()
+    engine.request(combat, 50, 0)
+    while engine.hint() is None:
+        time.sleep(0.01)
+    hint = engine.hint()
+    engine.close()
+    assert hint.action == SPECIAL and hint.win_rate == 1.0, hint
+    assert random.getstate() == state, "rollouts touched the game's random stream"
+    print(f"✅ finishing move found: {hint.action} ({hint.samples} rollouts)")
+
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    stats = benchmark(seconds)
+    hint = stats["hint"]
+    print(f"   {stats['rollouts_per_sec']:,.0f} rollouts/s of worker CPU, {stats['rollouts']:,} in {seconds:.0f}s")
+    print(f"   worker CPU {stats['worker_cpu_share']:.0%} of a core (budget {CPU_SHARE:.0%}), "
+          f"process {stats['process_cpu_share']:.0%}")
+    print(f"   first hint after {stats['first_hint_ms']:.0f} ms, worst 30 FPS frame overrun "
+          f"{stats['max_frame_overrun_ms']:.1f} ms")
+    print(f"   hint: {hint.action} win {hint.win_rate:.0%} in ~{hint.turns:.0f} turns; "
+          + ", ".join(f"{b} {s:.3f}" for b, s in hint.scores.items()))
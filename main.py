@@ -5,57 +5,17 @@ Enhanced with Settings and Leaderboard
 """
 import pygame
 import sys
-import random
 import os
-from character import Character
+from character import create_player
 from battle_gui import run_battle_gui_with_player
+from render import close_canvas, open_canvas
 from save_system import SaveSystem
-
-def create_player(name: str, char_class: str):
-    """Create a new player character"""
-    class_stats = {
-        "Citizen": {"hp": 100, "atk": 5, "def": 2},
-        "Soldier": {"hp": 120, "atk": 7, "def": 3},
-        "Police": {"hp": 110, "atk": 6, "def": 4}
-    }
-    
-    stats = class_stats.get(char_class, class_stats["Citizen"])
-    weapon = random.choice(["Juju", "Cutlass", "Gun"])
-    
-    sprite_map = {
-        "Citizen": "hero.png",
-        "Soldier": "soldier.png",
-        "Police": "police.png"
-    }
-    
-    skills = {}
-    if char_class == "Soldier":
-        skills["Military Strike"] = {"power": 8, "type": "damage", "mult": 1.5}
-    elif char_class == "Police":
-        skills["Arrest"] = {"power": 6, "type": "damage", "mult": 1.3}
-    
-    p = Character(
-        name=name,
-        level=1,
-        hp=stats["hp"],
-        max_hp=stats["hp"],
-        attack=stats["atk"],
-        defense=stats["def"],
-        char_class=char_class,
-        weapon=weapon,
-        xp=0,
-        xp_to_next=50,
-        sprite_path=sprite_map.get(char_class, "hero.png"),
-        skills=skills
-    )
-    return p
+from save_service import SOCKET_ENV, SaveServiceClient
 
 def main_menu_loop():
     """Main menu with Pygame GUI"""
     try:
         pygame.init()
-        screen = pygame.display.set_mode((640, 700))  # Increased height for new buttons
-        pygame.display.set_caption("⚔️ Escape the Streets of Nigeria")
         clock = pygame.time.Clock()
         
         try:
@@ -68,7 +28,9 @@ def main_menu_loop():
             bigfont = pygame.font.Font(None, 36)
             smallfont = pygame.font.Font(None, 18)
         
-        save_system = SaveSystem()
+        # Arcade boxes share one save service process (see save_service.py)
+        service_socket = os.environ.get(SOCKET_ENV)
+        save_system = SaveServiceClient(service_socket) if service_socket else SaveSystem(journal=True)
         
         # Input fields
         name_input = ""
@@ -82,14 +44,17 @@ def main_menu_loop():
         settings_btn = pygame.Rect(220, 440, 200, 50)
         leaderboard_btn = pygame.Rect(220, 500, 200, 50)
         quit_btn = pygame.Rect(220, 560, 200, 50)
+        endless_btn = pygame.Rect(220, 620, 200, 40)
         class_prev_btn = pygame.Rect(170, 240, 40, 40)
         class_next_btn = pygame.Rect(430, 240, 40, 40)
 
         running = True
         while running:
-            screen.fill((28, 28, 48))
+            # Back from a battle or submenu: switch the window back to the menu layout
+            canvas = open_canvas((640, 700), "⚔️ Escape the Streets of Nigeria")
+            canvas.clear((28, 28, 48))
             
-            for ev in pygame.event.get():
+            for ev in canvas.events():
                 if ev.type == pygame.QUIT:
                     save_system.close()
                     running = False
@@ -104,7 +69,7 @@ def main_menu_loop():
                             name_input += ev.unicode
                 
                 if ev.type == pygame.MOUSEBUTTONDOWN and ev.button == 1:
-                    mx, my = pygame.mouse.get_pos()
+                    mx, my = ev.pos
                     
                     # Class selection
                     if class_prev_btn.collidepoint(mx, my):
@@ -124,6 +89,18 @@ def main_menu_loop():
                             except Exception as e:
                                 print(f"Error starting game: {e}")
                     
+                    # Endless survival: stages past 3 until you fall
+                    if endless_btn.collidepoint(mx, my):
+                        if name_input.strip():
+                            try:
+                                player = create_player(name_input.strip(), class_options[selected_class])
+                                save_system.save_character(player, 1)
+                                run_battle_gui_with_player(player, save_system, 1, endless=True)
+                                name_input = ""
+                                input_active = True
+                            except Exception as e:
+                                print(f"Error starting endless mode: {e}")
+                    
                     # Load game
                     if load_btn.collidepoint(mx, my):
                         try:
@@ -151,65 +128,53 @@ def main_menu_loop():
                         running = False
             
             # Title
-            title_surf = bigfont.render("⚔️ ESCAPE THE STREETS", True, (231, 76, 60))
-            screen.blit(title_surf, (640//2 - title_surf.get_width()//2, 30))
+            canvas.text("⚔️ ESCAPE THE STREETS", (640//2, 30), bigfont, (231, 76, 60), center=True)
             
-            subtitle_surf = smallfont.render("An Urban Survival RPG", True, (243, 156, 18))
-            screen.blit(subtitle_surf, (640//2 - subtitle_surf.get_width()//2, 75))
+            canvas.text("An Urban Survival RPG", (640//2, 75), smallfont, (243, 156, 18), center=True)
             
             # Name input
-            label = font.render("Your Name:", True, (236, 240, 241))
-            screen.blit(label, (220, 130))
+            canvas.text("Your Name:", (220, 130), font, (236, 240, 241))
             
             input_box = pygame.Rect(220, 160, 200, 40)
-            pygame.draw.rect(screen, (52, 73, 94), input_box)
-            pygame.draw.rect(screen, (255, 255, 255) if input_active else (100, 100, 100), input_box, 2)
+            canvas.rect((52, 73, 94), input_box)
+            canvas.rect((255, 255, 255) if input_active else (100, 100, 100), input_box, 2)
             
-            name_surf = font.render(name_input, True, (236, 240, 241))
-            screen.blit(name_surf, (input_box.x + 10, input_box.y + 8))
+            canvas.text(name_input, (input_box.x + 10, input_box.y + 8), font, (236, 240, 241))
             
             # Class selection
-            class_label = font.render("Choose Your Role:", True, (236, 240, 241))
-            screen.blit(class_label, (220, 210))
+            canvas.text("Choose Your Role:", (220, 210), font, (236, 240, 241))
             
-            pygame.draw.rect(screen, (180, 180, 180), class_prev_btn)
-            pygame.draw.rect(screen, (180, 180, 180), class_next_btn)
-            prev_text = font.render("<", True, (0, 0, 0))
-            next_text = font.render(">", True, (0, 0, 0))
-            screen.blit(prev_text, (class_prev_btn.x + 12, class_prev_btn.y + 8))
-            screen.blit(next_text, (class_next_btn.x + 12, class_next_btn.y + 8))
+            canvas.rect((180, 180, 180), class_prev_btn)
+            canvas.rect((180, 180, 180), class_next_btn)
+            canvas.text("<", (class_prev_btn.x + 12, class_prev_btn.y + 8), font, (0, 0, 0))
+            canvas.text(">", (class_next_btn.x + 12, class_next_btn.y + 8), font, (0, 0, 0))
             
-            class_surf = font.render(class_options[selected_class], True, (46, 204, 113))
-            screen.blit(class_surf, (320 - class_surf.get_width()//2, 248))
+            canvas.text(class_options[selected_class], (320, 248), font, (46, 204, 113), center=True)
             
             # Buttons
-            pygame.draw.rect(screen, (231, 76, 60), start_btn)
-            pygame.draw.rect(screen, (52, 152, 219), load_btn)
-            pygame.draw.rect(screen, (155, 89, 182), settings_btn)
-            pygame.draw.rect(screen, (241, 196, 15), leaderboard_btn)
-            pygame.draw.rect(screen, (149, 165, 166), quit_btn)
-            
-            start_text = font.render("START NEW GAME", True, (255, 255, 255))
-            load_text = font.render("CONTINUE GAME", True, (255, 255, 255))
-            settings_text = font.render("⚙️ SETTINGS", True, (255, 255, 255))
-            leaderboard_text = font.render("🏆 LEADERBOARD", True, (255, 255, 255))
-            quit_text = font.render("QUIT", True, (255, 255, 255))
+            canvas.rect((231, 76, 60), start_btn)
+            canvas.rect((52, 152, 219), load_btn)
+            canvas.rect((155, 89, 182), settings_btn)
+            canvas.rect((241, 196, 15), leaderboard_btn)
+            canvas.rect((149, 165, 166), quit_btn)
+            canvas.rect((192, 57, 43), endless_btn)
             
-            screen.blit(start_text, (start_btn.x + 25, start_btn.y + 12))
-            screen.blit(load_text, (load_btn.x + 30, load_btn.y + 12))
-            screen.blit(settings_text, (settings_btn.x + 50, settings_btn.y + 12))
-            screen.blit(leaderboard_text, (leaderboard_btn.x + 25, leaderboard_btn.y + 12))
-            screen.blit(quit_text, (quit_btn.x + 82, quit_btn.y + 12))
+            canvas.text("START NEW GAME", (start_btn.x + 25, start_btn.y + 12), font, (255, 255, 255))
+            canvas.text("CONTINUE GAME", (load_btn.x + 30, load_btn.y + 12), font, (255, 255, 255))
+            canvas.text("⚙️ SETTINGS", (settings_btn.x + 50, settings_btn.y + 12), font, (255, 255, 255))
+            canvas.text("🏆 LEADERBOARD", (leaderboard_btn.x + 25, leaderboard_btn.y + 12), font, (255, 255, 255))
+            canvas.text("QUIT", (quit_btn.x + 82, quit_btn.y + 12), font, (255, 255, 255))
+            canvas.text("♾️ ENDLESS MODE", (endless_btn.x + 22, endless_btn.y + 8), font, (255, 255, 255))
             
             # Version/difficulty indicator
             difficulty = save_system.get_setting('difficulty')
-            diff_text = smallfont.render(f"Difficulty: {difficulty}", True, (149, 165, 166))
-            screen.blit(diff_text, (640//2 - diff_text.get_width()//2, 640))
+            canvas.text(f"Difficulty: {difficulty}", (640//2, 672), smallfont, (149, 165, 166), center=True)
             
-            pygame.display.flip()
+            canvas.present()
             clock.tick(30)
         
         save_system.close()
+        close_canvas()
         pygame.quit()
         
     except Exception as e:
@@ -217,13 +182,13 @@ def main_menu_loop():
         import traceback
         traceback.print_exc()
     finally:
+        close_canvas()
         pygame.quit()
         sys.exit()
 
 def show_settings_menu(save_system: SaveSystem):
     """Show settings menu"""
-    screen = pygame.display.set_mode((640, 600))
-    pygame.display.set_caption("⚙️ Settings")
+    canvas = open_canvas((640, 600), "⚙️ Settings")
     clock = pygame.time.Clock()
     
     try:
@@ -233,9 +198,9 @@ def show_settings_menu(save_system: SaveSystem):
         font = pygame.font.Font(None, 20)
         bigfont = pygame.font.Font(None, 32)
     
-    settings = save_system.load_settings()
+    settings = save_system.settings
     difficulties = ["Easy", "Normal", "Hard"]
-    current_diff_idx = difficulties.index(settings['difficulty'])
+    current_diff_idx = difficulties.index(settings.difficulty)
     
     # Buttons
     sound_btn = pygame.Rect(220, 150, 200, 50)
@@ -247,9 +212,9 @@ def show_settings_menu(save_system: SaveSystem):
     
     running = True
     while running:
-        screen.fill((28, 28, 48))
+        canvas.clear((28, 28, 48))
         
-        for ev in pygame.event.get():
+        for ev in canvas.events():
             if ev.type == pygame.QUIT:
                 running = False
             
@@ -258,77 +223,64 @@ def show_settings_menu(save_system: SaveSystem):
                     running = False
             
             if ev.type == pygame.MOUSEBUTTONDOWN and ev.button == 1:
-                mx, my = pygame.mouse.get_pos()
+                mx, my = ev.pos
                 
                 # Toggle sound
                 if sound_btn.collidepoint(mx, my):
-                    settings['sound_enabled'] = not settings['sound_enabled']
-                    save_system.save_settings(settings)
+                    settings.sound_enabled = not settings.sound_enabled
                 
                 # Toggle music
                 if music_btn.collidepoint(mx, my):
-                    settings['music_enabled'] = not settings['music_enabled']
-                    save_system.save_settings(settings)
+                    settings.music_enabled = not settings.music_enabled
                 
                 # Toggle effects
                 if effects_btn.collidepoint(mx, my):
-                    settings['screen_effects'] = not settings['screen_effects']
-                    save_system.save_settings(settings)
+                    settings.screen_effects = not settings.screen_effects
                 
                 # Difficulty selection
                 if diff_prev_btn.collidepoint(mx, my):
                     current_diff_idx = (current_diff_idx - 1) % len(difficulties)
-                    settings['difficulty'] = difficulties[current_diff_idx]
-                    save_system.save_settings(settings)
+                    settings.difficulty = difficulties[current_diff_idx]
                 
                 if diff_next_btn.collidepoint(mx, my):
                     current_diff_idx = (current_diff_idx + 1) % len(difficulties)
-                    settings['difficulty'] = difficulties[current_diff_idx]
-                    save_system.save_settings(settings)
+                    settings.difficulty = difficulties[current_diff_idx]
                 
                 # Back
                 if back_btn.collidepoint(mx, my):
                     running = False
         
         # Title
-        title = bigfont.render("⚙️ SETTINGS", True, (155, 89, 182))
-        screen.blit(title, (640//2 - title.get_width()//2, 40))
+        canvas.text("⚙️ SETTINGS", (640//2, 40), bigfont, (155, 89, 182), center=True)
         
         # Sound toggle
-        sound_color = (46, 204, 113) if settings['sound_enabled'] else (231, 76, 60)
-        sound_status = "ON" if settings['sound_enabled'] else "OFF"
-        pygame.draw.rect(screen, sound_color, sound_btn)
-        sound_text = font.render(f"🔊 Sound: {sound_status}", True, (255, 255, 255))
-        screen.blit(sound_text, (sound_btn.x + 40, sound_btn.y + 12))
+        sound_color = (46, 204, 113) if settings.sound_enabled else (231, 76, 60)
+        sound_status = "ON" if settings.sound_enabled else "OFF"
+        canvas.rect(sound_color, sound_btn)
+        canvas.text(f"🔊 Sound: {sound_status}", (sound_btn.x + 40, sound_btn.y + 12), font, (255, 255, 255))
         
         # Music toggle
-        music_color = (46, 204, 113) if settings['music_enabled'] else (231, 76, 60)
-        music_status = "ON" if settings['music_enabled'] else "OFF"
-        pygame.draw.rect(screen, music_color, music_btn)
-        music_text = font.render(f"🎵 Music: {music_status}", True, (255, 255, 255))
-        screen.blit(music_text, (music_btn.x + 40, music_btn.y + 12))
+        music_color = (46, 204, 113) if settings.music_enabled else (231, 76, 60)
+        music_status = "ON" if settings.music_enabled else "OFF"
+        canvas.rect(music_color, music_btn)
+        canvas.text(f"🎵 Music: {music_status}", (music_btn.x + 40, music_btn.y + 12), font, (255, 255, 255))
         
         # Effects toggle
-        effects_color = (46, 204, 113) if settings['screen_effects'] else (231, 76, 60)
-        effects_status = "ON" if settings['screen_effects'] else "OFF"
-        pygame.draw.rect(screen, effects_color, effects_btn)
-        effects_text = font.render(f"✨ Effects: {effects_status}", True, (255, 255, 255))
-        screen.blit(effects_text, (effects_btn.x + 30, effects_btn.y + 12))
+        effects_color = (46, 204, 113) if settings.screen_effects else (231, 76, 60)
+        effects_status = "ON" if settings.screen_effects else "OFF"
+        canvas.rect(effects_color, effects_btn)
+        canvas.text(f"✨ Effects: {effects_status}", (effects_btn.x + 30, effects_btn.y + 12), font, (255, 255, 255))
         
         # Difficulty selector
-        diff_label = font.render("🎯 Difficulty:", True, (236, 240, 241))
-        screen.blit(diff_label, (240, 370))
+        canvas.text("🎯 Difficulty:", (240, 370), font, (236, 240, 241))
         
-        pygame.draw.rect(screen, (180, 180, 180), diff_prev_btn)
-        pygame.draw.rect(screen, (180, 180, 180), diff_next_btn)
-        prev_text = font.render("<", True, (0, 0, 0))
-        next_text = font.render(">", True, (0, 0, 0))
-        screen.blit(prev_text, (diff_prev_btn.x + 12, diff_prev_btn.y + 10))
-        screen.blit(next_text, (diff_next_btn.x + 12, diff_next_btn.y + 10))
+        canvas.rect((180, 180, 180), diff_prev_btn)
+        canvas.rect((180, 180, 180), diff_next_btn)
+        canvas.text("<", (diff_prev_btn.x + 12, diff_prev_btn.y + 10), font, (0, 0, 0))
+        canvas.text(">", (diff_next_btn.x + 12, diff_next_btn.y + 10), font, (0, 0, 0))
         
         diff_colors = {"Easy": (46, 204, 113), "Normal": (241, 196, 15), "Hard": (231, 76, 60)}
-        diff_surf = font.render(settings['difficulty'], True, diff_colors[settings['difficulty']])
-        screen.blit(diff_surf, (320 - diff_surf.get_width()//2, 415))
+        canvas.text(settings.difficulty, (320, 415), font, diff_colors[settings.difficulty], center=True)
         
         # Difficulty descriptions
         diff_desc = {
@@ -336,21 +288,22 @@ def show_settings_menu(save_system: SaveSystem):
             "Normal": "Standard difficulty",
             "Hard": "Enemies have 150% HP"
         }
-        desc_surf = font.render(diff_desc[settings['difficulty']], True, (149, 165, 166))
-        screen.blit(desc_surf, (320 - desc_surf.get_width()//2, 445))
+        canvas.text(diff_desc[settings.difficulty], (320, 445), font, (149, 165, 166), center=True)
         
         # Back button
-        pygame.draw.rect(screen, (52, 152, 219), back_btn)
-        back_text = font.render("⬅️ BACK", True, (255, 255, 255))
-        screen.blit(back_text, (back_btn.x + 65, back_btn.y + 12))
+        canvas.rect((52, 152, 219), back_btn)
+        canvas.text("⬅️ BACK", (back_btn.x + 65, back_btn.y + 12), font, (255, 255, 255))
         
-        pygame.display.flip()
+        canvas.present()
+        save_system.flush_settings()
         clock.tick(30)
+    
+    # Persist anything still waiting on the debounce
+    save_system.flush_settings(force=True)
 
 def show_leaderboard_menu(save_system: SaveSystem):
     """Show leaderboard menu with tabs"""
-    screen = pygame.display.set_mode((700, 650))
-    pygame.display.set_caption("🏆 Leaderboard")
+    canvas = open_canvas((700, 650), "🏆 Leaderboard")
     clock = pygame.time.Clock()
     
     try:
@@ -375,9 +328,9 @@ def show_leaderboard_menu(save_system: SaveSystem):
     
     running = True
     while running:
-        screen.fill((28, 28, 48))
+        canvas.clear((28, 28, 48))
         
-        for ev in pygame.event.get():
+        for ev in canvas.events():
             if ev.type == pygame.QUIT:
                 running = False
             
@@ -390,7 +343,7 @@ def show_leaderboard_menu(save_system: SaveSystem):
                     current_tab = min(2, current_tab + 1)
             
             if ev.type == pygame.MOUSEBUTTONDOWN and ev.button == 1:
-                mx, my = pygame.mouse.get_pos()
+                mx, my = ev.pos
                 
                 # Tab selection
                 for i, btn in enumerate(tab_btns):
@@ -402,24 +355,21 @@ def show_leaderboard_menu(save_system: SaveSystem):
                     running = False
         
         # Title
-        title = bigfont.render("🏆 LEADERBOARD", True, (241, 196, 15))
-        screen.blit(title, (700//2 - title.get_width()//2, 30))
+        canvas.text("🏆 LEADERBOARD", (700//2, 30), bigfont, (241, 196, 15), center=True)
         
         # Tabs
         for i, (btn, tab_name) in enumerate(zip(tab_btns, tabs)):
             color = (52, 152, 219) if i == current_tab else (52, 73, 94)
-            pygame.draw.rect(screen, color, btn)
-            pygame.draw.rect(screen, (236, 240, 241), btn, 2)
-            tab_text = font.render(tab_name, True, (255, 255, 255))
-            screen.blit(tab_text, (btn.x + btn.width//2 - tab_text.get_width()//2, btn.y + 10))
+            canvas.rect(color, btn)
+            canvas.rect((236, 240, 241), btn, 2)
+            canvas.text(tab_name, (btn.x + btn.width//2, btn.y + 10), font, (255, 255, 255), center=True)
         
         # Leaderboard content
         y_start = 160
         
         if current_tab == 0:  # Fastest times
             entries = save_system.get_leaderboard_fastest()
-            header = font.render("Rank | Player | Time | Kills | Difficulty", True, (236, 240, 241))
-            screen.blit(header, (50, y_start))
+            canvas.text("Rank | Player | Time | Kills | Difficulty", (50, y_start), font, (236, 240, 241))
             
             for i, entry in enumerate(entries):
                 name, time, kills, diff, date = entry
@@ -427,13 +377,11 @@ def show_leaderboard_menu(save_system: SaveSystem):
                 seconds = int(time % 60)
                 rank_text = f"{i+1}. {name[:12]} | {minutes}m {seconds}s | {kills} | {diff}"
                 color = (241, 196, 15) if i == 0 else (192, 192, 192) if i == 1 else (205, 127, 50) if i == 2 else (236, 240, 241)
-                entry_surf = font.render(rank_text, True, color)
-                screen.blit(entry_surf, (60, y_start + 40 + i*30))
+                canvas.text(rank_text, (60, y_start + 40 + i*30), font, color)
         
         elif current_tab == 1:  # Highest damage
             entries = save_system.get_leaderboard_damage()
-            header = font.render("Rank | Player | Damage | Time | Difficulty", True, (236, 240, 241))
-            screen.blit(header, (50, y_start))
+            canvas.text("Rank | Player | Damage | Time | Difficulty", (50, y_start), font, (236, 240, 241))
             
             for i, entry in enumerate(entries):
                 name, damage, time, diff, date = entry
@@ -441,13 +389,11 @@ def show_leaderboard_menu(save_system: SaveSystem):
                 seconds = int(time % 60)
                 rank_text = f"{i+1}. {name[:12]} | {damage} DMG | {minutes}m {seconds}s | {diff}"
                 color = (241, 196, 15) if i == 0 else (192, 192, 192) if i == 1 else (205, 127, 50) if i == 2 else (236, 240, 241)
-                entry_surf = font.render(rank_text, True, color)
-                screen.blit(entry_surf, (60, y_start + 40 + i*30))
+                canvas.text(rank_text, (60, y_start + 40 + i*30), font, color)
         
         else:  # Most kills
             entries = save_system.get_leaderboard_enemies()
-            header = font.render("Rank | Player | Kills | Time | Difficulty", True, (236, 240, 241))
-            screen.blit(header, (50, y_start))
+            canvas.text("Rank | Player | Kills | Time | Difficulty", (50, y_start), font, (236, 240, 241))
             
             for i, entry in enumerate(entries):
                 name, kills, time, diff, date = entry
@@ -455,24 +401,20 @@ def show_leaderboard_menu(save_system: SaveSystem):
                 seconds = int(time % 60)
                 rank_text = f"{i+1}. {name[:12]} | {kills} | {minutes}m {seconds}s | {diff}"
                 color = (241, 196, 15) if i == 0 else (192, 192, 192) if i == 1 else (205, 127, 50) if i == 2 else (236, 240, 241)
-                entry_surf = font.render(rank_text, True, color)
-                screen.blit(entry_surf, (60, y_start + 40 + i*30))
+                canvas.text(rank_text, (60, y_start + 40 + i*30), font, color)
         
         # No entries message
         if not entries:
-            no_data = font.render("No records yet! Complete a run to appear here.", True, (149, 165, 166))
-            screen.blit(no_data, (700//2 - no_data.get_width()//2, y_start + 100))
+            canvas.text("No records yet! Complete a run to appear here.", (700//2, y_start + 100), font, (149, 165, 166), center=True)
         
         # Back button
-        pygame.draw.rect(screen, (52, 152, 219), back_btn)
-        back_text = font.render("⬅️ BACK", True, (255, 255, 255))
-        screen.blit(back_text, (back_btn.x + 65, back_btn.y + 15))
+        canvas.rect((52, 152, 219), back_btn)
+        canvas.text("⬅️ BACK", (back_btn.x + 65, back_btn.y + 15), font, (255, 255, 255))
         
         # Hint
-        hint = smallfont.render("← → to switch tabs | ESC to exit", True, (149, 165, 166))
-        screen.blit(hint, (700//2 - hint.get_width()//2, 630))
+        canvas.text("← → to switch tabs | ESC to exit", (700//2, 630), smallfont, (149, 165, 166), center=True)
         
-        pygame.display.flip()
+        canvas.present()
         clock.tick(30)
 
 def show_load_menu(save_system: SaveSystem):
@@ -483,8 +425,7 @@ def show_load_menu(save_system: SaveSystem):
         show_message_box("No saved games found!")
         return
     
-    screen = pygame.display.set_mode((640, 600))
-    pygame.display.set_caption("Load Game")
+    canvas = open_canvas((640, 600), "Load Game")
     clock = pygame.time.Clock()
     
     try:
@@ -498,9 +439,9 @@ def show_load_menu(save_system: SaveSystem):
     
     running = True
     while running:
-        screen.fill((28, 28, 48))
+        canvas.clear((28, 28, 48))
         
-        for ev in pygame.event.get():
+        for ev in canvas.events():
             if ev.type == pygame.QUIT:
                 running = False
             
@@ -522,7 +463,7 @@ def show_load_menu(save_system: SaveSystem):
                         print(f"Error loading save: {e}")
             
             if ev.type == pygame.MOUSEBUTTONDOWN and ev.button == 1:
-                mx, my = pygame.mouse.get_pos()
+                mx, my = ev.pos
                 for i in range(len(saves)):
                     rect = pygame.Rect(50, 100 + i*70, 540, 60)
                     if rect.collidepoint(mx, my):
@@ -535,33 +476,29 @@ def show_load_menu(save_system: SaveSystem):
                         except Exception as e:
                             print(f"Error loading save: {e}")
         
-        title = bigfont.render("📂 LOAD GAME", True, (52, 152, 219))
-        screen.blit(title, (640//2 - title.get_width()//2, 30))
+        canvas.text("📂 LOAD GAME", (640//2, 30), bigfont, (52, 152, 219), center=True)
         
         for i, save in enumerate(saves):
             name, char_class, level, weapon, current_level, last_saved = save
             rect = pygame.Rect(50, 100 + i*70, 540, 60)
             
             color = (52, 152, 219) if i == selected_save else (52, 73, 94)
-            pygame.draw.rect(screen, color, rect)
-            pygame.draw.rect(screen, (236, 240, 241), rect, 2)
+            canvas.rect(color, rect)
+            canvas.rect((236, 240, 241), rect, 2)
             
             text = f"{name} ({char_class}) - Lv {level} - {weapon} - Stage {current_level}"
-            text_surf = font.render(text, True, (236, 240, 241))
-            screen.blit(text_surf, (rect.x + 10, rect.y + 10))
+            canvas.text(text, (rect.x + 10, rect.y + 10), font, (236, 240, 241))
             
-            date_surf = font.render(f"Last played: {last_saved[:16]}", True, (149, 165, 166))
-            screen.blit(date_surf, (rect.x + 10, rect.y + 35))
+            canvas.text(f"Last played: {last_saved[:16]}", (rect.x + 10, rect.y + 35), font, (149, 165, 166))
         
-        hint = font.render("Click to load | ESC to cancel", True, (149, 165, 166))
-        screen.blit(hint, (640//2 - hint.get_width()//2, 560))
+        canvas.text("Click to load | ESC to cancel", (640//2, 560), font, (149, 165, 166), center=True)
         
-        pygame.display.flip()
+        canvas.present()
         clock.tick(30)
 
 def show_message_box(message: str):
     """Simple message box"""
-    screen = pygame.display.set_mode((400, 200))
+    canvas = open_canvas((400, 200))
     try:
         font = pygame.font.SysFont("Arial", 20)
     except:
@@ -570,17 +507,16 @@ def show_message_box(message: str):
     running = True
     start_time = pygame.time.get_ticks()
     while running:
-        for ev in pygame.event.get():
+        for ev in canvas.events():
             if ev.type == pygame.QUIT or ev.type == pygame.KEYDOWN:
                 running = False
         
         if pygame.time.get_ticks() - start_time > 2000:
             running = False
         
-        screen.fill((28, 28, 48))
-        text = font.render(message, True, (236, 240, 241))
-        screen.blit(text, (200 - text.get_width()//2, 90))
-        pygame.display.flip()
+        canvas.clear((28, 28, 48))
+        canvas.text(message, (200, 90), font, (236, 240, 241), center=True)
+        canvas.present()
 
 if __name__ == "__main__":
     os.makedirs("assets/sprites", exist_ok=True)
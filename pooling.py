@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+pooling.py - Reusable enemy Characters and Combats for high-churn simulation
+Servers and simulations start a new fight constantly. Instead of building
+a fresh enemy Character and Combat (with a new log list) every time, the
+pools hand out reset instances from per-template free lists.
+
+Debug mode (debug=True or NIGERIAN_RPG_POOL_DEBUG=1) remembers where every
+outstanding object was acquired, rejects double/foreign releases and can
+report leaks. Run directly for the allocation/GC benchmark:
+
+    python pooling.py [battles]
+"""
+import gc
+import os
+import random
+import sys
+import time
+import traceback
+from character import Character, PERSISTED_FIELDS, create_player
+from combat import Combat, create_enemy_for_level, pick_enemy_template, scale_enemy
+
+DEBUG = os.environ.get("NIGERIAN_RPG_POOL_DEBUG", "") not in ("", "0")
+MAX_FREE = 1024  # free objects kept per template
+
+
+class PoolLeakError(RuntimeError):
+    """Pooled objects were not released, or released incorrectly"""
+
+
+class _Pool:
+    """Free lists keyed by template plus optional debug bookkeeping"""
+
+    def __init__(self, debug=None, max_free=MAX_FREE):
+        self.debug = DEBUG if debug is None else debug
+        self.max_free = max_free
+        self.free = {}
+        self.created = 0
+        self.reused = 0
+        # id(obj) -> (obj, acquire site) while checked out (debug only)
+        self.outstanding = {}
+
+    def _take(self, key):
+        free = self.free.get(key)
+        if free:
+            self.reused += 1
+            return free.pop()
+        self.created += 1
+        return None
+
+    def _checked_out(self, obj):
+        if self.debug:
+            site = "".join(traceback.format_list(traceback.extract_stack(limit=4)[:-2]))
+            self.outstanding[id(obj)] = (obj, site)
+        return obj
+
+    def _put(self, key, obj):
+        if self.debug and self.outstanding.pop(id(obj), None) is None:
+            raise PoolLeakError(f"{obj!r} released twice or not acquired from this pool")
+        free = self.free.setdefault(key, [])
+        if len(free) < self.max_free:
+            free.append(obj)
+
+    def leaks(self) -> list:
+        """Acquire sites of objects still checked out (debug mode only)"""
+        return [site for _, site in self.outstanding.values()]
+
+    def assert_no_leaks(self):
+        leaks = self.leaks()
+        if leaks:
+            raise PoolLeakError(f"{len(leaks)} pooled object(s) never released; first acquired at:\n{leaks[0]}")
+
+    def free_count(self) -> int:
+        return sum(len(free) for free in self.free.values())
+
+
+class EnemyPool(_Pool):
+    """Drop-in for create_enemy_for_level that reuses released enemies"""
+
+    def __init__(self, debug=None, max_free=MAX_FREE):
+        super().__init__(debug, max_free)
+        self._resets = {}  # template name -> attribute values a fresh enemy starts with
+
+    def acquire(self, level: int, difficulty_multiplier: float = 1.0, difficulty: str = None) -> Character:
+        base = pick_enemy_template(level)
+        enemy = self._take(base["name"])
+        scaled_hp, defense = scale_enemy(base, difficulty_multiplier, difficulty)
+        if enemy is None:
+            enemy = Character(name=base["name"], level=base["level"], hp=scaled_hp, max_hp=scaled_hp,
+                              attack=base["atk"], defense=defense, sprite_path=base.get("sprite"))
+            if base["name"] not in self._resets:
+                self._resets[base["name"]] = {f: getattr(enemy, f) for f in PERSISTED_FIELDS
+                                              if f not in ("hp", "max_hp", "defense", "skills")}
+        else:
+            # Back to what create_enemy_for_level builds
+            enemy.reset_as_new(**self._resets[base["name"]], hp=scaled_hp, max_hp=scaled_hp,
+                               defense=defense)
+        return self._checked_out(enemy)
+
+    def release(self, enemy: Character):
+        self._put(enemy.name, enemy)
+
+
+class CombatPool(_Pool):
+    """Reuses Combat objects (and their log lists) via Combat.reset"""
+
+    def acquire(self, player: Character, enemy: Character) -> Combat:
+        combat = self._take(None)
+        if combat is None:
+            combat = Combat(player, enemy)
+        else:
+            combat.reset(player, enemy)
+        return self._checked_out(combat)
+
+    def release(self, combat: Combat):
+        combat.effects.clear()
+        combat.player = combat.enemy = None  # don't keep characters alive from the free list
+        self._put(None, combat)
+
+
+class BattlePool:
+    """Enemy + Combat pools together: one call per fight"""
+
+    def __init__(self, debug=None, max_free=MAX_FREE):
+        self.enemies = EnemyPool(debug, max_free)
+        self.combats = CombatPool(debug, max_free)
+
+    def acquire(self, player: Character, level: int, difficulty_multiplier: float = 1.0,
+                difficulty: str = None) -> Combat:
+        return self.combats.acquire(player, self.enemies.acquire(level, difficulty_multiplier, difficulty))
+
+    def release(self, combat: Combat):
+        self.enemies.release(combat.enemy)
+        self.combats.release(combat)
+
+    def assert_no_leaks(self):
+        self.enemies.assert_no_leaks()
+        self.combats.assert_no_leaks()
+
+
+# ============================================
+# BENCHMARK
+# ============================================
+
+class _GCTimer:
+    """Counts collections and times the pauses via gc.callbacks"""
+
+    def __init__(self):
+        self.pauses = []
+        self._start = None
+
+    def __call__(self, phase, info):
+        if phase == "start":
+            self._start = time.perf_counter()
+        elif self._start is not None:
+            self.pauses.append(time.perf_counter() - self._start)
+            self._start = None
+
+    def __enter__(self):
+        gc.collect()
+        gc.callbacks.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        gc.callbacks.remove(self)
+
+
+def _run_battles(battles, acquire, release, turns=3):
+    player = create_player("Bench", "Soldier")
+    for i in range(battles):
+        combat = acquire(player, i % 3 + 1)
+        for _ in range(turns):
+            combat.player_attack()
+            combat.enemy_turn()
+        player.hp = player.max_hp
+        release(combat)
+
+
+def _blocks_per_acquire(acquire, release, battles=10000) -> float:
+    """Memory blocks one acquire() leaves allocated, on average (measured with sys.getallocatedblocks)"""
+    player = create_player("Probe", "Citizen")
+    total = 0
+    for i in range(battles):
+        before = sys.getallocatedblocks()
+        combat = acquire(player, i % 3 + 1)
+        total += sys.getallocatedblocks() - before
+        release(combat)
+        del combat  # a fresh fight is freed here, before the next measurement
+    return total / battles
+
+
+def benchmark(battles=1000000, turns=3) -> dict:
+    """Fresh objects vs pooled ones: time, allocations and GC pauses"""
+    pool = BattlePool(debug=False)
+    variants = {
+        "fresh": (lambda player, level: Combat(player, create_enemy_for_level(level)), lambda combat: None),
+        "pooled": (pool.acquire, pool.release),
+    }
+    report = {}
+    for name, (acquire, release) in variants.items():
+        random.seed(0)
+        blocks_before = sys.getallocatedblocks()
+        with _GCTimer() as timer:
+            start = time.perf_counter()
+            _run_battles(battles, acquire, release, turns)
+            elapsed = time.perf_counter() - start
+        gen0 = len(timer.pauses)
+        report[name] = {
+            "battles_per_sec": battles / elapsed,
+            # gen0 runs after gc threshold[0] net container allocations
+            "gc_collections": gen0,
+            "gc_pause_total_ms": sum(timer.pauses) * 1000,
+            "gc_pause_max_ms": max(timer.pauses, default=0.0) * 1000,
+            "live_blocks_delta": sys.getallocatedblocks() - blocks_before,
+            "blocks_per_fight": _blocks_per_acquire(acquire, release),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    battles = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+    debug_pool = BattlePool(debug=True)
+    _run_battles(1000, debug_pool.acquire, debug_pool.release)
+    debug_pool.assert_no_leaks()
+    leaked = debug_pool.acquire(create_player("Leaky", "Citizen"), 1)
+    try:
+        debug_pool.assert_no_leaks()
+        raise AssertionError("leak not detected")
+    except PoolLeakError:
+        pass
+    enemy = leaked.enemy
+    debug_pool.release(leaked)
+    try:
+        debug_pool.enemies.release(enemy)
+        raise AssertionError("double release not detected")
+    except PoolLeakError:
+        pass
+    print("✅ debug pool: clean run, leak and double release all detected")
+
+    for name, stats in benchmark(battles).items():
+        print(f"   {name:<7} {stats['battles_per_sec']:>10,.0f} battles/s  "
+              f"{stats['blocks_per_fight']:>6.1f} blocks allocated per fight  "
+              f"{stats['gc_collections']:>5,} GC runs, pauses total {stats['gc_pause_total_ms']:.1f} ms "
+              f"(max {stats['gc_pause_max_ms']:.2f} ms)")
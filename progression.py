@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+progression.py - Closed-form XP curve and level-up tables
+Every level-up multiplies xp_to_next by XP_GROWTH, truncated with int(),
+and adds fixed stat increments. A ProgressionCurve precomputes that chain
+from a given xp_to_next: the threshold after each level-up and the
+cumulative XP needed to gain n levels. A grant of any size then resolves
+with one binary search instead of one loop per level, and questions like
+"how much XP to reach level N" need no replay.
+
+Curves are cached per starting xp_to_next, since loaded characters can
+be anywhere on the chain. Levels stop at MAX_LEVEL; XP still accumulates
+past the cap.
+
+    curve = curve_for(player.xp_to_next)
+    gained = curve.levels_for_xp(player.xp)
+    total_xp_for_level(10)      # from a fresh level-1 character
+
+Run directly to check bit-exactness against the old loop and for a benchmark.
+"""
+import sys
+import time
+from bisect import bisect_right
+from functools import lru_cache
+
+MAX_LEVEL = 99            # level cap
+FIRST_XP_TO_NEXT = 50     # Character.xp_to_next default
+XP_GROWTH = 1.3           # xp_to_next = int(xp_to_next * XP_GROWTH) per level
+HP_PER_LEVEL = 5          # max_hp gained per level (hp is refilled)
+ATTACK_PER_LEVEL = 1
+DEFENSE_PER_LEVEL = 1
+
+
+class ProgressionCurve:
+    """Thresholds and cumulative XP for up to MAX_LEVEL - 1 level-ups from one xp_to_next"""
+
+    __slots__ = ("thresholds", "cumulative")
+
+    def __init__(self, xp_to_next: int = FIRST_XP_TO_NEXT, levels: int = MAX_LEVEL - 1):
+        # thresholds[n]: xp_to_next after n level-ups
+        # cumulative[n]: XP spent on the first n level-ups
+        thresholds, cumulative = [xp_to_next], [0]
+        for _ in range(levels):
+            cumulative.append(cumulative[-1] + thresholds[-1])
+            thresholds.append(int(thresholds[-1] * XP_GROWTH))
+        self.thresholds = tuple(thresholds)
+        self.cumulative = tuple(cumulative)
+
+    def levels_for_xp(self, xp: int, max_levels: int = None) -> int:
+        """How many level-ups xp pays for (binary search), at most max_levels"""
+        gained = bisect_right(self.cumulative, xp) - 1
+        limit = len(self.cumulative) - 1 if max_levels is None else min(max_levels, len(self.cumulative) - 1)
+        return max(0, min(gained, limit))
+
+    def xp_for_levels(self, levels: int) -> int:
+        """XP needed to gain this many levels from the curve's start"""
+        return self.cumulative[levels]
+
+
+@lru_cache(maxsize=64)
+def curve_for(xp_to_next: int) -> ProgressionCurve:
+    """Shared curve starting at this xp_to_next"""
+    return ProgressionCurve(xp_to_next)
+
+
+def stat_gains(levels: int) -> dict:
+    """Stat increases from gaining this many levels"""
+    return {"max_hp": HP_PER_LEVEL * levels, "attack": ATTACK_PER_LEVEL * levels,
+            "defense": DEFENSE_PER_LEVEL * levels}
+
+
+def total_xp_for_level(level: int) -> int:
+    """Total XP a fresh level-1 character needs to reach level"""
+    return curve_for(FIRST_XP_TO_NEXT).xp_for_levels(max(0, min(level, MAX_LEVEL) - 1))
+
+
+def level_for_total_xp(total_xp: int) -> int:
+    """Level a fresh level-1 character reaches with this much total XP"""
+    return 1 + curve_for(FIRST_XP_TO_NEXT).levels_for_xp(total_xp)
+
+
+def _legacy_gain_xp(character, amount):
+    """The old one-level-per-iteration loop (plus the cap), kept as the reference"""
+    character.xp += int(amount)
+    while character.xp >= character.xp_to_next and character.level < MAX_LEVEL:
+        character.xp -= character.xp_to_next
+        character.level += 1
+        character.max_hp += 5
+        character.attack += 1
+        character.defense += 1
+        character.hp = character.max_hp
+        character.xp_to_next = int(character.xp_to_next * 1.3)
+
+
+if __name__ == "__main__":
+    import random
+    from dataclasses import replace
+    from character import create_player
+    random.seed(43)
+
+    for case in range(20000):
+        player = create_player("Check", random.choice(["Citizen", "Soldier", "Police"]))
+        player.level = random.randint(1, 40)
+        player.xp_to_next = random.choice([1, 2, 3, 4, 50, random.randint(5, 10 ** 6)])
+        player.xp = random.randint(0, player.xp_to_next - 1) if player.xp_to_next > 1 else 0
+        for _ in range(3):
+            amount = random.choice([random.randint(0, 200), random.randint(0, 10 ** 7), 10 ** random.randint(1, 15)])
+            reference = replace(player)
+            _legacy_gain_xp(reference, amount)
+            player.gain_xp(amount)
+            assert player == reference, (case, amount, player, reference)
+    assert level_for_total_xp(total_xp_for_level(12)) == 12
+    assert level_for_total_xp(total_xp_for_level(12) - 1) == 11
+    print("✅ 60,000 grants bit-exact with the per-level loop (caps, tiny and huge thresholds)")
+
+    grants = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    amount = total_xp_for_level(60)
+    player = create_player("Bench", "Citizen")
+    rates = []
+    for grant in (_legacy_gain_xp, type(player).gain_xp):
+        start = time.perf_counter()
+        for _ in range(grants):
+            player.level, player.xp, player.xp_to_next = 1, 0, FIRST_XP_TO_NEXT
+            grant(player, amount)
+        rates.append(grants / (time.perf_counter() - start))
+    loop, closed = rates
+    print(f"   level 1 -> 60 in one grant: loop {loop:,.0f}/s, closed form {closed:,.0f}/s "
+          f"({closed / loop:.1f}x)")
@@ -0,0 +1,568 @@
+# -*- coding: utf-8 -*-
+"""
+render.py - Draw interface for the game screens, with two backends
+The battle and menu screens draw through a Canvas instead of blitting onto
+the display surface themselves:
+
+    canvas = open_canvas((960, 600), "Battle")
+    for ev in canvas.events(): ...                   # mouse pos in 960x600 coordinates
+    canvas.clear((26, 26, 48))
+    canvas.image(background, (0, 0))                 # sprites, backgrounds
+    canvas.fill((0, 0, 0, 100))                      # translucent overlay
+    canvas.rect((200, 200, 200), button)             # width=2 for an outline
+    canvas.text("ATTACK", (80, 495), font, (0, 0, 0))
+    canvas.present()
+
+Each screen keeps its own logical size (960x600 battle, 640x700 menu, ...)
+and draws into a render target of that size, cached per size. The window
+is opened once and kept. present() scales the target into it in a single
+pass, keeping the aspect ratio, with black bars around it. Mouse positions
+from events() are mapped back to logical coordinates. Resizing the window or
+going fullscreen (F11, or NIGERIAN_RPG_WINDOW=fullscreen on a kiosk) changes
+one scale, not every element, and never calls set_mode on a screen switch.
+
+Backends:
+    surface   software blits into a logical-size Surface. present() scales it
+              onto pygame.display: a plain blit at 1x, scale() at whole-number
+              factors, smoothscale() otherwise. Translucent fills reuse one
+              cached SRCALPHA surface per size and colour.
+    texture   pygame._sdl2.video Renderer/Texture. It draws into a target
+              texture, and the renderer scales that to the window. Each sprite
+              and background is uploaded once and drawn as a texture. Rendered
+              text is kept as textures in an LRU. Fills and rects are renderer
+              primitives.
+
+Both backends keep rendered text in an LRU, keyed on text, font and colour.
+Pick the backend with NIGERIAN_RPG_RENDERER=surface|texture (default surface).
+NIGERIAN_RPG_RENDER_DRIVER=software forces SDL's software renderer, which
+also works headless (SDL_VIDEODRIVER=dummy). NIGERIAN_RPG_WINDOW=WxH sets
+the window size (default 960x700, which fits every screen at 1x).
+
+Run directly to compare both backends pixel by pixel on a battle-like scene,
+check the mouse mapping, and time frames at several window sizes.
+"""
+import os
+import sys
+import time
+from collections import OrderedDict
+import pygame
+
+RENDERER_ENV = "NIGERIAN_RPG_RENDERER"
+DRIVER_ENV = "NIGERIAN_RPG_RENDER_DRIVER"
+WINDOW_ENV = "NIGERIAN_RPG_WINDOW"
+RENDERER = os.environ.get(RENDERER_ENV, "surface")
+WINDOW_SIZE = (960, 700)    # holds the battle (960x600) and every menu unscaled
+FULLSCREEN = "fullscreen"
+TEXT_CACHE = 512        # rendered strings kept per canvas
+TEXTURE_CACHE = 256     # uploaded images kept by the texture backend
+FILL_CACHE = 32         # translucent fill surfaces kept by the surface backend
+MOUSE_EVENTS = (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION)
+
+
+def window_mode():
+    """The window NIGERIAN_RPG_WINDOW asks for: (w, h) or FULLSCREEN"""
+    value = os.environ.get(WINDOW_ENV, "").strip().lower()
+    if not value:
+        return WINDOW_SIZE
+    if value == FULLSCREEN:
+        return FULLSCREEN
+    try:
+        w, h = (int(n) for n in value.split("x"))
+        if w > 0 and h > 0:
+            return (w, h)
+    except ValueError:
+        pass
+    print(f"⚠️ {WINDOW_ENV}={value!r} is not WxH or {FULLSCREEN}, using {WINDOW_SIZE[0]}x{WINDOW_SIZE[1]}")
+    return WINDOW_SIZE
+
+
+def fit(logical, window) -> pygame.Rect:
+    """Where a logical-size frame goes in the window: as large as fits, centred"""
+    scale = min(window[0] / logical[0], window[1] / logical[1])
+    w, h = max(1, round(logical[0] * scale)), max(1, round(logical[1] * scale))
+    return pygame.Rect((window[0] - w) // 2, (window[1] - h) // 2, w, h)
+
+
+class Canvas:
+    """What a screen draws with. Colours with an alpha below 255 blend.
+    Coordinates are logical: the size the screen asked for, whatever the window."""
+
+    backend = None
+
+    def __init__(self, size, caption=None, window=WINDOW_SIZE):
+        self.size = tuple(size)
+        self.caption = None
+        self.fullscreen = window == FULLSCREEN
+        self.window_size = WINDOW_SIZE if self.fullscreen else tuple(window)  # size when windowed
+        self.viewport = pygame.Rect((0, 0), self.size)
+        self._fitted = None          # (window size, logical size) the viewport fits
+        self._text = OrderedDict()   # (text, id(font), colour) -> (font, drawable, w, h)
+        self.closed = False
+
+    def _cached_text(self, text, font, color):
+        key = (text, id(font), tuple(color))
+        entry = self._text.get(key)
+        if entry is None:
+            surface = font.render(text, True, color)
+            # The font stays referenced, so its id can't be reused while the entry lives
+            entry = self._text[key] = (font, self._text_drawable(surface)) + surface.get_size()
+            if len(self._text) > TEXT_CACHE:
+                self._text.popitem(last=False)
+        else:
+            self._text.move_to_end(key)
+        return entry
+
+    def text(self, text, pos, font, color=(255, 255, 255), center=False) -> pygame.Rect:
+        """Draw a string with its top-left (or top-centre, center=True) at pos; its Rect"""
+        x, y = pos
+        text = str(text)
+        if not text:
+            return pygame.Rect(x, y, 0, 0)
+        _, drawable, w, h = self._cached_text(text, font, color)
+        if center:
+            x -= w // 2
+        self._draw_text(drawable, x, y)
+        return pygame.Rect(x, y, w, h)
+
+    def _fit(self, window):
+        """Refit the viewport if the window or the logical size changed; True if it did"""
+        key = (tuple(window), self.size)
+        if key == self._fitted:
+            return False
+        self._fitted = key
+        self.viewport = fit(self.size, window)
+        return True
+
+    def to_logical(self, pos):
+        """Window pixel -> logical coordinate (outside 0..size on the bars)"""
+        self._fit(self._window_now())
+        vp = self.viewport
+        return ((pos[0] - vp.x) * self.size[0] // vp.w, (pos[1] - vp.y) * self.size[1] // vp.h)
+
+    def to_window(self, pos):
+        """Logical coordinate -> the window pixel at the middle of it"""
+        self._fit(self._window_now())
+        vp = self.viewport
+        return (vp.x + (2 * pos[0] + 1) * vp.w // (2 * self.size[0]),
+                vp.y + (2 * pos[1] + 1) * vp.h // (2 * self.size[1]))
+
+    def events(self) -> list:
+        """pygame.event.get() with mouse positions in logical coordinates.
+        F11 toggles fullscreen and is not passed on."""
+        self._check()
+        events = []
+        for ev in pygame.event.get():
+            if ev.type == pygame.KEYDOWN and ev.key == pygame.K_F11:
+                self.set_fullscreen(not self.fullscreen)
+                continue
+            if ev.type in MOUSE_EVENTS:
+                ev = pygame.event.Event(ev.type, dict(ev.dict, pos=self.to_logical(ev.pos)))
+            events.append(ev)
+        return events
+
+    def mouse_pos(self):
+        return self.to_logical(pygame.mouse.get_pos())
+
+    def resize(self, size, caption=None):
+        """Switch to a screen's logical size (its cached target); the window stays"""
+        self._check()
+        self.size = tuple(size)
+        self._use_target(self.size)
+        if caption and caption != self.caption:
+            self.caption = caption
+            self._set_caption(caption)
+
+    def _check(self):
+        if self.closed:
+            raise pygame.error(f"{self.backend} canvas is closed")
+
+    def close(self):
+        self._text.clear()
+        self.closed = True
+
+    # Backend hooks
+    def _text_drawable(self, surface):
+        raise NotImplementedError
+
+    def _draw_text(self, drawable, x, y):
+        raise NotImplementedError
+
+    def _use_target(self, size):
+        raise NotImplementedError
+
+    def _set_caption(self, caption):
+        raise NotImplementedError
+
+    def _window_now(self):
+        """The window's current size in pixels"""
+        raise NotImplementedError
+
+    def set_fullscreen(self, on: bool):
+        raise NotImplementedError
+
+    def clear(self, color):
+        raise NotImplementedError
+
+    def fill(self, color, rect=None):
+        """Fill rect (default: everything); RGBA colours blend over what is there"""
+        raise NotImplementedError
+
+    def rect(self, color, rect, width=0):
+        """Filled rectangle, or an outline `width` pixels thick inside rect"""
+        raise NotImplementedError
+
+    def image(self, surface, pos):
+        """Draw an image that stays the same between frames (sprite, background)"""
+        raise NotImplementedError
+
+    def present(self):
+        """Scale the frame to the window and show it"""
+        raise NotImplementedError
+
+    def snapshot(self) -> pygame.Surface:
+        """The current logical-size frame, read back as a Surface"""
+        raise NotImplementedError
+
+
+class SurfaceCanvas(Canvas):
+    """Software blits into a logical-size Surface, scaled onto the display"""
+
+    backend = "surface"
+
+    def __init__(self, size, caption=None, window=WINDOW_SIZE):
+        super().__init__(size, caption, window)
+        self._targets = {}            # logical size -> Surface (a handful of screens)
+        self._fills = OrderedDict()   # (w, h, rgba) -> SRCALPHA surface
+        self.surface = None
+        self._open_display()
+        self.resize(size, caption)
+
+    def _open_display(self):
+        if self.fullscreen:
+            pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        else:
+            pygame.display.set_mode(self.window_size, pygame.RESIZABLE)
+        self._fitted = None
+
+    def set_fullscreen(self, on):
+        self._check()
+        if on != self.fullscreen:
+            if not on:
+                self.window_size = WINDOW_SIZE
+            self.fullscreen = on
+            self._open_display()
+
+    def _window_now(self):
+        return pygame.display.get_surface().get_size()
+
+    def _use_target(self, size):
+        target = self._targets.get(size)
+        if target is None:
+            target = self._targets[size] = pygame.Surface(size).convert()
+        self.surface = target
+
+    def _set_caption(self, caption):
+        pygame.display.set_caption(caption)
+
+    def _text_drawable(self, surface):
+        return surface
+
+    def _draw_text(self, drawable, x, y):
+        self.surface.blit(drawable, (x, y))
+
+    def clear(self, color):
+        self._check()
+        self.surface.fill(color)
+
+    def fill(self, color, rect=None):
+        self._check()
+        rect = pygame.Rect(rect) if rect else self.surface.get_rect()
+        if len(color) < 4 or color[3] >= 255:
+            self.surface.fill(color[:3], rect)
+            return
+        key = (rect.w, rect.h, tuple(color))
+        layer = self._fills.get(key)
+        if layer is None:
+            layer = self._fills[key] = pygame.Surface(rect.size, pygame.SRCALPHA)
+            layer.fill(color)
+            if len(self._fills) > FILL_CACHE:
+                self._fills.popitem(last=False)
+        self.surface.blit(layer, rect)
+
+    def rect(self, color, rect, width=0):
+        self._check()
+        pygame.draw.rect(self.surface, color, rect, width)
+
+    def image(self, surface, pos):
+        self._check()
+        self.surface.blit(surface, pos)
+
+    def present(self):
+        self._check()
+        display = pygame.display.get_surface()
+        if self._fit(display.get_size()):
+            display.fill((0, 0, 0))   # the bars; the viewport is redrawn every frame
+        vp = self.viewport
+        if vp.size == self.size:
+            display.blit(self.surface, vp)
+        elif vp.w % self.size[0] == 0 and vp.h % self.size[1] == 0:
+            pygame.transform.scale(self.surface, vp.size, display.subsurface(vp))
+        else:
+            pygame.transform.smoothscale(self.surface, vp.size, display.subsurface(vp))
+        pygame.display.flip()
+
+    def snapshot(self):
+        return self.surface.copy()
+
+    def close(self):
+        super().close()
+        self._fills.clear()
+        self._targets.clear()
+        self.surface = None
+
+
+class TextureCanvas(Canvas):
+    """pygame._sdl2 Renderer: images and text live as textures, fills and rects are primitives"""
+
+    backend = "texture"
+
+    def __init__(self, size, caption=None, window=WINDOW_SIZE):
+        from pygame._sdl2.video import Renderer, Window
+        super().__init__(size, caption, window)
+        os.environ.setdefault("SDL_RENDER_SCALE_QUALITY", "linear")   # for the scaled present
+        self.window = Window(caption or "", size=self.window_size, resizable=True)
+        if self.fullscreen:
+            self.window.set_fullscreen(desktop=True)
+        software = os.environ.get(DRIVER_ENV, "") == "software"
+        self.renderer = Renderer(self.window, accelerated=0 if software else -1)
+        self.renderer.draw_blend_mode = pygame.BLENDMODE_BLEND
+        self._targets = {}               # logical size -> target Texture
+        self._textures = OrderedDict()   # id(surface) -> (surface, texture)
+        self.uploads = 0
+        self.resize(size, caption)
+
+    def set_fullscreen(self, on):
+        self._check()
+        if on != self.fullscreen:
+            self.fullscreen = on
+            if on:
+                self.window.set_fullscreen(desktop=True)
+            else:
+                self.window.set_windowed()
+                self.window.size = self.window_size = WINDOW_SIZE
+
+    def _window_now(self):
+        return self.window.size
+
+    def _use_target(self, size):
+        from pygame._sdl2.video import Texture
+        target = self._targets.get(size)
+        if target is None:
+            target = self._targets[size] = Texture(self.renderer, size, target=True)
+        self.renderer.target = target
+
+    def _set_caption(self, caption):
+        self.window.title = caption
+
+    def _texture(self, surface):
+        from pygame._sdl2.video import Texture
+        self.uploads += 1
+        return Texture.from_surface(self.renderer, surface)
+
+    def _text_drawable(self, surface):
+        return self._texture(surface)
+
+    def _draw_text(self, drawable, x, y):
+        drawable.draw(dstrect=(x, y))
+
+    def clear(self, color):
+        self._check()
+        self.renderer.draw_color = tuple(color[:3]) + (255,)
+        self.renderer.clear()
+
+    def fill(self, color, rect=None):
+        self._check()
+        self.renderer.draw_color = tuple(color) if len(color) == 4 else tuple(color) + (255,)
+        self.renderer.fill_rect(pygame.Rect(rect) if rect else pygame.Rect((0, 0), self.size))
+
+    def rect(self, color, rect, width=0):
+        if width <= 0:
+            self.fill(color, rect)
+            return
+        self._check()
+        self.renderer.draw_color = tuple(color) if len(color) == 4 else tuple(color) + (255,)
+        rect = pygame.Rect(rect)
+        for _ in range(min(width, (min(rect.w, rect.h) + 1) // 2)):
+            self.renderer.draw_rect(rect)
+            rect = rect.inflate(-2, -2)
+
+    def image(self, surface, pos):
+        self._check()
+        key = id(surface)
+        entry = self._textures.get(key)
+        if entry is None:
+            # The surface stays referenced, so its id can't be reused while the entry lives
+            entry = self._textures[key] = (surface, self._texture(surface))
+            if len(self._textures) > TEXTURE_CACHE:
+                self._textures.popitem(last=False)
+        else:
+            self._textures.move_to_end(key)
+        entry[1].draw(dstrect=pos)
+
+    def present(self):
+        self._check()
+        renderer = self.renderer
+        self._fit(self.window.size)
+        target = renderer.target
+        renderer.target = None
+        renderer.draw_color = (0, 0, 0, 255)
+        renderer.clear()
+        target.draw(dstrect=self.viewport)
+        renderer.present()
+        renderer.target = target
+
+    def snapshot(self):
+        return self.renderer.to_surface()
+
+    def close(self):
+        super().close()
+        self._textures.clear()
+        self._targets.clear()
+        self.renderer = None
+        if self.window is not None:
+            self.window.destroy()
+            self.window = None
+
+
+BACKENDS = {"surface": SurfaceCanvas, "texture": TextureCanvas}
+
+_canvas = None
+
+
+def open_canvas(size, caption=None, backend=None, window=None) -> Canvas:
+    """The game's canvas, switched to this logical size. The window is
+    created on first use (backend and window from the environment), then
+    kept for every screen."""
+    global _canvas
+    backend = backend or RENDERER
+    if backend not in BACKENDS:
+        print(f"⚠️ Unknown renderer {backend!r} (one of {sorted(BACKENDS)}), using surface")
+        backend = "surface"
+    if _canvas is not None and not _canvas.closed and _canvas.backend == backend:
+        _canvas.resize(size, caption)
+        return _canvas
+    close_canvas()
+    window = window or window_mode()
+    try:
+        _canvas = BACKENDS[backend](size, caption, window)
+    except (ImportError, pygame.error) as e:
+        if backend == "surface":
+            raise
+        print(f"⚠️ {backend} renderer unavailable ({e}), using surface")
+        _canvas = SurfaceCanvas(size, caption, window)
+    return _canvas
+
+
+def close_canvas():
+    """Release the canvas (call before pygame.quit())"""
+    global _canvas
+    if _canvas is not None and not _canvas.closed:
+        _canvas.close()
+    _canvas = None
+
+
+def _scene(canvas, sprites, font, bigfont, frame=0):
+    """A battle-screen-like frame: background, overlays, panels, sprites, text"""
+    background, hero, foe = sprites
+    canvas.clear((26, 26, 48))
+    canvas.image(background, (0, 0))
+    canvas.fill((0, 0, 0, 100))
+    canvas.fill((20, 20, 40, 180), (0, 0, 960, 120))
+    canvas.text("Player: Ade  Lv 7", (30, 18), bigfont)
+    canvas.rect((120, 10, 10), (30, 58, 250, 20))
+    canvas.rect((20, 200, 20), (30, 58, 180, 20))
+    canvas.rect((255, 255, 255), (30, 58, 250, 20), 2)
+    canvas.text(f"HP {100 - frame % 50}/120", (300, 56), font)
+    canvas.image(hero, (60, 120))
+    for i in range(3):
+        canvas.image(foe, (560 + i * 130, 130 + (i % 2) * 60))
+    canvas.rect((241, 196, 15), (556, 126, 108, 148), 2)
+    canvas.fill((20, 20, 40, 180), (0, 350, 960, 90))
+    for i in range(3):
+        canvas.text(f"Message line {i}", (30, 400 + i * 25), font)
+    for x, label in ((50, "ATTACK"), (230, "DEFEND"), (410, "SPECIAL"), (590, "FLEE")):
+        canvas.rect((200, 200, 200), (x, 480, 160, 56))
+        canvas.text(label, (x + 80, 495), font, (0, 0, 0), center=True)
+    canvas.text(f"Time: 0:{frame % 60:02d}", (30, 545), font, (200, 200, 255))
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault(DRIVER_ENV, "software")
+    pygame.init()
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    font, bigfont = pygame.font.Font(None, 22), pygame.font.Font(None, 32)
+
+    background = pygame.Surface((960, 600))
+    for y in range(600):
+        background.fill((40 + y // 10, 60, 90 - y // 10), (0, y, 960, 1))
+    hero = pygame.Surface((100, 150), pygame.SRCALPHA)
+    pygame.draw.ellipse(hero, (90, 120, 250, 255), hero.get_rect())
+    pygame.draw.ellipse(hero, (250, 250, 250, 120), hero.get_rect().inflate(-40, -60))
+    foe = pygame.Surface((100, 140), pygame.SRCALPHA)
+    pygame.draw.polygon(foe, (230, 80, 60, 230), [(50, 0), (100, 140), (0, 140)])
+    sprites = (background, hero, foe)
+
+    # Screen switches and resizes reuse the window: count set_mode calls
+    set_mode, mode_calls = pygame.display.set_mode, []
+    pygame.display.set_mode = lambda *a, **k: mode_calls.append(a) or set_mode(*a, **k)
+
+    shots, rates = {}, {}
+    windows = {"1x 960x600": (960, 600), "2x 1920x1200": (1920, 1200), "4K 3840x2160": (3840, 2160)}
+    for backend in ("surface", "texture"):
+        mode_calls.clear()
+        canvas = open_canvas((960, 600), "render check", backend, window=(960, 700))
+        assert canvas.backend == backend, f"{backend} backend unavailable"
+        _scene(canvas, sprites, font, bigfont)
+        shots[backend] = canvas.snapshot()
+        canvas.present()
+
+        # A 960x600 battle in the 960x700 window: 50 px bars, clicks mapped back
+        assert canvas.viewport == pygame.Rect(0, 50, 960, 600), canvas.viewport
+        pygame.event.clear()
+        pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=(130, 558)))
+        clicks = [ev.pos for ev in canvas.events() if ev.type == pygame.MOUSEBUTTONDOWN]
+        assert clicks == [(130, 508)], clicks
+        for size in ((640, 700), (700, 650), (400, 200), (960, 600)):
+            open_canvas(size, "menu", backend)
+            for point in ((0, 0), (size[0] // 2, size[1] // 3), (size[0] - 1, size[1] - 1)):
+                assert canvas.to_logical(canvas.to_window(point)) == point, (size, point)
+            assert canvas.to_logical(canvas.viewport.topleft) == (0, 0)
+            canvas.present()
+        assert len(canvas._targets) == 4 and len(mode_calls) <= 1, (len(canvas._targets), mode_calls)
+
+        rates[backend] = {}
+        for label, window in windows.items():
+            if backend == "surface":
+                set_mode(window, pygame.RESIZABLE)   # what a window resize hands us
+            else:
+                canvas.window.size = window
+            start = time.perf_counter()
+            for frame in range(frames):
+                _scene(canvas, sprites, font, bigfont, frame)
+                canvas.present()
+            rates[backend][label] = frames / (time.perf_counter() - start)
+            assert canvas.viewport == fit((960, 600), window)
+        if backend == "texture":
+            uploads = canvas.uploads
+        close_canvas()
+
+    a, b = (pygame.surfarray.pixels3d(shots[k]).astype("int16") for k in ("surface", "texture"))
+    diff = abs(a - b)
+    assert diff.mean() < 1.0 and (diff.max(axis=2) > 8).mean() < 0.001, (diff.mean(), diff.max())
+    print(f"✅ Surface and texture backends draw the same frame (mean difference {diff.mean():.3f}/255)")
+    print("✅ One window for every screen; clicks map back to logical coordinates through the bars")
+    for label in windows:
+        surface, texture = rates["surface"][label], rates["texture"][label]
+        print(f"   {label:<13} surface {surface:>6,.0f} FPS, texture {texture:>6,.0f} FPS")
+    print(f"   {frames * len(windows)} frames per backend, {uploads} texture uploads")
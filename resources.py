@@ -46,7 +46,14 @@ class AssetManager:
             path = os.path.join(ASSETS_DIR, filename)
         
         try:
-            img = pygame.image.load(path).convert_alpha()
+            img = pygame.image.load(path)
+            if pygame.display.get_surface() is not None:
+                img = img.convert_alpha()
+            else:
+                # The texture renderer has no display surface to convert to
+                rgba = pygame.Surface(img.get_size(), pygame.SRCALPHA, 32)
+                rgba.blit(img, (0, 0))
+                img = rgba
             if scale != 1.0:
                 w, h = img.get_size()
                 img = pygame.transform.smoothscale(img, (int(w*scale), int(h*scale)))
@@ -54,6 +61,8 @@ class AssetManager:
             print(f"✅ Loaded image: {filename}")
             return img
         except Exception as e:
+            # Remember the miss so a missing file isn't retried (and warned about) every stage
+            self.image_cache[cache_key] = None
             print(f"⚠️  Could not load image {filename}: {e}")
             return None
     
@@ -73,6 +82,7 @@ class AssetManager:
             print(f"✅ Loaded sound: {filename}")
             return sound
         except Exception as e:
+            self.sound_cache[filename] = None
             print(f"⚠️  Could not load sound {filename}: {e}")
             return None
     
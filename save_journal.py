@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+save_journal.py - Append-only autosave journal for Nigerian RPG
+Small binary records (one per changed stat) are appended on every
+meaningful change and fsynced in batches. SaveSystem checkpoints the
+full row into the characters table and replays the journal tail on load.
+"""
+import os
+import struct
+import time
+import zlib
+
+# Stats worth journaling, with their on-disk field ids
+JOURNAL_FIELDS = {
+    "hp": 1,
+    "max_hp": 2,
+    "xp": 3,
+    "xp_to_next": 4,
+    "level": 5,
+    "attack": 6,
+    "defense": 7,
+    "damage_dealt": 8,
+    "current_level": 9,  # stage, kept by SaveSystem rather than Character
+}
+FIELD_NAMES = {fid: name for name, fid in JOURNAL_FIELDS.items()}
+
+# magic, field id, name length, value  (+ name bytes + crc32)
+RECORD_HEADER = struct.Struct("<BBHq")
+RECORD_CRC = struct.Struct("<I")
+RECORD_MAGIC = 0xA5
+
+FSYNC_INTERVAL = 0.25  # seconds - upper bound on progress lost in a crash
+
+
+class SaveJournal:
+    """Append-only journal of per-stat deltas"""
+
+    def __init__(self, path, fsync_interval=FSYNC_INTERVAL):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.file = open(path, "ab")
+        self.buffer = bytearray()
+        self.last_sync = time.monotonic()
+        self.records_written = 0
+        self.syncs = 0
+        # name -> {field: value} as last journaled (or checkpointed)
+        self._last = {}
+        # players with records that have not been checkpointed yet
+        self._pending = set(self._scan_names())
+
+    @staticmethod
+    def encode(name: str, field: str, value: int) -> bytes:
+        """Encode one record"""
+        name_bytes = name.encode("utf-8")
+        body = RECORD_HEADER.pack(RECORD_MAGIC, JOURNAL_FIELDS[field], len(name_bytes), int(value)) + name_bytes
+        return body + RECORD_CRC.pack(zlib.crc32(body))
+
+    @staticmethod
+    def iter_records(data: bytes):
+        """Yield (name, field, value) until the end or the first torn/corrupt record"""
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(data):
+            magic, field_id, name_len, value = RECORD_HEADER.unpack_from(data, offset)
+            end = offset + RECORD_HEADER.size + name_len
+            if magic != RECORD_MAGIC or field_id not in FIELD_NAMES or end + RECORD_CRC.size > len(data):
+                return
+            (crc,) = RECORD_CRC.unpack_from(data, end)
+            if crc != zlib.crc32(data[offset:end]):
+                return
+            name = data[offset + RECORD_HEADER.size:end].decode("utf-8")
+            yield name, FIELD_NAMES[field_id], value
+            offset = end + RECORD_CRC.size
+
+    def _read_all(self) -> bytes:
+        try:
+            with open(self.path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return b""
+
+    def _scan_names(self):
+        return {name for name, _, _ in self.iter_records(self._read_all())}
+
+    def record(self, player, current_level: int) -> int:
+        """Append a record for every journaled stat that changed; returns how many"""
+        last = self._last.setdefault(player.name, {})
+        count = 0
+        for field in JOURNAL_FIELDS:
+            value = current_level if field == "current_level" else getattr(player, field)
+            if last.get(field) != value:
+                last[field] = value
+                self.buffer += self.encode(player.name, field, value)
+                count += 1
+        if count:
+            self._pending.add(player.name)
+            self.records_written += count
+        self.maybe_sync()
+        return count
+
+    def maybe_sync(self):
+        """fsync buffered records once FSYNC_INTERVAL has passed since the last sync"""
+        if self.buffer and time.monotonic() - self.last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        """Write and fsync everything buffered"""
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.buffer.clear()
+            self.syncs += 1
+        self.last_sync = time.monotonic()
+
+    def replay(self, name: str) -> dict:
+        """Latest journaled value of each stat for a player"""
+        self.sync()
+        values = {}
+        for rec_name, field, value in self.iter_records(self._read_all()):
+            if rec_name == name:
+                values[field] = value
+        return values
+
+    def checkpointed(self, player, current_level: int):
+        """Called after the full row is in the database - trims the journal"""
+        self._last[player.name] = {
+            field: current_level if field == "current_level" else getattr(player, field)
+            for field in JOURNAL_FIELDS
+        }
+        self._drop(player.name)
+
+    def forget(self, name: str):
+        """Drop a deleted player's records, so none replay onto a new save with the same name"""
+        self._last.pop(name, None)
+        self._drop(name)
+
+    def _drop(self, name: str):
+        """Remove a player's records from the buffer and the file"""
+        self._pending.discard(name)
+        self.buffer = bytearray(
+            b"".join(self.encode(n, f, v) for n, f, v in self.iter_records(bytes(self.buffer)) if n != name)
+        )
+        if not self._pending:
+            # Everything is in the database - start a fresh journal
+            self.buffer.clear()
+            self.file.truncate(0)
+            self.file.seek(0)
+            self.last_sync = time.monotonic()
+        elif name in self._scan_names():
+            # Other players still have records - rewrite without this one
+            self.sync()
+            kept = b"".join(self.encode(n, f, v) for n, f, v in self.iter_records(self._read_all())
+                            if n != name)
+            self.file.truncate(0)
+            self.file.seek(0)
+            self.file.write(kept)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def size(self) -> int:
+        return os.path.getsize(self.path) + len(self.buffer)
+
+    def close(self):
+        self.sync()
+        self.file.close()
@@ -0,0 +1,496 @@
+# -*- coding: utf-8 -*-
+"""
+save_service.py - Local save/leaderboard service shared by many game clients
+One process owns nigerian_rpg.db and serves every game instance on the
+box over a Unix domain socket, so the instances no longer fight over
+SQLite locks. Writes from all clients are group-committed: whatever is
+queued when the writer wakes up goes into one shared transaction, with
+each request in its own savepoint so a failing one leaves no partial writes.
+
+    python save_service.py serve [--db nigerian_rpg.db] [--socket PATH]
+    python save_service.py loadgen [--clients 16] [--seconds 5]
+
+Games switch over by setting NIGERIAN_RPG_SAVE_SOCKET (see main.py);
+SaveServiceClient is a drop-in replacement for SaveSystem.
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from character import Character, PERSISTED_FIELDS
+from save_system import GameSettings, SETTINGS_DEBOUNCE, SaveSystem
+
+DEFAULT_SOCKET = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or "/tmp", "nigerian_rpg_save.sock")
+SOCKET_ENV = "NIGERIAN_RPG_SAVE_SOCKET"
+
+# Frame: payload length, opcode, request id, then a compact JSON payload
+FRAME_HEADER = struct.Struct("<IBI")
+MAX_FRAME = 16 * 1024 * 1024
+
+# Opcodes
+OP_OK = 0
+OP_ERROR = 1
+OP_SAVE_CHARACTER = 10
+OP_SAVE_COMBAT_RESULT = 11
+OP_SAVE_TO_LEADERBOARD = 12
+OP_STORE_SETTINGS = 13
+OP_DELETE_SAVE = 14
+OP_TRIM_COMBAT_HISTORY = 15
+OP_LOAD_CHARACTER = 20
+OP_GET_ALL_SAVES = 21
+OP_GET_COMBAT_HISTORY = 22
+OP_GET_LEADERBOARD = 23
+OP_GET_BEST_TIME = 24
+OP_GET_SETTINGS = 25
+OP_GET_WIN_RATE = 26
+
+WRITE_OPS = {OP_SAVE_CHARACTER, OP_SAVE_COMBAT_RESULT, OP_SAVE_TO_LEADERBOARD,
+             OP_STORE_SETTINGS, OP_DELETE_SAVE, OP_TRIM_COMBAT_HISTORY}
+LEADERBOARDS = ("fastest", "damage", "enemies")
+
+
+def _encode(value) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def send_frame(sock, opcode, request_id, payload=None):
+    body = _encode(payload)
+    sock.sendall(FRAME_HEADER.pack(len(body), opcode, request_id) + body)
+
+
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("save service connection closed")
+        data += chunk
+    return bytes(data)
+
+
+def recv_frame(sock):
+    """Read one frame - returns (opcode, request_id, payload)"""
+    length, opcode, request_id = FRAME_HEADER.unpack(_recv_exact(sock, FRAME_HEADER.size))
+    if length > MAX_FRAME:
+        raise ConnectionError(f"frame too large ({length} bytes)")
+    return opcode, request_id, json.loads(_recv_exact(sock, length))
+
+
+def character_to_wire(player: Character) -> dict:
+    data = {field: getattr(player, field) for field in PERSISTED_FIELDS}
+    data["name"] = player.name
+    return data
+
+
+def character_from_wire(data: dict) -> Character:
+    return Character(**data)
+
+
+def _error(e) -> str:
+    return f"{type(e).__name__}: {e}"
+
+
+# ============================================
+# SERVER
+# ============================================
+
+class _Connection:
+    def __init__(self, sock):
+        self.sock = sock
+        self.send_lock = threading.Lock()
+
+    def reply(self, request_id, ok, payload):
+        with self.send_lock:
+            try:
+                send_frame(self.sock, OP_OK if ok else OP_ERROR, request_id, payload)
+            except OSError:
+                pass  # client went away; nothing to tell it
+
+
+class SaveService:
+    """Owns one SaveSystem and serves it to many clients"""
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, save_system=None, max_batch=256):
+        self.socket_path = socket_path
+        self.saves = save_system if save_system is not None else SaveSystem()
+        self.max_batch = max_batch
+        self.writes = queue.Queue()
+        self.running = False
+        self.server = None
+        self.batches = 0
+        self.batched_writes = 0
+        self._threads = []
+
+    def start(self):
+        """Bind the socket and start the accept and writer threads"""
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.socket_path)
+        self.server.listen(128)
+        self.running = True
+        for target in (self._accept_loop, self._writer_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"💾 Save service listening on {self.socket_path}")
+        return self
+
+    def serve_forever(self):
+        self.start()
+        try:
+            while self.running:
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.running = False
+        self.writes.put(None)
+        if self.server:
+            self.server.close()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self.saves.close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                sock, _ = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._client_loop, args=(_Connection(sock),), daemon=True).start()
+
+    def _client_loop(self, conn):
+        try:
+            while self.running:
+                opcode, request_id, payload = recv_frame(conn.sock)
+                if opcode in WRITE_OPS:
+                    self.writes.put((conn, opcode, request_id, payload))
+                else:
+                    # Reads use the pool's per-thread read-only connection
+                    self._answer(conn, opcode, request_id, payload)
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            conn.sock.close()
+
+    def _writer_loop(self):
+        """Group commit: everything queued when we wake shares one transaction"""
+        while True:
+            first = self.writes.get()
+            if first is None:
+                return
+            batch = [first]
+            while len(batch) < self.max_batch:
+                try:
+                    item = self.writes.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.running = False
+                    break
+                batch.append(item)
+
+            replies = []
+            try:
+                with self.saves.backend.transaction():
+                    for conn, opcode, request_id, payload in batch:
+                        try:
+                            # Nested transaction = savepoint: a failure undoes this request only
+                            with self.saves.backend.transaction():
+                                result = self._execute(opcode, payload)
+                            replies.append((conn, request_id, True, result))
+                        except Exception as e:
+                            replies.append((conn, request_id, False, _error(e)))
+            except Exception as e:
+                # The whole batch rolled back, so nothing cached from it can be trusted
+                self.saves.discard_cached_state()
+                replies = [(conn, request_id, False, _error(e)) for conn, _, request_id, _ in batch]
+            self.batches += 1
+            self.batched_writes += len(batch)
+            for conn, request_id, ok, result in replies:
+                conn.reply(request_id, ok, result)
+
+    def _answer(self, conn, opcode, request_id, payload):
+        ok, result = self._dispatch(opcode, payload)
+        conn.reply(request_id, ok, result)
+
+    def _dispatch(self, opcode, payload):
+        """Run one request against the SaveSystem - returns (ok, result)"""
+        try:
+            return True, self._execute(opcode, payload)
+        except Exception as e:
+            return False, _error(e)
+
+    def _execute(self, opcode, payload):
+        """Run one request against the SaveSystem - returns its result or raises"""
+        saves = self.saves
+        if opcode == OP_SAVE_CHARACTER:
+            player = character_from_wire(payload["player"])
+            player.mark_clean()
+            player.mark_dirty(*payload["dirty"])
+            return saves.save_character(player, payload["current_level"])
+        if opcode == OP_LOAD_CHARACTER:
+            player, current_level = saves.load_character(payload["name"])
+            return [character_to_wire(player) if player else None, current_level]
+        if opcode == OP_SAVE_COMBAT_RESULT:
+            # Each client plays at its own difficulty
+            return saves.save_combat_result(**payload)
+        if opcode == OP_SAVE_TO_LEADERBOARD:
+            return saves.save_to_leaderboard(**payload)
+        if opcode == OP_STORE_SETTINGS:
+            saves.settings.update(payload)
+            return saves.flush_settings(force=True)
+        if opcode == OP_DELETE_SAVE:
+            return saves.delete_save(payload["name"])
+        if opcode == OP_TRIM_COMBAT_HISTORY:
+            return saves.trim_combat_history(payload["player_name"], payload["keep"])
+        if opcode == OP_GET_ALL_SAVES:
+            return saves.get_all_saves()
+        if opcode == OP_GET_COMBAT_HISTORY:
+            return saves.get_combat_history(payload["player_name"], payload["limit"])
+        if opcode == OP_GET_LEADERBOARD:
+            method = getattr(saves, f"get_leaderboard_{LEADERBOARDS[payload['kind']]}")
+            return method(payload["limit"])
+        if opcode == OP_GET_BEST_TIME:
+            best = saves.get_player_best_time(payload["player_name"])
+            return None if best == float("inf") else best
+        if opcode == OP_GET_SETTINGS:
+            return saves.settings.to_dict()
+        if opcode == OP_GET_WIN_RATE:
+            return saves.get_win_rate(payload["dimension"], payload["key"])
+        raise ValueError(f"unknown opcode {opcode}")
+
+
+# ============================================
+# CLIENT
+# ============================================
+
+class SaveServiceError(Exception):
+    """The save service rejected a request"""
+
+
+class SaveServiceClient:
+    """SaveSystem-compatible proxy that talks to a SaveService"""
+
+    journal = None  # the service owns durability
+
+    def __init__(self, socket_path=DEFAULT_SOCKET):
+        self.socket_path = socket_path
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(socket_path)
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._saved_levels = {}
+        self.settings = GameSettings(**self._call(OP_GET_SETTINGS))
+        self._settings_changed_at = None
+        self.settings.subscribe(self._on_setting_changed)
+
+    def _call(self, opcode, payload=None):
+        with self._lock:
+            self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+            send_frame(self.sock, opcode, self._next_id, payload)
+            status, request_id, result = recv_frame(self.sock)
+        if request_id != self._next_id:
+            raise SaveServiceError(f"out-of-order reply {request_id} (expected {self._next_id})")
+        if status != OP_OK:
+            raise SaveServiceError(result)
+        return result
+
+    # ---- characters ----
+    def save_character(self, player: Character, current_level: int) -> bool:
+        """Send the character if anything changed (clean saves cost no I/O)"""
+        if self._saved_levels.get(player.name) == current_level and not player.is_dirty():
+            return False
+        dirty = sorted(player.dirty_fields()) if player.name in self._saved_levels else sorted(PERSISTED_FIELDS)
+        written = self._call(OP_SAVE_CHARACTER, {"player": character_to_wire(player),
+                                                 "dirty": dirty, "current_level": current_level})
+        player.mark_clean()
+        self._saved_levels[player.name] = current_level
+        return written
+
+    def record_progress(self, player: Character, current_level: int) -> int:
+        return 0
+
+    def load_character(self, name: str) -> tuple:
+        data, current_level = self._call(OP_LOAD_CHARACTER, {"name": name})
+        if data is None:
+            return None, None
+        player = character_from_wire(data)
+        player.mark_clean()
+        self._saved_levels[name] = current_level
+        return player, current_level
+
+    def get_all_saves(self) -> list:
+        return [tuple(row) for row in self._call(OP_GET_ALL_SAVES)]
+
+    def delete_save(self, name: str):
+        self._call(OP_DELETE_SAVE, {"name": name})
+        self._saved_levels.pop(name, None)
+
+    # ---- combat history ----
+    def save_combat_result(self, player_name: str, enemy_name: str, level: int, result: str,
+                           difficulty: str = None):
+        self._call(OP_SAVE_COMBAT_RESULT, {"player_name": player_name, "enemy_name": enemy_name,
+                                           "level": level, "result": result,
+                                           "difficulty": difficulty or self.settings.difficulty})
+
+    def get_combat_history(self, player_name: str, limit: int = 10) -> list:
+        return [tuple(row) for row in self._call(OP_GET_COMBAT_HISTORY,
+                                                 {"player_name": player_name, "limit": limit})]
+
+    def trim_combat_history(self, player_name: str, keep: int) -> int:
+        return self._call(OP_TRIM_COMBAT_HISTORY, {"player_name": player_name, "keep": keep})
+
+    # ---- settings (same in-memory model as SaveSystem) ----
+    def _on_setting_changed(self, key, old, new):
+        self._settings_changed_at = time.monotonic()
+
+    def load_settings(self) -> GameSettings:
+        return self.settings
+
+    def save_settings(self, settings):
+        if settings is not self.settings:
+            self.settings.update(dict(settings))
+        self.flush_settings()
+
+    def flush_settings(self, force: bool = False) -> bool:
+        if self._settings_changed_at is None:
+            return False
+        if not force and time.monotonic() - self._settings_changed_at < SETTINGS_DEBOUNCE:
+            return False
+        self._call(OP_STORE_SETTINGS, self.settings.to_dict())
+        self._settings_changed_at = None
+        return True
+
+    def get_setting(self, key: str):
+        return self.settings.get(key)
+
+    def toggle_setting(self, key: str):
+        if key in self.settings and isinstance(self.settings[key], bool):
+            self.settings[key] = not self.settings[key]
+            self.flush_settings()
+            return self.settings[key]
+        return None
+
+    # ---- leaderboard / analytics ----
+    def save_to_leaderboard(self, player_name: str, completion_time: float,
+                            total_damage: int, enemies_defeated: int, difficulty: str = None):
+        self._call(OP_SAVE_TO_LEADERBOARD, {"player_name": player_name, "completion_time": completion_time,
+                                            "total_damage": total_damage, "enemies_defeated": enemies_defeated,
+                                            "difficulty": difficulty or self.settings.difficulty})
+
+    def _leaderboard(self, kind, limit):
+        return [tuple(row) for row in self._call(OP_GET_LEADERBOARD, {"kind": LEADERBOARDS.index(kind),
+                                                                      "limit": limit})]
+
+    def get_leaderboard_fastest(self, limit: int = 10) -> list:
+        return self._leaderboard("fastest", limit)
+
+    def get_leaderboard_damage(self, limit: int = 10) -> list:
+        return self._leaderboard("damage", limit)
+
+    def get_leaderboard_enemies(self, limit: int = 10) -> list:
+        return self._leaderboard("enemies", limit)
+
+    def get_player_best_time(self, player_name: str) -> float:
+        best = self._call(OP_GET_BEST_TIME, {"player_name": player_name})
+        return best if best else float("inf")
+
+    def get_win_rate(self, dimension: str, key) -> float:
+        return self._call(OP_GET_WIN_RATE, {"dimension": dimension, "key": key})
+
+    def close(self):
+        try:
+            self.flush_settings(force=True)
+        finally:
+            self.sock.close()
+
+
+# ============================================
+# LOAD GENERATOR
+# ============================================
+
+def run_load(socket_path=DEFAULT_SOCKET, clients=16, seconds=5.0) -> dict:
+    """Simulate many game instances autosaving and fighting at once"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def game(index):
+        client = SaveServiceClient(socket_path)
+        player = Character(name=f"Load{index}", level=1, hp=100, max_hp=100, attack=5, defense=2)
+        local = []
+        try:
+            i = 0
+            while time.monotonic() < stop:
+                start = time.perf_counter()
+                player.take_damage(1) if player.hp > 1 else player.heal(100)
+                client.save_character(player, 1 + i % 3)
+                if i % 3 == 0:
+                    client.save_combat_result(player.name, "Bandit", 1, "Victory")
+                if i % 10 == 0:
+                    client.get_leaderboard_fastest()
+                    client.load_character(player.name)
+                if i % 50 == 0:
+                    client.save_to_leaderboard(player.name, 100.0 + i, i, 3)
+                local.append(time.perf_counter() - start)
+                i += 1
+        except Exception as e:
+            with lock:
+                errors.append(repr(e))
+        finally:
+            client.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=game, args=(i,)) for i in range(clients)]
+    began = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - began
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0.0
+    return {"clients": clients, "iterations": len(latencies), "iterations_per_sec": len(latencies) / elapsed,
+            "p50_ms": pick(0.50), "p99_ms": pick(0.99), "errors": errors}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Nigerian RPG save service")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve")
+    serve.add_argument("--db", default="nigerian_rpg.db")
+    serve.add_argument("--socket", default=DEFAULT_SOCKET)
+    load = sub.add_parser("loadgen")
+    load.add_argument("--socket", default=None, help="existing service (default: start a temporary one)")
+    load.add_argument("--clients", type=int, default=16)
+    load.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        SaveService(args.socket, SaveSystem(args.db)).serve_forever()
+    else:
+        service = None
+        if args.socket is None:
+            import tempfile
+            tmp = tempfile.mkdtemp()
+            service = SaveService(os.path.join(tmp, "save.sock"), SaveSystem(os.path.join(tmp, "load.db"))).start()
+        stats = run_load(args.socket or service.socket_path, args.clients, args.seconds)
+        print(f"✅ {stats['clients']} clients: {stats['iterations_per_sec']:,.0f} game iterations/s, "
+              f"p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms, {len(stats['errors'])} errors")
+        if service:
+            print(f"   {service.batched_writes} writes in {service.batches} transactions "
+                  f"({service.batched_writes / max(1, service.batches):.1f} per commit)")
+            service.stop()
@@ -1,216 +1,295 @@
 # save_system.py
-import sqlite3
 import json
+from dataclasses import dataclass, field, fields
+from analytics import CombatAggregates, combat_deltas, rebuild, run_deltas
 from character import Character
+from save_journal import SaveJournal
+from storage import CHARACTER_COLUMNS, LEADERBOARD_COLUMNS, SQLiteBackend
 from datetime import datetime
 import time
 
+# Settings writes are coalesced: a burst of clicks in the settings menu
+# becomes one UPDATE once the values have been quiet for this long.
+SETTINGS_DEBOUNCE = 0.5  # seconds
+
+@dataclass
+class GameSettings:
+    """In-memory game settings with change notifications.
+
+    Reading a setting is a plain attribute access (no I/O). Assigning one
+    notifies every subscriber with (key, old_value, new_value).
+    Dict-style access (settings['difficulty']) is kept for older callers.
+    """
+    sound_enabled: bool = True
+    music_enabled: bool = True
+    screen_effects: bool = True
+    difficulty: str = 'Normal'
+    _subscribers: list = field(default_factory=list, init=False, repr=False, compare=False)
+
+    def __setattr__(self, key, value):
+        if key.startswith('_'):
+            object.__setattr__(self, key, value)
+            return
+        # Coerce to the declared type so SQLite ints come back as bools
+        value = str(value) if key == 'difficulty' else bool(value)
+        old = self.__dict__.get(key)
+        object.__setattr__(self, key, value)
+        if old is not None and old != value:
+            for callback in list(self.__dict__.get('_subscribers', ())):
+                callback(key, old, value)
+
+    def subscribe(self, callback):
+        """Register callback(key, old, new); returns an unsubscribe function"""
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback) if callback in self._subscribers else None
+
+    def keys(self):
+        return [f.name for f in fields(self) if not f.name.startswith('_')]
+
+    def to_dict(self) -> dict:
+        return {key: getattr(self, key) for key in self.keys()}
+
+    def update(self, values: dict):
+        for key, value in values.items():
+            if key in self.keys():
+                setattr(self, key, value)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.keys() else default
+
+    def __getitem__(self, key):
+        if key not in self.keys():
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.keys():
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.keys()
+
 class SaveSystem:
-    def __init__(self, db_name='nigerian_rpg.db'):
-        self.conn = sqlite3.connect(db_name)
-        self.cursor = self.conn.cursor()
-        self.init_database()
-        self.settings = self.load_settings()
-    
-    def init_database(self):
-        """Initialize database tables"""
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS characters (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                char_class TEXT NOT NULL,
-                level INTEGER DEFAULT 1,
-                hp INTEGER,
-                max_hp INTEGER,
-                attack INTEGER,
-                defense INTEGER,
-                weapon TEXT,
-                xp INTEGER DEFAULT 0,
-                xp_to_next INTEGER DEFAULT 50,
-                current_level INTEGER DEFAULT 1,
-                damage_dealt INTEGER DEFAULT 0,
-                sprite_path TEXT,
-                skills TEXT,
-                last_saved DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS combat_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                player_name TEXT,
-                enemy_name TEXT,
-                level INTEGER,
-                result TEXT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # NEW: Settings table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS settings (
-                id INTEGER PRIMARY KEY CHECK (id = 1),
-                sound_enabled INTEGER DEFAULT 1,
-                music_enabled INTEGER DEFAULT 1,
-                screen_effects INTEGER DEFAULT 1,
-                difficulty TEXT DEFAULT 'Normal'
-            )
-        ''')
-        
-        # NEW: Leaderboard table
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS leaderboard (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                player_name TEXT NOT NULL,
-                completion_time REAL,
-                total_damage INTEGER,
-                enemies_defeated INTEGER,
-                run_date DATETIME DEFAULT CURRENT_TIMESTAMP,
-                difficulty TEXT DEFAULT 'Normal'
-            )
-        ''')
-        
-        # Initialize default settings if not exists
-        self.cursor.execute('SELECT id FROM settings WHERE id = 1')
-        if not self.cursor.fetchone():
-            self.cursor.execute('''
-                INSERT INTO settings (id, sound_enabled, music_enabled, screen_effects, difficulty)
-                VALUES (1, 1, 1, 1, 'Normal')
-            ''')
-        
-        self.conn.commit()
+    def __init__(self, db_name='nigerian_rpg.db', journal: bool = False, backend=None):
+        """
+        Args:
+            db_name: SQLite file used when no backend is given
+            journal: keep an append-only progress journal next to db_name
+            backend: a storage.StorageBackend (SQLite, memory, sharded...)
+        """
+        self.backend = backend if backend is not None else SQLiteBackend(db_name)
+        self.settings = GameSettings(**self.backend.load_settings())
+        # name -> current_level as last written/read, so clean saves can be skipped
+        self._saved_levels = {}
+        # Optional append-only journal between full-row checkpoints
+        self.journal = SaveJournal(db_name + '.savelog') if journal and db_name != ':memory:' else None
+        self._settings_changed_at = None
+        self.settings.subscribe(self._on_setting_changed)
+        # player name -> char_class, for the per-class analytics
+        self._char_classes = {}
+        self.stats = CombatAggregates(self.backend.load_aggregates())
+        if not self.stats.rows and (next(self.backend.iter_table('combat_history'), None) or
+                                    next(self.backend.iter_table('leaderboard'), None)):
+            # History from before aggregates existed
+            self.rebuild_aggregates()
     
-    def save_character(self, player: Character, current_level: int):
-        """Save or update character"""
-        self.cursor.execute('SELECT id FROM characters WHERE name = ?', (player.name,))
-        existing = self.cursor.fetchone()
+    def save_character(self, player: Character, current_level: int) -> bool:
+        """Save or update character - only dirty columns are written.
+
+        Returns False when nothing changed since the last save/load.
+        """
+        known_level = self._saved_levels.get(player.name)
+        dirty = player.dirty_fields()
+        if known_level == current_level and not dirty:
+            return False
         
-        skills_json = json.dumps(player.skills)
+        if known_level is None:
+            existing = self.backend.character_exists(player.name)
+            if existing:
+                # Row written by an earlier session - we can't trust it to match
+                dirty = set(CHARACTER_COLUMNS)
+        else:
+            existing = True
         
         if existing:
-            self.cursor.execute('''
-                UPDATE characters 
-                SET char_class=?, level=?, hp=?, max_hp=?, attack=?, defense=?,
-                    weapon=?, xp=?, xp_to_next=?, current_level=?, damage_dealt=?,
-                    sprite_path=?, skills=?, last_saved=?
-                WHERE name=?
-            ''', (player.char_class, player.level, player.hp, player.max_hp,
-                  player.attack, player.defense, player.weapon, player.xp,
-                  player.xp_to_next, current_level, player.damage_dealt,
-                  player.sprite_path, skills_json, datetime.now(), player.name))
+            changes = {col: player.skills_json() if col == 'skills' else getattr(player, col)
+                       for col in CHARACTER_COLUMNS if col in dirty}
+            changes['current_level'] = current_level
+            changes['last_saved'] = str(datetime.now())
+            self.backend.update_character(player.name, changes)
         else:
-            self.cursor.execute('''
-                INSERT INTO characters 
-                (name, char_class, level, hp, max_hp, attack, defense, weapon,
-                 xp, xp_to_next, current_level, damage_dealt, sprite_path, skills)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (player.name, player.char_class, player.level, player.hp,
-                  player.max_hp, player.attack, player.defense, player.weapon,
-                  player.xp, player.xp_to_next, current_level, player.damage_dealt,
-                  player.sprite_path, skills_json))
+            row = {col: getattr(player, col) for col in CHARACTER_COLUMNS}
+            row['name'] = player.name
+            row['skills'] = player.skills_json()
+            row['current_level'] = current_level
+            self.backend.insert_character(row)
         
-        self.conn.commit()
+        player.mark_clean()
+        self._saved_levels[player.name] = current_level
+        self._char_classes[player.name] = player.char_class
+        if self.journal:
+            self.journal.checkpointed(player, current_level)
         return True
     
+    def record_progress(self, player: Character, current_level: int) -> int:
+        """Journal changed stats (cheap enough to call every frame).
+
+        No-op unless the save system was opened with journal=True; the
+        periodic save_character call acts as the checkpoint.
+        """
+        if not self.journal:
+            return 0
+        return self.journal.record(player, current_level)
+    
     def load_character(self, name: str) -> tuple:
         """Load character by name - returns (Character, current_level)"""
-        self.cursor.execute('SELECT * FROM characters WHERE name = ?', (name,))
-        char = self.cursor.fetchone()
+        char = self.backend.load_character_row(name)
         
         if not char:
             return None, None
         
-        _, name, char_class, level, hp, max_hp, attack, defense, weapon, xp, xp_to_next, current_level, damage_dealt, sprite_path, skills_json, _ = char
-        
+        skills_json = char['skills']
         skills = json.loads(skills_json) if skills_json else {}
+        current_level = char['current_level']
         
         player = Character(
-            name=name,
-            level=level,
-            hp=hp,
-            max_hp=max_hp,
-            attack=attack,
-            defense=defense,
-            char_class=char_class,
-            weapon=weapon,
-            xp=xp,
-            xp_to_next=xp_to_next,
-            sprite_path=sprite_path,
+            name=char['name'],
+            level=char['level'],
+            hp=char['hp'],
+            max_hp=char['max_hp'],
+            attack=char['attack'],
+            defense=char['defense'],
+            char_class=char['char_class'],
+            weapon=char['weapon'],
+            xp=char['xp'],
+            xp_to_next=char['xp_to_next'],
+            sprite_path=char['sprite_path'],
             skills=skills,
-            damage_dealt=damage_dealt
+            damage_dealt=char['damage_dealt']
         )
+        player.mark_clean()
+        self._saved_levels[name] = current_level
+        self._char_classes[name] = player.char_class
+        
+        # Replay progress journaled after the last checkpoint
+        if self.journal:
+            for field, value in self.journal.replay(name).items():
+                if field == 'current_level':
+                    current_level = value
+                else:
+                    setattr(player, field, value)
         
         return player, current_level
     
     def get_all_saves(self) -> list:
         """Get all saved characters"""
-        self.cursor.execute('''
-            SELECT name, char_class, level, weapon, current_level, last_saved 
-            FROM characters 
-            ORDER BY last_saved DESC 
-            LIMIT 10
-        ''')
-        return self.cursor.fetchall()
+        return self.backend.list_saves(10)
     
-    def save_combat_result(self, player_name: str, enemy_name: str, level: int, result: str):
-        """Save combat history"""
-        self.cursor.execute('''
-            INSERT INTO combat_history (player_name, enemy_name, level, result)
-            VALUES (?, ?, ?, ?)
-        ''', (player_name, enemy_name, level, result))
-        self.conn.commit()
+    def save_combat_result(self, player_name: str, enemy_name: str, level: int, result: str,
+                           difficulty: str = None):
+        """Save combat history (and update the analytics aggregates)"""
+        difficulty = difficulty or self.settings.difficulty
+        deltas = combat_deltas(enemy_name, level, result, self._class_of(player_name), difficulty)
+        with self.backend.transaction():
+            self.backend.add_combat_result(player_name, enemy_name, level, result, difficulty)
+            self.backend.add_aggregates([agg.as_tuple() for agg in deltas])
+        # Only once the write has committed
+        self.stats.merge(deltas)
     
     def get_combat_history(self, player_name: str, limit: int = 10) -> list:
         """Get combat history for player"""
-        self.cursor.execute('''
-            SELECT enemy_name, level, result, timestamp 
-            FROM combat_history 
-            WHERE player_name = ? 
-            ORDER BY timestamp DESC 
-            LIMIT ?
-        ''', (player_name, limit))
-        return self.cursor.fetchall()
+        return self.backend.combat_history(player_name, limit)
+    
+    def trim_combat_history(self, player_name: str, keep: int) -> int:
+        """Keep only a player's newest `keep` combat results; returns how many
+        were deleted. The analytics already counted them, but a later
+        rebuild_aggregates() only sees what is left."""
+        return self.backend.trim_combat_history(player_name, keep)
+    
+    # ============================================
+    # ANALYTICS
+    # ============================================
+    
+    def _class_of(self, player_name: str):
+        """Character class for a player name (cached)"""
+        if player_name not in self._char_classes:
+            row = self.backend.load_character_row(player_name)
+            self._char_classes[player_name] = row['char_class'] if row else None
+        return self._char_classes[player_name]
+    
+    def rebuild_aggregates(self) -> CombatAggregates:
+        """Recompute the analytics from the raw tables (e.g. after deletes or imports)"""
+        self.stats = rebuild(self.backend)
+        self.backend.store_aggregates(self.stats.as_rows(), replace=True)
+        return self.stats
+    
+    def discard_cached_state(self):
+        """Forget what was cached from the database (e.g. after a rolled-back transaction)"""
+        self._saved_levels.clear()
+        self._char_classes.clear()
+        self.stats = CombatAggregates(self.backend.load_aggregates())
+    
+    def get_win_rate(self, dimension: str, key) -> float:
+        """Win rate for an enemy / level / class / difficulty - O(1), no query"""
+        return self.stats.win_rate(dimension, key)
     
     def delete_save(self, name: str):
-        """Delete a save file"""
-        self.cursor.execute('DELETE FROM characters WHERE name = ?', (name,))
-        self.cursor.execute('DELETE FROM combat_history WHERE player_name = ?', (name,))
-        self.conn.commit()
+        """Delete a save file and take its remaining combat history out of the analytics.
+
+        Results already trimmed away stay counted. Leaderboard runs survive the
+        delete, but drop out of the class they were counted under (its
+        min/max times are left as they were).
+        """
+        char_class = self._class_of(name)
+        with self.backend.transaction():
+            deltas = [agg for row in self.backend.player_rows('combat_history', name)
+                      for agg in combat_deltas(row['enemy_name'], row['level'], row['result'],
+                                               char_class, row['difficulty'], sign=-1)]
+            if char_class is not None:
+                deltas += [agg for row in self.backend.player_rows('leaderboard', name)
+                           for agg in run_deltas(row['completion_time'], row['total_damage'],
+                                                 row['enemies_defeated'], char_class,
+                                                 sign=-1, dimensions=('class',))]
+            self.backend.delete_character(name)
+            self.backend.add_aggregates([agg.as_tuple() for agg in deltas])
+        self.stats.merge(deltas)
+        self._saved_levels.pop(name, None)
+        self._char_classes.pop(name, None)
+        if self.journal:
+            self.journal.forget(name)
     
     # ============================================
     # NEW: SETTINGS METHODS
     # ============================================
     
-    def load_settings(self) -> dict:
-        """Load game settings"""
-        self.cursor.execute('SELECT * FROM settings WHERE id = 1')
-        row = self.cursor.fetchone()
-        if row:
-            return {
-                'sound_enabled': bool(row[1]),
-                'music_enabled': bool(row[2]),
-                'screen_effects': bool(row[3]),
-                'difficulty': row[4]
-            }
-        return {
-            'sound_enabled': True,
-            'music_enabled': True,
-            'screen_effects': True,
-            'difficulty': 'Normal'
-        }
-    
-    def save_settings(self, settings: dict):
-        """Save game settings"""
-        self.cursor.execute('''
-            UPDATE settings 
-            SET sound_enabled=?, music_enabled=?, screen_effects=?, difficulty=?
-            WHERE id=1
-        ''', (int(settings['sound_enabled']), 
-              int(settings['music_enabled']),
-              int(settings['screen_effects']),
-              settings['difficulty']))
-        self.conn.commit()
-        self.settings = settings
+    def _on_setting_changed(self, key, old, new):
+        """Settings subscriber - schedule a debounced write"""
+        self._settings_changed_at = time.monotonic()
+
+    def load_settings(self) -> GameSettings:
+        """Get game settings (served from memory, no database query)"""
+        return self.settings
+
+    def save_settings(self, settings):
+        """Apply settings; the database write is debounced (see flush_settings)"""
+        if settings is not self.settings:
+            self.settings.update(dict(settings))
+        self.flush_settings()
+
+    def flush_settings(self, force: bool = False) -> bool:
+        """Write pending settings once they have been quiet for SETTINGS_DEBOUNCE.
+
+        Call this once per frame from menu loops; force=True writes immediately.
+        Returns True if a write happened.
+        """
+        if self._settings_changed_at is None:
+            return False
+        if not force and time.monotonic() - self._settings_changed_at < SETTINGS_DEBOUNCE:
+            return False
+        self.backend.store_settings(self.settings.to_dict())
+        self._settings_changed_at = None
+        return True
     
     def get_setting(self, key: str):
         """Get specific setting value"""
@@ -220,7 +299,7 @@ class SaveSystem:
         """Toggle a boolean setting"""
         if key in self.settings and isinstance(self.settings[key], bool):
             self.settings[key] = not self.settings[key]
-            self.save_settings(self.settings)
+            self.flush_settings()
             return self.settings[key]
         return None
     
@@ -229,54 +308,46 @@ class SaveSystem:
     # ============================================
     
     def save_to_leaderboard(self, player_name: str, completion_time: float, 
-                           total_damage: int, enemies_defeated: int):
+                           total_damage: int, enemies_defeated: int, difficulty: str = None):
         """Save a completed run to leaderboard"""
-        difficulty = self.settings.get('difficulty', 'Normal')
-        self.cursor.execute('''
-            INSERT INTO leaderboard 
-            (player_name, completion_time, total_damage, enemies_defeated, difficulty)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (player_name, completion_time, total_damage, enemies_defeated, difficulty))
-        self.conn.commit()
+        difficulty = difficulty or self.settings.difficulty
+        deltas = run_deltas(completion_time, total_damage, enemies_defeated,
+                            self._class_of(player_name), difficulty)
+        with self.backend.transaction():
+            self.backend.add_leaderboard_entry(player_name, completion_time, total_damage,
+                                               enemies_defeated, difficulty)
+            self.backend.add_aggregates([agg.as_tuple() for agg in deltas])
+        self.stats.merge(deltas)
+    
+    def _leaderboard(self, order_by: str, descending: bool, columns: tuple, limit: int) -> list:
+        """Top leaderboard entries projected onto the requested columns"""
+        idx = [LEADERBOARD_COLUMNS.index(col) for col in columns]
+        return [tuple(entry[i] for i in idx)
+                for entry in self.backend.leaderboard(order_by, descending, limit)]
     
     def get_leaderboard_fastest(self, limit: int = 10) -> list:
         """Get top fastest completion times"""
-        self.cursor.execute('''
-            SELECT player_name, completion_time, enemies_defeated, difficulty, run_date
-            FROM leaderboard 
-            ORDER BY completion_time ASC 
-            LIMIT ?
-        ''', (limit,))
-        return self.cursor.fetchall()
+        return self._leaderboard('completion_time', False, (
+            'player_name', 'completion_time', 'enemies_defeated', 'difficulty', 'run_date'), limit)
     
     def get_leaderboard_damage(self, limit: int = 10) -> list:
         """Get top damage dealers"""
-        self.cursor.execute('''
-            SELECT player_name, total_damage, completion_time, difficulty, run_date
-            FROM leaderboard 
-            ORDER BY total_damage DESC 
-            LIMIT ?
-        ''', (limit,))
-        return self.cursor.fetchall()
+        return self._leaderboard('total_damage', True, (
+            'player_name', 'total_damage', 'completion_time', 'difficulty', 'run_date'), limit)
     
     def get_leaderboard_enemies(self, limit: int = 10) -> list:
         """Get most enemies defeated"""
-        self.cursor.execute('''
-            SELECT player_name, enemies_defeated, completion_time, difficulty, run_date
-            FROM leaderboard 
-            ORDER BY enemies_defeated DESC 
-            LIMIT ?
-        ''', (limit,))
-        return self.cursor.fetchall()
+        return self._leaderboard('enemies_defeated', True, (
+            'player_name', 'enemies_defeated', 'completion_time', 'difficulty', 'run_date'), limit)
     
     def get_player_best_time(self, player_name: str) -> float:
         """Get player's best completion time"""
-        self.cursor.execute('''
-            SELECT MIN(completion_time) FROM leaderboard WHERE player_name = ?
-        ''', (player_name,))
-        result = self.cursor.fetchone()
-        return result[0] if result and result[0] else float('inf')
+        result = self.backend.best_time(player_name)
+        return result if result else float('inf')
     
     def close(self):
         """Close database connection"""
-        self.conn.close()
+        self.flush_settings(force=True)
+        if self.journal:
+            self.journal.close()
+        self.backend.close()
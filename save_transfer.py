@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+save_transfer.py - Streaming export/import of saves, combat history and leaderboard
+Moves player data between machines as JSONL or CSV in constant memory:
+rows are streamed from the backend with generators, written back with
+executemany in chunked transactions, and both directions keep a
+checkpoint file so an interrupted transfer resumes where it stopped.
+
+    python save_transfer.py export nigerian_rpg.db backup/ --format jsonl
+    python save_transfer.py import backup/ new.db
+    python save_transfer.py verify nigerian_rpg.db new.db
+"""
+import argparse
+import csv
+import io
+import json
+import os
+from save_system import SaveSystem
+from storage import SQLiteBackend, TABLE_COLUMNS
+
+CHUNK_SIZE = 5000  # rows per transaction / checkpoint
+FORMATS = ("jsonl", "csv")
+
+# CSV stores everything as text - convert back on import
+INT_COLUMNS = {"level", "hp", "max_hp", "attack", "defense", "xp", "xp_to_next",
+               "damage_dealt", "current_level", "total_damage", "enemies_defeated"}
+FLOAT_COLUMNS = {"completion_time"}
+
+
+def _checkpoint_path(path):
+    return path + ".checkpoint"
+
+
+def _read_checkpoint(path):
+    try:
+        with open(_checkpoint_path(path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_checkpoint(path, state):
+    tmp = _checkpoint_path(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, _checkpoint_path(path))
+
+
+def _clear_checkpoint(path):
+    try:
+        os.remove(_checkpoint_path(path))
+    except FileNotFoundError:
+        pass
+
+
+def _format_for(path, fmt):
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown transfer format: {fmt!r} (expected one of {FORMATS})")
+    return fmt
+
+
+def _csv_line(values) -> str:
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerow(values)
+    return buf.getvalue()
+
+
+def _typed(column, value):
+    if value == "" or value is None:
+        return None
+    if column in INT_COLUMNS:
+        return int(value)
+    if column in FLOAT_COLUMNS:
+        return float(value)
+    return value
+
+
+# ============================================
+# EXPORT
+# ============================================
+
+def export_table(backend, table, path, fmt=None, chunk_size=CHUNK_SIZE, resume=True) -> int:
+    """Stream one table to a JSONL/CSV file; returns rows written by this call"""
+    fmt = _format_for(path, fmt)
+    columns = TABLE_COLUMNS[table]
+    state = _read_checkpoint(path) if resume else None
+    if state and state.get("table") == table and os.path.exists(path):
+        # Drop anything written after the last checkpoint, then carry on
+        with open(path, "r+b") as f:
+            f.truncate(state["offset"])
+        after, total = state["key"], state["rows"]
+    else:
+        after, total = None, 0
+        with open(path, "wb") as f:
+            if fmt == "csv":
+                f.write(_csv_line(columns).encode("utf-8"))
+
+    written = 0
+    with open(path, "ab") as f:
+        key = after
+        for key, row in backend.iter_table(table, after, chunk_size):
+            if fmt == "jsonl":
+                line = json.dumps(row, ensure_ascii=False) + "\n"
+            else:
+                line = _csv_line(["" if row[col] is None else row[col] for col in columns])
+            f.write(line.encode("utf-8"))
+            written += 1
+            if written % chunk_size == 0:
+                f.flush()
+                _write_checkpoint(path, {"table": table, "key": key, "rows": total + written,
+                                         "offset": f.tell()})
+    _clear_checkpoint(path)
+    return written
+
+
+def export_all(backend, directory, fmt="jsonl", chunk_size=CHUNK_SIZE) -> dict:
+    """Export every table into directory/<table>.<fmt>"""
+    os.makedirs(directory, exist_ok=True)
+    return {table: export_table(backend, table, os.path.join(directory, f"{table}.{fmt}"), fmt, chunk_size)
+            for table in TABLE_COLUMNS}
+
+
+# ============================================
+# IMPORT
+# ============================================
+
+def _lines(f, position):
+    """Yield raw lines, updating position[0] to the byte offset after each"""
+    for line in f:
+        position[0] += len(line)
+        yield line
+
+
+def read_rows(path, table, fmt=None, offset=0):
+    """Generator of (offset_after_row, row_dict) from a transfer file"""
+    fmt = _format_for(path, fmt)
+    columns = TABLE_COLUMNS[table]
+    with open(path, "rb") as f:
+        if fmt == "jsonl":
+            f.seek(offset)
+            position = [offset]
+            for line in _lines(f, position):
+                if line.strip():
+                    data = json.loads(line)
+                    yield position[0], {col: data.get(col) for col in columns}
+        else:
+            header = next(csv.reader([f.readline().decode("utf-8")]))
+            f.seek(max(offset, f.tell()))
+            position = [f.tell()]
+            text = (line.decode("utf-8") for line in _lines(f, position))
+            for values in csv.reader(text):
+                data = dict(zip(header, values))
+                yield position[0], {col: _typed(col, data.get(col)) for col in columns}
+
+
+def import_table(backend, table, path, fmt=None, chunk_size=CHUNK_SIZE, resume=True) -> int:
+    """Stream a JSONL/CSV file into a table; returns rows imported by this call"""
+    state = _read_checkpoint(path) if resume else None
+    offset = state["offset"] if state and state.get("table") == table else 0
+    total = state["rows"] if offset else 0
+
+    imported = 0
+    batch = []
+    for position, row in read_rows(path, table, fmt, offset):
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            backend.insert_rows(table, batch)
+            imported += len(batch)
+            batch = []
+            _write_checkpoint(path, {"table": table, "offset": position, "rows": total + imported})
+    if batch:
+        backend.insert_rows(table, batch)
+        imported += len(batch)
+    _clear_checkpoint(path)
+    return imported
+
+
+def import_all(backend, directory, fmt="jsonl", chunk_size=CHUNK_SIZE) -> dict:
+    """Import every directory/<table>.<fmt> file that exists"""
+    counts = {}
+    for table in TABLE_COLUMNS:
+        path = os.path.join(directory, f"{table}.{fmt}")
+        if os.path.exists(path):
+            counts[table] = import_table(backend, table, path, fmt, chunk_size)
+    return counts
+
+
+# ============================================
+# VERIFICATION
+# ============================================
+
+def verify_roundtrip(source_backend, target_backend) -> int:
+    """Check every exported character loads identically on both sides.
+
+    Goes through SaveSystem.load_character so the check covers exactly what
+    the game will see. Returns the number of characters compared.
+    """
+    source = SaveSystem(backend=source_backend)
+    target = SaveSystem(backend=target_backend)
+    checked = 0
+    for _, row in source_backend.iter_table("characters"):
+        expected = source.load_character(row["name"])
+        actual = target.load_character(row["name"])
+        if expected != actual:
+            raise ValueError(f"Round trip mismatch for {row['name']}: {expected} != {actual}")
+        checked += 1
+    return checked
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export/import Nigerian RPG save data")
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help="database -> directory of JSONL/CSV files")
+    exp.add_argument("db")
+    exp.add_argument("directory")
+    imp = sub.add_parser("import", help="directory of JSONL/CSV files -> database")
+    imp.add_argument("directory")
+    imp.add_argument("db")
+    for p in (exp, imp):
+        p.add_argument("--format", choices=FORMATS, default="jsonl")
+        p.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    ver = sub.add_parser("verify", help="compare characters between two databases")
+    ver.add_argument("source_db")
+    ver.add_argument("target_db")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        backend = SQLiteBackend(args.db)
+        counts = export_all(backend, args.directory, args.format, args.chunk_size)
+    elif args.command == "import":
+        backend = SQLiteBackend(args.db)
+        counts = import_all(backend, args.directory, args.format, args.chunk_size)
+    else:
+        source, backend = SQLiteBackend(args.source_db), SQLiteBackend(args.target_db)
+        counts = {"characters verified": verify_roundtrip(source, backend)}
+        source.close()
+    backend.close()
+    for table, count in counts.items():
+        print(f"✅ {table}: {count} rows")
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+skills.py - Skill compiler for Character.use_skill
+Skills are stored as plain dicts because they round-trip through
+SaveSystem as JSON, e.g. {"power": 8, "type": "damage", "mult": 1.5}.
+compile_skill validates a definition once and turns it into an immutable
+CompiledSkill whose apply function has the numbers prebound. A use is
+then one call, with no dict lookups and no comparisons on the type string.
+
+Compiled skills are cached by definition, so every Soldier's "Military
+Strike" shares one object. Each Character keeps a name -> CompiledSkill
+table, filled as each skill is first used, so a malformed definition only
+fails its own uses. The table is dropped when its skills change, at the
+same points that reset skills_json. Only the fields a type uses are
+validated.
+
+Types:
+    damage  attack * mult + power - target defense (at least 1)
+    heal    power + level * scale, on the user
+    buff    a status effect (status_effects.py) for `turns` turns. Beneficial
+            kinds land on the user, others on the target. Needs the fight's
+            StatusEngine: {"type": "buff", "effect": "regen", "power": 4, "turns": 3}
+Any other type compiles to a skill that does nothing, as before.
+
+    python skills.py [uses]     # equivalence check + use_skill benchmark
+"""
+import json
+import sys
+import time
+from collections import namedtuple
+from functools import lru_cache
+from status_effects import BENEFICIAL, EFFECT_RULES, REGEN
+
+DAMAGE, HEAL, BUFF = "damage", "heal", "buff"
+
+CompiledSkill = namedtuple("CompiledSkill", "kind power mult scale effect turns apply")
+
+
+def _number(definition, key, default):
+    value = definition.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"skill {definition!r}: {key} must be a number, not {value!r}")
+    return value
+
+
+def _damage(mult, power):
+    def apply(user, name, target, effects=None):
+        dmg = max(1, int(user.attack * mult + power - target.get_defense()))
+        target.take_damage(dmg)
+        user.damage_dealt += dmg
+        return f"{user.name} used {name} for {dmg} damage!", dmg
+    return apply
+
+
+def _heal(power, scale):
+    def apply(user, name, target, effects=None):
+        heal_amt = int(power + user.level * scale)
+        user.heal(heal_amt)
+        return f"{user.name} used {name} and healed {heal_amt} HP!", heal_amt
+    return apply
+
+
+def _buff(effect, power, turns):
+    on_user = effect in BENEFICIAL
+
+    def apply(user, name, target, effects=None):
+        if effects is None:
+            return f"{user.name} used {name} but nothing happened.", 0
+        applied = effects.apply(user if on_user else target, effect, power, turns)
+        if not applied:
+            return f"{user.name} used {name} but nothing happened.", 0
+        return f"{user.name} used {name}!\n{applied}", power
+    return apply
+
+
+def _nothing(user, name, target, effects=None):
+    return f"{user.name} used {name} but nothing happened.", 0
+
+
+@lru_cache(maxsize=1024)
+def _compile(key: str) -> CompiledSkill:
+    definition = json.loads(key)
+    if not isinstance(definition, dict):
+        raise ValueError(f"skill definition must be a dict, not {definition!r}")
+    kind = definition.get("type", DAMAGE)
+    if kind == DAMAGE:
+        power, mult = _number(definition, "power", 0), _number(definition, "mult", 1.0)
+        return CompiledSkill(kind, power, mult, 0, None, 0, _damage(mult, power))
+    if kind == HEAL:
+        power, scale = _number(definition, "power", 0), _number(definition, "scale", 0)
+        return CompiledSkill(kind, power, 1.0, scale, None, 0, _heal(power, scale))
+    if kind == BUFF:
+        power = _number(definition, "power", 0)
+        effect = definition.get("effect", REGEN)
+        if effect not in EFFECT_RULES:
+            raise ValueError(f"skill {definition!r}: unknown effect {effect!r} (one of {sorted(EFFECT_RULES)})")
+        turns = definition.get("turns", 3)
+        if isinstance(turns, bool) or not isinstance(turns, int) or turns < 1:
+            raise ValueError(f"skill {definition!r}: turns must be a positive whole number")
+        return CompiledSkill(kind, power, 1.0, 0, effect, turns, _buff(effect, int(power), turns))
+    return CompiledSkill(kind, 0, 1.0, 0, None, 0, _nothing)
+
+
+def compile_skill(definition: dict) -> CompiledSkill:
+    """Validated, shared CompiledSkill for one definition (ValueError if malformed)"""
+    return _compile(json.dumps(definition, sort_keys=True))
+
+
+def _legacy_use_skill(self, skill_name, target):
+    """The old dict-walking use_skill, kept as the reference"""
+    if skill_name not in self.skills:
+        return f"{self.name} tried to use {skill_name} but doesn't know it.", 0
+
+    skill = self.skills[skill_name]
+    typ = skill.get("type", "damage")
+    power = skill.get("power", 0)
+
+    if typ == "damage":
+        dmg = max(1, int(self.attack * skill.get("mult", 1.0) + power - target.get_defense()))
+        target.take_damage(dmg)
+        self.damage_dealt += dmg
+        return f"{self.name} used {skill_name} for {dmg} damage!", dmg
+    elif typ == "heal":
+        heal_amt = int(power + self.level * skill.get("scale", 0))
+        self.heal(heal_amt)
+        return f"{self.name} used {skill_name} and healed {heal_amt} HP!", heal_amt
+    else:
+        return f"{self.name} used {skill_name} but nothing happened.", 0
+
+
+if __name__ == "__main__":
+    import random
+    from dataclasses import replace
+    from character import create_player
+    from combat import create_enemy_for_level
+    random.seed(46)
+
+    definitions = [
+        {"power": 8, "type": "damage", "mult": 1.5},
+        {"power": 6, "type": "damage", "mult": 1.3},
+        {"type": "damage"},
+        {"power": 12, "type": "heal", "scale": 1.5},
+        {"power": 3, "type": "heal"},
+        {"power": 1, "type": "dance"},
+    ]
+    for case in range(5000):
+        user = create_player("Check", random.choice(["Citizen", "Soldier", "Police"]))
+        user.level, user.attack = random.randint(1, 40), random.randint(1, 60)
+        user.hp = random.randint(1, user.max_hp)
+        user.skills = {f"S{i}": dict(random.choice(definitions), power=random.randint(0, 30))
+                       for i in range(3)}
+        target = create_enemy_for_level(random.randint(1, 3))
+        name = random.choice(list(user.skills) + ["Unknown"])
+        ref_user, ref_target = replace(user), replace(target)
+        ref_user.skills = user.skills
+        assert user.use_skill(name, target) == _legacy_use_skill(ref_user, name, ref_target), case
+        assert (user, target) == (ref_user, ref_target), case
+    soldiers = [create_player(f"P{i}", "Soldier") for i in range(3)]
+    compiled = [s.use_skill("Military Strike", create_enemy_for_level(1)) and s._compiled_skills for s in soldiers]
+    assert compiled[0]["Military Strike"] is compiled[1]["Military Strike"] is compiled[2]["Military Strike"]
+    for bad in ({"type": "damage", "power": "8"}, {"type": "buff", "effect": "fireball"},
+                {"type": "buff", "turns": 0}):
+        try:
+            compile_skill(bad)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{bad} compiled")
+    # A broken definition fails only its own uses; unused fields aren't checked
+    user = create_player("Check", "Soldier")
+    user.skills["Shuffle"] = {"type": "dance", "power": "lots", "mult": None}
+    user.skills["Bad Aid"] = {"type": "heal", "power": "8"}
+    user.skills["Patch"] = {"type": "heal", "power": 3, "mult": "unused"}
+    target = create_enemy_for_level(1)
+    assert user.use_skill("Shuffle", target)[1] == 0
+    assert user.use_skill("Military Strike", target)[1] > 0
+    assert user.use_skill("Patch", target)[1] == 3
+    try:
+        user.use_skill("Bad Aid", target)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Bad Aid compiled")
+    assert user.use_skill("Military Strike", target)[1] > 0
+    print("✅ 5,000 uses identical to the dict-walking use_skill; compiled skills shared; "
+          "bad definitions rejected, each on its own")
+
+    uses = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    user = create_player("Bench", "Soldier")
+    user.skills["First Aid"] = {"power": 5, "type": "heal", "scale": 0.5}
+    target = create_enemy_for_level(1)
+    names = ["Military Strike", "First Aid"] * (uses // 2)
+    rates = []
+    for use in (_legacy_use_skill, type(user).use_skill):
+        target.hp = target.max_hp = 10 ** 12
+        start = time.perf_counter()
+        for name in names:
+            use(user, name, target)
+        rates.append(len(names) / (time.perf_counter() - start))
+    legacy, compiled = rates
+    print(f"   use_skill: dict-walking {legacy:,.0f}/s, compiled {compiled:,.0f}/s ({compiled / legacy:.2f}x)")
@@ -0,0 +1,542 @@
+# -*- coding: utf-8 -*-
+"""
+status_effects.py - Bleed, stun, defense break and regen, expired by a timer wheel
+Specials apply effects that last a number of turns (see SPECIAL_EFFECTS).
+Each kind has a stacking rule:
+
+- STACK: independent instances up to a cap. At the cap the oldest is replaced.
+- REFRESH: one instance. Reapplying extends it to the later expiry.
+- STRONGEST: one instance. A stronger (or equal but longer) one replaces it.
+
+Each character keeps running totals of its live effects in a StatusState:
+bleed and regen per turn, defense lost, and stun count. Totals change only
+when an effect is applied or expires, so a turn's bleed/regen is one
+add per affected character, whatever the number of stacks.
+
+Expiry goes through a hierarchical timer wheel (Varghese & Lauck). It has
+WHEEL_LEVELS rings of 2**WHEEL_BITS slots; each ring covers 64x the span of
+the one below. An effect is filed by its expiry turn. Turning the wheel
+pops one level-0 slot and, every 64 turns, cascades one slot down from the
+ring above. The cost per turn is the number of effects expiring, not the
+number alive. Replaced effects are only flagged dead and are skipped when
+their slot comes up.
+
+Combat owns a StatusEngine and ticks it at the top of the player's turn.
+Snapshots (combat_snapshot.py) keep the wheel turn and each character's
+effects_of(); restore() rebuilds the engine from them. The models that play
+fights out without an engine (combat_env, hint_engine, enemy_ai) carry a
+turns-left summary instead: see summarize(), tick_summary() and
+apply_to_summary().
+
+    engine = StatusEngine()
+    engine.apply(enemy, BLEED, power=3, turns=3)
+    lines = engine.advance()      # one turn: bleed/regen, then expiries
+
+Run directly for checks and a benchmark with thousands of live effects.
+"""
+import random
+import sys
+import time
+
+BLEED, STUN, DEFENSE_BREAK, REGEN = "bleed", "stun", "defense_break", "regen"
+STACK, REFRESH, STRONGEST = "stack", "refresh", "strongest"
+
+# kind: (stacking rule, max live instances per character)
+EFFECT_RULES = {
+    BLEED: (STACK, 5),
+    REGEN: (STACK, 3),
+    STUN: (REFRESH, 1),
+    DEFENSE_BREAK: (STRONGEST, 1),
+}
+# Kinds that land on whoever used the special rather than the target
+BENEFICIAL = frozenset({REGEN})
+
+# What each special ability applies on top of its 2x damage: (kind, power, turns)
+SPECIAL_EFFECTS = {
+    "BENIN RAMPAGE": (BLEED, 3, 3),
+    "LAGOS ATTACK": (DEFENSE_BREAK, 2, 3),
+    "BARAWO BARAGE": (BLEED, 2, 4),
+    "OGUN STRIKE": (DEFENSE_BREAK, 3, 2),
+    "SANGO FATAL": (STUN, 0, 1),
+    "AMADIOHA SPAWN": (REGEN, 4, 3),
+    "BARRAGE": (BLEED, 2, 3),
+    "AK47 FIESTA": (STUN, 0, 1),
+    "MK 419 BARRAGE": (DEFENSE_BREAK, 4, 3),
+}
+
+WHEEL_BITS = 6            # 64 slots per ring
+WHEEL_LEVELS = 4          # 64**4 turns before the top ring wraps
+
+
+class Effect:
+    __slots__ = ("kind", "power", "expires", "target", "active")
+
+    def __init__(self, kind, power, expires, target):
+        self.kind = kind
+        self.power = power
+        self.expires = expires
+        self.target = target
+        self.active = True
+
+    def __repr__(self):
+        return f"Effect({self.kind}, power={self.power}, expires={self.expires}, active={self.active})"
+
+
+class StatusState:
+    """Totals of one character's live effects (Character.status)"""
+    __slots__ = ("bleed", "regen", "defense_break", "stun", "live")
+
+    def __init__(self):
+        self.bleed = self.regen = self.defense_break = self.stun = 0
+        self.live = {}   # kind -> [Effect], oldest first
+
+    def __repr__(self):
+        return (f"StatusState(bleed={self.bleed}, regen={self.regen}, "
+                f"defense_break={self.defense_break}, stun={self.stun})")
+
+
+class TimerWheel:
+    """Hierarchical timing wheel over integer turns"""
+
+    def __init__(self, bits=WHEEL_BITS, levels=WHEEL_LEVELS):
+        self.bits = bits
+        self.size = 1 << bits
+        self.mask = self.size - 1
+        self.levels = levels
+        self.now = 0
+        self._rings = [[[] for _ in range(self.size)] for _ in range(levels)]
+        self.cascaded = 0
+        self.filed = 0   # items currently in the rings
+
+    def schedule(self, due: int, item):
+        """File item to come out of advance() at turn due (> now)"""
+        if due <= self.now:
+            raise ValueError(f"due turn {due} is not after now ({self.now})")
+        # The ring is the highest digit where due and now differ
+        diff, level = (due ^ self.now) >> self.bits, 0
+        while diff and level < self.levels - 1:
+            diff >>= self.bits
+            level += 1
+        self._rings[level][(due >> (self.bits * level)) & self.mask].append((due, item))
+        self.filed += 1
+
+    def advance(self) -> list:
+        """Move to the next turn; the items due now"""
+        self.now = now = self.now + 1
+        fired = []
+        if not now & self.mask:
+            # Crossed a ring boundary: pull the next slot of each ring above
+            # down, highest first, so items can fall through several rings
+            top = 1
+            while top < self.levels - 1 and not now & ((1 << (self.bits * (top + 1))) - 1):
+                top += 1
+            for level in range(top, 0, -1):
+                ring = self._rings[level]
+                slot = (now >> (self.bits * level)) & self.mask
+                entries, ring[slot] = ring[slot], []
+                self.cascaded += len(entries)
+                self.filed -= len(entries)
+                for due, item in entries:
+                    if due == now:
+                        fired.append(item)
+                    else:
+                        self.schedule(due, item)
+        ring = self._rings[0]
+        slot = now & self.mask
+        if ring[slot]:
+            fired.extend(item for _, item in ring[slot])
+            self.filed -= len(ring[slot])
+            ring[slot] = []
+        return fired
+
+    def clear(self):
+        self.now = 0
+        if self.filed:
+            self._rings = [[[] for _ in range(self.size)] for _ in range(self.levels)]
+            self.filed = 0
+
+
+class StatusEngine:
+    """Live effects for one fight: apply, tick once per turn, expire"""
+
+    def __init__(self):
+        self.wheel = TimerWheel()
+        self._tracked = {}   # id -> every character given a StatusState
+        self._ticking = {}   # id -> characters with bleed or regen
+        self.live = 0
+        self.expired = 0
+        self.ticked = []     # characters whose HP the last advance() changed
+        self.ended = []      # effects the last advance() expired
+
+    @property
+    def turn(self) -> int:
+        return self.wheel.now
+
+    def clear(self, *characters):
+        """Drop every effect (new fight); characters are detached as well"""
+        for character in (*self._tracked.values(), *characters):
+            if character is not None:
+                character.status = None
+        self._tracked.clear()
+        self._ticking.clear()
+        self.wheel.clear()
+        self.live = 0
+        self.ticked, self.ended = [], []
+
+    def is_stunned(self, character) -> bool:
+        status = character.status
+        return bool(status and status.stun)
+
+    def apply(self, target, kind: str, power: int = 0, turns: int = 1) -> str:
+        """Put an effect on target for `turns` turns; a message, or "" if it changed nothing"""
+        rule, cap = EFFECT_RULES[kind]
+        turns = max(1, int(turns))
+        status = target.status
+        live = status.live.get(kind, ()) if status else ()
+        expires = self.wheel.now + turns
+        if live and rule == REFRESH:
+            old = live[0]
+            if expires <= old.expires and power <= old.power:
+                return ""
+            expires, power = max(expires, old.expires), max(power, old.power)
+            self._remove(old)
+        elif live and rule == STRONGEST:
+            old = live[0]
+            if power < old.power or (power == old.power and expires <= old.expires):
+                return ""
+            self._remove(old)
+        elif len(live) >= cap:
+            self._remove(live[0])
+        self._place(target, kind, power, expires)
+        return _applied_message(target, kind, power, turns, len(target.status.live[kind]))
+
+    def _place(self, target, kind, power, expires):
+        """File a new live effect (stacking rules already applied)"""
+        status = target.status
+        if status is None:
+            status = target.status = StatusState()
+            self._tracked[id(target)] = target
+        effect = Effect(kind, power, expires, target)
+        status.live.setdefault(kind, []).append(effect)
+        self._adjust(status, kind, power, 1)
+        if status.bleed or status.regen:
+            self._ticking[id(target)] = target
+        self.wheel.schedule(expires, effect)
+        self.live += 1
+
+    def effects_of(self, character) -> tuple:
+        """A character's live effects as (kind, power, expires) tuples, oldest first per kind"""
+        status = character.status
+        if not status:
+            return ()
+        return tuple((e.kind, e.power, e.expires)
+                     for kind in EFFECT_RULES for e in status.live.get(kind, ()))
+
+    def restore(self, turn: int, placements):
+        """Rebuild the fight's effects: turn as in self.turn, placements as
+        [(character, effects_of(character))]"""
+        self.clear(*(character for character, _ in placements))
+        self.wheel.now = turn
+        for character, effects in placements:
+            for kind, power, expires in effects:
+                self._place(character, kind, power, expires)
+
+    def advance(self) -> list:
+        """One turn: bleed and regen hit every affected character, then due effects expire.
+        Returns the message lines."""
+        lines, ticked = [], []
+        for key, character in list(self._ticking.items()):
+            if not character.is_alive():
+                del self._ticking[key]
+                continue
+            status = character.status
+            if status.bleed:
+                character.take_damage(status.bleed)
+                lines.append(f"🩸 {character.name} bleeds for {status.bleed}xp damage!")
+                if not character.is_alive():
+                    lines.append(f"💀 {character.name} bled out!")
+            if status.regen and character.is_alive():
+                before = character.hp
+                character.heal(status.regen)
+                if character.hp > before:
+                    lines.append(f"💚 {character.name} regenerates {character.hp - before} HP")
+            ticked.append(character)
+        self.ticked = ticked
+
+        ended = self.ended = []
+        for effect in self.wheel.advance():
+            if effect.active:
+                self._remove(effect)
+                ended.append(effect)
+                self.expired += 1
+                target = effect.target
+                if not target.status.live[effect.kind] and target.is_alive():
+                    lines.append(_expired_message(target, effect.kind))
+        return lines
+
+    def _remove(self, effect):
+        effect.active = False
+        target = effect.target
+        status = target.status
+        status.live[effect.kind].remove(effect)
+        self._adjust(status, effect.kind, effect.power, -1)
+        if not (status.bleed or status.regen):
+            self._ticking.pop(id(target), None)
+        self.live -= 1
+
+    @staticmethod
+    def _adjust(status, kind, power, sign):
+        if kind == BLEED:
+            status.bleed += sign * power
+        elif kind == REGEN:
+            status.regen += sign * power
+        elif kind == DEFENSE_BREAK:
+            status.defense_break += sign * power
+        elif kind == STUN:
+            status.stun += sign
+
+
+def _applied_message(target, kind, power, turns, stacks) -> str:
+    name = target.name
+    if kind == BLEED:
+        stacked = f" x{stacks}" if stacks > 1 else ""
+        return f"🩸 {name} is bleeding{stacked}! ({target.status.bleed}/turn for {turns} turns)"
+    if kind == REGEN:
+        return f"💚 {name} starts regenerating ({target.status.regen} HP/turn for {turns} turns)"
+    if kind == DEFENSE_BREAK:
+        return f"🔨 {name}'s guard is broken! (-{power} DEF for {turns} turns)"
+    return f"😵 {name} is stunned!"
+
+
+def _expired_message(target, kind) -> str:
+    return {
+        BLEED: f"🩹 {target.name} stops bleeding",
+        REGEN: f"💚 {target.name}'s regeneration fades",
+        DEFENSE_BREAK: f"🛡️ {target.name}'s guard recovers",
+        STUN: f"💫 {target.name} shakes off the stun",
+    }[kind]
+
+
+# Turns-left summary of a fight's effects, where specials put them:
+# (enemy bleed, turns, enemy defense break, turns, enemy stun turns, player regen, turns).
+# Specials are at least five attacks apart and none lasts more than four
+# turns, so one instance per kind is exact for fights driven by specials.
+# A fight with nothing live always gets NO_EFFECTS itself, so models can test
+# for it with `is`.
+NO_EFFECTS = (0, 0, 0, 0, 0, 0, 0)
+
+
+def summarize(engine, player, enemy) -> tuple:
+    """The summary of a live fight (stacks add up and last as long as the longest)"""
+    def turns_left(status, kind):
+        live = status.live.get(kind) if status else None
+        return max(e.expires for e in live) - engine.turn if live else 0
+    foe, own = enemy.status, player.status
+    if not (foe or own):
+        return NO_EFFECTS
+    summary = (foe.bleed if foe else 0, turns_left(foe, BLEED),
+               foe.defense_break if foe else 0, turns_left(foe, DEFENSE_BREAK), turns_left(foe, STUN),
+               own.regen if own else 0, turns_left(own, REGEN))
+    return NO_EFFECTS if summary == NO_EFFECTS else summary
+
+
+def tick_summary(summary) -> tuple:
+    """StatusEngine.advance() on a summary: (enemy bleed damage, player regen, next summary)"""
+    if summary is NO_EFFECTS:
+        return 0, 0, summary
+    bleed, bleed_left, brk, break_left, stun_left, regen, regen_left = summary
+    bleed_left, break_left, regen_left = max(0, bleed_left - 1), max(0, break_left - 1), max(0, regen_left - 1)
+    if not (bleed_left or break_left or stun_left > 1 or regen_left):
+        return bleed, regen, NO_EFFECTS
+    return (bleed, regen,
+            (bleed if bleed_left else 0, bleed_left, brk if break_left else 0, break_left,
+             max(0, stun_left - 1), regen if regen_left else 0, regen_left))
+
+
+def apply_to_summary(summary, kind, power, turns) -> tuple:
+    """The summary after a special's effect lands"""
+    bleed, bleed_left, brk, break_left, stun_left, regen, regen_left = summary
+    if kind == BLEED:
+        return (power, turns, brk, break_left, stun_left, regen, regen_left)
+    if kind == DEFENSE_BREAK:
+        return (bleed, bleed_left, power, turns, stun_left, regen, regen_left)
+    if kind == STUN:
+        return (bleed, bleed_left, brk, break_left, max(stun_left, turns), regen, regen_left)
+    return (bleed, bleed_left, brk, break_left, stun_left, power, turns)
+
+
+def _scan_expiring(effects, turn):
+    """Reference: every live effect due this turn, by full scan"""
+    return sorted(id(e) for e in effects if e.active and e.expires == turn)
+
+
+def _countdown_turn(effects, characters):
+    """The plain alternative: every effect counts down each turn (O(all effects)),
+    with the same bleed/regen work and messages as StatusEngine.advance"""
+    for character in characters:
+        character.status.bleed = character.status.regen = 0
+    still = []
+    for effect in effects:
+        effect.expires -= 1
+        if effect.expires > 0:
+            still.append(effect)
+            if effect.kind == BLEED:
+                effect.target.status.bleed += effect.power
+            elif effect.kind == REGEN:
+                effect.target.status.regen += effect.power
+    lines = []
+    for character in characters:
+        status = character.status
+        if status.bleed:
+            character.take_damage(status.bleed)
+            lines.append(f"🩸 {character.name} bleeds for {status.bleed}xp damage!")
+        if status.regen:
+            character.heal(status.regen)
+            lines.append(f"💚 {character.name} regenerates {status.regen} HP")
+    return still
+
+
+def benchmark(characters=1000, turns=200, seed=7) -> dict:
+    """Turns/s for `characters` fighters carrying every stack the caps allow
+    (whatever expires is re-applied), against per-effect countdown"""
+    from character import Character
+    rng = random.Random(seed)
+    durations = (1, 2, 3, 5, 8, 40, 200, 5000)
+    plan = [kind for kind, (_, cap) in EFFECT_RULES.items() for _ in range(cap)]
+    cast = [Character(name=f"C{i}", level=1, hp=10 ** 9, max_hp=10 ** 9, attack=1, defense=5)
+            for i in range(characters)]
+
+    engine = StatusEngine()
+
+    def refill(character):
+        live = character.status.live if character.status else {}
+        for kind, (_, cap) in EFFECT_RULES.items():
+            for _ in range(cap - len(live.get(kind, ()))):
+                engine.apply(character, kind, rng.randint(1, 4), rng.choice(durations))
+
+    for character in cast:
+        refill(character)
+    live, expired = engine.live, engine.expired
+    start = time.perf_counter()
+    for _ in range(turns):
+        engine.advance()
+        # Top up only the characters that lost effects this turn
+        for target in {id(e.target): e.target for e in engine.ended}.values():
+            refill(target)
+    wheel = time.perf_counter() - start
+    expired = engine.expired - expired
+
+    effects = [Effect(kind, rng.randint(1, 4), rng.choice(durations), c) for c in cast for kind in plan]
+    start = time.perf_counter()
+    for _ in range(turns):
+        effects = _countdown_turn(effects, cast)
+        while len(effects) < live:
+            effects.append(Effect(rng.choice(plan), rng.randint(1, 4), rng.choice(durations), rng.choice(cast)))
+    countdown = time.perf_counter() - start
+    return {"live": live, "turns": turns, "expired": expired,
+            "wheel_turns_per_sec": turns / wheel, "countdown_turns_per_sec": turns / countdown}
+
+
+def expiry_benchmark(timers=100_000, turns=2000, seed=7) -> dict:
+    """Expiry bookkeeping alone: `timers` live timers (re-armed as they fire)
+    in a TimerWheel vs a countdown list"""
+    rng = random.Random(seed)
+    durations = [rng.choice((1, 2, 3, 5, 8, 40, 200, 5000)) for _ in range(4096)]
+    wheel = TimerWheel()
+    for i in range(timers):
+        wheel.schedule(durations[i % 4096], i)
+    fired = 0
+    start = time.perf_counter()
+    for turn in range(turns):
+        for i in wheel.advance():
+            wheel.schedule(wheel.now + durations[(i + turn) % 4096], i)
+            fired += 1
+    wheel_time = time.perf_counter() - start
+
+    remaining = [durations[i % 4096] for i in range(timers)]
+    start = time.perf_counter()
+    for turn in range(turns):
+        for i in range(timers):
+            remaining[i] -= 1
+            if not remaining[i]:
+                remaining[i] = durations[(i + turn) % 4096]
+    countdown_time = time.perf_counter() - start
+    return {"timers": timers, "fired_per_turn": fired / turns,
+            "wheel_turns_per_sec": turns / wheel_time, "countdown_turns_per_sec": turns / countdown_time}
+
+
+if __name__ == "__main__":
+    from character import Character
+
+    # Wheel: random due turns (many past the level-0 span) fire exactly on time
+    rng = random.Random(45)
+    wheel, due_at = TimerWheel(bits=3, levels=3), {}
+    for i in range(5000):
+        due = wheel.now + rng.choice((1, 2, 7, 8, 9, 63, 64, 65, 511, 512, 513, 2000)) + rng.randint(0, 40)
+        wheel.schedule(due, i)
+        due_at.setdefault(due, set()).add(i)
+        if i % 50 == 0:
+            for item in wheel.advance():
+                assert item in due_at.get(wheel.now, ()), (item, wheel.now)
+                due_at[wheel.now].discard(item)
+    while any(due_at.values()):
+        for item in wheel.advance():
+            assert item in due_at.get(wheel.now, ()), (item, wheel.now)
+            due_at[wheel.now].discard(item)
+        assert not due_at.get(wheel.now), (wheel.now, due_at.get(wheel.now))
+    print(f"✅ timer wheel fires 5,000 timers on their turn (incl. past the top ring, {wheel.cascaded} cascades)")
+
+    # Engine against a full scan of every effect ever applied
+    engine = StatusEngine()
+    cast = [Character(name=f"C{i}", level=1, hp=10 ** 6, max_hp=10 ** 6, attack=1, defense=3) for i in range(40)]
+    applied = []
+    for turn in range(600):
+        for _ in range(rng.randint(0, 12)):
+            target = rng.choice(cast)
+            engine.apply(target, rng.choice(list(EFFECT_RULES)), rng.randint(0, 5), rng.randint(1, 90))
+            applied.extend(sum(target.status.live.values(), []))
+        expected = _scan_expiring(set(applied), engine.turn + 1)
+        before = engine.expired
+        engine.advance()
+        assert engine.expired - before == len(expected), (turn, engine.expired - before, len(expected))
+        for c in cast:
+            status = c.status
+            if status is None:
+                continue
+            live = status.live
+            assert status.bleed == sum(e.power for e in live.get(BLEED, ()))
+            assert status.defense_break == sum(e.power for e in live.get(DEFENSE_BREAK, ()))
+            assert status.stun == len(live.get(STUN, ()))
+            for kind, (rule, cap) in EFFECT_RULES.items():
+                assert len(live.get(kind, ())) <= cap
+    print(f"✅ totals, caps and expiries match a full scan over 600 turns ({engine.expired:,} expired)")
+
+    # Turns-left summary against the engine, specials five turns apart as in a fight
+    player = Character(name="P", level=1, hp=10 ** 6, max_hp=2 * 10 ** 6, attack=1, defense=3)
+    enemy = Character(name="E", level=1, hp=10 ** 6, max_hp=10 ** 6, attack=1, defense=3)
+    engine = StatusEngine()
+    summary = NO_EFFECTS
+    for turn in range(3000):
+        bleed, regen, summary = tick_summary(summary)
+        before = (player.hp, enemy.hp)
+        engine.advance()
+        assert (player.hp - before[0], before[1] - enemy.hp) == (regen, bleed), turn
+        assert summarize(engine, player, enemy) == summary, (turn, summarize(engine, player, enemy), summary)
+        assert (enemy.get_defense() < enemy.defense) == bool(summary[3]), turn
+        if turn % 5 == 0:
+            kind, power, turns = rng.choice(list(SPECIAL_EFFECTS.values()))
+            engine.apply(player if kind in BENEFICIAL else enemy, kind, power, turns)
+            summary = apply_to_summary(summary, kind, power, turns)
+        assert engine.is_stunned(enemy) == bool(summary[4]), turn
+    print("✅ turns-left summary follows the engine through 3,000 turns of specials")
+
+    timers = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    stats = expiry_benchmark(timers, turns=max(50, 20_000_000 // timers))
+    print(f"   expiry only, {stats['timers']:,} live timers ({stats['fired_per_turn']:,.0f} due/turn): "
+          f"wheel {stats['wheel_turns_per_sec']:,.0f} turns/s, countdown {stats['countdown_turns_per_sec']:,.0f} turns/s "
+          f"({stats['wheel_turns_per_sec'] / stats['countdown_turns_per_sec']:.0f}x)")
+    for characters in (100, 1000):
+        stats = benchmark(characters)
+        print(f"   engine, {stats['live']:>6,} live effects on {characters:,} fighters: "
+              f"wheel {stats['wheel_turns_per_sec']:,.0f} turns/s, countdown {stats['countdown_turns_per_sec']:,.0f} turns/s "
+              f"({stats['expired'] / stats['turns']:,.0f} expiries/turn)")
@@ -0,0 +1,900 @@
+# -*- coding: utf-8 -*-
+"""
+storage.py - Storage backends for the Nigerian RPG save system
+SaveSystem talks to one of these instead of a hard-wired SQLite connection:
+  - SQLiteBackend: the original single nigerian_rpg.db file
+  - MemoryBackend: plain Python containers, for simulations and tests
+  - ShardedSQLiteBackend: players hashed across N SQLite files
+"""
+import zlib
+import heapq
+import threading
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from db_pool import BUSY_TIMEOUT, ConnectionPool
+
+# Character attributes stored in their own column of the characters table
+CHARACTER_COLUMNS = ('char_class', 'level', 'hp', 'max_hp', 'attack', 'defense', 'weapon',
+                     'xp', 'xp_to_next', 'damage_dealt', 'sprite_path', 'skills')
+
+# Everything a character row holds, in table order
+CHARACTER_ROW = ('name',) + CHARACTER_COLUMNS + ('current_level', 'last_saved')
+
+# Leaderboard entries as returned by StorageBackend.leaderboard()
+LEADERBOARD_COLUMNS = ('player_name', 'completion_time', 'total_damage',
+                       'enemies_defeated', 'difficulty', 'run_date')
+
+# Exportable tables and their columns (row ids are storage-internal)
+TABLE_COLUMNS = {
+    'characters': CHARACTER_ROW,
+    'combat_history': ('player_name', 'enemy_name', 'level', 'result', 'timestamp', 'difficulty'),
+    'leaderboard': LEADERBOARD_COLUMNS,
+}
+
+# Columns filled with the current time when an imported row leaves them empty
+TIMESTAMP_COLUMNS = ('last_saved', 'timestamp', 'run_date')
+
+# Incrementally maintained analytics counters, one row per (dimension, key)
+AGGREGATE_COLUMNS = ('dimension', 'key', 'wins', 'losses', 'runs', 'total_time',
+                     'min_time', 'max_time', 'total_damage', 'total_kills')
+
+DEFAULT_SETTINGS = {
+    'sound_enabled': True,
+    'music_enabled': True,
+    'screen_effects': True,
+    'difficulty': 'Normal'
+}
+
+
+def timestamp() -> str:
+    """Current UTC time in SQLite's CURRENT_TIMESTAMP format"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def merge_aggregate(row: tuple, delta: tuple) -> tuple:
+    """Add a delta onto an aggregate row (both in AGGREGATE_COLUMNS order).
+
+    Counters are summed; min_time/max_time keep the extreme of the two,
+    ignoring a side that has none.
+    """
+    merged = list(row[:2])
+    for col, old, new in zip(AGGREGATE_COLUMNS[2:], row[2:], delta[2:]):
+        if col in ('min_time', 'max_time'):
+            known = [v for v in (old, new) if v is not None]
+            merged.append((min if col == 'min_time' else max)(known) if known else None)
+        else:
+            merged.append(old + new)
+    return tuple(merged)
+
+
+def aggregate_is_empty(row: tuple) -> bool:
+    """True once a row counts no fights and no runs"""
+    wins, losses, runs = row[2:5]
+    return wins == 0 and losses == 0 and runs == 0
+
+
+class StorageBackend:
+    """Interface every SaveSystem backend implements.
+
+    Character rows are dicts keyed by CHARACTER_ROW with `skills` already
+    serialized to JSON text. Leaderboard rows are tuples in
+    LEADERBOARD_COLUMNS order.
+    """
+
+    # ---- characters ----
+    def character_exists(self, name: str) -> bool:
+        raise NotImplementedError
+
+    def load_character_row(self, name: str):
+        """Row dict for a character, or None"""
+        raise NotImplementedError
+
+    def insert_character(self, row: dict):
+        raise NotImplementedError
+
+    def update_character(self, name: str, changes: dict):
+        """Write only the given columns (any of CHARACTER_ROW except name)"""
+        raise NotImplementedError
+
+    def list_saves(self, limit: int) -> list:
+        """(name, char_class, level, weapon, current_level, last_saved), newest first"""
+        raise NotImplementedError
+
+    def delete_character(self, name: str):
+        """Delete a character and its combat history"""
+        raise NotImplementedError
+
+    # ---- combat history ----
+    def add_combat_result(self, player_name: str, enemy_name: str, level: int, result: str,
+                          difficulty: str = None):
+        raise NotImplementedError
+
+    def combat_history(self, player_name: str, limit: int) -> list:
+        """(enemy_name, level, result, timestamp), newest first"""
+        raise NotImplementedError
+
+    def trim_combat_history(self, player_name: str, keep: int) -> int:
+        """Delete all but a player's newest `keep` results; returns how many went"""
+        raise NotImplementedError
+
+    # ---- settings ----
+    def load_settings(self) -> dict:
+        raise NotImplementedError
+
+    def store_settings(self, values: dict):
+        raise NotImplementedError
+
+    # ---- leaderboard ----
+    def add_leaderboard_entry(self, player_name: str, completion_time: float,
+                              total_damage: int, enemies_defeated: int, difficulty: str):
+        raise NotImplementedError
+
+    def leaderboard(self, order_by: str, descending: bool, limit: int) -> list:
+        """Top entries sorted on one of LEADERBOARD_COLUMNS"""
+        raise NotImplementedError
+
+    def best_time(self, player_name: str):
+        """Fastest completion time for a player, or None"""
+        raise NotImplementedError
+
+    # ---- analytics ----
+    def load_aggregates(self) -> list:
+        """All aggregate rows as tuples in AGGREGATE_COLUMNS order"""
+        raise NotImplementedError
+
+    def store_aggregates(self, rows: list, replace: bool = False):
+        """Upsert aggregate rows; replace=True drops every existing row first"""
+        raise NotImplementedError
+
+    def add_aggregates(self, rows: list):
+        """Add delta rows onto the stored ones (see merge_aggregate).
+
+        Atomic against other writers on the same storage; rows left counting
+        nothing are dropped.
+        """
+        raise NotImplementedError
+
+    def player_rows(self, table: str, player_name: str) -> list:
+        """Row dicts of one player's combat_history or leaderboard rows"""
+        raise NotImplementedError
+
+    # ---- bulk transfer ----
+    def iter_table(self, table: str, after=None, chunk_size: int = 1000):
+        """Yield (key, row_dict) for every row of a TABLE_COLUMNS table in a stable order.
+
+        Keys are JSON-serializable; passing the last key seen as `after`
+        resumes the scan just past it.
+        """
+        raise NotImplementedError
+
+    def insert_rows(self, table: str, rows: list):
+        """Bulk insert row dicts; characters replace any existing row with the same name"""
+        raise NotImplementedError
+
+    @contextmanager
+    def transaction(self):
+        """Group several writes into one commit where the backend supports it"""
+        yield self
+
+    def close(self):
+        pass
+
+
+def _fill_timestamps(row: dict) -> dict:
+    for col in TIMESTAMP_COLUMNS:
+        if col in row and not row[col]:
+            row[col] = timestamp()
+    return row
+
+
+class SQLiteBackend(StorageBackend):
+    """Single-file SQLite storage (the original nigerian_rpg.db layout).
+
+    Safe to share between threads: writes go through the pool's serialized
+    writer, reads use per-thread read-only connections.
+
+    compact_history=True stores combat history dictionary-encoded (see
+    _create_compact_history); the public methods behave the same either way.
+    """
+
+    def __init__(self, db_name='nigerian_rpg.db', busy_timeout=BUSY_TIMEOUT, compact_history=False):
+        self.db_name = db_name
+        self.compact_history = compact_history
+        self.pool = ConnectionPool(db_name, busy_timeout)
+        # lookup table -> {name: id}, filled lazily by _lookup_id
+        self._lookup_ids = {'players': {}, 'enemies': {}, 'results': {}, 'difficulties': {}}
+        self.init_database()
+
+    def init_database(self):
+        """Initialize database tables"""
+        with self.pool.writer() as conn:
+            self._create_tables(conn)
+            if self.compact_history:
+                self._create_compact_history(conn)
+
+    def _create_compact_history(self, conn):
+        """Dictionary-encoded combat history.
+
+        Player, enemy and result names are stored once in lookup tables and
+        referenced by integer id; rows are clustered on (player_id, timestamp)
+        in a WITHOUT ROWID table, so one player's history is a contiguous
+        range scan. Timestamps are unix seconds; seq breaks ties between one
+        player's rows in the same second.
+        """
+        for table in self._lookup_ids:
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL UNIQUE
+                )
+            ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS combat_history_compact (
+                player_id INTEGER NOT NULL REFERENCES players(id),
+                timestamp INTEGER NOT NULL,
+                seq INTEGER NOT NULL,
+                enemy_id INTEGER NOT NULL REFERENCES enemies(id),
+                level INTEGER,
+                result_id INTEGER NOT NULL REFERENCES results(id),
+                difficulty_id INTEGER REFERENCES difficulties(id),
+                PRIMARY KEY (player_id, timestamp, seq)
+            ) WITHOUT ROWID
+        ''')
+        self._add_missing_column(conn, 'combat_history_compact', 'difficulty_id', 'INTEGER')
+
+        # One-off migration of rows written with the plain layout
+        legacy = conn.execute(f'SELECT {", ".join(TABLE_COLUMNS["combat_history"])} '
+                              'FROM combat_history ORDER BY id').fetchall()
+        if legacy:
+            self._insert_compact(conn, [dict(zip(TABLE_COLUMNS['combat_history'], row)) for row in legacy])
+            conn.execute('DELETE FROM combat_history')
+
+    @staticmethod
+    def _add_missing_column(conn, table, column, decl):
+        """ALTER TABLE for databases created before the column existed"""
+        existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        if column not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {decl}')
+
+    def _lookup_id(self, conn, table, name):
+        """Id of name in a lookup table, inserting it on first use"""
+        if name is None:
+            return None
+        ids = self._lookup_ids[table]
+        key = ids.get(name)
+        if key is None:
+            conn.execute(f'INSERT OR IGNORE INTO {table} (name) VALUES (?)', (name,))
+            key = conn.execute(f'SELECT id FROM {table} WHERE name = ?', (name,)).fetchone()[0]
+            ids[name] = key
+        return key
+
+    def _insert_compact(self, conn, rows):
+        """Insert combat_history row dicts (timestamp may be a string or None).
+
+        seq is allocated by the INSERT itself, inside the write transaction,
+        so two processes writing the same file can't pick the same key.
+        """
+        params = []
+        for row in rows:
+            params.append((self._lookup_id(conn, 'players', row['player_name']),
+                           row.get('timestamp'),
+                           self._lookup_id(conn, 'enemies', row['enemy_name']),
+                           row['level'],
+                           self._lookup_id(conn, 'results', row['result']),
+                           self._lookup_id(conn, 'difficulties', row.get('difficulty'))))
+        conn.executemany('''
+            INSERT INTO combat_history_compact
+            (player_id, timestamp, seq, enemy_id, level, result_id, difficulty_id)
+            SELECT r.player_id, r.ts,
+                   (SELECT COALESCE(MAX(seq), 0) + 1 FROM combat_history_compact
+                    WHERE player_id = r.player_id AND timestamp = r.ts),
+                   r.enemy_id, r.level, r.result_id, r.difficulty_id
+            FROM (SELECT ? AS player_id,
+                         COALESCE(CAST(strftime('%s', ?) AS INTEGER),
+                                  CAST(strftime('%s', 'now') AS INTEGER)) AS ts,
+                         ? AS enemy_id, ? AS level, ? AS result_id, ? AS difficulty_id) AS r
+        ''', params)
+
+    def _create_tables(self, conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS characters (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                char_class TEXT NOT NULL,
+                level INTEGER DEFAULT 1,
+                hp INTEGER,
+                max_hp INTEGER,
+                attack INTEGER,
+                defense INTEGER,
+                weapon TEXT,
+                xp INTEGER DEFAULT 0,
+                xp_to_next INTEGER DEFAULT 50,
+                current_level INTEGER DEFAULT 1,
+                damage_dealt INTEGER DEFAULT 0,
+                sprite_path TEXT,
+                skills TEXT,
+                last_saved DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS combat_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                player_name TEXT,
+                enemy_name TEXT,
+                level INTEGER,
+                result TEXT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                difficulty TEXT
+            )
+        ''')
+        self._add_missing_column(conn, 'combat_history', 'difficulty', 'TEXT')
+
+        # NEW: Settings table
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS settings (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                sound_enabled INTEGER DEFAULT 1,
+                music_enabled INTEGER DEFAULT 1,
+                screen_effects INTEGER DEFAULT 1,
+                difficulty TEXT DEFAULT 'Normal'
+            )
+        ''')
+
+        # NEW: Leaderboard table
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS leaderboard (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                player_name TEXT NOT NULL,
+                completion_time REAL,
+                total_damage INTEGER,
+                enemies_defeated INTEGER,
+                run_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+                difficulty TEXT DEFAULT 'Normal'
+            )
+        ''')
+
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS aggregates (
+                dimension TEXT NOT NULL,
+                key TEXT NOT NULL,
+                wins INTEGER DEFAULT 0,
+                losses INTEGER DEFAULT 0,
+                runs INTEGER DEFAULT 0,
+                total_time REAL DEFAULT 0,
+                min_time REAL,
+                max_time REAL,
+                total_damage INTEGER DEFAULT 0,
+                total_kills INTEGER DEFAULT 0,
+                PRIMARY KEY (dimension, key)
+            ) WITHOUT ROWID
+        ''')
+
+        # Initialize default settings if not exists
+        if not conn.execute('SELECT id FROM settings WHERE id = 1').fetchall():
+            conn.execute('''
+                INSERT INTO settings (id, sound_enabled, music_enabled, screen_effects, difficulty)
+                VALUES (1, 1, 1, 1, 'Normal')
+            ''')
+
+    def transaction(self):
+        """Context manager grouping several writes into one commit"""
+        return self.pool.transaction()
+
+    def character_exists(self, name):
+        rows = self.pool.reader().execute('SELECT id FROM characters WHERE name = ?', (name,)).fetchall()
+        return bool(rows)
+
+    def load_character_row(self, name):
+        rows = self.pool.reader().execute(
+            f'SELECT {", ".join(CHARACTER_ROW)} FROM characters WHERE name = ?', (name,)).fetchall()
+        return dict(zip(CHARACTER_ROW, rows[0])) if rows else None
+
+    def insert_character(self, row):
+        columns = [col for col in CHARACTER_ROW if col != 'last_saved' or row.get(col)]
+        with self.pool.writer() as conn:
+            conn.execute(f'''
+                INSERT INTO characters ({", ".join(columns)})
+                VALUES ({", ".join("?" * len(columns))})
+            ''', [row.get(col) for col in columns])
+
+    def update_character(self, name, changes):
+        columns = [col for col in CHARACTER_ROW[1:] if col in changes]
+        if not columns:
+            return
+        assignments = ', '.join(f'{col}=?' for col in columns)
+        with self.pool.writer() as conn:
+            conn.execute(f'UPDATE characters SET {assignments} WHERE name=?',
+                         [changes[col] for col in columns] + [name])
+
+    def list_saves(self, limit):
+        return self.pool.reader().execute('''
+            SELECT name, char_class, level, weapon, current_level, last_saved
+            FROM characters
+            ORDER BY last_saved DESC
+            LIMIT ?
+        ''', (limit,)).fetchall()
+
+    def delete_character(self, name):
+        with self.pool.writer() as conn:
+            conn.execute('DELETE FROM characters WHERE name = ?', (name,))
+            conn.execute('DELETE FROM combat_history WHERE player_name = ?', (name,))
+            if self.compact_history:
+                conn.execute('''
+                    DELETE FROM combat_history_compact
+                    WHERE player_id = (SELECT id FROM players WHERE name = ?)
+                ''', (name,))
+
+    def _write_compact(self, rows):
+        """Insert compact history rows in one transaction"""
+        try:
+            with self.pool.transaction() as conn:
+                self._insert_compact(conn, rows)
+        except Exception:
+            # Ids cached during a rolled-back transaction may not exist
+            for ids in self._lookup_ids.values():
+                ids.clear()
+            raise
+
+    def add_combat_result(self, player_name, enemy_name, level, result, difficulty=None):
+        if self.compact_history:
+            self._write_compact([{'player_name': player_name, 'enemy_name': enemy_name,
+                                  'level': level, 'result': result, 'difficulty': difficulty}])
+            return
+        with self.pool.writer() as conn:
+            conn.execute('''
+                INSERT INTO combat_history (player_name, enemy_name, level, result, difficulty)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (player_name, enemy_name, level, result, difficulty))
+
+    def combat_history(self, player_name, limit):
+        if self.compact_history:
+            return self.pool.reader().execute('''
+                SELECT e.name, h.level, r.name, datetime(h.timestamp, 'unixepoch')
+                FROM combat_history_compact h
+                JOIN enemies e ON e.id = h.enemy_id
+                JOIN results r ON r.id = h.result_id
+                WHERE h.player_id = (SELECT id FROM players WHERE name = ?)
+                ORDER BY h.timestamp DESC, h.seq DESC
+                LIMIT ?
+            ''', (player_name, limit)).fetchall()
+        return self.pool.reader().execute('''
+            SELECT enemy_name, level, result, timestamp
+            FROM combat_history
+            WHERE player_name = ?
+            ORDER BY timestamp DESC, id DESC
+            LIMIT ?
+        ''', (player_name, limit)).fetchall()
+
+    def trim_combat_history(self, player_name, keep):
+        with self.pool.writer() as conn:
+            if self.compact_history:
+                return conn.execute('''
+                    DELETE FROM combat_history_compact
+                    WHERE player_id = (SELECT id FROM players WHERE name = ?1)
+                      AND (timestamp, seq) NOT IN (
+                          SELECT timestamp, seq FROM combat_history_compact
+                          WHERE player_id = (SELECT id FROM players WHERE name = ?1)
+                          ORDER BY timestamp DESC, seq DESC
+                          LIMIT ?2)
+                ''', (player_name, keep)).rowcount
+            return conn.execute('''
+                DELETE FROM combat_history
+                WHERE player_name = ?1 AND id NOT IN (
+                    SELECT id FROM combat_history
+                    WHERE player_name = ?1
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ?2)
+            ''', (player_name, keep)).rowcount
+
+    def load_settings(self):
+        rows = self.pool.reader().execute('SELECT * FROM settings WHERE id = 1').fetchall()
+        if rows:
+            row = rows[0]
+            return {
+                'sound_enabled': bool(row[1]),
+                'music_enabled': bool(row[2]),
+                'screen_effects': bool(row[3]),
+                'difficulty': row[4]
+            }
+        return dict(DEFAULT_SETTINGS)
+
+    def store_settings(self, values):
+        with self.pool.writer() as conn:
+            conn.execute('''
+                UPDATE settings
+                SET sound_enabled=?, music_enabled=?, screen_effects=?, difficulty=?
+                WHERE id=1
+            ''', (int(values['sound_enabled']),
+                  int(values['music_enabled']),
+                  int(values['screen_effects']),
+                  values['difficulty']))
+
+    def add_leaderboard_entry(self, player_name, completion_time, total_damage, enemies_defeated, difficulty):
+        with self.pool.writer() as conn:
+            conn.execute('''
+                INSERT INTO leaderboard
+                (player_name, completion_time, total_damage, enemies_defeated, difficulty)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (player_name, completion_time, total_damage, enemies_defeated, difficulty))
+
+    def leaderboard(self, order_by, descending, limit):
+        if order_by not in LEADERBOARD_COLUMNS:
+            raise ValueError(f"Unknown leaderboard column: {order_by}")
+        return self.pool.reader().execute(f'''
+            SELECT {", ".join(LEADERBOARD_COLUMNS)}
+            FROM leaderboard
+            ORDER BY {order_by} {"DESC" if descending else "ASC"}, id ASC
+            LIMIT ?
+        ''', (limit,)).fetchall()
+
+    def best_time(self, player_name):
+        rows = self.pool.reader().execute('''
+            SELECT MIN(completion_time) FROM leaderboard WHERE player_name = ?
+        ''', (player_name,)).fetchall()
+        return rows[0][0] if rows else None
+
+    def _iter_compact_history(self, after, chunk_size):
+        # Keyset pagination over the clustered primary key
+        last = tuple(after) if after is not None else (-1, -1, -1)
+        while True:
+            rows = self.pool.reader().execute('''
+                SELECT h.player_id, h.timestamp, h.seq,
+                       p.name, e.name, h.level, r.name, datetime(h.timestamp, 'unixepoch'), d.name
+                FROM combat_history_compact h
+                JOIN players p ON p.id = h.player_id
+                JOIN enemies e ON e.id = h.enemy_id
+                JOIN results r ON r.id = h.result_id
+                LEFT JOIN difficulties d ON d.id = h.difficulty_id
+                WHERE (h.player_id, h.timestamp, h.seq) > (?, ?, ?)
+                ORDER BY h.player_id, h.timestamp, h.seq
+                LIMIT ?
+            ''', (*last, chunk_size)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                last = row[:3]
+                yield list(last), dict(zip(TABLE_COLUMNS['combat_history'], row[3:]))
+
+    def load_aggregates(self):
+        return self.pool.reader().execute(
+            f'SELECT {", ".join(AGGREGATE_COLUMNS)} FROM aggregates').fetchall()
+
+    def store_aggregates(self, rows, replace=False):
+        with self.pool.transaction() as conn:
+            if replace:
+                conn.execute('DELETE FROM aggregates')
+            conn.executemany(f'''
+                INSERT OR REPLACE INTO aggregates ({", ".join(AGGREGATE_COLUMNS)})
+                VALUES ({", ".join("?" * len(AGGREGATE_COLUMNS))})
+            ''', rows)
+
+    def add_aggregates(self, rows):
+        # The addition happens inside SQLite, so concurrent writers can't lose updates
+        with self.pool.transaction() as conn:
+            conn.executemany(f'''
+                INSERT INTO aggregates ({", ".join(AGGREGATE_COLUMNS)})
+                VALUES ({", ".join("?" * len(AGGREGATE_COLUMNS))})
+                ON CONFLICT (dimension, key) DO UPDATE SET
+                    wins = wins + excluded.wins,
+                    losses = losses + excluded.losses,
+                    runs = runs + excluded.runs,
+                    total_time = total_time + excluded.total_time,
+                    min_time = MIN(COALESCE(min_time, excluded.min_time),
+                                   COALESCE(excluded.min_time, min_time)),
+                    max_time = MAX(COALESCE(max_time, excluded.max_time),
+                                   COALESCE(excluded.max_time, max_time)),
+                    total_damage = total_damage + excluded.total_damage,
+                    total_kills = total_kills + excluded.total_kills
+            ''', rows)
+            if any(row[2] < 0 or row[3] < 0 or row[4] < 0 for row in rows):
+                conn.execute('DELETE FROM aggregates WHERE wins = 0 AND losses = 0 AND runs = 0')
+
+    def player_rows(self, table, player_name):
+        if table == 'combat_history' and self.compact_history:
+            rows = self.pool.reader().execute('''
+                SELECT p.name, e.name, h.level, r.name, datetime(h.timestamp, 'unixepoch'), d.name
+                FROM combat_history_compact h
+                JOIN players p ON p.id = h.player_id
+                JOIN enemies e ON e.id = h.enemy_id
+                JOIN results r ON r.id = h.result_id
+                LEFT JOIN difficulties d ON d.id = h.difficulty_id
+                WHERE h.player_id = (SELECT id FROM players WHERE name = ?)
+            ''', (player_name,)).fetchall()
+        else:
+            columns = TABLE_COLUMNS[table]
+            rows = self.pool.reader().execute(
+                f'SELECT {", ".join(columns)} FROM {table} WHERE player_name = ?',
+                (player_name,)).fetchall()
+        return [dict(zip(TABLE_COLUMNS[table], row)) for row in rows]
+
+    def iter_table(self, table, after=None, chunk_size=1000):
+        if table == 'combat_history' and self.compact_history:
+            yield from self._iter_compact_history(after, chunk_size)
+            return
+        columns = TABLE_COLUMNS[table]
+        last = after or 0
+        while True:
+            # Keyset pagination - constant memory and no OFFSET rescans
+            rows = self.pool.reader().execute(f'''
+                SELECT id, {", ".join(columns)} FROM {table}
+                WHERE id > ? ORDER BY id LIMIT ?
+            ''', (last, chunk_size)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                last = row[0]
+                yield last, dict(zip(columns, row[1:]))
+
+    def insert_rows(self, table, rows):
+        columns = TABLE_COLUMNS[table]
+        rows = [_fill_timestamps({col: row.get(col) for col in columns}) for row in rows]
+        if table == 'combat_history' and self.compact_history:
+            self._write_compact(rows)
+            return
+        with self.pool.transaction() as conn:
+            if table == 'characters':
+                conn.executemany('DELETE FROM characters WHERE name = ?', [(row['name'],) for row in rows])
+            conn.executemany(f'''
+                INSERT INTO {table} ({", ".join(columns)})
+                VALUES ({", ".join("?" * len(columns))})
+            ''', [tuple(row[col] for col in columns) for row in rows])
+
+    def close(self):
+        self.pool.close()
+
+
+class MemoryBackend(StorageBackend):
+    """In-process storage with no disk I/O (simulations, tests, benchmarks)"""
+
+    def __init__(self):
+        self.characters = {}
+        self.history = {}
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.entries = []
+        self.aggregates = {}
+
+    def character_exists(self, name):
+        return name in self.characters
+
+    def load_character_row(self, name):
+        row = self.characters.get(name)
+        return dict(row) if row else None
+
+    def insert_character(self, row):
+        full = {col: row.get(col) for col in CHARACTER_ROW}
+        full['current_level'] = full['current_level'] or 1
+        full['last_saved'] = full['last_saved'] or timestamp()
+        self.characters[row['name']] = full
+
+    def update_character(self, name, changes):
+        row = self.characters.get(name)
+        if row is not None:
+            row.update((col, val) for col, val in changes.items() if col in CHARACTER_ROW[1:])
+
+    def list_saves(self, limit):
+        # Stable sort keeps insertion order for equal timestamps, newest first
+        rows = sorted(reversed(list(self.characters.values())),
+                      key=lambda r: str(r['last_saved']), reverse=True)
+        return [(r['name'], r['char_class'], r['level'], r['weapon'], r['current_level'], r['last_saved'])
+                for r in rows[:limit]]
+
+    def delete_character(self, name):
+        self.characters.pop(name, None)
+        self.history.pop(name, None)
+
+    def add_combat_result(self, player_name, enemy_name, level, result, difficulty=None):
+        self.history.setdefault(player_name, []).append((enemy_name, level, result, timestamp(), difficulty))
+
+    def combat_history(self, player_name, limit):
+        entries = self.history.get(player_name, [])[-limit:] if limit > 0 else []
+        return [entry[:4] for entry in reversed(entries)]
+
+    def trim_combat_history(self, player_name, keep):
+        entries = self.history.get(player_name, [])
+        removed = max(0, len(entries) - keep)
+        del entries[:removed]
+        return removed
+
+    def load_settings(self):
+        return dict(self.settings)
+
+    def store_settings(self, values):
+        self.settings = {key: values[key] for key in DEFAULT_SETTINGS}
+
+    def add_leaderboard_entry(self, player_name, completion_time, total_damage, enemies_defeated, difficulty):
+        self.entries.append((player_name, completion_time, total_damage, enemies_defeated,
+                             difficulty, timestamp()))
+
+    def leaderboard(self, order_by, descending, limit):
+        if order_by not in LEADERBOARD_COLUMNS:
+            raise ValueError(f"Unknown leaderboard column: {order_by}")
+        col = LEADERBOARD_COLUMNS.index(order_by)
+        pick = heapq.nlargest if descending else heapq.nsmallest
+        return pick(limit, self.entries, key=lambda e: e[col])
+
+    def best_time(self, player_name):
+        times = [e[1] for e in self.entries if e[0] == player_name and e[1] is not None]
+        return min(times) if times else None
+
+    def load_aggregates(self):
+        return list(self.aggregates.values())
+
+    def store_aggregates(self, rows, replace=False):
+        if replace:
+            self.aggregates.clear()
+        for row in rows:
+            self.aggregates[tuple(row[:2])] = tuple(row)
+
+    def add_aggregates(self, rows):
+        for row in rows:
+            key = tuple(row[:2])
+            old = self.aggregates.get(key)
+            merged = merge_aggregate(old, row) if old else tuple(row)
+            if aggregate_is_empty(merged):
+                self.aggregates.pop(key, None)
+            else:
+                self.aggregates[key] = merged
+
+    def player_rows(self, table, player_name):
+        if table == 'combat_history':
+            return [dict(zip(TABLE_COLUMNS[table], (player_name,) + entry))
+                    for entry in self.history.get(player_name, [])]
+        return [dict(zip(LEADERBOARD_COLUMNS, entry)) for entry in self.entries if entry[0] == player_name]
+
+    def _table_rows(self, table):
+        if table == 'characters':
+            return (dict(row) for row in self.characters.values())
+        if table == 'combat_history':
+            return (dict(zip(TABLE_COLUMNS[table], (name,) + entry))
+                    for name, entries in self.history.items() for entry in entries)
+        return (dict(zip(LEADERBOARD_COLUMNS, entry)) for entry in self.entries)
+
+    def iter_table(self, table, after=None, chunk_size=1000):
+        start = -1 if after is None else after
+        for key, row in enumerate(self._table_rows(table)):
+            if key > start:
+                yield key, row
+
+    def insert_rows(self, table, rows):
+        columns = TABLE_COLUMNS[table]
+        for row in rows:
+            row = _fill_timestamps({col: row.get(col) for col in columns})
+            if table == 'characters':
+                self.characters[row['name']] = row
+            elif table == 'combat_history':
+                self.history.setdefault(row['player_name'], []).append(
+                    tuple(row[col] for col in columns[1:]))
+            else:
+                self.entries.append(tuple(row[col] for col in columns))
+
+
+class ShardedSQLiteBackend(StorageBackend):
+    """Players hashed across N SQLite files; settings live on shard 0.
+
+    Per-player operations touch one shard; leaderboard and save listings
+    merge the per-shard top-N results.
+
+    transaction() only joins the shards its block touches, each on first
+    use, so a player's write locks their shard and shard 0 (aggregates,
+    settings) rather than every file. Shard 0 is always joined first, so
+    concurrent transactions take shard locks in the same order. A commit
+    that spans shards is best-effort: each file commits on its own, so a
+    failure part-way can leave the earlier shards committed. Listings that
+    merge every shard read what is committed.
+    """
+
+    def __init__(self, db_name='nigerian_rpg.db', shards: int = 4, busy_timeout=BUSY_TIMEOUT,
+                 compact_history=False):
+        base = db_name[:-3] if db_name.endswith('.db') else db_name
+        self.shards = [SQLiteBackend(f"{base}.shard{i}.db", busy_timeout, compact_history)
+                       for i in range(shards)]
+        # This thread's open transaction() levels, outermost first: (ExitStack, joined shard indices)
+        self._local = threading.local()
+
+    def shard_index(self, name: str) -> int:
+        # crc32 rather than hash() so the mapping survives interpreter restarts
+        return zlib.crc32(name.encode('utf-8')) % len(self.shards)
+
+    def shard_for(self, name: str) -> SQLiteBackend:
+        return self._shard(self.shard_index(name))
+
+    def _shard(self, index: int) -> SQLiteBackend:
+        """Shard `index`, joined to every transaction() open on this thread"""
+        shard = self.shards[index]
+        for stack, joined in getattr(self._local, 'levels', ()):
+            if index not in joined:
+                if index and 0 not in joined:
+                    stack.enter_context(self.shards[0].transaction())
+                    joined.add(0)
+                stack.enter_context(shard.transaction())
+                joined.add(index)
+        return shard
+
+    def character_exists(self, name):
+        return self.shard_for(name).character_exists(name)
+
+    def load_character_row(self, name):
+        return self.shard_for(name).load_character_row(name)
+
+    def insert_character(self, row):
+        self.shard_for(row['name']).insert_character(row)
+
+    def update_character(self, name, changes):
+        self.shard_for(name).update_character(name, changes)
+
+    def list_saves(self, limit):
+        rows = [row for shard in self.shards for row in shard.list_saves(limit)]
+        return heapq.nlargest(limit, rows, key=lambda r: str(r[5]))
+
+    def delete_character(self, name):
+        self.shard_for(name).delete_character(name)
+
+    def add_combat_result(self, player_name, enemy_name, level, result, difficulty=None):
+        self.shard_for(player_name).add_combat_result(player_name, enemy_name, level, result, difficulty)
+
+    def combat_history(self, player_name, limit):
+        return self.shard_for(player_name).combat_history(player_name, limit)
+
+    def trim_combat_history(self, player_name, keep):
+        return self.shard_for(player_name).trim_combat_history(player_name, keep)
+
+    def load_settings(self):
+        return self._shard(0).load_settings()
+
+    def store_settings(self, values):
+        self._shard(0).store_settings(values)
+
+    def add_leaderboard_entry(self, player_name, *args):
+        self.shard_for(player_name).add_leaderboard_entry(player_name, *args)
+
+    def leaderboard(self, order_by, descending, limit):
+        col = LEADERBOARD_COLUMNS.index(order_by)
+        rows = [row for shard in self.shards for row in shard.leaderboard(order_by, descending, limit)]
+        pick = heapq.nlargest if descending else heapq.nsmallest
+        return pick(limit, rows, key=lambda e: e[col])
+
+    def best_time(self, player_name):
+        return self.shard_for(player_name).best_time(player_name)
+
+    def load_aggregates(self):
+        # Aggregates span every player, so they live on shard 0 with the settings
+        return self._shard(0).load_aggregates()
+
+    def store_aggregates(self, rows, replace=False):
+        self._shard(0).store_aggregates(rows, replace)
+
+    def add_aggregates(self, rows):
+        self._shard(0).add_aggregates(rows)
+
+    def player_rows(self, table, player_name):
+        return self.shard_for(player_name).player_rows(table, player_name)
+
+    def iter_table(self, table, after=None, chunk_size=1000):
+        start_shard, start_id = after if after is not None else (0, None)
+        for index in range(start_shard, len(self.shards)):
+            resume = start_id if index == start_shard else None
+            for key, row in self.shards[index].iter_table(table, resume, chunk_size):
+                yield [index, key], row
+
+    def insert_rows(self, table, rows):
+        owner = 'name' if table == 'characters' else 'player_name'
+        by_shard = {}
+        for row in rows:
+            by_shard.setdefault(self.shard_index(row[owner]), []).append(row)
+        for index in sorted(by_shard):
+            self._shard(index).insert_rows(table, by_shard[index])
+
+    @contextmanager
+    def transaction(self):
+        levels = self._local.__dict__.setdefault('levels', [])
+        with ExitStack() as stack:
+            levels.append((stack, set()))
+            try:
+                yield self
+            finally:
+                levels.pop()
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+"""
+storage_checks.py - Conformance and throughput checks for storage backends
+Every backend in storage.py must pass check_backend(). Run directly to
+check and benchmark all of them in a temporary directory:
+
+    python storage_checks.py [operations]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from analytics import CombatAggregates, combat_deltas
+from character import Character
+from save_system import SaveSystem
+from storage import MemoryBackend, SQLiteBackend, ShardedSQLiteBackend
+
+
+def _player(name, **overrides):
+    stats = dict(name=name, level=1, hp=100, max_hp=100, attack=5, defense=2,
+                 char_class="Soldier", weapon="Gun", sprite_path="soldier.png",
+                 skills={"Military Strike": {"power": 8, "type": "damage", "mult": 1.5}})
+    stats.update(overrides)
+    return Character(**stats)
+
+
+def check_backend(backend):
+    """Run the conformance checks through SaveSystem; raises AssertionError on failure"""
+    saves = SaveSystem(backend=backend)
+
+    # Characters: insert, delta update, reload
+    player = _player("Ade")
+    assert saves.save_character(player, 1)
+    assert not saves.save_character(player, 1), "clean character should not be rewritten"
+    player.take_damage(30)
+    player.gain_xp(60)
+    assert saves.save_character(player, 2)
+    loaded, level = saves.load_character("Ade")
+    assert loaded == player and level == 2, (loaded, level)
+    assert not loaded.is_dirty()
+    assert saves.load_character("Nobody") == (None, None)
+
+    # A second SaveSystem on the same backend must see the row as existing
+    other = SaveSystem(backend=backend)
+    fresh = _player("Ade", hp=1)
+    other.save_character(fresh, 3)
+    loaded, level = saves.load_character("Ade")
+    assert loaded.hp == 1 and level == 3 and loaded.level == 1
+
+    for name in ("Bola", "Chidi", "Dayo"):
+        saves.save_character(_player(name), 1)
+    names = [row[0] for row in saves.get_all_saves()]
+    assert sorted(names) == ["Ade", "Bola", "Chidi", "Dayo"], names
+    assert all(len(row) == 6 for row in saves.get_all_saves())
+
+    # Combat history: newest first, per player, limited
+    for i, result in enumerate(["Victory", "Victory", "Defeat"]):
+        saves.save_combat_result("Ade", f"Enemy{i}", i + 1, result)
+    saves.save_combat_result("Bola", "Bandit", 1, "Defeat")
+    history = saves.get_combat_history("Ade")
+    assert [h[0] for h in history] == ["Enemy2", "Enemy1", "Enemy0"], history
+    assert [h[2] for h in history] == ["Defeat", "Victory", "Victory"]
+    assert len(saves.get_combat_history("Ade", limit=2)) == 2
+    assert saves.get_combat_history("Nobody") == []
+
+    # Retention keeps a player's newest results and leaves other players alone
+    assert saves.trim_combat_history("Ade", 2) == 1
+    assert [h[0] for h in saves.get_combat_history("Ade")] == ["Enemy2", "Enemy1"]
+    assert saves.trim_combat_history("Ade", 2) == 0
+    assert len(saves.get_combat_history("Bola")) == 1
+
+    # Delete removes the character and its history only; the trimmed
+    # Enemy0 victory stays counted, the rest comes out of the analytics
+    saves.delete_save("Ade")
+    assert saves.load_character("Ade") == (None, None)
+    assert saves.get_combat_history("Ade") == []
+    assert len(saves.get_combat_history("Bola")) == 1
+    assert saves.stats.get("enemy", "Enemy0").wins == 1
+    assert ("enemy", "Enemy1") not in saves.stats.rows and ("enemy", "Enemy2") not in saves.stats.rows
+
+    # Settings round trip
+    saves.settings.difficulty = "Hard"
+    saves.settings.sound_enabled = False
+    saves.flush_settings(force=True)
+    reread = SaveSystem(backend=backend).settings
+    assert reread.difficulty == "Hard" and reread.sound_enabled is False
+    assert reread.music_enabled is True
+
+    # Leaderboard ordering and projections
+    for name, secs, dmg, kills in [("Bola", 300.0, 90, 3), ("Chidi", 200.0, 150, 5), ("Dayo", 250.0, 120, 4)]:
+        saves.save_to_leaderboard(name, secs, dmg, kills)
+    assert [r[0] for r in saves.get_leaderboard_fastest()] == ["Chidi", "Dayo", "Bola"]
+    assert [r[0] for r in saves.get_leaderboard_damage()] == ["Chidi", "Dayo", "Bola"]
+    assert [r[0] for r in saves.get_leaderboard_enemies(limit=2)] == ["Chidi", "Dayo"]
+    fastest = saves.get_leaderboard_fastest()[0]
+    assert fastest[1:4] == (200.0, 5, "Hard"), fastest
+    assert saves.get_player_best_time("Dayo") == 250.0
+    assert saves.get_player_best_time("Nobody") == float("inf")
+
+    # Analytics: incremental counters survive a reopen and match a rebuild,
+    # apart from the trimmed result a rebuild can no longer see
+    saves.save_combat_result("Bola", "Bandit", 1, "Victory")
+    assert saves.get_win_rate("enemy", "Bandit") == 0.5
+    assert saves.get_win_rate("class", "Soldier") == 2 / 3
+    assert saves.get_win_rate("difficulty", "Hard") == 1.0
+    hard = saves.stats.get("difficulty", "Hard")
+    assert (hard.runs, hard.min_time, hard.max_time, hard.total_kills) == (3, 200.0, 300.0, 12)
+    incremental = sorted(saves.stats.as_rows())
+    assert sorted(SaveSystem(backend=backend).stats.as_rows()) == incremental
+    trimmed = CombatAggregates(incremental)
+    trimmed.merge(combat_deltas("Enemy0", 1, "Victory", "Soldier", "Normal", sign=-1))
+    assert sorted(saves.rebuild_aggregates().as_rows()) == sorted(trimmed.as_rows())
+
+    # Two SaveSystems on one backend add onto each other's counters
+    first, second = SaveSystem(backend=backend), SaveSystem(backend=backend)
+    wins = saves.stats.get("enemy", "Bandit").wins
+    first.save_combat_result("Bola", "Bandit", 1, "Victory")
+    second.save_combat_result("Bola", "Bandit", 1, "Victory")
+    first.save_combat_result("Bola", "Bandit", 1, "Victory")
+    assert SaveSystem(backend=backend).stats.get("enemy", "Bandit").wins == wins + 3
+    return True
+
+
+def check_sharded_transactions(backend):
+    """Grouped writes join only the shards they touch, savepoints included"""
+    name = next(n for n in (f"Shard{i}" for i in range(100)) if backend.shard_index(n) > 1)
+    index = backend.shard_index(name)
+    rows = [agg.as_tuple() for agg in combat_deltas("Bandit", 1, "Victory")]
+
+    def joined():
+        return {i for i, shard in enumerate(backend.shards) if shard.pool._writer.in_transaction}
+
+    with backend.transaction():
+        backend.add_combat_result(name, "Bandit", 1, "Victory")
+        assert joined() == {0, index}, joined()
+        try:
+            with backend.transaction():
+                backend.add_combat_result(name, "Thief", 1, "Defeat")
+                raise RuntimeError("rolled back")
+        except RuntimeError:
+            pass
+        backend.add_aggregates(rows)
+        assert joined() == {0, index}, joined()
+    assert not joined()
+    assert [row[0] for row in backend.combat_history(name, 10)] == ["Bandit"]
+
+    try:
+        with backend.transaction():
+            backend.add_combat_result(name, "Bandit", 1, "Defeat")
+            raise RuntimeError("rolled back")
+    except RuntimeError:
+        pass
+    assert len(backend.combat_history(name, 10)) == 1 and not joined()
+
+
+def measure_throughput(backend, operations=2000) -> dict:
+    """Operations per second for the hot SaveSystem paths"""
+    saves = SaveSystem(backend=backend)
+    players = [_player(f"P{i}") for i in range(50)]
+    results = {}
+
+    start = time.perf_counter()
+    for i in range(operations):
+        player = players[i % len(players)]
+        player.take_damage(1)
+        saves.save_character(player, 1)
+    results["save_character"] = operations / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(operations):
+        saves.load_character(players[i % len(players)].name)
+    results["load_character"] = operations / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(operations):
+        saves.save_combat_result(players[i % len(players)].name, "Bandit", 1, "Victory")
+    results["save_combat_result"] = operations / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(operations):
+        saves.save_to_leaderboard(players[i % len(players)].name, 100.0 + i, i, 3)
+    results["save_to_leaderboard"] = operations / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(operations // 10):
+        saves.get_leaderboard_fastest()
+    results["get_leaderboard_fastest"] = (operations // 10) / (time.perf_counter() - start)
+    return results
+
+
+def stress_concurrency(backend, readers=4, writers=2, seconds=2.0) -> dict:
+    """Hammer one backend from several threads through a shared SaveSystem.
+
+    Readers poll the leaderboard and combat history (the UI / stats exporter),
+    writers save characters and results (the game / background writer).
+    Returns reads/s, writes/s and the number of "database is locked" errors.
+    """
+    saves = SaveSystem(backend=backend)
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "locked": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def tally(key, n=1):
+        with lock:
+            counts[key] += n
+
+    def run(work):
+        done = 0
+        try:
+            while not stop.is_set():
+                work(done)
+                done += 1
+        except sqlite3.OperationalError as e:
+            tally("locked" if "locked" in str(e) else "errors")
+        except Exception:
+            tally("errors")
+        return done
+
+    def reader(_):
+        def work(i):
+            saves.get_leaderboard_fastest()
+            saves.get_combat_history(f"W{i % writers}")
+        tally("reads", 2 * run(work))
+
+    def writer(index):
+        player = _player(f"W{index}")
+
+        def work(i):
+            player.take_damage(1) if player.hp > 1 else player.heal(100)
+            saves.save_character(player, 1)
+            saves.save_combat_result(player.name, "Bandit", 1, "Victory")
+            if i % 10 == 0:
+                saves.save_to_leaderboard(player.name, 100.0 + i, i, 3)
+        tally("writes", 2 * run(work))
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return {
+        "reads_per_sec": counts["reads"] / elapsed,
+        "writes_per_sec": counts["writes"] / elapsed,
+        "locked_errors": counts["locked"],
+        "other_errors": counts["errors"],
+    }
+
+
+def measure_history_layouts(directory, rows=200000, players=500) -> dict:
+    """On-disk size and scan speed of plain vs compact combat_history.
+
+    Both layouts get the same rows (enemy names from the level tables,
+    almost all Victory/Defeat results); sizes are measured after VACUUM.
+    """
+    enemies = ["Bandit", "Area Boy", "Kidnapper", "Armed Robber", "Politician"]
+    data = [{"player_name": f"Player{i % players:04d}", "enemy_name": enemies[i % len(enemies)],
+             "level": i % 3 + 1, "result": "Victory" if i % 4 else "Defeat",
+             "timestamp": f"2025-12-{1 + i % 28:02d} 12:{i % 60:02d}:{(i // 60) % 60:02d}"}
+            for i in range(rows)]
+    report = {}
+    for name, compact in (("plain", False), ("compact", True)):
+        path = os.path.join(directory, f"history_{name}.db")
+        backend = SQLiteBackend(path, compact_history=compact)
+        backend.insert_rows("combat_history", data)
+        with backend.pool.writer() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        backend.pool._writer.execute("VACUUM")
+
+        start = time.perf_counter()
+        for i in range(players):
+            backend.combat_history(f"Player{i:04d}", 10)
+        history_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scanned = sum(1 for _ in backend.iter_table("combat_history", chunk_size=5000))
+        scan_time = time.perf_counter() - start
+        backend.close()
+        report[name] = {
+            "bytes": os.path.getsize(path),
+            "history_queries_per_sec": players / history_time,
+            "rows_scanned_per_sec": scanned / scan_time,
+        }
+    return report
+
+
+def backend_factories(directory):
+    """Fresh instance of each backend, keyed by name"""
+    return {
+        "memory": lambda tag: MemoryBackend(),
+        "sqlite": lambda tag: SQLiteBackend(os.path.join(directory, f"{tag}.db")),
+        "sqlite-compact": lambda tag: SQLiteBackend(os.path.join(directory, f"{tag}_compact.db"),
+                                                    compact_history=True),
+        "sharded": lambda tag: ShardedSQLiteBackend(os.path.join(directory, f"{tag}_sharded.db"), shards=4),
+    }
+
+
+if __name__ == "__main__":
+    operations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, factory in backend_factories(tmp).items():
+            backend = factory("conformance")
+            check_backend(backend)
+            backend.close()
+            print(f"✅ {name}: conformance passed")
+            if name == "sharded":
+                backend = factory("transactions")
+                check_sharded_transactions(backend)
+                backend.close()
+                print(f"✅ {name}: transactions join only the shards they touch")
+
+            backend = factory("throughput")
+            for op, rate in measure_throughput(backend, operations).items():
+                print(f"   {op:<24} {rate:>12,.0f} ops/s")
+            backend.close()
+
+            backend = factory("stress")
+            stress = stress_concurrency(backend)
+            backend.close()
+            print(f"   concurrent: {stress['reads_per_sec']:,.0f} reads/s, "
+                  f"{stress['writes_per_sec']:,.0f} writes/s, "
+                  f"{stress['locked_errors']} locked, {stress['other_errors']} other errors")
+            assert stress["locked_errors"] == 0 and stress["other_errors"] == 0
+
+        layouts = measure_history_layouts(tmp, rows=max(operations * 50, 10000))
+        print("combat_history layouts:")
+        for name, stats in layouts.items():
+            print(f"   {name:<8} {stats['bytes'] / 1024:>10,.0f} KiB  "
+                  f"{stats['history_queries_per_sec']:>10,.0f} history queries/s  "
+                  f"{stats['rows_scanned_per_sec']:>12,.0f} rows scanned/s")
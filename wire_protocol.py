@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+wire_protocol.py - Compact binary battle state sync for remote clients
+Instead of the full Character dataclass and emoji log lines, each update
+is a struct-packed frame holding only the fields that changed since the
+snapshot the client last acknowledged, plus (event id, amount) pairs.
+
+Frame (version 1, little endian):
+    header   <BBHHH  version, kind (FULL/DELTA), seq, base seq, field mask
+    fields   one value per set mask bit, in FIELDS order
+    events   <B count, then <BH (event id, amount) each
+
+Run directly for the fuzz tests and a throughput benchmark:
+
+    python wire_protocol.py [messages]
+"""
+import json
+import random
+import struct
+import sys
+import time
+from typing import NamedTuple
+from character import create_player
+from combat import Combat, create_enemy_for_level
+
+PROTOCOL_VERSION = 1
+
+KIND_FULL = 0
+KIND_DELTA = 1
+
+# Animation states as drawn by battle_gui
+ANIMATION_STATES = ("normal", "damage", "victory")
+ANIM_NORMAL, ANIM_DAMAGE, ANIM_VICTORY = range(3)
+
+HEADER = struct.Struct("<BBHHH")
+EVENT_COUNT = struct.Struct("<B")
+EVENT = struct.Struct("<BH")
+MAX_EVENTS = 255
+SEQ_MASK = 0xFFFF
+HISTORY = 64  # snapshots kept on each side; older acks force a full frame
+
+
+class BattleState(NamedTuple):
+    """Everything a remote client needs to draw one battle frame"""
+    player_hp: int
+    player_max_hp: int
+    player_level: int
+    player_xp: int
+    player_xp_to_next: int
+    enemy_hp: int
+    enemy_max_hp: int
+    enemy_level: int
+    special_meter: int
+    special_uses: int
+    player_anim: int
+    enemy_anim: int
+    game_level: int
+    turn: int
+
+
+# struct format per BattleState field, in mask-bit order
+FIELD_FORMATS = ("H", "H", "H", "I", "I", "H", "H", "H", "H", "B", "B", "B", "B", "I")
+FIELDS = BattleState._fields
+ALL_FIELDS = (1 << len(FIELDS)) - 1
+_body_structs = {}
+
+
+class ProtocolError(ValueError):
+    """A frame could not be encoded or decoded"""
+
+
+def _body_struct(mask) -> struct.Struct:
+    """Struct for the fields present in mask (one per mask, built once)"""
+    body = _body_structs.get(mask)
+    if body is None:
+        body = _body_structs[mask] = struct.Struct(
+            "<" + "".join(fmt for i, fmt in enumerate(FIELD_FORMATS) if mask >> i & 1))
+    return body
+
+
+def _seq_newer(a, b) -> bool:
+    """True if sequence number a comes after b (with 16-bit wraparound)"""
+    return a != b and (a - b) & SEQ_MASK < 0x8000
+
+
+def state_from_combat(combat, game_level, special_meter=0, special_uses=0,
+                      player_anim=ANIM_NORMAL, enemy_anim=ANIM_NORMAL) -> BattleState:
+    player, enemy = combat.player, combat.enemy
+    return BattleState(player.hp, player.max_hp, player.level, player.xp, player.xp_to_next,
+                       enemy.hp, enemy.max_hp, enemy.level, special_meter, special_uses,
+                       player_anim, enemy_anim, game_level, combat.turn_count)
+
+
+class DeltaEncoder:
+    """Server side: encodes states as deltas against the last acked snapshot"""
+
+    def __init__(self, history=HISTORY):
+        self.history = history
+        self.seq = 0
+        self.sent = {}      # seq -> BattleState still awaiting an ack
+        self.acked = None   # (seq, BattleState) the client is known to have
+
+    def encode(self, state: BattleState, events=()) -> bytes:
+        """Frame for state plus (event_id, amount) pairs"""
+        self.seq = (self.seq + 1) & SEQ_MASK
+        acked = self.acked
+        if acked is None or (self.seq - acked[0]) & SEQ_MASK >= self.history:
+            kind, base_seq, mask = KIND_FULL, 0, ALL_FIELDS
+        else:
+            kind, (base_seq, base) = KIND_DELTA, acked
+            mask = 0
+            for i, (new, old) in enumerate(zip(state, base)):
+                if new != old:
+                    mask |= 1 << i
+        if len(events) > MAX_EVENTS:
+            raise ProtocolError(f"too many events in one frame ({len(events)})")
+        try:
+            frame = [HEADER.pack(PROTOCOL_VERSION, kind, self.seq, base_seq, mask),
+                     _body_struct(mask).pack(*(v for i, v in enumerate(state) if mask >> i & 1)),
+                     EVENT_COUNT.pack(len(events))]
+            frame.extend(EVENT.pack(event_id, amount) for event_id, amount in events)
+        except struct.error as e:
+            raise ProtocolError(f"value out of range: {e}") from None
+
+        self.sent[self.seq] = state
+        if len(self.sent) > self.history:
+            del self.sent[next(iter(self.sent))]
+        return b"".join(frame)
+
+    def ack(self, seq) -> bool:
+        """Client confirmed it decoded seq; later deltas are taken against it"""
+        state = self.sent.get(seq)
+        if state is None or (self.acked and not _seq_newer(seq, self.acked[0])):
+            return False
+        self.acked = (seq, state)
+        for old in [s for s in self.sent if not _seq_newer(s, seq)]:
+            del self.sent[old]
+        return True
+
+    def reset(self):
+        """Forget the client's baseline (e.g. after a reconnect) - next frame is full"""
+        self.acked = None
+        self.sent.clear()
+
+
+class DeltaDecoder:
+    """Client side: rebuilds full states from FULL and DELTA frames"""
+
+    def __init__(self, history=HISTORY):
+        self.history = history
+        self.states = {}  # seq -> BattleState decoded recently
+
+    def decode(self, data: bytes) -> tuple:
+        """Returns (seq, BattleState, [(event_id, amount), ...]); raises ProtocolError"""
+        if len(data) < HEADER.size:
+            raise ProtocolError("frame shorter than header")
+        version, kind, seq, base_seq, mask = HEADER.unpack_from(data)
+        if version != PROTOCOL_VERSION:
+            raise ProtocolError(f"unsupported protocol version {version}")
+        if mask & ~ALL_FIELDS:
+            raise ProtocolError(f"unknown fields in mask {mask:#06x}")
+        if kind == KIND_FULL:
+            if mask != ALL_FIELDS:
+                raise ProtocolError("full frame missing fields")
+            values = [0] * len(FIELDS)
+        elif kind == KIND_DELTA:
+            base = self.states.get(base_seq)
+            if base is None:
+                raise ProtocolError(f"delta against unknown snapshot {base_seq}")
+            values = list(base)
+        else:
+            raise ProtocolError(f"unknown frame kind {kind}")
+
+        body = _body_struct(mask)
+        offset = HEADER.size + body.size
+        if len(data) < offset + EVENT_COUNT.size:
+            raise ProtocolError("truncated frame")
+        present = iter(body.unpack_from(data, HEADER.size))
+        for i in range(len(FIELDS)):
+            if mask >> i & 1:
+                values[i] = next(present)
+        count, = EVENT_COUNT.unpack_from(data, offset)
+        offset += EVENT_COUNT.size
+        if len(data) != offset + count * EVENT.size:
+            raise ProtocolError("event list length mismatch")
+        events = [EVENT.unpack_from(data, offset + i * EVENT.size) for i in range(count)]
+
+        state = BattleState(*values)
+        self.states[seq] = state
+        if len(self.states) > self.history:
+            del self.states[next(iter(self.states))]
+        return seq, state, events
+
+
+# ============================================
+# FUZZ TESTS AND BENCHMARK
+# ============================================
+
+def _random_state(rng) -> BattleState:
+    return BattleState(*(rng.randrange(1 << (8 * struct.calcsize(fmt))) for fmt in FIELD_FORMATS))
+
+
+def _evolve(state, rng) -> BattleState:
+    """Change a few fields, like a real turn does"""
+    values = list(state)
+    for _ in range(rng.randint(0, 4)):
+        i = rng.randrange(len(values))
+        values[i] = rng.randrange(1 << (8 * struct.calcsize(FIELD_FORMATS[i])))
+    return BattleState(*values)
+
+
+def fuzz_roundtrip(iterations=20000, seed=0, loss=0.2, ack_loss=0.3) -> int:
+    """Lossy channel: every frame that arrives must decode to exactly what was sent"""
+    rng = random.Random(seed)
+    encoder, decoder = DeltaEncoder(), DeltaDecoder()
+    state = _random_state(rng)
+    delivered = 0
+    for _ in range(iterations):
+        state = _evolve(state, rng)
+        events = [(rng.randrange(256), rng.randrange(65536)) for _ in range(rng.randint(0, 3))]
+        frame = encoder.encode(state, events)
+        if rng.random() < loss:
+            continue
+        seq, decoded, decoded_events = decoder.decode(frame)
+        assert decoded == state, (decoded, state)
+        assert decoded_events == events
+        delivered += 1
+        if rng.random() >= ack_loss:
+            encoder.ack(seq)
+    return delivered
+
+
+def fuzz_decoder(iterations=20000, seed=1) -> int:
+    """Corrupted frames must either decode or raise ProtocolError - nothing else"""
+    rng = random.Random(seed)
+    encoder, decoder = DeltaEncoder(), DeltaDecoder()
+    state = _random_state(rng)
+    rejected = 0
+    for _ in range(iterations):
+        state = _evolve(state, rng)
+        frame = bytearray(encoder.encode(state, [(1, rng.randrange(100))]))
+        mutation = rng.randrange(4)
+        if mutation == 0:
+            frame[rng.randrange(len(frame))] ^= 1 << rng.randrange(8)
+        elif mutation == 1:
+            del frame[rng.randrange(len(frame)):]
+        elif mutation == 2:
+            frame += bytes(rng.randrange(256) for _ in range(rng.randint(1, 4)))
+        else:
+            frame = bytearray(rng.randrange(256) for _ in range(rng.randint(0, 40)))
+        try:
+            seq, _, _ = decoder.decode(bytes(frame))
+            encoder.ack(seq)
+        except ProtocolError:
+            rejected += 1
+    return rejected
+
+
+def _battle_trace(messages, seed=2) -> list:
+    """(BattleState, events, json_equivalent) from real simulated fights"""
+    rng = random.Random(seed)
+    random.seed(seed)
+    trace = []
+    while len(trace) < messages:
+        player = create_player("Bench", rng.choice(["Citizen", "Soldier", "Police"]))
+        for level in (1, 2, 3):
+            combat = Combat(player, create_enemy_for_level(level))
+            meter = 0
+            while len(trace) < messages and not combat.is_over()[0]:
+                msg = combat.player_attack() if rng.random() < 0.8 else combat.player_defend()
+                meter += player.get_weapon_damage()
+                events = [(combat.last_event, combat.last_amount)]
+                if not combat.is_over()[0]:
+                    msg += "\n" + combat.enemy_turn()
+                    events.append((combat.last_event, combat.last_amount))
+                state = state_from_combat(combat, level, meter, 0, ANIM_NORMAL, ANIM_DAMAGE)
+                legacy = dict(state._asdict(), message=msg, player_name=player.name,
+                              enemy=combat.enemy.name, skills=player.skills)
+                trace.append((state, events, legacy))
+            if combat.is_over()[1] != "player":
+                break
+            player.hp = player.max_hp
+    return trace
+
+
+def benchmark(messages=100000) -> dict:
+    """Encode/decode throughput and bytes per message vs the JSON equivalent"""
+    trace = _battle_trace(messages)
+    encoder, decoder = DeltaEncoder(), DeltaDecoder()
+
+    start = time.perf_counter()
+    frames = []
+    for state, events, _ in trace:
+        frames.append(encoder.encode(state, events))
+        encoder.ack(encoder.seq)
+    encode_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for frame in frames:
+        decoder.decode(frame)
+    decode_time = time.perf_counter() - start
+
+    json_bytes = sum(len(json.dumps(legacy, ensure_ascii=False).encode("utf-8")) for _, _, legacy in trace)
+    return {"messages": len(trace),
+            "encode_per_sec": len(trace) / encode_time,
+            "decode_per_sec": len(trace) / decode_time,
+            "bytes_per_message": sum(map(len, frames)) / len(frames),
+            "json_bytes_per_message": json_bytes / len(trace)}
+
+
+if __name__ == "__main__":
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    delivered = fuzz_roundtrip()
+    print(f"✅ round-trip fuzz: {delivered} frames decoded exactly over a lossy channel")
+    rejected = fuzz_decoder()
+    print(f"✅ corruption fuzz: {rejected} corrupted frames rejected cleanly, no crashes")
+    stats = benchmark(messages)
+    print(f"   {stats['messages']:,} messages: encode {stats['encode_per_sec']:,.0f} msg/s, "
+          f"decode {stats['decode_per_sec']:,.0f} msg/s")
+    print(f"   {stats['bytes_per_message']:.1f} bytes/message vs "
+          f"{stats['json_bytes_per_message']:.0f} as JSON with log text")